@@ -3,45 +3,39 @@ auth.py
 
 This module provides JWT-based authentication for FastAPI routes.
 
-Environment Variables:
-    JWT_SECRET (str): Secret key used to sign and verify JWT tokens.
-                      This must be defined in the environment.
-                      🚨 WARNING: Do not hardcode secrets in production.
+Configuration:
+    Settings.jwt_secret (str): Secret key used to sign and verify JWT tokens,
+                               read from the `JWT_SECRET` environment variable
+                               (see `llmops.config`). It is validated once at
+                               app startup rather than at import time.
+                               🚨 WARNING: Do not hardcode secrets in production.
 
 Dependencies:
     - fastapi.security.HTTPBearer: Used to extract Bearer token from request headers.
     - jwt.decode: Verifies and decodes the token.
 """
 
-import os
-
 import jwt
-from dotenv import load_dotenv
-from fastapi import HTTPException, Security
+from fastapi import Depends, HTTPException, Request, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jwt import PyJWTError
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Get JWT_SECRET from environment (required)
-JWT_SECRET = os.getenv("JWT_SECRET")
-if not JWT_SECRET:
-    raise RuntimeError(
-        "❌ JWT_SECRET is not set in the environment. Please define it in your .env"
-    )
-
-# JWT signing algorithm
-JWT_ALGORITHM = "HS256"
+from llmops.config import Settings, get_request_settings
+from llmops.timing import span
 
 # FastAPI security scheme to extract Bearer tokens from Authorization header
 security = HTTPBearer()
 
 
-def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Security(security)):
+def verify_jwt_token(
+    request: Request, credentials: HTTPAuthorizationCredentials = Security(security)
+):
     """
     Dependency function to verify a JWT token passed via Authorization header.
 
+    The signing secret and algorithm come from the settings of the app serving
+    the request.
+
     Returns:
         str: User identifier (`sub` claim) extracted from the token.
 
@@ -51,15 +45,40 @@ def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Security(securi
             - Expired
             - Missing the required `sub` claim
     """
-    try:
-        # Decode and validate JWT
-        payload = jwt.decode(
-            credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM]
-        )
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Token missing subject")
-        return user_id
-
-    except PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    settings = get_request_settings(request)
+    with span("auth"):
+        try:
+            # Decode and validate JWT
+            payload = jwt.decode(
+                credentials.credentials,
+                settings.jwt_secret,
+                algorithms=[settings.jwt_algorithm],
+            )
+        except PyJWTError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+    user_id = payload.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Token missing subject")
+    return user_id
+
+
+def require_admin(
+    user_id: str = Depends(verify_jwt_token),
+    settings: Settings = Depends(get_request_settings),
+):
+    """
+    Dependency function restricting a route to administrators.
+
+    The JWT is verified by `verify_jwt_token`; its subject must be listed in
+    `Settings.admin_users` (`LLMOPS_ADMIN_USERS`).
+
+    Returns:
+        str: Administrator user identifier.
+
+    Raises:
+        HTTPException: 401 for an invalid token, 403 for a non-admin subject.
+    """
+    if user_id not in settings.admin_users:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return user_id
@@ -0,0 +1 @@
+# Command-line tools operating on recorded usage data
@@ -0,0 +1,477 @@
+"""
+replay.py
+
+`llmops-replay`: re-issues recorded `usage_logs` traffic against a running service.
+
+Hand-written test traffic does not reproduce production load shapes. This tool
+streams `usage_logs` rows in id order (prompt, user, model, timestamp) from a
+read-only connection and sends each prompt to a target instance, keeping the
+original inter-arrival times scaled by `--speed` (1 = real time, 10 = ten times
+faster, 0 = as fast as `--concurrency` allows). The schedule is open-loop:
+requests are sent on time whether or not earlier ones finished, up to the
+concurrency cap; `max_lag_seconds` in the report shows when the cap held the
+schedule back.
+
+Rows without a stored prompt (dropped by the prompt retention policy, see
+`llmops.retention`, or ingested without one) are skipped and counted in the
+report, since sending them as empty prompts would distort the load;
+`--include-dropped` sends them with an empty prompt anyway.
+
+Requests carry the recorded user in `x-user-id` and a per-user JWT minted the
+same way as `/auth/token` (HS256 over `JWT_SECRET`, 15-minute expiry), so
+policies, per-client counters and metrics see the original users.
+
+The report compares the recorded latencies with the latencies observed by the
+replay (end-to-end, including network and queueing) at p50/p90/p95/p99,
+overall and per recorded model, and the recorded request rate with the
+achieved one. Quantiles come from `DDSketch`, so memory stays bounded for
+replays of any length.
+
+Usage:
+    llmops-replay --target http://localhost:8000 --speed 10
+    llmops-replay --db data/usage.db --model llama3 --limit 5000 --speed 0 --json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import httpx
+import jwt
+
+from llmops.database import iter_usage_logs
+from llmops.sketches import DDSketch
+
+# Validity of minted replay tokens, matching `/auth/token`
+TOKEN_TTL_SECONDS = 15 * 60
+
+# Quantiles compared in the report
+REPORT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+class TokenMinter:
+    """
+    Mints and caches one JWT per replayed user.
+
+    Attributes:
+        secret (str): Signing secret.
+        algorithm (str): JWT signing algorithm.
+        ttl (float): Token validity in seconds.
+    """
+
+    def __init__(
+        self, secret: str, algorithm: str = "HS256", ttl: float = TOKEN_TTL_SECONDS
+    ):
+        """
+        Args:
+            secret (str): Signing secret, i.e. the target's `JWT_SECRET`.
+            algorithm (str): Signing algorithm. Defaults to "HS256".
+            ttl (float): Token validity in seconds. Defaults to 15 minutes.
+        """
+        self.secret = secret
+        self.algorithm = algorithm
+        self.ttl = ttl
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+
+    def token(self, user: str) -> str:
+        """
+        Returns a valid token for `user`, minting a new one near expiry.
+
+        Args:
+            user (str): JWT subject.
+
+        Returns:
+            str: Encoded JWT.
+        """
+        now = time.time()
+        cached = self._tokens.get(user)
+        if cached is not None and cached[1] - now > min(60, self.ttl / 2):
+            return cached[0]
+        expires = now + self.ttl
+        token = jwt.encode(
+            {"sub": user, "exp": int(expires)}, self.secret, algorithm=self.algorithm
+        )
+        self._tokens[user] = (token, expires)
+        return token
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """
+    Converts a stored ISO-8601 timestamp to epoch seconds.
+
+    Args:
+        value (str, optional): Timestamp from `usage_logs.timestamp`.
+
+    Returns:
+        float or None: Epoch seconds, or None if missing or unparseable.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def schedule(entries: Iterable[Dict], speed: float) -> Iterator[Tuple[float, Dict]]:
+    """
+    Assigns each entry its send offset from the start of the replay.
+
+    Offsets preserve the recorded inter-arrival times divided by `speed`.
+    Entries without a usable timestamp, or recorded out of order, are sent
+    immediately after the previous one.
+
+    Args:
+        entries (Iterable[Dict]): Usage log entries in id order.
+        speed (float): Time compression factor; 0 sends everything at once.
+
+    Yields:
+        Tuple[float, Dict]: (offset in seconds, entry).
+    """
+    first = None
+    offset = 0.0
+    for entry in entries:
+        stamp = parse_timestamp(entry.get("timestamp"))
+        if speed > 0 and stamp is not None:
+            if first is None:
+                first = stamp
+            offset = max(offset, (stamp - first) / speed)
+        yield offset, entry
+
+
+@dataclass
+class ReplayReport:
+    """
+    Outcome of a replay run.
+
+    Attributes:
+        speed (float): Time compression factor used.
+        sent (int): Requests sent.
+        skipped (int): Rows without a stored prompt that were not sent.
+        succeeded (int): Requests answered with a 2xx status.
+        statuses (Dict[str, int]): Responses by status code ("error" for
+            transport failures).
+        first_timestamp (float, optional): Earliest recorded timestamp.
+        last_timestamp (float, optional): Latest recorded timestamp.
+        elapsed (float): Wall-clock duration of the replay.
+        max_lag (float): Largest delay of a send behind its schedule.
+        recorded (Dict[str, DDSketch]): Recorded latencies per model.
+        replayed (Dict[str, DDSketch]): Observed latencies of successful
+            requests per recorded model.
+    """
+
+    speed: float
+    sent: int = 0
+    skipped: int = 0
+    succeeded: int = 0
+    statuses: Dict[str, int] = field(default_factory=dict)
+    first_timestamp: Optional[float] = None
+    last_timestamp: Optional[float] = None
+    elapsed: float = 0.0
+    max_lag: float = 0.0
+    recorded: Dict[str, DDSketch] = field(default_factory=dict)
+    replayed: Dict[str, DDSketch] = field(default_factory=dict)
+
+    @staticmethod
+    def _compare(recorded: DDSketch, replayed: DDSketch) -> dict:
+        """Summarises two latency sketches and their per-quantile deltas."""
+        latencies = {}
+        for q in REPORT_QUANTILES:
+            before, after = recorded.quantile(q), replayed.quantile(q)
+            delta = None if before is None or after is None else after - before
+            latencies[f"p{q * 100:g}"] = {
+                "recorded": before,
+                "replayed": after,
+                "delta": delta,
+            }
+        return {
+            "recorded_count": recorded.count,
+            "replayed_count": replayed.count,
+            "latency_seconds": latencies,
+        }
+
+    def to_dict(self) -> dict:
+        """
+        Builds the JSON report.
+
+        Returns:
+            dict: Counts, throughput and latency comparisons, overall and per model.
+        """
+        recorded_all, replayed_all = DDSketch(), DDSketch()
+        for sketch in self.recorded.values():
+            recorded_all.merge(sketch)
+        for sketch in self.replayed.values():
+            replayed_all.merge(sketch)
+
+        recorded_rps = None
+        if self.first_timestamp is not None and self.last_timestamp is not None:
+            span_seconds = self.last_timestamp - self.first_timestamp
+            if span_seconds > 0:
+                recorded_rps = self.sent / span_seconds
+        replayed_rps = self.sent / self.elapsed if self.elapsed > 0 else None
+
+        return {
+            "speed": self.speed,
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "succeeded": self.succeeded,
+            "failed": self.sent - self.succeeded,
+            "statuses": self.statuses,
+            "elapsed_seconds": self.elapsed,
+            "max_lag_seconds": self.max_lag,
+            "throughput_rps": {
+                "recorded": recorded_rps,
+                "target": (
+                    recorded_rps * self.speed
+                    if recorded_rps is not None and self.speed > 0
+                    else None
+                ),
+                "replayed": replayed_rps,
+            },
+            "overall": self._compare(recorded_all, replayed_all),
+            "models": {
+                model: self._compare(
+                    self.recorded[model], self.replayed.get(model, DDSketch())
+                )
+                for model in sorted(self.recorded)
+            },
+        }
+
+
+async def replay(
+    entries: Iterable[Dict],
+    target: str,
+    minter: TokenMinter,
+    speed: float = 1.0,
+    endpoint: str = "/llm",
+    concurrency: int = 64,
+    timeout: float = 60.0,
+    client: Optional[httpx.AsyncClient] = None,
+    include_dropped: bool = False,
+) -> ReplayReport:
+    """
+    Replays usage log entries against a target service.
+
+    Args:
+        entries (Iterable[Dict]): Usage log entries in id order, e.g. from
+            `iter_usage_logs`.
+        target (str): Base URL of the service.
+        minter (TokenMinter): Source of per-user JWTs.
+        speed (float): Time compression factor; 0 replays as fast as possible.
+            Defaults to 1.
+        endpoint (str): Route receiving the prompts. Defaults to "/llm".
+        concurrency (int): Maximum requests in flight. Defaults to 64.
+        timeout (float): Per-request timeout in seconds. Defaults to 60.
+        client (httpx.AsyncClient, optional): Client to send with, e.g. bound
+            to an ASGI app in tests. Defaults to a new client for `target`.
+        include_dropped (bool): Send rows without a stored prompt with an
+            empty prompt instead of skipping them. Defaults to False.
+
+    Returns:
+        ReplayReport: Counts, timings and latency sketches of the run.
+    """
+    report = ReplayReport(speed=speed)
+    owns_client = client is None
+    if owns_client:
+        client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency),
+        )
+    url = target.rstrip("/") + endpoint
+    slots = asyncio.Semaphore(concurrency)
+    in_flight = set()
+
+    def replayable(entries: Iterable[Dict]) -> Iterator[Dict]:
+        for entry in entries:
+            if entry.get("prompt") is None and not include_dropped:
+                report.skipped += 1
+                continue
+            yield entry
+
+    async def send(entry: Dict):
+        model = entry.get("model") or "unknown"
+        user = entry.get("user") or "anonymous"
+        headers = {
+            "Authorization": f"Bearer {minter.token(user)}",
+            "x-user-id": user,
+        }
+        started = time.perf_counter()
+        try:
+            res = await client.post(
+                url, json={"prompt": entry.get("prompt") or ""}, headers=headers
+            )
+            status = str(res.status_code)
+            ok = res.is_success
+        except httpx.HTTPError:
+            status, ok = "error", False
+        finally:
+            slots.release()
+        latency = time.perf_counter() - started
+        report.statuses[status] = report.statuses.get(status, 0) + 1
+        if ok:
+            report.succeeded += 1
+            report.replayed.setdefault(model, DDSketch()).add(latency)
+
+    start = time.perf_counter()
+    try:
+        for offset, entry in schedule(replayable(entries), speed):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            report.max_lag = max(report.max_lag, time.perf_counter() - start - offset)
+
+            stamp = parse_timestamp(entry.get("timestamp"))
+            if stamp is not None:
+                if report.first_timestamp is None or stamp < report.first_timestamp:
+                    report.first_timestamp = stamp
+                if report.last_timestamp is None or stamp > report.last_timestamp:
+                    report.last_timestamp = stamp
+            if entry.get("latency") is not None:
+                model = entry.get("model") or "unknown"
+                report.recorded.setdefault(model, DDSketch()).add(entry["latency"])
+
+            report.sent += 1
+            task = asyncio.create_task(send(entry))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+    finally:
+        report.elapsed = time.perf_counter() - start
+        if owns_client:
+            await client.aclose()
+    return report
+
+
+def format_report(data: dict) -> str:
+    """
+    Renders a report dict as a human-readable table.
+
+    Args:
+        data (dict): Output of `ReplayReport.to_dict`.
+
+    Returns:
+        str: Multi-line summary.
+    """
+
+    def number(value, unit=""):
+        return "-" if value is None else f"{value:.3f}{unit}"
+
+    speed = "max" if data["speed"] <= 0 else f"{data['speed']:g}x"
+    rps = data["throughput_rps"]
+    lines = [
+        f"Replayed {data['sent']} requests at {speed} in "
+        f"{data['elapsed_seconds']:.2f}s ({data['failed']} failed, "
+        f"max lag {data['max_lag_seconds']:.3f}s, {data['skipped']} skipped "
+        "without a stored prompt)",
+        f"Statuses: {json.dumps(data['statuses'], sort_keys=True)}",
+        f"Throughput (req/s): recorded {number(rps['recorded'])}, "
+        f"target {number(rps['target'])}, replayed {number(rps['replayed'])}",
+    ]
+    sections = [("all models", data["overall"])] + list(data["models"].items())
+    for name, section in sections:
+        lines.append("")
+        lines.append(
+            f"{name}: {section['recorded_count']} recorded, "
+            f"{section['replayed_count']} replayed OK"
+        )
+        lines.append(f"  {'':6}{'recorded':>12}{'replayed':>12}{'delta':>12}")
+        for label, row in section["latency_seconds"].items():
+            lines.append(
+                f"  {label:6}{number(row['recorded'], 's'):>12}"
+                f"{number(row['replayed'], 's'):>12}{number(row['delta'], 's'):>12}"
+            )
+    return "\n".join(lines)
+
+
+def _filtered(
+    entries: Iterable[Dict], user: Optional[str], model: Optional[str]
+) -> Iterator[Dict]:
+    """Yields the entries matching the optional user and model filters."""
+    for entry in entries:
+        if user is not None and entry.get("user") != user:
+            continue
+        if model is not None and entry.get("model") != model:
+            continue
+        yield entry
+
+
+def main(argv=None) -> int:
+    """
+    Entry point of the `llmops-replay` console script.
+
+    Args:
+        argv (list, optional): Command-line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: Exit status; 1 if any replayed request failed.
+    """
+    from llmops.config import get_settings
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(
+        prog="llmops-replay",
+        description="Replay recorded usage_logs traffic against an LLMOps service.",
+    )
+    parser.add_argument("--db", default=settings.db_path, help="Source SQLite file")
+    parser.add_argument("--target", default="http://localhost:8000")
+    parser.add_argument("--endpoint", default="/llm", help="Route receiving prompts")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Time compression factor (1 = real time, 0 = as fast as possible)",
+    )
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--after-id", type=int, default=0, help="Skip ids up to this")
+    parser.add_argument("--limit", type=int, help="Replay at most this many rows")
+    parser.add_argument("--user", help="Only replay this user's requests")
+    parser.add_argument("--model", help="Only replay requests for this model")
+    parser.add_argument(
+        "--jwt-secret",
+        default=settings.jwt_secret,
+        help="Target's JWT_SECRET (defaults to the environment)",
+    )
+    parser.add_argument(
+        "--include-dropped",
+        action="store_true",
+        help="Also send rows whose prompt was not stored, with an empty prompt",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the JSON report")
+    args = parser.parse_args(argv)
+    if not args.jwt_secret:
+        parser.error("JWT_SECRET is not set; pass --jwt-secret")
+    if args.speed < 0 or args.concurrency < 1:
+        parser.error("--speed must be >= 0 and --concurrency >= 1")
+
+    entries = _filtered(
+        iter_usage_logs(args.db, after_id=args.after_id), args.user, args.model
+    )
+    if args.limit is not None:
+        entries = itertools.islice(entries, args.limit)
+    report = asyncio.run(
+        replay(
+            entries,
+            args.target,
+            TokenMinter(args.jwt_secret, settings.jwt_algorithm),
+            speed=args.speed,
+            endpoint=args.endpoint,
+            concurrency=args.concurrency,
+            timeout=args.timeout,
+            include_dropped=args.include_dropped,
+        )
+    )
+    data = report.to_dict()
+    print(json.dumps(data, indent=2) if args.json else format_report(data))
+    return 1 if data["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
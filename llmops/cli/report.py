@@ -0,0 +1,508 @@
+"""
+report.py
+
+`llmops-report`: offline usage reports over a SQLite `usage_logs` history.
+
+Ad-hoc `sqlite3` queries over a multi-GB history run on one core. This tool
+splits `usage_logs` into id ranges of `--chunk-rows` rows (ids are the
+rowid, so each range is a contiguous B-tree scan) and aggregates the ranges in
+a process pool, each worker with its own read-only connection. Partial
+aggregates are merged as they complete:
+
+- Per user and UTC day: requests and tokens.
+- Per model: requests, tokens, fallbacks, generation throughput (when the
+  timing columns exist) and latency quantiles from mergeable `DDSketch`es.
+- Top prompts by repeat count. Exact counts of every distinct prompt would
+  need memory for the whole history, so each range keeps a Misra-Gries
+  summary of `--prompt-capacity` prompts; summaries merge with the same
+  guarantee. Reported counts are lower bounds, at most `error` below the
+  true count (and exact when `error` is 0). Under a prompt retention policy
+  (`llmops.retention`) each stored prompt counts `1 / prompt_sample_rate`
+  times, an unbiased estimate of its requests; dropped prompts are skipped.
+
+A sharded store (`LLMOPS_STORAGE_BACKEND=sqlite_sharded`) is reported as a
+whole: the id ranges of every shard file go to the same pool and their
+aggregates are merged. Without `--db` the files of the configured backend are
+read.
+
+The live service is left alone: connections are read-only, the id range is
+fixed when the report starts (rows written meanwhile are excluded), and every
+range is a short read transaction, so the service's writers only ever wait for
+one chunk.
+
+Usage:
+    llmops-report --db data/usage.db
+    llmops-report --db data/usage.shard0.db data/usage.shard1.db
+    llmops-report --since 2025-01-01 --until 2025-02-01 --format csv --output reports/
+    llmops-report --jobs 8 --top 50 --output report.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from llmops.sketches import DDSketch
+
+# Rows aggregated per task, bounding worker memory and read transaction length
+DEFAULT_CHUNK_ROWS = 250_000
+
+# Prompts tracked per summary; counts are within `rows / (capacity + 1)`
+DEFAULT_PROMPT_CAPACITY = 10_000
+
+# Latency quantiles reported per model
+REPORT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def reduce_counts(counts: Dict[str, int], capacity: int) -> int:
+    """
+    Shrinks a Misra-Gries summary to at most `capacity` entries in place.
+
+    Subtracts the (capacity + 1)-th largest count from every entry and drops
+    those left at zero or below.
+
+    Args:
+        counts (Dict[str, int]): Item counts.
+        capacity (int): Entries to keep.
+
+    Returns:
+        int: Amount subtracted from each kept count (0 if nothing was dropped).
+    """
+    if len(counts) <= capacity:
+        return 0
+    cut = sorted(counts.values(), reverse=True)[capacity]
+    for item in list(counts):
+        counts[item] -= cut
+        if counts[item] <= 0:
+            del counts[item]
+    return cut
+
+
+@dataclass
+class ModelStats:
+    """
+    Usage totals of one model.
+
+    Attributes:
+        requests (int): Rows served by the model.
+        tokens (int): Tokens of those rows.
+        fallbacks (int): Rows where the model stood in for another one.
+        eval_tokens (int): Generated tokens reported by the model server.
+        eval_seconds (float): Generation time reported by the model server.
+        latency (DDSketch): Latency distribution.
+    """
+
+    requests: int = 0
+    tokens: int = 0
+    fallbacks: int = 0
+    eval_tokens: int = 0
+    eval_seconds: float = 0.0
+    latency: DDSketch = field(default_factory=DDSketch)
+
+    def merge(self, other: "ModelStats"):
+        """Adds another partial's totals into this one."""
+        self.requests += other.requests
+        self.tokens += other.tokens
+        self.fallbacks += other.fallbacks
+        self.eval_tokens += other.eval_tokens
+        self.eval_seconds += other.eval_seconds
+        self.latency.merge(other.latency)
+
+
+@dataclass
+class UsageAggregate:
+    """
+    Mergeable aggregate of a set of `usage_logs` rows.
+
+    Attributes:
+        rows (int): Rows aggregated.
+        user_days (Dict[Tuple[str, str], List[int]]): (user, day) ->
+            [requests, tokens].
+        models (Dict[str, ModelStats]): Totals per model.
+        prompts (Dict[str, int]): Misra-Gries summary of prompt counts.
+        prompt_error (int): Maximum undercount of any prompt in `prompts`.
+        prompt_capacity (int): Prompts kept by the summary.
+    """
+
+    rows: int = 0
+    user_days: Dict[Tuple[str, str], List[int]] = field(default_factory=dict)
+    models: Dict[str, ModelStats] = field(default_factory=dict)
+    prompts: Dict[str, int] = field(default_factory=dict)
+    prompt_error: int = 0
+    prompt_capacity: int = DEFAULT_PROMPT_CAPACITY
+
+    def merge(self, other: "UsageAggregate"):
+        """
+        Adds another aggregate into this one.
+
+        Args:
+            other (UsageAggregate): Aggregate of disjoint rows.
+
+        Returns:
+            None
+        """
+        self.rows += other.rows
+        for key, (requests, tokens) in other.user_days.items():
+            totals = self.user_days.setdefault(key, [0, 0])
+            totals[0] += requests
+            totals[1] += tokens
+        for model, stats in other.models.items():
+            self.models.setdefault(model, ModelStats()).merge(stats)
+        for prompt, count in other.prompts.items():
+            self.prompts[prompt] = self.prompts.get(prompt, 0) + count
+        self.prompt_error += other.prompt_error + reduce_counts(
+            self.prompts, self.prompt_capacity
+        )
+
+
+def _bound(value: Optional[str]) -> Optional[str]:
+    """Normalises an ISO-8601 date or timestamp to the stored UTC form."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """Opens a read-only connection that never writes to the database."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+def aggregate_range(
+    db_path: str,
+    first_id: int,
+    last_id: int,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    prompt_capacity: int = DEFAULT_PROMPT_CAPACITY,
+) -> UsageAggregate:
+    """
+    Aggregates the rows with ids in `[first_id, last_id]`. Runs in a worker.
+
+    Args:
+        db_path (str): SQLite database file.
+        first_id (int): First id of the range.
+        last_id (int): Last id of the range.
+        since (str, optional): Inclusive UTC ISO-8601 lower timestamp bound.
+        until (str, optional): Exclusive UTC ISO-8601 upper timestamp bound.
+        prompt_capacity (int): Prompts kept by the summary.
+
+    Returns:
+        UsageAggregate: Aggregate of the range.
+    """
+    where = "id BETWEEN ? AND ?"
+    params: list = [first_id, last_id]
+    if since:
+        where += " AND timestamp >= ?"
+        params.append(since)
+    if until:
+        where += " AND timestamp < ?"
+        params.append(until)
+
+    result = UsageAggregate(prompt_capacity=prompt_capacity)
+    conn = _connect(db_path)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(usage_logs)")}
+        for user, day, requests, tokens in conn.execute(
+            f"""
+            SELECT user, substr(timestamp, 1, 10), COUNT(*), COALESCE(SUM(tokens), 0)
+            FROM usage_logs WHERE {where} GROUP BY 1, 2
+            """,
+            params,
+        ):
+            result.user_days[(user, day)] = [requests, tokens]
+            result.rows += requests
+
+        fallback = "fallback_from IS NOT NULL" if "fallback_from" in columns else "0"
+        timings = (
+            "eval_count, eval_seconds" if "eval_seconds" in columns else "NULL, NULL"
+        )
+        for model, latency, tokens, fell_back, eval_count, eval_seconds in conn.execute(
+            f"SELECT model, latency, tokens, {fallback}, {timings} "
+            f"FROM usage_logs WHERE {where}",
+            params,
+        ):
+            stats = result.models.get(model)
+            if stats is None:
+                stats = result.models[model] = ModelStats()
+            stats.requests += 1
+            stats.tokens += tokens or 0
+            stats.fallbacks += fell_back
+            if eval_count is not None and eval_seconds:
+                stats.eval_tokens += eval_count
+                stats.eval_seconds += eval_seconds
+            if latency is not None:
+                stats.latency.add(latency)
+
+        weight = (
+            "1.0 / COALESCE(prompt_sample_rate, 1)"
+            if "prompt_sample_rate" in columns
+            else "1"
+        )
+        result.prompts = dict(
+            conn.execute(
+                f"""
+                SELECT prompt, CAST(ROUND(SUM({weight})) AS INTEGER) FROM usage_logs
+                WHERE {where} AND prompt IS NOT NULL GROUP BY prompt
+                """,
+                params,
+            )
+        )
+    finally:
+        conn.close()
+    result.prompt_error = reduce_counts(result.prompts, prompt_capacity)
+    return result
+
+
+def id_ranges(
+    db_path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS
+) -> Iterator[Tuple[int, int]]:
+    """
+    Splits the ids present when called into consecutive ranges.
+
+    Args:
+        db_path (str): SQLite database file.
+        chunk_rows (int): Ids per range. Defaults to 250,000.
+
+    Yields:
+        Tuple[int, int]: Inclusive (first id, last id) of each range.
+    """
+    conn = _connect(db_path)
+    try:
+        low, high = conn.execute("SELECT MIN(id), MAX(id) FROM usage_logs").fetchone()
+    finally:
+        conn.close()
+    if low is None:
+        return
+    for first in range(low, high + 1, chunk_rows):
+        yield first, min(first + chunk_rows - 1, high)
+
+
+def build_report(
+    db_paths: Union[str, Sequence[str]],
+    jobs: Optional[int] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    prompt_capacity: int = DEFAULT_PROMPT_CAPACITY,
+) -> UsageAggregate:
+    """
+    Aggregates whole databases, in parallel when there are several ranges.
+
+    Args:
+        db_paths (str or Sequence[str]): SQLite database file, or the files of
+            a sharded store; their rows are aggregated together.
+        jobs (int, optional): Worker processes. Defaults to the CPU count;
+            1 aggregates in this process.
+        chunk_rows (int): Ids per range. Defaults to 250,000.
+        since (str, optional): Inclusive ISO-8601 lower bound; naive values are UTC.
+        until (str, optional): Exclusive ISO-8601 upper bound; naive values are UTC.
+        prompt_capacity (int): Prompts kept by the summaries.
+
+    Returns:
+        UsageAggregate: Aggregate of every matching row.
+
+    Raises:
+        sqlite3.OperationalError: If the database cannot be opened.
+        ValueError: If a bound is not ISO-8601.
+    """
+    since, until = _bound(since), _bound(until)
+    if isinstance(db_paths, str):
+        db_paths = [db_paths]
+    ranges = [
+        (path, first, last)
+        for path in db_paths
+        for first, last in id_ranges(path, chunk_rows)
+    ]
+    total = UsageAggregate(prompt_capacity=prompt_capacity)
+    jobs = min(jobs or os.cpu_count() or 1, len(ranges))
+    if jobs <= 1:
+        for path, first, last in ranges:
+            total.merge(
+                aggregate_range(path, first, last, since, until, prompt_capacity)
+            )
+        return total
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(
+                aggregate_range, path, first, last, since, until, prompt_capacity
+            )
+            for path, first, last in ranges
+        ]
+        for future in futures:
+            total.merge(future.result())
+    return total
+
+
+def report_tables(aggregate: UsageAggregate, top: int = 20) -> Dict[str, List[dict]]:
+    """
+    Renders an aggregate as report tables.
+
+    Args:
+        aggregate (UsageAggregate): Merged aggregate.
+        top (int): Prompts listed. Defaults to 20.
+
+    Returns:
+        Dict[str, List[dict]]: Rows of the "user_daily", "models" and
+            "top_prompts" tables.
+    """
+    user_daily = [
+        {"day": day, "user": user, "requests": requests, "tokens": tokens}
+        for (user, day), (requests, tokens) in sorted(
+            aggregate.user_days.items(), key=lambda item: (item[0][1], item[0][0])
+        )
+    ]
+    models = []
+    for model, stats in sorted(
+        aggregate.models.items(), key=lambda item: -item[1].requests
+    ):
+        row = {
+            "model": model,
+            "requests": stats.requests,
+            "share": stats.requests / aggregate.rows if aggregate.rows else 0.0,
+            "tokens": stats.tokens,
+            "fallbacks": stats.fallbacks,
+            "eval_tokens_per_second": (
+                stats.eval_tokens / stats.eval_seconds if stats.eval_seconds else None
+            ),
+            "mean_latency_seconds": (
+                stats.latency.total / stats.latency.count
+                if stats.latency.count
+                else None
+            ),
+        }
+        for q in REPORT_QUANTILES:
+            row[f"p{q * 100:g}_latency_seconds"] = stats.latency.quantile(q)
+        models.append(row)
+    top_prompts = [
+        {"prompt": prompt, "requests": count, "error": aggregate.prompt_error}
+        for prompt, count in sorted(
+            aggregate.prompts.items(), key=lambda item: (-item[1], item[0])
+        )[:top]
+    ]
+    return {"user_daily": user_daily, "models": models, "top_prompts": top_prompts}
+
+
+def write_csv(tables: Dict[str, List[dict]], directory: str) -> List[str]:
+    """
+    Writes each table to `<directory>/<table>.csv`.
+
+    Args:
+        tables (Dict[str, List[dict]]): Output of `report_tables`.
+        directory (str): Destination directory; created if missing.
+
+    Returns:
+        List[str]: Paths written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, rows in tables.items():
+        path = os.path.join(directory, f"{name}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as out:
+            if rows:
+                writer = csv.DictWriter(out, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None) -> int:
+    """
+    Entry point of the `llmops-report` console script.
+
+    Args:
+        argv (list, optional): Command-line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: Exit status.
+    """
+    from llmops.config import Settings
+    from llmops.storage.sharded_sqlite import sqlite_paths
+
+    settings = Settings.from_env()
+    parser = argparse.ArgumentParser(
+        prog="llmops-report",
+        description="Aggregate a usage_logs SQLite history into usage reports.",
+    )
+    parser.add_argument(
+        "--db",
+        nargs="+",
+        default=sqlite_paths(
+            settings.db_path, settings.storage_backend, settings.sqlite_shards
+        ),
+        help="Source SQLite files, e.g. every shard of a sharded store "
+        "(defaults to the configured backend's files)",
+    )
+    parser.add_argument("--since", help="Inclusive ISO-8601 start (UTC if naive)")
+    parser.add_argument("--until", help="Exclusive ISO-8601 end (UTC if naive)")
+    parser.add_argument(
+        "--jobs", type=int, help="Worker processes (defaults to the CPU count)"
+    )
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--top", type=int, default=20, help="Top prompts listed")
+    parser.add_argument(
+        "--prompt-capacity",
+        type=int,
+        default=DEFAULT_PROMPT_CAPACITY,
+        help="Prompts tracked per summary (bounds memory and count error)",
+    )
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument(
+        "--output",
+        help="JSON file, or CSV directory (required for csv); JSON defaults to stdout",
+    )
+    args = parser.parse_args(argv)
+    if args.format == "csv" and not args.output:
+        parser.error("--format csv requires --output DIRECTORY")
+    if args.chunk_rows < 1 or args.top < 0 or args.prompt_capacity < 1:
+        parser.error("--chunk-rows and --prompt-capacity must be >= 1, --top >= 0")
+    for path in args.db:
+        if not os.path.exists(path):
+            parser.error(f"database not found: {path}")
+
+    started = time.perf_counter()
+    try:
+        aggregate = build_report(
+            args.db,
+            jobs=args.jobs,
+            chunk_rows=args.chunk_rows,
+            since=args.since,
+            until=args.until,
+            prompt_capacity=args.prompt_capacity,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    tables = report_tables(aggregate, top=args.top)
+    elapsed = time.perf_counter() - started
+
+    if args.format == "csv":
+        for path in write_csv(tables, args.output):
+            print(path)
+    else:
+        document = json.dumps(
+            {"rows": aggregate.rows, "elapsed_seconds": elapsed, **tables}, indent=2
+        )
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as out:
+                out.write(document + "\n")
+        else:
+            print(document)
+    print(f"Aggregated {aggregate.rows} rows in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+"""
+search_index.py
+
+`llmops-search-index`: builds the prompt search index of existing databases.
+
+Databases that held usage rows before the FTS5 prompt index existed get the
+index and its triggers on first open, with the older rows recorded as pending
+(see `llmops.storage.search_index`). This command indexes those rows in short
+transactions, pausing between chunks, so it can run in the background next to
+the live service. Interrupted runs resume where they stopped.
+
+`--rebuild` instead rebuilds the whole index in one transaction, which blocks
+writers until it finishes; use it to repair an index offline.
+
+Without `--db`, the files of the configured backend are processed: the
+SQLite database, or every shard of the sharded backend.
+
+Usage:
+    llmops-search-index
+    llmops-search-index --db data/usage.db --chunk-rows 20000 --pause 0.05
+    llmops-search-index --status
+    llmops-search-index --rebuild
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from llmops.storage.search_index import (
+    backfill_search_index,
+    pending_rows,
+    rebuild_search_index,
+)
+from llmops.storage.sqlite_store import ensure_usage_table
+
+
+def configured_paths() -> list:
+    """
+    Returns the SQLite files of the configured storage backend.
+
+    Returns:
+        list: `LLMOPS_DB_PATH`, or its shard files for "sqlite_sharded".
+    """
+    from llmops.config import Settings
+
+    from llmops.storage.sharded_sqlite import sqlite_paths
+
+    settings = Settings.from_env()
+    return sqlite_paths(
+        settings.db_path, settings.storage_backend, settings.sqlite_shards
+    )
+
+
+def main(argv=None) -> int:
+    """
+    Entry point of the `llmops-search-index` console script.
+
+    Args:
+        argv (list, optional): Command-line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: Exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog="llmops-search-index",
+        description="Index the prompts of existing usage_logs rows for /logs/search.",
+    )
+    parser.add_argument(
+        "--db", nargs="+", help="SQLite files (defaults to the configured backend)"
+    )
+    parser.add_argument("--chunk-rows", type=int, default=5000)
+    parser.add_argument(
+        "--pause",
+        type=float,
+        default=0.01,
+        help="Seconds between chunks, leaving the write lock to the service",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--rebuild", action="store_true", help="Rebuild in one blocking transaction"
+    )
+    mode.add_argument("--status", action="store_true", help="Only report pending rows")
+    args = parser.parse_args(argv)
+    if args.chunk_rows < 1 or args.pause < 0:
+        parser.error("--chunk-rows must be >= 1 and --pause >= 0")
+
+    for path in args.db or configured_paths():
+        if not os.path.exists(path):
+            parser.error(f"database not found: {path}")
+        started = time.perf_counter()
+        if args.status:
+            conn = sqlite3.connect(path)
+            try:
+                ensure_usage_table(conn, path)
+                print(f"{path}: {pending_rows(conn)} ids pending")
+            finally:
+                conn.close()
+            continue
+        if args.rebuild:
+            rows = rebuild_search_index(path)
+        else:
+            rows = backfill_search_index(
+                path,
+                chunk_rows=args.chunk_rows,
+                pause=args.pause,
+                progress=lambda done, left: print(
+                    f"{path}: {done} rows indexed, {left} ids pending",
+                    file=sys.stderr,
+                ),
+            )
+        print(f"{path}: indexed {rows} rows in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
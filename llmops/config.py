@@ -0,0 +1,381 @@
+"""
+config.py
+
+Typed application settings for the LLMOps service.
+
+All environment-driven configuration is read here, once, into a frozen
+`Settings` object. `create_app(settings)` in `main.py` attaches it to
+`app.state.settings`, and routes receive it through the `get_request_settings`
+dependency, so tests can build an app from explicit settings without touching
+the process environment.
+
+Reading settings has no side effects: `.env` is only loaded by `get_settings()`,
+and required values are checked by `Settings.validate()` during app startup
+rather than at import time.
+
+Environment Variables:
+    JWT_SECRET (str): Secret key used to sign and verify JWT tokens. Required.
+    LLMOPS_DB_PATH (str): SQLite database file. Defaults to "data/usage.db".
+    LLMOPS_STORAGE_BACKEND (str): Usage log backend, "sqlite", "segment_log" or "sqlite_sharded". Defaults to "sqlite".
+    LLMOPS_SEGMENT_DIR (str): Segment log directory for the "segment_log" backend. Defaults to "data/segments".
+    LLMOPS_SQLITE_SHARDS (int): SQLite files of the "sqlite_sharded" backend. Defaults to 4.
+    LLM_MODE (str): "simulation", "openai" or "ollama". Defaults to "simulation".
+    OLLAMA_MODEL (str): Default Ollama model. Defaults to "llama3".
+    OLLAMA_URL (str): Base URL of the Ollama HTTP API. Defaults to "http://localhost:11434".
+    LLMOPS_BATCH_CONCURRENCY (int): Max parallel prompts per /llm/batch call. Defaults to 8.
+    LLMOPS_BATCH_MAX_PROMPTS (int): Max prompts per /llm/batch call. Defaults to 500.
+    LLMOPS_INGEST_BATCH_SIZE (int): Events per /ingest transaction. Defaults to 5000.
+    LLMOPS_ENABLE_INGEST (bool): Mount the /ingest route. Defaults to true.
+    LLMOPS_ENABLE_INSTRUMENTATOR (bool): Attach prometheus-fastapi-instrumentator. Defaults to true.
+    LLMOPS_ADMIN_USERS (str): Comma-separated JWT subjects with admin rights. Defaults to "admin".
+    LLMOPS_ENABLE_PROFILER (bool): Mount the admin profiling routes. Defaults to true.
+    LLMOPS_SERVER_TIMING (bool): Add a Server-Timing header with stage timings. Defaults to false.
+    LLMOPS_ENABLE_COMPRESSION (bool): Compress responses with zstd/gzip when accepted. Defaults to true.
+    LLMOPS_COMPRESSION_MIN_BYTES (int): Smallest response body that is compressed. Defaults to 1024.
+    LLMOPS_LB_STRATEGY (str): "least_outstanding" or "latency_weighted". Defaults to "least_outstanding".
+    LLMOPS_HEALTH_CHECK_INTERVAL (float): Seconds between backend probes, 0 disables. Defaults to 10.
+    LLMOPS_BREAKER_FAILURE_RATIO (float): Failure ratio that opens a backend circuit. Defaults to 0.5.
+    LLMOPS_BREAKER_SLOW_CALL_SECONDS (float): Calls slower than this count as failures. Defaults to 10.
+    LLMOPS_BREAKER_OPEN_SECONDS (float): Open-circuit cool-down before probing. Defaults to 30.
+    LLMOPS_HEDGE_REQUESTS (bool): Hedge upstream calls slower than the backend p95. Defaults to false.
+    LLMOPS_CONCURRENCY_ALGORITHM (str): Adaptive upstream limit, "gradient", "aimd" or "none". Defaults to "gradient".
+    LLMOPS_CONCURRENCY_INITIAL_LIMIT (int): Starting in-flight limit per model. Defaults to 20.
+    LLMOPS_CONCURRENCY_MAX_LIMIT (int): Highest in-flight limit per model. Defaults to 200.
+    LLMOPS_CONCURRENCY_AIMD_LATENCY_SECONDS (float): Average latency that makes AIMD back off. Defaults to 5.
+    LLMOPS_WARMUP_INTERVAL (float): Seconds between model warm-up/keep-alive rounds, 0 disables. Defaults to 30.
+    LLMOPS_KEEP_ALIVE_SECONDS (float): How long Ollama keeps a model loaded after a call. Defaults to 1800.
+    LLMOPS_KEEP_ALIVE_IDLE_SECONDS (float): Time without calls before a model is left to unload. Defaults to 3600.
+    LLMOPS_LIVE_BUFFER_SIZE (int): Undelivered live events kept per subscriber. Defaults to 1000.
+    LLMOPS_LIVE_REPLAY_SIZE (int): Recent live events kept for resuming clients. Defaults to 1000.
+    LLMOPS_QUERY_CACHE_SIZE (int): Cached usage query results, 0 disables. Defaults to 256.
+    LLMOPS_QUERY_CACHE_MAX_ROWS (int): Rows held across cached results. Defaults to 50000.
+    LLMOPS_MCP_RELOAD_INTERVAL (float): Seconds between MCP file checks, 0 disables. Defaults to 2.
+    LLMOPS_CLIENT_COUNTERS_PATH (str): File shared by workers for per-client counters. Defaults to private memory.
+    LLMOPS_CLIENT_COUNTER_SLOTS (int): Maximum distinct clients counted. Defaults to 4096.
+    LLMOPS_CLIENT_SNAPSHOT_INTERVAL (float): Seconds between counter snapshots to SQLite. Defaults to 30.
+    LLMOPS_TOP_USERS (int): Heaviest users given their own metric label. Defaults to 20.
+    LLMOPS_QUANTILE_WINDOW_SECONDS (int): Length of one latency sketch window. Defaults to 60.
+    LLMOPS_QUANTILE_RETENTION_WINDOWS (int): Latency sketch windows kept in memory. Defaults to 60.
+    LLMOPS_FINGERPRINT_WINDOW (int): Recent prompts indexed for duplicate detection, 0 disables. Defaults to 20000.
+    LLMOPS_FINGERPRINT_THRESHOLD (float): Similarity at which prompts are near duplicates. Defaults to 0.8.
+    LLMOPS_PROMPT_SAMPLE_RATE (float): Share of prompts stored at random; 1 stores every prompt (no retention policy). Defaults to 1.
+    LLMOPS_PROMPT_LATENCY_PERCENTILE (float): Per-model latency percentile above which prompts are stored, 0 disables. Defaults to 0.99.
+    LLMOPS_PROMPT_FLAGGED_USERS (str): Comma-separated users whose prompts are always stored. Defaults to none.
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Mapping, Optional, Tuple
+
+from fastapi import Request
+
+
+def _env_bool(value: Optional[str], default: bool) -> bool:
+    """
+    Parses a boolean environment value.
+
+    Args:
+        value (str, optional): Raw value, e.g. "true", "0", "off".
+        default (bool): Value used when `value` is unset or empty.
+
+    Returns:
+        bool: Parsed flag.
+    """
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Immutable application settings.
+
+    Attributes:
+        jwt_secret (str, optional): Secret key for signing and verifying JWTs.
+        jwt_algorithm (str): JWT signing algorithm.
+        db_path (str): SQLite database file path.
+        storage_backend (str): Usage log storage backend.
+        segment_dir (str): Directory of the segment log backend.
+        sqlite_shards (int): Shard files of the sharded SQLite backend.
+        llm_mode (str): Active LLM backend mode.
+        ollama_model (str): Default Ollama model name.
+        ollama_url (str): Base URL of the Ollama HTTP API.
+        batch_concurrency (int): Max parallel prompts per batch request.
+        batch_max_prompts (int): Max prompts accepted per batch request.
+        ingest_batch_size (int): Events per ingestion transaction.
+        enable_ingest (bool): Whether the /ingest route is mounted.
+        enable_instrumentator (bool): Whether default HTTP instrumentation is attached.
+        admin_users (Tuple[str, ...]): JWT subjects allowed to use admin routes.
+        enable_profiler (bool): Whether the admin profiling routes are mounted.
+        server_timing (bool): Whether responses carry a Server-Timing header.
+        enable_compression (bool): Whether response bodies are compressed.
+        compression_min_bytes (int): Smallest response body that is compressed.
+        lb_strategy (str): Backend balancing strategy.
+        health_check_interval (float): Seconds between active backend probes.
+        breaker_failure_ratio (float): Failure ratio that opens a backend circuit.
+        breaker_slow_call_seconds (float): Latency counted as a failure by breakers.
+        breaker_open_seconds (float): Open-circuit cool-down.
+        hedge_requests (bool): Whether slow upstream calls are hedged.
+        concurrency_algorithm (str): Adaptive upstream concurrency algorithm.
+        concurrency_initial_limit (int): Starting in-flight limit per model.
+        concurrency_max_limit (int): Highest in-flight limit per model.
+        concurrency_aimd_latency_seconds (float): AIMD slow-window threshold.
+        warmup_interval (float): Seconds between model warm-up rounds.
+        keep_alive_seconds (float): Ollama keep-alive sent with upstream calls.
+        keep_alive_idle_seconds (float): Idle time before a model is left to unload.
+        live_buffer_size (int): Per-subscriber bound of the live event stream.
+        live_replay_size (int): Events retained for live stream resume.
+        query_cache_size (int): Maximum cached usage query results.
+        query_cache_max_rows (int): Maximum rows across cached query results.
+        mcp_reload_interval (float): Seconds between registry/policy file checks.
+        client_counters_path (str): Shared per-client counter file ("" = private).
+        client_counter_slots (int): Capacity of the per-client counter table.
+        client_snapshot_interval (float): Seconds between counter snapshots.
+        top_users (int): Users labelled individually in request metrics.
+        quantile_window_seconds (int): Length of one latency sketch window.
+        quantile_retention_windows (int): Latency sketch windows retained.
+        fingerprint_window (int): Recent prompts indexed for duplicate detection.
+        fingerprint_threshold (float): Similarity of near-duplicate prompts.
+        prompt_sample_rate (float): Share of prompts stored by head sampling.
+        prompt_latency_percentile (float): Latency percentile of stored outliers.
+        prompt_flagged_users (Tuple[str, ...]): Users whose prompts are always stored.
+    """
+
+    jwt_secret: Optional[str] = None
+    jwt_algorithm: str = "HS256"
+    db_path: str = "data/usage.db"
+    storage_backend: str = "sqlite"
+    segment_dir: str = "data/segments"
+    sqlite_shards: int = 4
+    llm_mode: str = "simulation"
+    ollama_model: str = "llama3"
+    ollama_url: str = "http://localhost:11434"
+    batch_concurrency: int = 8
+    batch_max_prompts: int = 500
+    ingest_batch_size: int = 5000
+    enable_ingest: bool = True
+    enable_instrumentator: bool = True
+    admin_users: Tuple[str, ...] = ("admin",)
+    enable_profiler: bool = True
+    server_timing: bool = False
+    enable_compression: bool = True
+    compression_min_bytes: int = 1024
+    lb_strategy: str = "least_outstanding"
+    health_check_interval: float = 10.0
+    breaker_failure_ratio: float = 0.5
+    breaker_slow_call_seconds: float = 10.0
+    breaker_open_seconds: float = 30.0
+    hedge_requests: bool = False
+    concurrency_algorithm: str = "gradient"
+    concurrency_initial_limit: int = 20
+    concurrency_max_limit: int = 200
+    concurrency_aimd_latency_seconds: float = 5.0
+    warmup_interval: float = 30.0
+    keep_alive_seconds: float = 1800.0
+    keep_alive_idle_seconds: float = 3600.0
+    live_buffer_size: int = 1000
+    live_replay_size: int = 1000
+    query_cache_size: int = 256
+    query_cache_max_rows: int = 50000
+    mcp_reload_interval: float = 2.0
+    client_counters_path: str = ""
+    client_counter_slots: int = 4096
+    client_snapshot_interval: float = 30.0
+    top_users: int = 20
+    quantile_window_seconds: int = 60
+    quantile_retention_windows: int = 60
+    fingerprint_window: int = 20000
+    fingerprint_threshold: float = 0.8
+    prompt_sample_rate: float = 1.0
+    prompt_latency_percentile: float = 0.99
+    prompt_flagged_users: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_env(cls, env: Optional[Mapping[str, str]] = None) -> "Settings":
+        """
+        Builds settings from environment variables.
+
+        Args:
+            env (Mapping[str, str], optional): Source mapping. Defaults to `os.environ`.
+
+        Returns:
+            Settings: Parsed settings with defaults for unset values.
+        """
+        env = os.environ if env is None else env
+        return cls(
+            jwt_secret=env.get("JWT_SECRET") or None,
+            db_path=env.get("LLMOPS_DB_PATH", cls.db_path),
+            storage_backend=env.get("LLMOPS_STORAGE_BACKEND", cls.storage_backend),
+            segment_dir=env.get("LLMOPS_SEGMENT_DIR", cls.segment_dir),
+            sqlite_shards=int(env.get("LLMOPS_SQLITE_SHARDS", cls.sqlite_shards)),
+            llm_mode=env.get("LLM_MODE", cls.llm_mode),
+            ollama_model=env.get("OLLAMA_MODEL", cls.ollama_model),
+            ollama_url=env.get("OLLAMA_URL", cls.ollama_url).rstrip("/"),
+            batch_concurrency=int(
+                env.get("LLMOPS_BATCH_CONCURRENCY", cls.batch_concurrency)
+            ),
+            batch_max_prompts=int(
+                env.get("LLMOPS_BATCH_MAX_PROMPTS", cls.batch_max_prompts)
+            ),
+            ingest_batch_size=int(
+                env.get("LLMOPS_INGEST_BATCH_SIZE", cls.ingest_batch_size)
+            ),
+            enable_ingest=_env_bool(env.get("LLMOPS_ENABLE_INGEST"), True),
+            enable_instrumentator=_env_bool(
+                env.get("LLMOPS_ENABLE_INSTRUMENTATOR"), True
+            ),
+            admin_users=tuple(
+                user.strip()
+                for user in env.get("LLMOPS_ADMIN_USERS", "admin").split(",")
+                if user.strip()
+            ),
+            enable_profiler=_env_bool(env.get("LLMOPS_ENABLE_PROFILER"), True),
+            server_timing=_env_bool(env.get("LLMOPS_SERVER_TIMING"), False),
+            enable_compression=_env_bool(env.get("LLMOPS_ENABLE_COMPRESSION"), True),
+            compression_min_bytes=int(
+                env.get("LLMOPS_COMPRESSION_MIN_BYTES", cls.compression_min_bytes)
+            ),
+            lb_strategy=env.get("LLMOPS_LB_STRATEGY", cls.lb_strategy),
+            health_check_interval=float(
+                env.get("LLMOPS_HEALTH_CHECK_INTERVAL", cls.health_check_interval)
+            ),
+            breaker_failure_ratio=float(
+                env.get("LLMOPS_BREAKER_FAILURE_RATIO", cls.breaker_failure_ratio)
+            ),
+            breaker_slow_call_seconds=float(
+                env.get(
+                    "LLMOPS_BREAKER_SLOW_CALL_SECONDS", cls.breaker_slow_call_seconds
+                )
+            ),
+            breaker_open_seconds=float(
+                env.get("LLMOPS_BREAKER_OPEN_SECONDS", cls.breaker_open_seconds)
+            ),
+            hedge_requests=_env_bool(env.get("LLMOPS_HEDGE_REQUESTS"), False),
+            concurrency_algorithm=env.get(
+                "LLMOPS_CONCURRENCY_ALGORITHM", cls.concurrency_algorithm
+            ),
+            concurrency_initial_limit=int(
+                env.get(
+                    "LLMOPS_CONCURRENCY_INITIAL_LIMIT", cls.concurrency_initial_limit
+                )
+            ),
+            concurrency_max_limit=int(
+                env.get("LLMOPS_CONCURRENCY_MAX_LIMIT", cls.concurrency_max_limit)
+            ),
+            concurrency_aimd_latency_seconds=float(
+                env.get(
+                    "LLMOPS_CONCURRENCY_AIMD_LATENCY_SECONDS",
+                    cls.concurrency_aimd_latency_seconds,
+                )
+            ),
+            warmup_interval=float(
+                env.get("LLMOPS_WARMUP_INTERVAL", cls.warmup_interval)
+            ),
+            keep_alive_seconds=float(
+                env.get("LLMOPS_KEEP_ALIVE_SECONDS", cls.keep_alive_seconds)
+            ),
+            keep_alive_idle_seconds=float(
+                env.get("LLMOPS_KEEP_ALIVE_IDLE_SECONDS", cls.keep_alive_idle_seconds)
+            ),
+            live_buffer_size=int(
+                env.get("LLMOPS_LIVE_BUFFER_SIZE", cls.live_buffer_size)
+            ),
+            live_replay_size=int(
+                env.get("LLMOPS_LIVE_REPLAY_SIZE", cls.live_replay_size)
+            ),
+            query_cache_size=int(
+                env.get("LLMOPS_QUERY_CACHE_SIZE", cls.query_cache_size)
+            ),
+            query_cache_max_rows=int(
+                env.get("LLMOPS_QUERY_CACHE_MAX_ROWS", cls.query_cache_max_rows)
+            ),
+            mcp_reload_interval=float(
+                env.get("LLMOPS_MCP_RELOAD_INTERVAL", cls.mcp_reload_interval)
+            ),
+            client_counters_path=env.get(
+                "LLMOPS_CLIENT_COUNTERS_PATH", cls.client_counters_path
+            ),
+            client_counter_slots=int(
+                env.get("LLMOPS_CLIENT_COUNTER_SLOTS", cls.client_counter_slots)
+            ),
+            client_snapshot_interval=float(
+                env.get("LLMOPS_CLIENT_SNAPSHOT_INTERVAL", cls.client_snapshot_interval)
+            ),
+            top_users=int(env.get("LLMOPS_TOP_USERS", cls.top_users)),
+            quantile_window_seconds=int(
+                env.get("LLMOPS_QUANTILE_WINDOW_SECONDS", cls.quantile_window_seconds)
+            ),
+            quantile_retention_windows=int(
+                env.get(
+                    "LLMOPS_QUANTILE_RETENTION_WINDOWS", cls.quantile_retention_windows
+                )
+            ),
+            fingerprint_window=int(
+                env.get("LLMOPS_FINGERPRINT_WINDOW", cls.fingerprint_window)
+            ),
+            fingerprint_threshold=float(
+                env.get("LLMOPS_FINGERPRINT_THRESHOLD", cls.fingerprint_threshold)
+            ),
+            prompt_sample_rate=float(
+                env.get("LLMOPS_PROMPT_SAMPLE_RATE", cls.prompt_sample_rate)
+            ),
+            prompt_latency_percentile=float(
+                env.get(
+                    "LLMOPS_PROMPT_LATENCY_PERCENTILE", cls.prompt_latency_percentile
+                )
+            ),
+            prompt_flagged_users=tuple(
+                user.strip()
+                for user in env.get("LLMOPS_PROMPT_FLAGGED_USERS", "").split(",")
+                if user.strip()
+            ),
+        )
+
+    def validate(self):
+        """
+        Checks that required settings are present.
+
+        Returns:
+            None
+
+        Raises:
+            RuntimeError: If `jwt_secret` is not set.
+        """
+        if not self.jwt_secret:
+            raise RuntimeError(
+                "❌ JWT_SECRET is not set in the environment. Please define it in your .env"
+            )
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    """
+    Loads `.env` (if present) and returns the process-wide settings.
+
+    Returns:
+        Settings: Settings parsed from the environment.
+    """
+    # Imported lazily so that building Settings directly never touches disk
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return Settings.from_env()
+
+
+def get_request_settings(request: Request) -> Settings:
+    """
+    FastAPI dependency returning the settings of the app serving `request`.
+
+    Falls back to `get_settings()` for routers mounted on an app that was not
+    built by `create_app`.
+
+    Args:
+        request (Request): Incoming FastAPI request.
+
+    Returns:
+        Settings: Active settings.
+    """
+    settings = getattr(request.app.state, "settings", None)
+    return settings if settings is not None else get_settings()
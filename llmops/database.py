@@ -1,59 +1,557 @@
 """
 database.py
 
-Lightweight SQLite-based logging module for LLMOps usage data.
+Lightweight logging module for LLMOps usage data.
+
+Usage logs are kept by a pluggable storage backend (`llmops.storage`) selected
+with `LLMOPS_STORAGE_BACKEND`:
+
+    - "sqlite" (default): the `usage_logs` table of `LLMOPS_DB_PATH`.
+    - "segment_log": memory-mapped append-only segments in `LLMOPS_SEGMENT_DIR`,
+      for ingest rates beyond SQLite's single writer lock (one writing process
+      per directory).
+    - "sqlite_sharded": `LLMOPS_SQLITE_SHARDS` SQLite files next to
+      `LLMOPS_DB_PATH`, picked by a hash of the user, so workers writing for
+      different users do not share a write lock.
+
+The functions below are the only entry points; they work the same against
+either backend. Per-client counter snapshots always live in SQLite.
 
 Responsibilities:
-    - Ensures `usage_logs` table exists before reads/writes.
-    - Logs model prompt usage via `log_usage`.
+    - Prepares the storage location and schema at startup via `init_db(path)`.
+    - Ensures the SQLite tables exist before reads/writes, adding columns
+      introduced after a database was created.
+    - Logs model prompt usage via `log_usage`, with the generation timings
+      reported by the model server when known.
+    - Logs many entries in one transaction via `log_usage_batch(entries)`.
+    - Stores prompts subject to the retention policy set with
+      `configure_prompt_retention(policy)` (see `llmops.retention`); row
+      metadata is always stored.
+    - Notifies write listeners (e.g. the live event broadcaster) with every
+      committed row via `add_write_listener(listener)`.
+    - Serves repeated reads from a write-aware LRU result cache; every write
+      bumps a generation counter that invalidates all cached results, and
+      results are keyed by the store's data version, so writes of other
+      processes to SQLite files are seen as well.
     - Supports querying logs via:
         - `get_recent_logs(limit)`
         - `get_usage_by_model(model)`
         - `get_usage_by_client(user)`
+        - `get_usage_between(start, end)`
+        - `search_usage(query, ...)`: ranked full-text search over prompts
+          (SQLite backends only)
+    - Streams logs in id order via `iter_usage_logs(db_path, after_id, until_id)`,
+      from a read-only SQLite connection for offline tools.
+    - Persists per-client usage counter snapshots via `save_client_usage` /
+      `load_client_usage` (table `client_usage`).
 
 Environment Variables:
     LLMOPS_DB_PATH: Path override for the SQLite database file. Defaults to "data/usage.db".
+    LLMOPS_STORAGE_BACKEND: "sqlite", "segment_log" or "sqlite_sharded". Defaults to "sqlite".
+    LLMOPS_SEGMENT_DIR: Segment log directory. Defaults to "data/segments".
+    LLMOPS_SQLITE_SHARDS: Shard files of the "sqlite_sharded" backend. Defaults to 4.
+    Each is read once; values passed to `init_db` take precedence and are
+    kept in this module rather than written back to the environment.
+
+Metrics:
+    QUERY_CACHE_REQUESTS: Cached query lookups, by query and result (hit/miss).
+    QUERY_CACHE_ROWS: Rows currently held by the query cache.
+
+Note:
+    The generation counter is per process. Writes made to the same SQLite
+    files by other processes change the header's file change counter
+    (`UsageStore.data_version`) instead, which costs one 4-byte read per cached
+    lookup. Segment logs are locked to one writing process, so the generation
+    counter alone covers them.
 """
 
 import os
 import sqlite3
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
-from functools import lru_cache
-from typing import Dict, List
+from functools import wraps
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from llmops.storage.base import TIMING_COLUMNS, USAGE_COLUMNS, UsageStore
+from llmops.storage.sqlite_store import SQLiteUsageStore, ensure_usage_table
+
+# Storage backends selectable with LLMOPS_STORAGE_BACKEND
+STORAGE_BACKENDS = ("sqlite", "segment_log", "sqlite_sharded")
+
+# Open usage stores by (backend, location)
+_STORES: Dict[Tuple[str, str], UsageStore] = {}
+
+# Guards creation and closing of usage stores
+_STORES_LOCK = threading.Lock()
+
+# Columns of the events passed to write listeners (everything but the prompt)
+EVENT_COLUMNS = [c for c in USAGE_COLUMNS if c != "prompt"]
+
+# Callables notified with the events committed by each write
+_WRITE_LISTENERS: List[Callable[[List[Dict]], None]] = []
+
+# Write listeners whose events also carry the `prompt`
+_PROMPT_LISTENERS: List[Callable[[List[Dict]], None]] = []
+
+# Resolved store configuration (db_path, storage_backend, segment_dir,
+# sqlite_shards): values passed to `init_db`, else read once from the environment
+_STORE_CONFIG: Dict[str, object] = {}
+
+# Policy deciding which written rows keep their prompt (None keeps every prompt)
+_PROMPT_RETENTION = None
+
+# Prometheus counter: query cache lookups by query and result ("hit", "miss")
+QUERY_CACHE_REQUESTS = Counter(
+    "llm_query_cache_requests_total",
+    "Usage query cache lookups",
+    ["query", "result"],
+)
+
+# Prometheus gauge: rows held by the query cache
+QUERY_CACHE_ROWS = Gauge("llm_query_cache_rows", "Rows held by the usage query cache")
+
+
+class QueryCache:
+    """
+    LRU cache of query results, invalidated by a write generation counter.
+
+    Each entry remembers the generation it was read at; any write since then
+    makes it stale. Memory is bounded both by entry count and by the total
+    number of cached rows.
+
+    Attributes:
+        max_entries (int): Maximum cached results; 0 disables caching.
+        max_rows (int): Maximum rows across all cached results.
+        generation (int): Number of writes observed so far.
+    """
+
+    def __init__(self, max_entries: int = 256, max_rows: int = 50000):
+        """
+        Args:
+            max_entries (int): Maximum cached results. Defaults to 256.
+            max_rows (int): Maximum total cached rows. Defaults to 50000.
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        """
+        Records a write, invalidating every cached result.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._rows = 0
+        QUERY_CACHE_ROWS.set(0)
+
+    def get(self, key):
+        """
+        Looks up a fresh cached result.
+
+        Args:
+            key (Hashable): Query key.
+
+        Returns:
+            tuple:
+                - List[Dict] or None: Copy of the cached rows, or None on a miss.
+                - int: Current generation, to pass to `put` after a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != self.generation:
+                return None, self.generation
+            self._entries.move_to_end(key)
+            rows = entry[1]
+        return [dict(row) for row in rows], entry[0]
+
+    def put(self, key, generation: int, rows: List[Dict]):
+        """
+        Stores a result read at `generation`, unless a write happened meanwhile.
+
+        Args:
+            key (Hashable): Query key.
+            generation (int): Generation observed before the query ran.
+            rows (List[Dict]): Query result.
+
+        Returns:
+            None
+        """
+        if self.max_entries <= 0 or len(rows) > self.max_rows:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._rows -= len(previous[1])
+            self._entries[key] = (generation, [dict(row) for row in rows])
+            self._rows += len(rows)
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._rows -= len(evicted)
+            QUERY_CACHE_ROWS.set(self._rows)
+
+
+# Process-wide query result cache
+_QUERY_CACHE = QueryCache()
+
+
+def configure_query_cache(max_entries: int, max_rows: int):
+    """
+    Replaces the query cache with one using the given bounds.
+
+    Args:
+        max_entries (int): Maximum cached results; 0 disables caching.
+        max_rows (int): Maximum rows across all cached results.
+
+    Returns:
+        None
+    """
+    global _QUERY_CACHE
+    _QUERY_CACHE = QueryCache(max_entries=max_entries, max_rows=max_rows)
+    QUERY_CACHE_ROWS.set(0)
+
+
+def configure_prompt_retention(policy):
+    """
+    Sets the prompt retention policy applied to every usage write.
+
+    Args:
+        policy (PromptRetention, optional): Policy from `llmops.retention`, or
+            None to store every prompt.
+
+    Returns:
+        None
+    """
+    global _PROMPT_RETENTION
+    _PROMPT_RETENTION = policy
+
+
+def cached_query(func: Callable[..., List[Dict]]) -> Callable[..., List[Dict]]:
+    """
+    Decorator serving a read query from the query cache when nothing was written.
+
+    Results are keyed by database path, data version, query name and
+    arguments; entries of an older data version are never looked up again and
+    leave the LRU as it fills.
+
+    Args:
+        func (Callable[..., List[Dict]]): Query returning a list of row dicts.
+
+    Returns:
+        Callable[..., List[Dict]]: Cached query.
+    """
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = _QUERY_CACHE
+        if cache.max_entries <= 0:
+            return func(*args, **kwargs)
+        version = get_usage_store().data_version()
+        key = (_store_key(), version, name, args, tuple(sorted(kwargs.items())))
+        rows, generation = cache.get(key)
+        if rows is not None:
+            QUERY_CACHE_REQUESTS.labels(query=name, result="hit").inc()
+            return rows
+        QUERY_CACHE_REQUESTS.labels(query=name, result="miss").inc()
+        rows = func(*args, **kwargs)
+        cache.put(key, generation, rows)
+        return rows
+
+    return wrapper
+
+
+def add_write_listener(
+    listener: Callable[[List[Dict]], None], with_prompts: bool = False
+):
+    """
+    Registers a callable notified after every committed usage write.
+
+    The listener receives a list of event dicts (`EVENT_COLUMNS`) on the writing
+    thread; it must be thread-safe, fast and must not raise.
+
+    Args:
+        listener (Callable[[List[Dict]], None]): Callback to register. Adding
+            the same listener twice has no effect.
+        with_prompts (bool): Also pass each row's `prompt` in its event.
+            Defaults to False.
+
+    Returns:
+        None
+    """
+    listeners = _PROMPT_LISTENERS if with_prompts else _WRITE_LISTENERS
+    if listener not in listeners:
+        listeners.append(listener)
+
+
+def remove_write_listener(listener: Callable[[List[Dict]], None]):
+    """
+    Unregisters a write listener. Unknown listeners are ignored.
+
+    Args:
+        listener (Callable[[List[Dict]], None]): Callback to remove.
+
+    Returns:
+        None
+    """
+    for listeners in (_WRITE_LISTENERS, _PROMPT_LISTENERS):
+        if listener in listeners:
+            listeners.remove(listener)
+
+
+def _notify_write(
+    ids: List[int], rows: List[tuple], prompts: Optional[List[str]] = None
+):
+    """
+    Invalidates cached queries and passes freshly committed rows to listeners.
+
+    Args:
+        ids (List[int]): Row ids of the inserted rows.
+        rows (List[tuple]): Inserted values in `USAGE_COLUMNS` order, without `id`.
+        prompts (List[str], optional): Prompts as received, passed to prompt
+            listeners even when the retention policy did not store them.
+            Defaults to the stored prompts.
+
+    Returns:
+        None
+    """
+    _QUERY_CACHE.bump()
+    if not _WRITE_LISTENERS and not _PROMPT_LISTENERS:
+        return
+    with_prompts = [
+        {"id": row_id, **dict(zip(USAGE_COLUMNS[1:], row))}
+        for row_id, row in zip(ids, rows)
+    ]
+    if prompts is not None:
+        for event, prompt in zip(with_prompts, prompts):
+            event["prompt"] = prompt
+    if _WRITE_LISTENERS:
+        events = [
+            {key: value for key, value in event.items() if key != "prompt"}
+            for event in with_prompts
+        ]
+        for listener in list(_WRITE_LISTENERS):
+            listener(events)
+    for listener in list(_PROMPT_LISTENERS):
+        listener(with_prompts)
+
+
+def store_setting(name: str) -> Callable[[Callable[[], object]], Callable[[], object]]:
+    """
+    Decorator resolving a store setting once and keeping it in `_STORE_CONFIG`.
+
+    The decorated function reads the setting from the environment; it is only
+    called while `init_db` has not set the value. Like `functools.lru_cache`,
+    the getter gains a `cache_clear()` that forgets the value, so the next call
+    reads the environment again.
+
+    Args:
+        name (str): Key of the setting in `_STORE_CONFIG`.
+
+    Returns:
+        Callable: Decorator producing the getter.
+    """
+
+    def decorator(read: Callable[[], object]) -> Callable[[], object]:
+        @wraps(read)
+        def getter():
+            value = _STORE_CONFIG.get(name)
+            if value is None:
+                value = _STORE_CONFIG[name] = read()
+            return value
+
+        getter.cache_clear = lambda: _STORE_CONFIG.pop(name, None)
+        return getter
 
-# Ensure data directory exists (default path)
-os.makedirs("data", exist_ok=True)
+    return decorator
 
 
-@lru_cache()
+@store_setting("db_path")
 def get_db_path() -> str:
     """
     Retrieve the SQLite database path, allowing for environment overrides.
 
     Returns:
-        str: The resolved database file path.
+        str: The path passed to `init_db`, else `LLMOPS_DB_PATH`.
     """
     return os.environ.get("LLMOPS_DB_PATH", "data/usage.db")
 
 
+@store_setting("storage_backend")
+def get_storage_backend() -> str:
+    """
+    Retrieve the usage log storage backend, allowing for environment overrides.
+
+    Returns:
+        str: One of `STORAGE_BACKENDS`: the backend passed to `init_db`, else
+            `LLMOPS_STORAGE_BACKEND`.
+    """
+    return os.environ.get("LLMOPS_STORAGE_BACKEND", "sqlite")
+
+
+@store_setting("segment_dir")
+def get_segment_dir() -> str:
+    """
+    Retrieve the segment log directory, allowing for environment overrides.
+
+    Returns:
+        str: The directory passed to `init_db`, else `LLMOPS_SEGMENT_DIR`.
+    """
+    return os.environ.get("LLMOPS_SEGMENT_DIR", "data/segments")
+
+
+@store_setting("sqlite_shards")
+def get_sqlite_shards() -> int:
+    """
+    Retrieve the shard count of the sharded SQLite backend, allowing for
+    environment overrides.
+
+    Returns:
+        int: The count passed to `init_db`, else `LLMOPS_SQLITE_SHARDS`.
+    """
+    return int(os.environ.get("LLMOPS_SQLITE_SHARDS", "4"))
+
+
+def _store_key() -> Tuple[str, str]:
+    """Returns the (backend, location) of the active usage store."""
+    backend = get_storage_backend()
+    if backend == "segment_log":
+        return backend, get_segment_dir()
+    if backend == "sqlite_sharded":
+        return backend, f"{get_db_path()}#{get_sqlite_shards()}"
+    return backend, get_db_path()
+
+
+def get_usage_store() -> UsageStore:
+    """
+    Returns the usage store of the configured backend, opening it on first use.
+
+    Returns:
+        UsageStore: Active store.
+
+    Raises:
+        ValueError: If `LLMOPS_STORAGE_BACKEND` names an unknown backend.
+    """
+    key = _store_key()
+    store = _STORES.get(key)
+    if store is not None:
+        return store
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            backend, location = key
+            if backend == "sqlite":
+                store = SQLiteUsageStore(location)
+            elif backend == "segment_log":
+                # Imported lazily: only needed when the backend is selected
+                from llmops.storage.segment_log import SegmentLogStore
+
+                store = SegmentLogStore(location)
+            elif backend == "sqlite_sharded":
+                from llmops.storage.sharded_sqlite import ShardedSQLiteUsageStore
+
+                store = ShardedSQLiteUsageStore(get_db_path(), get_sqlite_shards())
+            else:
+                raise ValueError(
+                    f"Unknown storage backend {backend!r}; "
+                    f"expected one of {', '.join(STORAGE_BACKENDS)}"
+                )
+            _STORES[key] = store
+    return store
+
+
+def close_usage_stores():
+    """
+    Closes every open usage store. Called at application shutdown.
+
+    Returns:
+        None
+    """
+    with _STORES_LOCK:
+        for store in _STORES.values():
+            store.close()
+        _STORES.clear()
+
+
+def init_db(
+    db_path: str = None,
+    storage_backend: str = None,
+    segment_dir: str = None,
+    sqlite_shards: int = None,
+):
+    """
+    Prepares the database for use. Called from the application lifespan.
+
+    Optionally points the module at a new database file, storage backend,
+    segment directory or shard count, creates the parent directory and ensures the schema
+    exists and the usage store opens. The given values are kept in module
+    state (`_STORE_CONFIG`), never written to `os.environ`, so they do not
+    leak into subprocesses or other code reading the environment.
+
+    Args:
+        db_path (str, optional): Database file to use. Defaults to the current
+            `get_db_path()` value.
+        storage_backend (str, optional): Usage log backend. Defaults to the
+            current `get_storage_backend()` value.
+        segment_dir (str, optional): Segment log directory. Defaults to the
+            current `get_segment_dir()` value.
+        sqlite_shards (int, optional): Shard files of the "sqlite_sharded"
+            backend. Defaults to the current `get_sqlite_shards()` value.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If the storage backend is unknown, or the shard files
+            were created with another shard count.
+    """
+    for name, value in (
+        ("db_path", db_path),
+        ("storage_backend", storage_backend),
+        ("segment_dir", segment_dir),
+        ("sqlite_shards", sqlite_shards),
+    ):
+        if value:
+            _STORE_CONFIG[name] = value
+
+    parent = os.path.dirname(get_db_path())
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    ensure_table_exists()
+    get_usage_store()
+
+
 def ensure_table_exists():
     """
-    Creates the `usage_logs` table if it doesn't already exist.
+    Creates the SQLite tables if they don't already exist.
 
-    This is a defensive check called before all database operations.
+    This is a defensive check called before all SQLite operations. `usage_logs`
+    is only created when it is the active backend; databases created before a
+    column was introduced are migrated in place, once per path and process.
     """
-    conn = sqlite3.connect(get_db_path())
+    path = get_db_path()
+    conn = sqlite3.connect(path)
     cursor = conn.cursor()
+    if get_storage_backend() == "sqlite":
+        ensure_usage_table(conn, path)
     cursor.execute(
         """
-        CREATE TABLE IF NOT EXISTS usage_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            user TEXT,
-            prompt TEXT,
-            model TEXT,
-            latency REAL,
-            tokens INTEGER
+        CREATE TABLE IF NOT EXISTS client_usage (
+            client TEXT PRIMARY KEY,
+            requests INTEGER,
+            tokens INTEGER,
+            updated_at TEXT
         )
     """
     )
@@ -61,41 +559,134 @@ def ensure_table_exists():
     conn.close()
 
 
-def log_usage(user: str, prompt: str, model: str, latency: float, tokens: int):
+def _utc_timestamp(timestamp: Optional[str]) -> str:
+    """
+    Normalises a provided timestamp to UTC ISO-8601, or returns the current time.
+
+    Every backend then stores comparable strings; naive values are taken as UTC.
+
+    Raises:
+        ValueError: If `timestamp` is not ISO-8601.
+    """
+    if not timestamp:
+        return datetime.now(timezone.utc).isoformat()
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def log_usage(
+    user: str,
+    prompt: str,
+    model: str,
+    latency: float,
+    tokens: int,
+    fallback_from: Optional[str] = None,
+    timings: Optional[Dict] = None,
+    error: Optional[str] = None,
+) -> int:
     """
     Record a usage log entry for a prompt handled by an LLM.
 
+    The prompt is stored subject to the retention policy set with
+    `configure_prompt_retention`; the other columns always are.
+
     Args:
         user (str): The user ID submitting the prompt.
         prompt (str): The original prompt text.
         model (str): The name of the model used.
         latency (float): Inference duration in seconds.
         tokens (int): Token count of the prompt.
+        fallback_from (str, optional): Model originally requested, when `model`
+            served the prompt as its fallback.
+        timings (Dict, optional): Generation timings reported by the model
+            server, keyed by `TIMING_COLUMNS`; missing keys are stored as NULL.
+        error (str, optional): Error type of a failed upstream call.
 
     Returns:
-        None
+        int: Id of the inserted row.
     """
-    ensure_table_exists()
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT INTO usage_logs (timestamp, user, prompt, model, latency, tokens)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (
-            datetime.now(timezone.utc).isoformat(),
-            user,
-            prompt,
-            model,
-            latency,
-            tokens,
-        ),
+    timings = timings or {}
+    row = (
+        datetime.now(timezone.utc).isoformat(),
+        user,
+        prompt,
+        model,
+        latency,
+        tokens,
+        fallback_from,
+        *(timings.get(column) for column in TIMING_COLUMNS),
+        error,
+        None,
+        None,
     )
-    conn.commit()
-    conn.close()
+    return _append([row])[0]
+
+
+def log_usage_batch(entries: Iterable[Dict]) -> int:
+    """
+    Record many usage log entries in a single transaction.
+
+    Each entry is a dict with the same fields accepted by `log_usage`
+    (`user`, `prompt`, `model`, `latency`, `tokens`, optional `fallback_from`
+    and `error`), optional generation timings (`TIMING_COLUMNS`) and an
+    optional ISO-8601 `timestamp`, stored converted to UTC; entries
+    without one are stamped with the current UTC time. Prompts are stored
+    subject to the retention policy, as in `log_usage`.
+
+    Args:
+        entries (Iterable[Dict]): Usage entries to persist.
+
+    Returns:
+        int: Number of rows inserted.
+
+    Raises:
+        ValueError: If an entry's timestamp is not ISO-8601.
+    """
+    rows = [
+        (
+            _utc_timestamp(entry.get("timestamp")),
+            entry["user"],
+            entry["prompt"],
+            entry["model"],
+            entry["latency"],
+            entry["tokens"],
+            entry.get("fallback_from"),
+            *(entry.get(column) for column in TIMING_COLUMNS),
+            entry.get("error"),
+            None,
+            None,
+        )
+        for entry in entries
+    ]
+    if not rows:
+        return 0
+    return len(_append(rows))
 
 
+def _append(rows: List[tuple]) -> List[int]:
+    """
+    Applies the prompt retention policy, persists rows and notifies listeners.
+
+    Args:
+        rows (List[tuple]): Values in `USAGE_COLUMNS[1:]` order.
+
+    Returns:
+        List[int]: Ids of the inserted rows.
+    """
+    policy = _PROMPT_RETENTION
+    if policy is None:
+        ids = get_usage_store().append_ids(rows)
+        _notify_write(ids, rows)
+        return ids
+    stored = policy.apply(rows)
+    ids = get_usage_store().append_ids(stored)
+    _notify_write(ids, stored, [row[2] for row in rows])
+    return ids
+
+
+@cached_query
 def get_recent_logs(limit: int = 10) -> List[Dict]:
     """
     Fetch the most recent LLM usage logs.
@@ -106,33 +697,13 @@ def get_recent_logs(limit: int = 10) -> List[Dict]:
     Returns:
         List[Dict]: List of log entries sorted by newest first.
     """
-    ensure_table_exists()
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT id, timestamp, user, model, latency, tokens
-        FROM usage_logs
-        ORDER BY id DESC
-        LIMIT ?
-        """,
-        (limit,),
-    )
-    rows = cursor.fetchall()
-    conn.close()
     return [
-        {
-            "id": row[0],
-            "timestamp": row[1],
-            "user": row[2],
-            "model": row[3],
-            "latency": row[4],
-            "tokens": row[5],
-        }
-        for row in rows
+        {column: row[column] for column in EVENT_COLUMNS}
+        for row in get_usage_store().recent(limit)
     ]
 
 
+@cached_query
 def get_usage_by_model(model: str) -> List[Dict]:
     """
     Fetch all log entries for a specific model.
@@ -143,23 +714,10 @@ def get_usage_by_model(model: str) -> List[Dict]:
     Returns:
         List[Dict]: All log entries for the specified model.
     """
-    ensure_table_exists()
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM usage_logs WHERE model = ?", (model,))
-    rows = cursor.fetchall()
-    conn.close()
-    return [
-        dict(
-            zip(
-                ["id", "timestamp", "user", "prompt", "model", "latency", "tokens"],
-                row,
-            )
-        )
-        for row in rows
-    ]
+    return get_usage_store().find("model", model)
 
 
+@cached_query
 def get_usage_by_client(user: str) -> List[Dict]:
     """
     Fetch all log entries submitted by a specific user/client.
@@ -170,18 +728,170 @@ def get_usage_by_client(user: str) -> List[Dict]:
     Returns:
         List[Dict]: All log entries for the given user.
     """
+    return get_usage_store().find("user", user)
+
+
+@cached_query
+def get_usage_between(start: str, end: str) -> List[Dict]:
+    """
+    Fetch all log entries with `start <= timestamp < end`.
+
+    Args:
+        start (str): Inclusive ISO-8601 lower bound; naive values are UTC.
+        end (str): Exclusive ISO-8601 upper bound; naive values are UTC.
+
+    Returns:
+        List[Dict]: Matching log entries in id order.
+
+    Raises:
+        ValueError: If a bound is not ISO-8601.
+    """
+    return get_usage_store().between(_utc_timestamp(start), _utc_timestamp(end))
+
+
+@cached_query
+def search_usage(
+    query: str,
+    user: Optional[str] = None,
+    model: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict]:
+    """
+    Search log entries by prompt text, most relevant first.
+
+    Args:
+        query (str): FTS5 query: words, "quoted phrases", prefix* terms and
+            AND/OR/NOT.
+        user (str, optional): Only entries of this user.
+        model (str, optional): Only entries of this model.
+        start (str, optional): Inclusive ISO-8601 lower timestamp bound.
+        end (str, optional): Exclusive ISO-8601 upper timestamp bound.
+        limit (int): Maximum entries. Defaults to 20.
+        offset (int): Best matches to skip, for pagination. Defaults to 0.
+
+    Returns:
+        List[Dict]: Entries with a relevance `score` and a `snippet` of the
+            prompt around the matches.
+
+    Raises:
+        ValueError: If the query or a timestamp is invalid.
+        NotImplementedError: If the active backend has no prompt index.
+    """
+    return get_usage_store().search(
+        query,
+        user,
+        model,
+        _utc_timestamp(start) if start else None,
+        _utc_timestamp(end) if end else None,
+        limit,
+        offset,
+    )
+
+
+def iter_usage_logs(
+    db_path: str = None,
+    after_id: int = 0,
+    until_id: Optional[int] = None,
+    chunk_size: int = 1000,
+) -> Iterator[Dict]:
+    """
+    Stream log entries in id order without loading them into memory.
+
+    Given a `db_path`, reads that SQLite file through a read-only connection
+    with keyset pagination, so a running service can keep writing to it
+    meanwhile. Otherwise streams from the configured usage store. Rows written
+    after the call starts are not returned unless `until_id` includes them.
+
+    Args:
+        db_path (str, optional): SQLite database file to read. Defaults to the
+            configured usage store.
+        after_id (int): Only return rows with a greater id. Defaults to 0.
+        until_id (int, optional): Last id to return. Defaults to the largest id
+            present when iteration starts.
+        chunk_size (int): Rows fetched per query. Defaults to 1000.
+
+    Yields:
+        Dict: One log entry with every `USAGE_COLUMNS` value.
+    """
+    if db_path is None:
+        yield from get_usage_store().scan(after_id, until_id, chunk_size)
+        return
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(usage_logs)")}
+        columns = [c for c in USAGE_COLUMNS if c in existing]
+        if until_id is None:
+            until_id = conn.execute("SELECT MAX(id) FROM usage_logs").fetchone()[0]
+            if until_id is None:
+                return
+        last_id = after_id
+        while True:
+            rows = conn.execute(
+                f"""
+                SELECT {', '.join(columns)} FROM usage_logs
+                WHERE id > ? AND id <= ? ORDER BY id LIMIT ?
+                """,
+                (last_id, until_id, chunk_size),
+            ).fetchall()
+            for row in rows:
+                entry = dict.fromkeys(USAGE_COLUMNS)
+                entry.update(zip(columns, row))
+                yield entry
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
+
+
+def save_client_usage(rows: Iterable[Tuple[str, int, int]]) -> int:
+    """
+    Persist a snapshot of per-client usage counters.
+
+    Rows replace the stored totals of their client; clients absent from the
+    snapshot are left untouched.
+
+    Args:
+        rows (Iterable[Tuple[str, int, int]]): (client, requests, tokens) totals.
+
+    Returns:
+        int: Number of clients written.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    values = [(client, requests, tokens, now) for client, requests, tokens in rows]
+    if not values:
+        return 0
+
     ensure_table_exists()
     conn = sqlite3.connect(get_db_path())
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM usage_logs WHERE user = ?", (user,))
+    cursor.executemany(
+        """
+        INSERT OR REPLACE INTO client_usage (client, requests, tokens, updated_at)
+        VALUES (?, ?, ?, ?)
+        """,
+        values,
+    )
+    conn.commit()
+    conn.close()
+    return len(values)
+
+
+def load_client_usage() -> List[Tuple[str, int, int]]:
+    """
+    Fetch the last persisted per-client usage counters.
+
+    Returns:
+        List[Tuple[str, int, int]]: (client, requests, tokens) totals.
+    """
+    ensure_table_exists()
+    conn = sqlite3.connect(get_db_path())
+    cursor = conn.cursor()
+    cursor.execute("SELECT client, requests, tokens FROM client_usage")
     rows = cursor.fetchall()
     conn.close()
-    return [
-        dict(
-            zip(
-                ["id", "timestamp", "user", "prompt", "model", "latency", "tokens"],
-                row,
-            )
-        )
-        for row in rows
-    ]
+    return rows
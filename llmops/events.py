@@ -0,0 +1,346 @@
+"""
+events.py
+
+In-process fan-out of newly written usage events to live subscribers.
+
+`llmops.database` notifies write listeners with every committed `usage_logs`
+row; the application registers `UsageBroadcaster.publish` as one of them at
+startup. Each subscriber (e.g. one `/logs/stream` connection) owns a bounded
+buffer filled by the publisher, so N dashboard viewers cost one in-memory
+fan-out per write instead of N polling queries against SQLite.
+
+Writes happen on threadpool threads, so publishing is thread-safe: events are
+appended to subscriber buffers under a lock and the subscriber's event loop is
+woken once per write via `call_soon_threadsafe`.
+
+Slow consumers never block writers: when a subscriber's buffer is full the
+oldest buffered event is discarded and counted, and the subscriber is told how
+many events it missed. The most recent events are also kept in a replay ring,
+so a reconnecting client can resume after the last event id it saw.
+
+Event ids are assigned by the broadcaster, not taken from the storage: row ids
+are not consecutive in publication order when other processes write to the
+same log or when the sharded store interleaves ids by shard. Each published
+event gets the next number of a per-broadcaster sequence, sent as
+`<epoch>-<sequence>` where the epoch identifies the broadcaster instance. An
+id from another worker or an earlier process does not match the epoch, so the
+stream continues from new events without replaying or reporting a false gap.
+
+Metrics:
+    LIVE_SUBSCRIBERS: Currently connected live subscribers.
+    LIVE_DROPPED: Events discarded for slow subscribers.
+"""
+
+import asyncio
+import json
+import secrets
+import threading
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from prometheus_client import Counter, Gauge
+
+# Prometheus gauge: live usage-event subscribers
+LIVE_SUBSCRIBERS = Gauge("llm_live_subscribers", "Connected live usage subscribers")
+
+# Prometheus counter: events discarded because a subscriber fell behind
+LIVE_DROPPED = Counter(
+    "llm_live_events_dropped_total", "Live usage events dropped for slow subscribers"
+)
+
+
+class Subscription:
+    """
+    One subscriber's filtered, bounded view of the usage event stream.
+
+    Attributes:
+        user (str, optional): Only events for this user are delivered.
+        model (str, optional): Only events for this model are delivered.
+        buffer_size (int): Maximum number of undelivered events kept.
+        dropped (int): Events discarded since the last delivery.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        user: Optional[str] = None,
+        model: Optional[str] = None,
+        buffer_size: int = 1000,
+    ):
+        """
+        Args:
+            loop (AbstractEventLoop): Event loop the subscriber consumes on.
+            user (str, optional): User filter. Defaults to all users.
+            model (str, optional): Model filter. Defaults to all models.
+            buffer_size (int): Undelivered events kept. Defaults to 1000.
+        """
+        self.loop = loop
+        self.user = user
+        self.model = model
+        self.buffer_size = buffer_size
+        self.dropped = 0
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def matches(self, event: Dict) -> bool:
+        """
+        Checks an event against the subscriber's filters.
+
+        Args:
+            event (Dict): Usage event.
+
+        Returns:
+            bool: True if the event should be delivered.
+        """
+        return (self.user is None or event["user"] == self.user) and (
+            self.model is None or event["model"] == self.model
+        )
+
+    def offer(self, events: List[Tuple[int, Dict]]) -> bool:
+        """
+        Buffers the matching events, discarding the oldest on overflow.
+
+        Args:
+            events (List[Tuple[int, Dict]]): Newly published events with their
+                broadcaster sequence numbers.
+
+        Returns:
+            bool: True if at least one event was buffered.
+        """
+        added = False
+        with self._lock:
+            for sequenced in events:
+                if not self.matches(sequenced[1]):
+                    continue
+                if len(self._buffer) >= self.buffer_size:
+                    self._buffer.popleft()
+                    self.dropped += 1
+                    LIVE_DROPPED.inc()
+                self._buffer.append(sequenced)
+                added = True
+        return added
+
+    def wake(self):
+        """
+        Signals the consumer that events are waiting. Must run on `loop`.
+
+        Returns:
+            None
+        """
+        self._ready.set()
+
+    async def next_batch(self, timeout: Optional[float] = None) -> Tuple[List, int]:
+        """
+        Waits for buffered events and takes all of them.
+
+        Args:
+            timeout (float, optional): Seconds to wait before returning empty.
+
+        Returns:
+            tuple:
+                - List[Tuple[int, Dict]]: (sequence, event) pairs in
+                  publication order (possibly empty).
+                - int: Events dropped since the previous batch.
+        """
+        if not self._buffer and not self.dropped:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return [], 0
+        self._ready.clear()
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+
+class UsageBroadcaster:
+    """
+    Thread-safe publisher of usage events to live subscribers.
+
+    Attributes:
+        buffer_size (int): Per-subscriber buffer bound.
+        replay_size (int): Recent events kept for resuming clients.
+        epoch (str): Random identifier of this broadcaster's sequence.
+    """
+
+    def __init__(self, buffer_size: int = 1000, replay_size: int = 1000):
+        """
+        Args:
+            buffer_size (int): Per-subscriber buffer bound. Defaults to 1000.
+            replay_size (int): Events kept for resume. Defaults to 1000.
+        """
+        self.buffer_size = buffer_size
+        self.replay_size = replay_size
+        self.epoch = secrets.token_hex(4)
+        self._sequence = 0
+        self._recent = deque(maxlen=replay_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def event_id(self, sequence: int) -> str:
+        """
+        Formats a sequence number as the SSE event id sent to clients.
+
+        Args:
+            sequence (int): Broadcaster sequence number.
+
+        Returns:
+            str: `<epoch>-<sequence>`.
+        """
+        return f"{self.epoch}-{sequence}"
+
+    def _sequence_of(self, event_id: Optional[str]) -> Optional[int]:
+        """Returns the sequence number of an event id of this broadcaster."""
+        epoch, _, sequence = (event_id or "").partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def publish(self, events: List[Dict]):
+        """
+        Fans committed usage events out to every matching subscriber.
+
+        Safe to call from any thread; never blocks on subscribers.
+
+        Args:
+            events (List[Dict]): Committed events, in write order.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            first = self._sequence + 1
+            self._sequence += len(events)
+            sequenced = list(zip(range(first, self._sequence + 1), events))
+            self._recent.extend(sequenced)
+            woken = [sub for sub in self._subscribers if sub.offer(sequenced)]
+        for sub in woken:
+            try:
+                sub.loop.call_soon_threadsafe(sub.wake)
+            except RuntimeError:
+                # Subscriber's event loop has been closed
+                self.unsubscribe(sub)
+
+    def subscribe(
+        self,
+        user: Optional[str] = None,
+        model: Optional[str] = None,
+        last_id: Optional[str] = None,
+    ) -> Subscription:
+        """
+        Registers a subscriber on the running event loop.
+
+        With the `last_id` of an event this broadcaster sent, retained events
+        published after it are replayed first; if some of them have already
+        left the replay ring, the gap is reported through
+        `Subscription.dropped`. Ids of other broadcasters are ignored.
+
+        Args:
+            user (str, optional): User filter.
+            model (str, optional): Model filter.
+            last_id (str, optional): Last event id (`event_id`) the client
+                received.
+
+        Returns:
+            Subscription: The new subscription.
+        """
+        sub = Subscription(
+            asyncio.get_running_loop(), user, model, buffer_size=self.buffer_size
+        )
+        with self._lock:
+            last = self._sequence_of(last_id)
+            if last is not None and last <= self._sequence:
+                if self._recent and self._recent[0][0] > last + 1:
+                    sub.dropped = self._recent[0][0] - last - 1
+                sub.offer([pair for pair in self._recent if pair[0] > last])
+            self._subscribers.add(sub)
+        LIVE_SUBSCRIBERS.inc()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        """
+        Removes a subscriber. Unknown subscribers are ignored.
+
+        Args:
+            sub (Subscription): Subscription to remove.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if sub not in self._subscribers:
+                return
+            self._subscribers.discard(sub)
+        LIVE_SUBSCRIBERS.dec()
+
+    @property
+    def subscriber_count(self) -> int:
+        """int: Number of connected subscribers."""
+        return len(self._subscribers)
+
+
+async def sse_stream(
+    broadcaster: UsageBroadcaster,
+    user: Optional[str] = None,
+    model: Optional[str] = None,
+    last_id: Optional[str] = None,
+    keepalive: float = 15.0,
+) -> AsyncIterator[str]:
+    """
+    Subscribes and renders the events as Server-Sent Events until the client
+    disconnects.
+
+    The subscription is made when the stream is first iterated, not when it
+    is created: a response whose body never starts (the client left before)
+    then leaves no subscriber behind.
+
+    Each usage event is sent as `event: usage` with its broadcaster event id
+    (`UsageBroadcaster.event_id`) as the SSE `id`, so browsers resume
+    automatically via `Last-Event-ID`; the row id stays in the data. Missed events are
+    announced as `event: dropped` with a `{"dropped": n}` payload, and an SSE
+    comment is sent after `keepalive` idle seconds to keep proxies from closing
+    the connection.
+
+    Args:
+        broadcaster (UsageBroadcaster): Broadcaster to subscribe to.
+        user (str, optional): User filter.
+        model (str, optional): Model filter.
+        last_id (str, optional): Event id to resume after.
+        keepalive (float): Idle seconds between keep-alive comments.
+
+    Yields:
+        str: SSE-formatted chunks.
+    """
+    sub = broadcaster.subscribe(user=user, model=model, last_id=last_id)
+    try:
+        while True:
+            events, dropped = await sub.next_batch(timeout=keepalive)
+            if dropped:
+                yield f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+            if events:
+                yield "".join(
+                    f"id: {broadcaster.event_id(sequence)}\nevent: usage\n"
+                    f"data: {json.dumps(event)}\n\n"
+                    for sequence, event in events
+                )
+            elif not dropped:
+                yield ": keepalive\n\n"
+    finally:
+        broadcaster.unsubscribe(sub)
+
+
+def get_request_broadcaster(request: Request) -> UsageBroadcaster:
+    """
+    FastAPI dependency returning the broadcaster of the serving application.
+
+    Args:
+        request (Request): Incoming request.
+
+    Returns:
+        UsageBroadcaster: `app.state.broadcaster`.
+    """
+    return request.app.state.broadcaster
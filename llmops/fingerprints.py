@@ -0,0 +1,457 @@
+"""
+fingerprints.py
+
+Near-duplicate prompt detection with MinHash signatures and LSH buckets.
+
+Every logged prompt is fingerprinted online by a database write listener, and
+the fingerprints answer two questions for the `/mcp/stats/duplication` route:
+how much prompt volume is (near-)duplicate text, and what hit rate a response
+cache would get.
+
+- Prompts are normalised (Unicode NFKC, case-folded, whitespace collapsed),
+  truncated to `MAX_PROMPT_CHARS` and split into overlapping 5-byte shingles.
+- A MinHash signature of `NUM_PERM` values estimates the Jaccard similarity
+  of two prompts' shingle sets as the share of equal values.
+- Signatures are split into `BANDS` bands indexed in hash buckets (LSH), so
+  the candidates for a new prompt are found without comparing it to every
+  stored one. With 8 bands of 8 rows, pairs above ~0.77 similarity share a
+  bucket with high probability. Candidates at or above `threshold` join the
+  cluster of the most similar one.
+- Exact (same model and prompt) and normalised (same model and normalised
+  prompt) repeats are counted too: they are the hit rates of an exact and of
+  a normalising response cache. Near duplicates bound what a semantic cache
+  could reach.
+
+Work and memory are bounded: prompts are truncated, at most `window` recent
+prompts are indexed (older ones are evicted, so repeats are detected within
+that window), per-user and per-model counters are capped, and only a limited
+number of candidates is compared per prompt. With numpy installed, shingling
+and MinHash are vectorised over each written batch; otherwise a pure Python
+path computes the same signatures, more slowly.
+
+Each worker process fingerprints the prompts it logs.
+
+Metrics:
+    PROMPT_DUPLICATES: Logged prompts repeating an earlier one, by kind.
+"""
+
+import hashlib
+import random
+import struct
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+from fastapi import Request
+from prometheus_client import Counter as MetricCounter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Prometheus counter: prompts repeating an earlier one ("exact", "normalised", "near")
+PROMPT_DUPLICATES = MetricCounter(
+    "llm_prompt_duplicates_total", "Logged prompts repeating an earlier one", ["kind"]
+)
+
+# MinHash signature length and LSH bands (rows per band = NUM_PERM // BANDS)
+NUM_PERM = 64
+BANDS = 8
+
+# Signatures are stored packed, as NUM_PERM little-endian 32-bit values
+_BAND_BYTES = 4 * NUM_PERM // BANDS
+
+# Bytes per shingle, and the prompt prefix that is fingerprinted
+SHINGLE_SIZE = 5
+MAX_PROMPT_CHARS = 2000
+
+# Shingles hashed per vectorised MinHash step, bounding temporary memory
+MAX_BATCH_SHINGLES = 65536
+
+# Label for users and models beyond the tracked ones
+OTHER = "other"
+
+# MinHash permutations h -> (a * h + b) >> 32 (multiply-shift hashing); with
+# a, b < 2**32 the sums fit in 64 bits
+_MASK = 0xFFFFFFFF
+_MIX = 0x9E3779B1
+_RNG = random.Random(0x5EED)
+_A = [_RNG.randrange(1, 1 << 32) for _ in range(NUM_PERM)]
+_B = [_RNG.randrange(0, 1 << 32) for _ in range(NUM_PERM)]
+
+
+def normalise_prompt(prompt: str) -> str:
+    """
+    Normalises a prompt for fingerprinting and normalised cache keys.
+
+    Args:
+        prompt (str): Prompt as logged.
+
+    Returns:
+        str: NFKC-normalised, case-folded prompt with whitespace runs
+            collapsed to single spaces.
+    """
+    return " ".join(unicodedata.normalize("NFKC", prompt).casefold().split())
+
+
+def _shingle_bytes(prompt: str) -> bytes:
+    """Returns the normalised, truncated UTF-8 text that is shingled."""
+    return normalise_prompt(prompt)[:MAX_PROMPT_CHARS].encode("utf-8")
+
+
+def _shingles(data: bytes) -> List[int]:
+    """Hashes the overlapping shingles of `data` to 32-bit values (pure Python)."""
+    if len(data) < SHINGLE_SIZE:
+        data = data.ljust(SHINGLE_SIZE, b"\0")
+    hashes = set()
+    for i in range(len(data) - SHINGLE_SIZE + 1):
+        x = int.from_bytes(data[i : i + SHINGLE_SIZE], "little")
+        hashes.add(((x ^ (x >> 17)) * _MIX) & _MASK)
+    return list(hashes)
+
+
+def minhash(prompts: Sequence[str]) -> List[bytes]:
+    """
+    Computes the MinHash signatures of prompts.
+
+    Args:
+        prompts (Sequence[str]): Prompts as logged.
+
+    Returns:
+        List[bytes]: One packed signature of `NUM_PERM` little-endian 32-bit
+            values per prompt. The numpy and pure Python paths return
+            identical signatures.
+    """
+    if np is None:
+        pack = struct.Struct(f"<{NUM_PERM}I").pack
+        signatures = []
+        for prompt in prompts:
+            hashes = _shingles(_shingle_bytes(prompt))
+            signatures.append(
+                pack(*(min((a * h + b) >> 32 for h in hashes) for a, b in zip(_A, _B)))
+            )
+        return signatures
+    return [row.tobytes() for row in _minhash_numpy(prompts).astype("<u4")]
+
+
+def similarities(signature: bytes, others: Sequence[bytes]) -> List[float]:
+    """
+    Estimates the Jaccard similarity of a prompt to others from signatures.
+
+    Args:
+        signature (bytes): Signature from `minhash`.
+        others (Sequence[bytes]): Signatures to compare it with.
+
+    Returns:
+        List[float]: Share of equal signature values with each of `others`,
+            in [0, 1].
+    """
+    if np is None:
+        values = memoryview(signature).cast("I")
+        return [
+            sum(x == y for x, y in zip(values, memoryview(other).cast("I"))) / NUM_PERM
+            for other in others
+        ]
+    stacked = np.frombuffer(b"".join(others), dtype="<u4").reshape(-1, NUM_PERM)
+    equal = stacked == np.frombuffer(signature, dtype="<u4")
+    return (np.count_nonzero(equal, axis=1) / NUM_PERM).tolist()
+
+
+def _minhash_numpy(prompts: Sequence[str]):
+    """Vectorised `minhash` over a whole batch: returns an (n, NUM_PERM) array."""
+    texts = [_shingle_bytes(prompt).ljust(SHINGLE_SIZE, b"\0") for prompt in prompts]
+    lengths = np.array([len(text) for text in texts], dtype=np.int64)
+    data = np.frombuffer(b"".join(texts) + b"\0" * SHINGLE_SIZE, dtype=np.uint8)
+
+    # One shingle per byte offset of the joined text, minus those crossing a prompt end
+    weights = np.array([1 << (8 * i) for i in range(SHINGLE_SIZE)], dtype=np.uint64)
+    windows = np.lib.stride_tricks.sliding_window_view(data, SHINGLE_SIZE)
+    x = windows[: int(lengths.sum())].astype(np.uint64) @ weights
+    prompt_of = np.repeat(np.arange(len(texts), dtype=np.uint64), lengths)
+    offset = np.arange(len(x)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    valid = offset <= np.repeat(lengths - SHINGLE_SIZE, lengths)
+    hashes = ((x ^ (x >> np.uint64(17))) * np.uint64(_MIX)) & np.uint64(_MASK)
+
+    # Shingles are grouped by prompt in order; repeats do not change a minimum
+    hashes = hashes[valid]
+    firsts = np.searchsorted(prompt_of[valid], np.arange(len(texts), dtype=np.uint64))
+
+    a = np.array(_A, dtype=np.uint64)[:, None]
+    b = np.array(_B, dtype=np.uint64)[:, None]
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint64)
+    ends = np.append(firsts[1:], len(hashes))
+    start = 0
+    while start < len(texts):
+        # Permute at most MAX_BATCH_SHINGLES hashes per step (at least one prompt)
+        end = max(
+            start + 1,
+            int(np.searchsorted(ends, firsts[start] + MAX_BATCH_SHINGLES, "right")),
+        )
+        permuted = (a * hashes[None, firsts[start] : ends[end - 1]] + b) >> np.uint64(
+            32
+        )
+        signatures[start:end] = np.minimum.reduceat(
+            permuted, firsts[start:end] - firsts[start], axis=1
+        ).T
+        start = end
+    return signatures
+
+
+def _digest(text: str) -> bytes:
+    """Returns a compact hash used as a cache key."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+def _band(signature: bytes, band: int) -> bytes:
+    """Returns the LSH bucket key of one band of a signature."""
+    return signature[band * _BAND_BYTES : (band + 1) * _BAND_BYTES]
+
+
+class PromptFingerprinter:
+    """
+    Online near-duplicate index of recent prompts with duplication counters.
+
+    Thread-safe: fed from the database writing threads, read by requests.
+
+    Attributes:
+        window (int): Most recent prompts kept in the index.
+        threshold (float): Estimated Jaccard similarity of near duplicates.
+        max_keys (int): Users and models counted individually.
+        max_candidates (int): LSH candidates compared per prompt.
+    """
+
+    def __init__(
+        self,
+        window: int = 20000,
+        threshold: float = 0.8,
+        max_keys: int = 1000,
+        max_candidates: int = 32,
+    ):
+        """
+        Args:
+            window (int): Prompts kept in the index. Defaults to 20000.
+            threshold (float): Similarity of near duplicates. Defaults to 0.8.
+            max_keys (int): Users/models counted individually. Defaults to 1000.
+            max_candidates (int): Candidates compared per prompt. Defaults to 32.
+        """
+        self.window = window
+        self.threshold = threshold
+        self.max_keys = max_keys
+        self.max_candidates = max_candidates
+        # (signature, exact key, normalised key, cluster id, user, model)
+        self._slots: List[Optional[tuple]] = [None] * window
+        self._next = 0
+        self._buckets: List[Dict[tuple, set]] = [{} for _ in range(BANDS)]
+        self._exact: Counter = Counter()
+        self._normalised: Counter = Counter()
+        self._clusters: Dict[int, dict] = {}
+        self._cluster_ids = 0
+        self._totals = [0, 0, 0, 0]
+        self._by_user: Dict[str, List[int]] = {}
+        self._by_model: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def record_events(self, events: List[Dict]):
+        """
+        Database write listener fingerprinting every new prompt.
+
+        Signatures of the whole batch are computed before taking the lock.
+
+        Args:
+            events (List[Dict]): Events with `user`, `model` and `prompt`.
+
+        Returns:
+            None
+        """
+        events = [event for event in events if event.get("prompt") is not None]
+        if not events:
+            return
+        signatures = minhash([event["prompt"] for event in events])
+        with self._lock:
+            for event, signature in zip(events, signatures):
+                self._add(event["prompt"], event["user"], event["model"], signature)
+
+    def add(self, prompt: str, user: str, model: str):
+        """
+        Fingerprints one prompt.
+
+        Args:
+            prompt (str): Prompt text.
+            user (str): User who sent it.
+            model (str): Model that served it.
+
+        Returns:
+            None
+        """
+        self.record_events([{"prompt": prompt, "user": user, "model": model}])
+
+    def _similar(self, signature: bytes, exclude: int) -> Optional[int]:
+        """Returns the most similar slot but `exclude` at or above `threshold`."""
+        candidates = set()
+        for band, buckets in enumerate(self._buckets):
+            candidates |= buckets.get(_band(signature, band), set())
+            candidates.discard(exclude)
+            if len(candidates) >= self.max_candidates:
+                break
+        slots = list(candidates)[: self.max_candidates]
+        if not slots:
+            return None
+        estimates = similarities(signature, [self._slots[slot][0] for slot in slots])
+        best = max(range(len(slots)), key=estimates.__getitem__)
+        return slots[best] if estimates[best] >= self.threshold else None
+
+    def _count(self, table: Dict[str, List[int]], key: str, hits: tuple):
+        """Adds one request and its hits to a capped per-key counter."""
+        if key not in table and len(table) >= self.max_keys:
+            key = OTHER
+        counts = table.setdefault(key, [0, 0, 0, 0])
+        for i, hit in enumerate((True, *hits)):
+            counts[i] += hit
+
+    def _evict(self, slot: int):
+        """Removes a slot from the index and the window counters."""
+        entry = self._slots[slot]
+        if entry is None:
+            return
+        signature, exact, normalised, cluster_id, user, model = entry
+        for band, buckets in enumerate(self._buckets):
+            key = _band(signature, band)
+            members = buckets.get(key)
+            if members is not None:
+                members.discard(slot)
+                if not members:
+                    del buckets[key]
+        for table, key in ((self._exact, exact), (self._normalised, normalised)):
+            table[key] -= 1
+            if table[key] <= 0:
+                del table[key]
+        cluster = self._clusters[cluster_id]
+        cluster["size"] -= 1
+        for counter, key in ((cluster["users"], user), (cluster["models"], model)):
+            counter[key] -= 1
+            if counter[key] <= 0:
+                del counter[key]
+        if cluster["size"] <= 0:
+            del self._clusters[cluster_id]
+        self._slots[slot] = None
+
+    def _add(self, prompt: str, user: str, model: str, signature: bytes):
+        """Indexes one fingerprinted prompt. Called with the lock held."""
+        if self.window <= 0:
+            return
+        exact = _digest(f"{model}\0{prompt}")
+        normalised = _digest(f"{model}\0{normalise_prompt(prompt)}")
+        slot = self._next
+        self._next = (slot + 1) % self.window
+        # The slot about to be overwritten cannot host the new prompt's cluster
+        similar = self._similar(signature, exclude=slot)
+        hits = (
+            self._exact[exact] > 0,
+            self._normalised[normalised] > 0,
+            similar is not None,
+        )
+        for kind, hit in zip(("exact", "normalised", "near"), hits):
+            if hit:
+                PROMPT_DUPLICATES.labels(kind=kind).inc()
+        for i, hit in enumerate((True, *hits)):
+            self._totals[i] += hit
+        self._count(self._by_user, user, hits)
+        self._count(self._by_model, model, hits)
+
+        if similar is not None:
+            cluster_id = self._slots[similar][3]
+        self._evict(slot)
+        if similar is None:
+            self._cluster_ids += 1
+            cluster_id = self._cluster_ids
+            self._clusters[cluster_id] = {
+                "size": 0,
+                "example": prompt[:200],
+                "users": Counter(),
+                "models": Counter(),
+            }
+        cluster = self._clusters[cluster_id]
+        cluster["size"] += 1
+        cluster["users"][user] += 1
+        cluster["models"][model] += 1
+
+        for band, buckets in enumerate(self._buckets):
+            buckets.setdefault(_band(signature, band), set()).add(slot)
+        self._exact[exact] += 1
+        self._normalised[normalised] += 1
+        self._slots[slot] = (signature, exact, normalised, cluster_id, user, model)
+
+    @staticmethod
+    def _ratios(counts: List[int]) -> dict:
+        """Formats [requests, exact, normalised, near] counts as rates."""
+        requests = counts[0]
+
+        def rate(hits):
+            return hits / requests if requests else 0.0
+
+        return {
+            "requests": requests,
+            "exact_hit_rate": rate(counts[1]),
+            "normalised_hit_rate": rate(counts[2]),
+            "near_duplicate_ratio": rate(counts[3]),
+        }
+
+    def report(self, top: int = 10) -> dict:
+        """
+        Summarises duplication since startup and the largest current clusters.
+
+        Args:
+            top (int): Users, models and clusters listed. Defaults to 10.
+
+        Returns:
+            dict: `overall`, `by_user` and `by_model` rates (share of requests
+                whose prompt repeated one still in the window: exactly, after
+                normalisation, or as a near duplicate), the window fill and the
+                largest near-duplicate `clusters` with their size, an example
+                prompt and their top users and models.
+        """
+        with self._lock:
+
+            def ranked(table):
+                rows = sorted(table.items(), key=lambda item: -item[1][0])[:top]
+                return [{"key": key, **self._ratios(counts)} for key, counts in rows]
+
+            clusters = sorted(
+                (c for c in self._clusters.values() if c["size"] > 1),
+                key=lambda c: -c["size"],
+            )[:top]
+            return {
+                "window": {
+                    "prompts": sum(slot is not None for slot in self._slots),
+                    "capacity": self.window,
+                },
+                "threshold": self.threshold,
+                "overall": self._ratios(self._totals),
+                "by_user": ranked(self._by_user),
+                "by_model": ranked(self._by_model),
+                "clusters": [
+                    {
+                        "size": c["size"],
+                        "example": c["example"],
+                        "users": dict(c["users"].most_common(3)),
+                        "models": dict(c["models"].most_common(3)),
+                    }
+                    for c in clusters
+                ],
+            }
+
+
+def get_request_fingerprints(request: Request) -> Optional[PromptFingerprinter]:
+    """
+    FastAPI dependency returning the prompt fingerprinter of the serving app.
+
+    Args:
+        request (Request): Incoming request.
+
+    Returns:
+        PromptFingerprinter: `app.state.fingerprints`, or None when
+            fingerprinting is disabled.
+    """
+    return getattr(request.app.state, "fingerprints", None)
@@ -0,0 +1,222 @@
+"""
+heavy_hitters.py
+
+Streaming top-K user tracking for bounded-cardinality Prometheus labels.
+
+Labelling request metrics with raw user IDs would create one time series per
+user. `UserLabeler` instead runs the Space-Saving algorithm over the request
+stream: it monitors at most `capacity` users with approximate request counts
+(over-estimated by at most the recorded error), and only the top `k` of them by
+guaranteed count (count - error) get their own label. Everyone else is
+reported as "other".
+
+Counts are kept in a stream-summary structure (count -> users bucket, plus the
+current minimum count), so each update is O(1) regardless of traffic. The set
+of labelled users is recomputed every `refresh_every` updates in O(capacity),
+which keeps per-request cost amortised O(1) and prevents label flapping.
+Counts are halved at each refresh once `decay_every` updates have been seen,
+so users whose traffic stops eventually drop out of the top-K. Users losing
+their label are passed to the `on_unlabel` callback, so the metric series
+labelled with them can be removed instead of being exported forever.
+
+Not thread-safe: used from the event loop by `metrics_middleware`.
+"""
+
+import heapq
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# Label for users outside the top-K
+OTHER = "other"
+
+
+class UserLabeler:
+    """
+    Space-Saving heavy-hitter tracker mapping user IDs to metric labels.
+
+    Attributes:
+        k (int): Number of users labelled individually.
+        capacity (int): Number of users monitored by the summary.
+        min_count (int): Guaranteed requests needed before a user is labelled.
+        refresh_every (int): Updates between recomputations of the top-K.
+        decay_every (int): Updates between halvings of all counts.
+        on_unlabel (Callable[[Set[str]], None], optional): Called with the
+            users that lost their own label.
+    """
+
+    def __init__(
+        self,
+        k: int = 20,
+        capacity: int = None,
+        min_count: int = 10,
+        refresh_every: int = 1000,
+        decay_every: int = 100000,
+        on_unlabel: Optional[Callable[[Set[str]], None]] = None,
+    ):
+        """
+        Args:
+            k (int): Users labelled individually. Defaults to 20.
+            capacity (int, optional): Users monitored. Defaults to `5 * k`.
+            min_count (int): Requests before labelling. Defaults to 10.
+            refresh_every (int): Updates between top-K refreshes. Defaults to 1000.
+            decay_every (int): Updates between count halvings. Defaults to 100000.
+            on_unlabel (Callable[[Set[str]], None], optional): Receives users
+                that lost their label. Defaults to None.
+        """
+        self.k = k
+        self.capacity = capacity or 5 * k
+        self.min_count = min_count
+        self.refresh_every = refresh_every
+        self.decay_every = decay_every
+        self.on_unlabel = on_unlabel
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._buckets: Dict[int, Dict[str, None]] = {}
+        self._min = 0
+        self._labelled = set()
+        self._since_refresh = 0
+        self._since_decay = 0
+
+    def _move(self, user: str, old: int, new: int):
+        """
+        Moves a user between count buckets, maintaining the minimum count.
+
+        Args:
+            user (str): Monitored user.
+            old (int): Previous count (0 if newly inserted).
+            new (int): New count.
+
+        Returns:
+            None
+        """
+        if old:
+            bucket = self._buckets[old]
+            del bucket[user]
+            if not bucket:
+                del self._buckets[old]
+                if self._min == old:
+                    self._min = new
+        self._buckets.setdefault(new, {})[user] = None
+        self._counts[user] = new
+        if not old and (self._min == 0 or new < self._min):
+            self._min = new
+
+    def offer(self, user: str):
+        """
+        Counts one request for `user` in O(1).
+
+        Args:
+            user (str): User ID.
+
+        Returns:
+            None
+        """
+        count = self._counts.get(user)
+        if count is not None:
+            self._move(user, count, count + 1)
+        elif len(self._counts) < self.capacity:
+            self._errors[user] = 0
+            self._move(user, 0, 1)
+        else:
+            # Replace a user with the minimum count; its count becomes our error
+            floor = self._min
+            evicted = next(iter(self._buckets[floor]))
+            del self._buckets[floor][evicted]
+            del self._counts[evicted]
+            del self._errors[evicted]
+            if evicted in self._labelled:
+                self._unlabel({evicted})
+            if not self._buckets[floor]:
+                del self._buckets[floor]
+                self._min = floor + 1
+            self._errors[user] = floor
+            self._buckets.setdefault(floor + 1, {})[user] = None
+            self._counts[user] = floor + 1
+
+    def label(self, user: str) -> str:
+        """
+        Counts a request and returns the metric label to use for it.
+
+        Args:
+            user (str): User ID.
+
+        Returns:
+            str: `user` if it is one of the top-K users, otherwise "other".
+        """
+        self.offer(user)
+        self._since_refresh += 1
+        self._since_decay += 1
+        if self._since_refresh >= self.refresh_every:
+            self._refresh()
+        if user in self._labelled:
+            return user
+        if (
+            len(self._labelled) < self.k
+            and self._counts[user] - self._errors[user] >= self.min_count
+        ):
+            self._labelled.add(user)
+            return user
+        return OTHER
+
+    def _refresh(self):
+        """
+        Recomputes the labelled set, decaying counts first if due.
+
+        Returns:
+            None
+        """
+        self._since_refresh = 0
+        if self._since_decay >= self.decay_every:
+            self._since_decay = 0
+            self._decay()
+        labelled = {
+            user for user, guaranteed in self.top() if guaranteed >= self.min_count
+        }
+        dropped = self._labelled - labelled
+        self._labelled = labelled
+        if dropped:
+            self._unlabel(dropped)
+
+    def _unlabel(self, users: Set[str]):
+        """
+        Removes users from the labelled set and reports them to `on_unlabel`.
+
+        Args:
+            users (Set[str]): Users losing their label.
+
+        Returns:
+            None
+        """
+        self._labelled -= users
+        if self.on_unlabel is not None:
+            self.on_unlabel(users)
+
+    def _decay(self):
+        """
+        Halves every count and error, dropping users that reach zero.
+
+        Returns:
+            None
+        """
+        counts = {u: c // 2 for u, c in self._counts.items() if c // 2 > 0}
+        self._errors = {u: self._errors[u] // 2 for u in counts}
+        self._counts = {}
+        self._buckets = {}
+        self._min = 0
+        for user, count in counts.items():
+            self._move(user, 0, count)
+
+    def top(self, n: int = None) -> List[Tuple[str, int]]:
+        """
+        Returns the users with the highest guaranteed request counts.
+
+        Args:
+            n (int, optional): Number of users. Defaults to `k`.
+
+        Returns:
+            List[Tuple[str, int]]: (user, guaranteed count), highest first.
+        """
+        return heapq.nlargest(
+            n or self.k,
+            ((u, c - self._errors[u]) for u, c in self._counts.items()),
+            key=lambda item: item[1],
+        )
@@ -1,34 +1,41 @@
 """
 main.py
 
-This module initializes the FastAPI application, sets up Prometheus instrumentation,
+This module builds the FastAPI application, sets up Prometheus instrumentation,
 and configures authentication-protected LLM endpoints.
 
 Key Features:
+- `create_app(settings)` application factory driven by a typed `Settings` object.
+- Startup side effects (settings validation, database preparation) run in the
+  app lifespan instead of at import time.
+- Route modules and optional subsystems (ingestion, admin profiler, default HTTP
+  instrumentation) are imported lazily inside the factory, keeping `import llmops.main` cheap.
 - Exposes a `/metrics` endpoint for Prometheus scraping.
-- Automatically tracks request count and latency with labeled metrics.
-- Includes token issuance and LLM proxy routes.
+- Records per-stage request timings (auth, policy, upstream, db, serialize) as
+  histograms and, optionally, a `Server-Timing` header.
+- Encodes JSON with orjson when installed and compresses large responses with
+  zstd/gzip (see `llmops.responses`).
+- Exposes `/ready`, which succeeds once the served models are warm (see
+  `llmops.mcp.warmup`).
 - Uses middleware to log Prometheus-compatible metrics with label cardinality control.
+
+`llmops.main:app` is still available for `uvicorn llmops.main:app`; it is created
+on first access. Prefer `uvicorn --factory llmops.main:create_app`.
 """
 
+import asyncio
+import threading
 import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Set, Tuple
 
 from fastapi import Depends, FastAPI, Request
 from fastapi.responses import Response
 from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
-from prometheus_fastapi_instrumentator import Instrumentator
-
-from llmops.auth import verify_jwt_token
-from llmops.routes import llm_proxy, token_issuer
-from llmops.routes.llm_proxy import (
-    router as llm_router,  # ✅ Explicit router import for echo
-)
-
-# Initialize FastAPI app
-app = FastAPI()
 
-# Attach Prometheus instrumentation
-Instrumentator().instrument(app).expose(app)
+from llmops.config import Settings, get_settings
+from llmops.responses import CompressionMiddleware, FastJSONResponse
+from llmops.timing import StageTimingMiddleware
 
 # Prometheus counter: tracks total requests by endpoint, method, and user
 REQUEST_COUNT = Counter(
@@ -40,8 +47,12 @@ REQUEST_LATENCY = Histogram(
     "request_latency_seconds", "Latency of API requests", ["endpoint", "user"]
 )
 
+# User label -> (endpoint, method) pairs it has request series for, so the
+# series of users leaving the top-K can be removed by their label values
+_USER_SERIES: Dict[str, Set[Tuple[str, str]]] = {}
+_USER_SERIES_LOCK = threading.Lock()
+
 
-@app.middleware("http")
 async def metrics_middleware(request: Request, call_next):
     """
     Middleware to capture Prometheus metrics for each request.
@@ -50,6 +61,14 @@ async def metrics_middleware(request: Request, call_next):
         - REQUEST_COUNT: Total API requests by endpoint, method, and user.
         - REQUEST_LATENCY: Latency per request in seconds.
 
+    The user label is the `x-user-id` header for the current top-K users by
+    request volume (see `llmops.heavy_hitters`), "other" for the long tail and
+    "anonymous" when the header is missing, which keeps label cardinality
+    bounded while heavy users stay visible per user. For the same reason the
+    endpoint label is the matched route template (e.g. `/llm`), or "unmatched"
+    for requests no route handled, never the raw URL path. Series of users
+    that leave the top-K are removed (`remove_user_series`).
+
     Args:
         request (Request): Incoming FastAPI request.
         call_next (Callable): Next ASGI application handler.
@@ -59,24 +78,66 @@ async def metrics_middleware(request: Request, call_next):
     """
     start_time = time.time()
 
-    # Normalize user ID to reduce label cardinality
-    ALLOWED_USERS = {"demo-user", "admin", "test-user"}
-    raw_user = request.headers.get("x-user-id", "anonymous")
-    user = raw_user if raw_user in ALLOWED_USERS else "anonymous"
-
     response = await call_next(request)
     process_time = time.time() - start_time
 
-    REQUEST_COUNT.labels(
-        endpoint=request.url.path, method=request.method, user=user
-    ).inc()
+    # Normalize user ID to reduce label cardinality. Labelled right before
+    # recording, so a label dropped meanwhile cannot re-create a removed series
+    raw_user = request.headers.get("x-user-id")
+    user = request.app.state.user_labeler.label(raw_user) if raw_user else "anonymous"
 
-    REQUEST_LATENCY.labels(endpoint=request.url.path, user=user).observe(process_time)
+    route = request.scope.get("route")
+    endpoint = route.path if route is not None else "unmatched"
+
+    record_request(endpoint, request.method, user, process_time)
 
     return response
 
 
-@app.get("/metrics")
+def record_request(endpoint: str, method: str, user: str, seconds: float):
+    """
+    Records one request in `REQUEST_COUNT` and `REQUEST_LATENCY`.
+
+    The label values are remembered per user for `remove_user_series`.
+
+    Args:
+        endpoint (str): Route template, or "unmatched".
+        method (str): HTTP method.
+        user (str): User label.
+        seconds (float): Request latency in seconds.
+
+    Returns:
+        None
+    """
+    with _USER_SERIES_LOCK:
+        _USER_SERIES.setdefault(user, set()).add((endpoint, method))
+        REQUEST_COUNT.labels(endpoint=endpoint, method=method, user=user).inc()
+        REQUEST_LATENCY.labels(endpoint=endpoint, user=user).observe(seconds)
+
+
+def remove_user_series(users):
+    """
+    Removes the request metric series of users that left the top-K.
+
+    Registered as the `UserLabeler.on_unlabel` callback, so the number of
+    exported per-user series stays bounded by K however often the top users
+    change; later requests of these users are counted as "other".
+
+    Args:
+        users (Set[str]): Users that lost their own label.
+
+    Returns:
+        None
+    """
+    with _USER_SERIES_LOCK:
+        for user in users:
+            pairs = _USER_SERIES.pop(user, set())
+            for endpoint, method in pairs:
+                REQUEST_COUNT.remove(endpoint, method, user)
+            for endpoint in {endpoint for endpoint, _ in pairs}:
+                REQUEST_LATENCY.remove(endpoint, user)
+
+
 def metrics():
     """
     Expose current Prometheus metrics at `/metrics`.
@@ -87,7 +148,24 @@ def metrics():
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
-@app.get("/")
+def readiness(request: Request):
+    """
+    Readiness endpoint: succeeds once the served models are loaded.
+
+    Args:
+        request (Request): Incoming FastAPI request.
+
+    Returns:
+        dict or FastJSONResponse: `{"status": "ready", ...}`, or the same
+            document with status "warming" and HTTP 503 while models load.
+    """
+    warmup = request.app.state.warmup
+    models = warmup.status()
+    if warmup.ready():
+        return {"status": "ready", "models": models}
+    return FastJSONResponse({"status": "warming", "models": models}, status_code=503)
+
+
 def health_check():
     """
     Health check endpoint for readiness and uptime monitoring.
@@ -98,11 +176,269 @@ def health_check():
     return {"status": "ok", "message": "Welcome to LLMOps Dashboard"}
 
 
-# Register token issuance route
-app.include_router(token_issuer.router)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan hook performing startup side effects.
+
+    Validates settings and prepares the SQLite database and usage log storage
+    backend (directory + schema, query cache, prompt retention policy) before the first request is served, connects the live event
+    broadcaster, latency sketches and prompt fingerprints to database writes, loads the MCP
+    registry/policy files and restores per-client counters, then runs active
+    backend health checks, model warm-up and keep-alive, MCP file
+    hot-reloading and counter snapshots until shutdown.
+
+    Args:
+        app (FastAPI): Application being started.
+
+    Yields:
+        None
+    """
+    from llmops.database import (
+        add_write_listener,
+        close_usage_stores,
+        configure_prompt_retention,
+        configure_query_cache,
+        init_db,
+        remove_write_listener,
+    )
+    from llmops.mcp import client_tracker, model_registry, usage_policy
+    from llmops.mcp.watcher import FileWatcher
+
+    settings = app.state.settings
+    settings.validate()
+    init_db(
+        settings.db_path,
+        settings.storage_backend,
+        settings.segment_dir,
+        settings.sqlite_shards,
+    )
+    configure_query_cache(settings.query_cache_size, settings.query_cache_max_rows)
+    configure_prompt_retention(app.state.prompt_retention)
+
+    broadcaster = app.state.broadcaster
+    add_write_listener(broadcaster.publish)
+    quantiles = app.state.quantiles
+    add_write_listener(quantiles.record_events)
+    fingerprints = app.state.fingerprints
+    if fingerprints is not None:
+        add_write_listener(fingerprints.record_events, with_prompts=True)
+
+    # Initial load of persisted MCP state, then hot-reload on file changes
+    watcher = FileWatcher(settings.mcp_reload_interval)
+    watcher.watch(
+        "model_registry",
+        model_registry.MODEL_REGISTRY_FILE,
+        model_registry.load_registry,
+    )
+    watcher.watch(
+        "usage_policies", usage_policy.USAGE_POLICIES_FILE, usage_policy.load_policies
+    )
+    watcher.poll()
+    watch_task = None
+    if settings.mcp_reload_interval > 0:
+        watch_task = asyncio.create_task(watcher.run())
+
+    # Per-client totals shared by workers, durable through SQLite snapshots
+    client_tracker.configure_client_counters(
+        settings.client_counters_path or None, settings.client_counter_slots
+    )
+    client_tracker.restore_client_usage()
+    snapshot_task = None
+    if settings.client_snapshot_interval > 0:
+        snapshot_task = asyncio.create_task(
+            client_tracker.run_snapshots(settings.client_snapshot_interval)
+        )
+
+    pool = app.state.backend_pool
+
+    def served_models():
+        return [settings.ollama_model, *model_registry.MODEL_REGISTRY]
+
+    health_task = None
+    if settings.health_check_interval > 0:
+        health_task = asyncio.create_task(
+            pool.run_health_checks(settings.health_check_interval, served_models)
+        )
+
+    # Preload served models, then keep recently used ones resident
+    warmup_task = None
+    if settings.warmup_interval > 0:
+        warmup_task = asyncio.create_task(
+            app.state.warmup.run(settings.warmup_interval, served_models)
+        )
+
+    yield
 
-# Register protected LLM proxy routes
-app.include_router(llm_proxy.router, dependencies=[Depends(verify_jwt_token)])
+    remove_write_listener(broadcaster.publish)
+    remove_write_listener(quantiles.record_events)
+    if fingerprints is not None:
+        remove_write_listener(fingerprints.record_events)
+    if watch_task is not None:
+        watch_task.cancel()
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+    client_tracker.snapshot_client_usage()
+    if health_task is not None:
+        health_task.cancel()
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await pool.aclose()
+    configure_prompt_retention(None)
+    close_usage_stores()
 
-# ✅ Register public /llm/echo endpoint directly
-app.include_router(llm_router, prefix="/llm")
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Application factory for the LLMOps service.
+
+    Args:
+        settings (Settings, optional): Settings to run with. Defaults to
+            `get_settings()`, which reads `.env` and the environment.
+
+    Returns:
+        FastAPI: Configured application with routes, middleware and metrics.
+    """
+    settings = settings or get_settings()
+
+    app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+    app.state.settings = settings
+
+    from llmops.mcp.backend_pool import build_backend_pool
+
+    # Load-balanced, circuit-broken upstream backends driven by the MCP registry
+    app.state.backend_pool = build_backend_pool(settings)
+
+    from llmops.mcp.concurrency_limiter import build_upstream_limiters
+
+    # Latency-adaptive in-flight limits per model in front of upstream calls
+    app.state.upstream_limiters = build_upstream_limiters(settings)
+
+    from llmops.mcp.warmup import build_warmup_manager
+
+    # Model preloading, keep-alive and readiness for the served models
+    app.state.warmup = build_warmup_manager(settings, app.state.backend_pool)
+
+    from llmops.events import UsageBroadcaster
+    from llmops.heavy_hitters import UserLabeler
+    from llmops.sketches import QuantileStore
+
+    # Top-K users get their own metric label, the long tail is "other"
+    app.state.user_labeler = UserLabeler(
+        k=settings.top_users, on_unlabel=remove_user_series
+    )
+
+    # Fan-out of committed usage events to /logs/stream subscribers
+    app.state.broadcaster = UsageBroadcaster(
+        buffer_size=settings.live_buffer_size, replay_size=settings.live_replay_size
+    )
+
+    # Mergeable latency sketches per (window, user, model) for tail quantiles
+    app.state.quantiles = QuantileStore(
+        window_seconds=settings.quantile_window_seconds,
+        retention_windows=settings.quantile_retention_windows,
+    )
+
+    from llmops.retention import build_prompt_retention
+
+    # Which logged rows keep their prompt text (None: every prompt is stored)
+    app.state.prompt_retention = build_prompt_retention(settings)
+
+    from llmops.fingerprints import PromptFingerprinter
+
+    # MinHash index of recent prompts for duplication and cache hit-rate stats
+    app.state.fingerprints = (
+        PromptFingerprinter(settings.fingerprint_window, settings.fingerprint_threshold)
+        if settings.fingerprint_window > 0
+        else None
+    )
+
+    if settings.enable_instrumentator:
+        # Attach Prometheus instrumentation
+        from prometheus_fastapi_instrumentator import Instrumentator
+
+        Instrumentator().instrument(app).expose(app)
+
+    if settings.enable_compression:
+        # Negotiated zstd/gzip for complete bodies; streams pass through. Added
+        # first so it runs innermost, before the HTTP middlewares re-chunk bodies
+        app.add_middleware(
+            CompressionMiddleware, minimum_size=settings.compression_min_bytes
+        )
+
+    app.middleware("http")(metrics_middleware)
+    app.add_api_route("/metrics", metrics, methods=["GET"])
+    app.add_api_route("/", health_check, methods=["GET"])
+    app.add_api_route("/ready", readiness, methods=["GET"])
+
+    from llmops.auth import verify_jwt_token
+    from llmops.routes import (
+        llm_echo,
+        llm_proxy,
+        log_search,
+        log_stream,
+        mcp_stats,
+        token_issuer,
+    )
+
+    # Register token issuance route
+    app.include_router(token_issuer.router)
+
+    # Register protected LLM proxy routes
+    app.include_router(llm_proxy.router, dependencies=[Depends(verify_jwt_token)])
+
+    # Register protected live usage feed
+    app.include_router(log_stream.router, dependencies=[Depends(verify_jwt_token)])
+
+    # Register protected prompt search
+    app.include_router(log_search.router, dependencies=[Depends(verify_jwt_token)])
+
+    # Register protected latency quantile queries
+    app.include_router(mcp_stats.router, dependencies=[Depends(verify_jwt_token)])
+
+    # Register public /llm/echo endpoint
+    app.include_router(llm_echo.router)
+
+    if settings.enable_ingest:
+        from llmops.routes import ingest
+
+        # Register protected usage ingestion route
+        app.include_router(ingest.router, dependencies=[Depends(verify_jwt_token)])
+
+    if settings.enable_profiler:
+        from llmops.auth import require_admin
+        from llmops.profiling import ProfilingMiddleware, instrument_routes
+        from llmops.routes import profiler
+
+        # Register admin-only profiling routes; middleware is idle until enabled
+        app.include_router(profiler.router, dependencies=[Depends(require_admin)])
+        instrument_routes(app)
+        app.add_middleware(ProfilingMiddleware)
+
+    # Outermost: per-stage spans -> histograms and optional Server-Timing header
+    app.add_middleware(StageTimingMiddleware, server_timing=settings.server_timing)
+
+    return app
+
+
+def __getattr__(name: str):
+    """
+    Lazily builds the module-level `app` on first access.
+
+    Keeps `uvicorn llmops.main:app` working without constructing the app
+    (and reading the environment) at import time.
+
+    Args:
+        name (str): Attribute being looked up.
+
+    Returns:
+        FastAPI: The default application when `name == "app"`.
+
+    Raises:
+        AttributeError: For any other missing attribute.
+    """
+    if name == "app":
+        app = create_app()
+        globals()["app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
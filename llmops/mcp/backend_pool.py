@@ -0,0 +1,621 @@
+"""
+backend_pool.py
+
+Load-balanced pool of inference backends for the Model Control Plane (MCP).
+
+Each model registered in `model_registry` may list several serving endpoints
+(e.g. one Ollama per GPU box). The pool keeps one `Backend` per (model, endpoint)
+and picks one per request:
+
+- "least_outstanding": fewest in-flight requests, ties broken by lower EWMA latency.
+- "latency_weighted": power-of-two-choices on `ewma_latency * (in_flight + 1)`,
+  which steers traffic away from slow hosts before their queues build up.
+
+Health is tracked both passively (request failures) and actively (periodic
+`GET /api/tags` probes via `run_health_checks`). A backend is evicted after
+`unhealthy_after` consecutive failures and readmitted after `healthy_after`
+consecutive successful probes. If every backend of a model is unhealthy the pool
+routes across all of them rather than failing outright ("panic mode").
+
+Independently, every backend has a `CircuitBreaker`. An open breaker takes the
+backend out of selection entirely, so a stalled host fails fast instead of
+holding each request for the full upstream timeout.
+
+`request()` runs one upstream call with optional hedging: if the chosen backend
+has not answered by its observed p95 latency, a duplicate is sent to a second
+backend and whichever answers first wins; the loser is cancelled. A failed
+first attempt is retried once on another backend.
+
+Metrics:
+    BACKEND_IN_FLIGHT: In-flight requests per backend.
+    BACKEND_LATENCY: Request latency per backend.
+    BACKEND_HEALTHY: 1 if the backend is admitted, 0 if evicted.
+    HEDGED_REQUESTS: Hedges launched, and hedges that beat the primary.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from fastapi import Request
+from prometheus_client import Counter, Gauge, Histogram
+
+from llmops.mcp.circuit_breaker import CircuitBreaker
+from llmops.mcp.model_registry import get_model_endpoints
+
+# Prometheus gauge: in-flight upstream requests per backend
+BACKEND_IN_FLIGHT = Gauge(
+    "llm_backend_in_flight", "In-flight requests per LLM backend", ["model", "backend"]
+)
+
+# Prometheus histogram: upstream latency per backend
+BACKEND_LATENCY = Histogram(
+    "llm_backend_latency_seconds",
+    "Latency of requests per LLM backend",
+    ["model", "backend"],
+)
+
+# Prometheus gauge: backend admission state (1 healthy, 0 evicted)
+BACKEND_HEALTHY = Gauge(
+    "llm_backend_healthy", "Whether an LLM backend is in rotation", ["model", "backend"]
+)
+
+# Prometheus counter: hedged requests by outcome ("launched", "won")
+HEDGED_REQUESTS = Counter(
+    "llm_hedged_requests_total", "Hedged LLM backend requests", ["model", "outcome"]
+)
+
+STRATEGIES = ("least_outstanding", "latency_weighted")
+
+# Latency samples kept per backend for the hedging p95
+LATENCY_SAMPLES = 128
+
+
+class NoBackendAvailable(Exception):
+    """Raised when a model has no backend to route to (all excluded or open)."""
+
+
+class Backend:
+    """
+    One serving endpoint for one model.
+
+    Attributes:
+        model (str): Model served.
+        url (str): Endpoint base URL.
+        in_flight (int): Requests currently outstanding.
+        ewma_latency (float): Exponentially weighted moving average latency (seconds).
+        healthy (bool): Whether the backend is in rotation.
+        consecutive_failures (int): Failures since the last success.
+        consecutive_successes (int): Successes since the last failure.
+        breaker (CircuitBreaker): Circuit breaker guarding the backend.
+        latencies (deque): Most recent successful call latencies.
+        lock (threading.Lock): Guards the counters above, which reservations
+            made from threadpool threads update concurrently.
+    """
+
+    def __init__(self, model: str, url: str, breaker_options: Optional[dict] = None):
+        """
+        Args:
+            model (str): Model served.
+            url (str): Endpoint base URL.
+            breaker_options (dict, optional): Keyword arguments for `CircuitBreaker`.
+        """
+        self.model = model
+        self.url = url
+        self.in_flight = 0
+        self.ewma_latency = 0.0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.breaker = CircuitBreaker(model, url, **(breaker_options or {}))
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.lock = threading.Lock()
+        BACKEND_HEALTHY.labels(model=model, backend=url).set(1)
+
+    def p95(self, min_samples: int = 20) -> Optional[float]:
+        """
+        Computes the p95 of recent successful call latencies.
+
+        Args:
+            min_samples (int): Samples required for a meaningful value. Defaults to 20.
+
+        Returns:
+            float or None: p95 latency in seconds, or None with too few samples.
+        """
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def status(self) -> dict:
+        """
+        Summarizes the backend state.
+
+        Returns:
+            dict: URL, health, in-flight count and EWMA latency.
+        """
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "circuit": self.breaker.state,
+            "in_flight": self.in_flight,
+            "ewma_latency": self.ewma_latency,
+        }
+
+
+class BackendPool:
+    """
+    Registry-driven set of backends with load balancing and health tracking.
+
+    Attributes:
+        default_url (str): Endpoint used for models without registered endpoints.
+        strategy (str): Balancing strategy, one of `STRATEGIES`.
+        ewma_alpha (float): Weight of the newest latency sample in the EWMA.
+        unhealthy_after (int): Consecutive failures before eviction.
+        healthy_after (int): Consecutive successful probes before readmission.
+        breaker_options (dict): Keyword arguments for each backend's `CircuitBreaker`.
+        hedge_min_samples (int): Latency samples needed before hedging a backend.
+    """
+
+    def __init__(
+        self,
+        default_url: str = "http://localhost:11434",
+        strategy: str = "least_outstanding",
+        ewma_alpha: float = 0.3,
+        unhealthy_after: int = 3,
+        healthy_after: int = 2,
+        breaker_options: Optional[dict] = None,
+        hedge_min_samples: int = 20,
+    ):
+        """
+        Args:
+            default_url (str): Endpoint for models without registered endpoints.
+            strategy (str): "least_outstanding" or "latency_weighted".
+            ewma_alpha (float): EWMA smoothing factor. Defaults to 0.3.
+            unhealthy_after (int): Failures before eviction. Defaults to 3.
+            healthy_after (int): Probe successes before readmission. Defaults to 2.
+            breaker_options (dict, optional): Circuit breaker settings per backend.
+            hedge_min_samples (int): Samples before hedging is enabled. Defaults to 20.
+
+        Raises:
+            ValueError: If `strategy` is unknown.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown balancing strategy: {strategy}")
+        self.default_url = default_url.rstrip("/")
+        self.strategy = strategy
+        self.ewma_alpha = ewma_alpha
+        self.unhealthy_after = unhealthy_after
+        self.healthy_after = healthy_after
+        self.breaker_options = dict(breaker_options or {})
+        self.hedge_min_samples = hedge_min_samples
+        self._backends: Dict[Tuple[str, str], Backend] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """httpx.AsyncClient: Shared keep-alive client for upstream calls."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=30.0)
+        return self._client
+
+    async def aclose(self):
+        """
+        Closes the shared HTTP client.
+
+        Returns:
+            None
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def backends(self, model: str) -> List[Backend]:
+        """
+        Returns the backends for a model, reconciled with the registry.
+
+        Endpoints added to the registry gain a backend; state (health, latency)
+        of existing endpoints is preserved.
+
+        Args:
+            model (str): Model name or alias.
+
+        Returns:
+            List[Backend]: Backends serving the model.
+        """
+        urls = [url.rstrip("/") for url in get_model_endpoints(model)] or [
+            self.default_url
+        ]
+        backends = []
+        for url in urls:
+            backend = self._backends.get((model, url))
+            if backend is None:
+                # setdefault: threads reconciling at once must share one backend
+                backend = self._backends.setdefault(
+                    (model, url), Backend(model, url, self.breaker_options)
+                )
+            backends.append(backend)
+        return backends
+
+    def choose(self, model: str, exclude: Tuple[str, ...] = ()) -> Backend:
+        """
+        Picks a backend for the next request according to the strategy.
+
+        Args:
+            model (str): Model name or alias.
+            exclude (Tuple[str, ...]): Backend URLs to skip (e.g. already tried).
+
+        Returns:
+            Backend: Selected backend.
+
+        Raises:
+            NoBackendAvailable: If every backend is excluded or its circuit is open.
+        """
+        candidates = [
+            b
+            for b in self.backends(model)
+            if b.url not in exclude and b.breaker.available()
+        ]
+        if not candidates:
+            raise NoBackendAvailable(f"No backend available for model '{model}'")
+
+        # Panic mode: route across all backends if none is healthy
+        healthy = [b for b in candidates if b.healthy] or candidates
+
+        if self.strategy == "latency_weighted" and len(healthy) > 1:
+            a, b = random.sample(healthy, 2)
+            cost_a = (a.ewma_latency or 1e-3) * (a.in_flight + 1)
+            cost_b = (b.ewma_latency or 1e-3) * (b.in_flight + 1)
+            return a if cost_a <= cost_b else b
+
+        random.shuffle(healthy)
+        return min(healthy, key=lambda b: (b.in_flight, b.ewma_latency))
+
+    def is_available(self, model: str) -> bool:
+        """
+        Reports whether a model can currently be served, without reserving a backend.
+
+        Backends are reconciled with the registry first, so a model the pool
+        has not routed yet is judged by the state of its fresh backends. Health
+        only counts for models with registered endpoints: the `default_url`
+        backend of any other model is probed at a host that does not serve it
+        (e.g. no Ollama runs next to a simulated model).
+
+        Args:
+            model (str): Model name or alias.
+
+        Returns:
+            bool: True if at least one backend is healthy (or the model has no
+                registered endpoints) and its circuit would admit a call.
+        """
+        ignore_health = not get_model_endpoints(model)
+        return any(
+            (b.healthy or ignore_health) and b.breaker.available()
+            for b in self.backends(model)
+        )
+
+    @contextmanager
+    def reserve(
+        self,
+        model: str,
+        exclude: Tuple[str, ...] = (),
+        backend: Optional[Backend] = None,
+    ):
+        """
+        Reserves a backend for the duration of one call, from any thread.
+
+        In-flight counts, latency, passive health and the circuit breaker are
+        updated on exit; an exception raised inside the block counts as a
+        backend failure, a cancellation does not. Synchronous callers (e.g.
+        route handlers running in the threadpool) use it directly;
+        `acquire` is the async form.
+
+        Args:
+            model (str): Model name or alias.
+            exclude (Tuple[str, ...]): Backend URLs to skip.
+            backend (Backend, optional): Pre-selected backend; chosen by the
+                strategy if omitted.
+
+        Yields:
+            Backend: Selected backend.
+
+        Raises:
+            NoBackendAvailable: If no backend can be selected or its circuit
+                rejects the call.
+        """
+        if backend is None:
+            backend = self.choose(model, exclude)
+        if not backend.breaker.allow():
+            raise NoBackendAvailable(f"Circuit open for backend '{backend.url}'")
+        labels = {"model": backend.model, "backend": backend.url}
+        with backend.lock:
+            backend.in_flight += 1
+        BACKEND_IN_FLIGHT.labels(**labels).inc()
+        start = time.perf_counter()
+        try:
+            yield backend
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                backend.breaker.release()
+            else:
+                backend.breaker.record_failure()
+                self._record_failure(backend)
+            raise
+        else:
+            latency = time.perf_counter() - start
+            backend.breaker.record_success(latency)
+            BACKEND_LATENCY.labels(**labels).observe(latency)
+            with backend.lock:
+                backend.latencies.append(latency)
+                backend.ewma_latency = (
+                    latency
+                    if backend.ewma_latency == 0.0
+                    else self.ewma_alpha * latency
+                    + (1 - self.ewma_alpha) * backend.ewma_latency
+                )
+                backend.consecutive_failures = 0
+        finally:
+            with backend.lock:
+                backend.in_flight -= 1
+            BACKEND_IN_FLIGHT.labels(**labels).dec()
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        model: str,
+        exclude: Tuple[str, ...] = (),
+        backend: Optional[Backend] = None,
+    ):
+        """
+        Reserves a backend for the duration of one upstream request.
+
+        Async form of `reserve`, with the same bookkeeping.
+
+        Args:
+            model (str): Model name or alias.
+            exclude (Tuple[str, ...]): Backend URLs to skip.
+            backend (Backend, optional): Pre-selected backend; chosen by the
+                strategy if omitted.
+
+        Yields:
+            Backend: Selected backend.
+
+        Raises:
+            NoBackendAvailable: If no backend can be selected or its circuit
+                rejects the call.
+        """
+        with self.reserve(model, exclude, backend) as reserved:
+            yield reserved
+
+    async def request(
+        self,
+        model: str,
+        send: Callable[[Backend], Awaitable[Any]],
+        hedge: bool = False,
+    ) -> Any:
+        """
+        Performs one upstream call with failover and optional hedging.
+
+        `send(backend)` is awaited on a chosen backend. With `hedge=True`, once
+        that call has run longer than the backend's observed p95, the same call
+        is started on a second backend; the first success is returned and the
+        other attempt is cancelled. If the first attempt fails before a hedge
+        was sent, it is retried once on another backend.
+
+        Args:
+            model (str): Model name or alias.
+            send (Callable[[Backend], Awaitable[Any]]): Performs the call on a backend.
+            hedge (bool): Whether to hedge slow calls. Defaults to False.
+
+        Returns:
+            Any: Result of the winning `send` call.
+
+        Raises:
+            NoBackendAvailable: If no backend can be selected.
+            Exception: The last upstream error if every attempt failed.
+        """
+
+        async def attempt(backend: Backend):
+            async with self.acquire(model, backend=backend) as acquired:
+                return await send(acquired)
+
+        def launch_alternate():
+            try:
+                alternate = self.choose(model, exclude=tuple(tried))
+            except NoBackendAvailable:
+                return None
+            tried.append(alternate.url)
+            return asyncio.create_task(attempt(alternate))
+
+        primary = self.choose(model)
+        tried = [primary.url]
+        delay = primary.p95(self.hedge_min_samples) if hedge else None
+        first = asyncio.create_task(attempt(primary))
+        pending = {first}
+        second_sent = False
+        last_error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                wait_for = delay if delay is not None and not second_sent else None
+                done, pending = await asyncio.wait(
+                    pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Primary exceeded its p95: hedge on another backend
+                    second_sent = True
+                    task = launch_alternate()
+                    if task is not None:
+                        HEDGED_REQUESTS.labels(model=model, outcome="launched").inc()
+                        pending.add(task)
+                    continue
+
+                for task in done:
+                    if task.exception() is None:
+                        if delay is not None and second_sent and task is not first:
+                            HEDGED_REQUESTS.labels(model=model, outcome="won").inc()
+                        return task.result()
+                    last_error = task.exception()
+
+                if not pending and not second_sent:
+                    # Fail over once to another backend
+                    second_sent = True
+                    task = launch_alternate()
+                    if task is not None:
+                        pending.add(task)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        raise last_error
+
+    def _record_failure(self, backend: Backend):
+        """
+        Counts a failure and evicts the backend past the threshold.
+
+        Args:
+            backend (Backend): Backend that failed.
+
+        Returns:
+            None
+        """
+        with backend.lock:
+            backend.consecutive_failures += 1
+            backend.consecutive_successes = 0
+            evict = backend.healthy and (
+                backend.consecutive_failures >= self.unhealthy_after
+            )
+            if evict:
+                backend.healthy = False
+        if evict:
+            BACKEND_HEALTHY.labels(model=backend.model, backend=backend.url).set(0)
+
+    def _record_probe_success(self, backend: Backend):
+        """
+        Counts a successful probe and readmits the backend past the threshold.
+
+        Args:
+            backend (Backend): Backend that answered the probe.
+
+        Returns:
+            None
+        """
+        with backend.lock:
+            backend.consecutive_failures = 0
+            backend.consecutive_successes += 1
+            readmit = not backend.healthy and (
+                backend.consecutive_successes >= self.healthy_after
+            )
+            if readmit:
+                backend.healthy = True
+        if readmit:
+            BACKEND_HEALTHY.labels(model=backend.model, backend=backend.url).set(1)
+
+    async def check_health(self, timeout: float = 2.0):
+        """
+        Probes every known backend once with `GET {url}/api/tags`.
+
+        Args:
+            timeout (float): Per-probe timeout in seconds. Defaults to 2.0.
+
+        Returns:
+            None
+        """
+
+        async def probe(backend: Backend):
+            try:
+                res = await self.client.get(f"{backend.url}/api/tags", timeout=timeout)
+                res.raise_for_status()
+            except Exception:
+                self._record_failure(backend)
+            else:
+                self._record_probe_success(backend)
+
+        await asyncio.gather(*(probe(b) for b in list(self._backends.values())))
+
+    async def run_health_checks(
+        self, interval: float, models: Callable[[], Iterable[str]] = tuple
+    ):
+        """
+        Probes backends forever at a fixed interval. Run as a background task.
+
+        Args:
+            interval (float): Seconds between probe rounds.
+            models (Callable[[], Iterable[str]]): Returns the models whose
+                backends are registered before each round, so models added by
+                a registry reload are probed too.
+
+        Returns:
+            None
+        """
+        while True:
+            for model in models():
+                self.backends(model)
+            await self.check_health()
+            await asyncio.sleep(interval)
+
+    def status(self) -> Dict[str, List[dict]]:
+        """
+        Summarizes all known backends grouped by model.
+
+        Returns:
+            Dict[str, List[dict]]: Model -> backend status entries.
+        """
+        result: Dict[str, List[dict]] = {}
+        for (model, _), backend in self._backends.items():
+            result.setdefault(model, []).append(backend.status())
+        return result
+
+
+# Pool used by routers mounted outside `create_app` (e.g. in unit tests)
+_DEFAULT_POOL: Optional[BackendPool] = None
+
+
+def get_request_backend_pool(request: Request) -> BackendPool:
+    """
+    FastAPI dependency returning the backend pool of the app serving `request`.
+
+    Args:
+        request (Request): Incoming FastAPI request.
+
+    Returns:
+        BackendPool: `app.state.backend_pool`, or a process-wide default pool
+            built from `get_settings()` when the app has none.
+    """
+    global _DEFAULT_POOL
+    pool = getattr(request.app.state, "backend_pool", None)
+    if pool is not None:
+        return pool
+    if _DEFAULT_POOL is None:
+        from llmops.config import get_settings
+
+        _DEFAULT_POOL = build_backend_pool(get_settings())
+    return _DEFAULT_POOL
+
+
+def build_backend_pool(settings) -> BackendPool:
+    """
+    Builds a backend pool configured from application settings.
+
+    Args:
+        settings (Settings): Active settings.
+
+    Returns:
+        BackendPool: Pool using the configured strategy and breaker thresholds.
+    """
+    return BackendPool(
+        default_url=settings.ollama_url,
+        strategy=settings.lb_strategy,
+        breaker_options={
+            "failure_ratio": settings.breaker_failure_ratio,
+            "slow_call_seconds": settings.breaker_slow_call_seconds,
+            "open_seconds": settings.breaker_open_seconds,
+        },
+    )
@@ -0,0 +1,213 @@
+"""
+circuit_breaker.py
+
+Per-backend circuit breaker for upstream LLM calls.
+
+A breaker watches the outcomes of the last `window` calls to one backend. Calls
+that fail, or that succeed slower than `slow_call_seconds`, count as failures.
+Once at least `min_calls` outcomes are known and the failure ratio reaches
+`failure_ratio`, the breaker opens: requests are rejected immediately instead of
+waiting out the upstream timeout. After `open_seconds` it turns half-open and
+admits up to `half_open_max_calls` probe requests; a successful probe closes it,
+a failed probe re-opens it.
+
+Every method may be called from any thread (synchronous route handlers report
+outcomes from the threadpool); state changes happen under a lock, so concurrent
+callers cannot exceed `half_open_max_calls` or lose outcomes.
+
+States:
+    "closed": traffic flows normally.
+    "open": traffic is rejected until the cool-down elapses.
+    "half_open": a limited number of probes are allowed through.
+
+Metrics:
+    BREAKER_STATE: 0 closed, 1 half-open, 2 open, per backend.
+    BREAKER_TRANSITIONS: State changes per backend and target state.
+"""
+
+import threading
+import time
+from collections import deque
+
+from prometheus_client import Counter, Gauge
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Prometheus gauge: breaker state per backend (0 closed, 1 half-open, 2 open)
+BREAKER_STATE = Gauge(
+    "llm_circuit_breaker_state",
+    "Circuit breaker state per LLM backend",
+    ["model", "backend"],
+)
+
+# Prometheus counter: breaker state transitions per backend
+BREAKER_TRANSITIONS = Counter(
+    "llm_circuit_breaker_transitions_total",
+    "Circuit breaker state transitions per LLM backend",
+    ["model", "backend", "state"],
+)
+
+
+class CircuitBreaker:
+    """
+    Failure-ratio and slow-call circuit breaker with half-open probing.
+
+    Attributes:
+        state (str): Current state ("closed", "open" or "half_open").
+        failure_ratio (float): Failure fraction that opens the breaker.
+        window (int): Number of recent outcomes considered.
+        min_calls (int): Outcomes required before the ratio is evaluated.
+        slow_call_seconds (float): Successful calls slower than this count as failures.
+        open_seconds (float): Cool-down before half-open probing.
+        half_open_max_calls (int): Concurrent probes allowed while half-open.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        backend: str,
+        failure_ratio: float = 0.5,
+        window: int = 20,
+        min_calls: int = 5,
+        slow_call_seconds: float = 10.0,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        """
+        Args:
+            model (str): Model served by the backend (metric label).
+            backend (str): Backend URL (metric label).
+            failure_ratio (float): Failure fraction that opens the breaker. Defaults to 0.5.
+            window (int): Recent outcomes considered. Defaults to 20.
+            min_calls (int): Outcomes needed before tripping. Defaults to 5.
+            slow_call_seconds (float): Slow-call threshold. Defaults to 10.0.
+            open_seconds (float): Open-state cool-down. Defaults to 30.0.
+            half_open_max_calls (int): Concurrent half-open probes. Defaults to 1.
+        """
+        self.failure_ratio = failure_ratio
+        self.window = window
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self._labels = {"model": model, "backend": backend}
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._lock = threading.Lock()
+        BREAKER_STATE.labels(**self._labels).set(_STATE_VALUES[CLOSED])
+
+    def _transition(self, state: str):
+        """
+        Moves to `state` and updates metrics. Called with the lock held.
+
+        Args:
+            state (str): Target state.
+
+        Returns:
+            None
+        """
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state in (OPEN, CLOSED):
+            self._half_open_in_flight = 0
+        if state == CLOSED:
+            self._outcomes.clear()
+        BREAKER_STATE.labels(**self._labels).set(_STATE_VALUES[state])
+        BREAKER_TRANSITIONS.labels(**self._labels, state=state).inc()
+
+    def available(self) -> bool:
+        """
+        Reports whether a call would currently be admitted, without reserving it.
+
+        Returns:
+            bool: False while open (before the cool-down) or while all
+                half-open probe slots are taken.
+        """
+        if self.state == OPEN:
+            return time.monotonic() - self._opened_at >= self.open_seconds
+        if self.state == HALF_OPEN:
+            return self._half_open_in_flight < self.half_open_max_calls
+        return True
+
+    def allow(self) -> bool:
+        """
+        Admits a call, reserving a probe slot when half-open.
+
+        Returns:
+            bool: True if the call may proceed.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    return False
+                self._half_open_in_flight += 1
+            return True
+
+    def record_success(self, latency: float):
+        """
+        Records a completed call.
+
+        Args:
+            latency (float): Call duration in seconds.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if latency > self.slow_call_seconds:
+                self._fail()
+            elif self.state == HALF_OPEN:
+                self._transition(CLOSED)
+            else:
+                self._outcomes.append(False)
+
+    def record_failure(self):
+        """
+        Records a failed (or too slow) call and trips the breaker if needed.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._fail()
+
+    def _fail(self):
+        """
+        Records a failure outcome. Called with the lock held.
+
+        Returns:
+            None
+        """
+        if self.state == HALF_OPEN:
+            self._transition(OPEN)
+            return
+        self._outcomes.append(True)
+        if (
+            self.state == CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and sum(self._outcomes) / len(self._outcomes) >= self.failure_ratio
+        ):
+            self._transition(OPEN)
+
+    def release(self):
+        """
+        Frees a half-open probe slot for a call that ended without an outcome
+        (e.g. a cancelled hedge).
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._half_open_in_flight > 0:
+                self._half_open_in_flight -= 1
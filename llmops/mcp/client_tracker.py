@@ -1,16 +1,74 @@
 """
 client_tracker.py
 
-Provides in-memory tracking for client usage of LLM models.
+Provides tracking for client usage of LLM models.
 
-This module maintains a simple in-process log of token usage per client.
-Useful for diagnostics, basic analytics, and debugging purposes in the MCP.
+This module maintains two views of token usage per client:
+
+- `CLIENT_LOGS`: a simple in-process log of recent usage entries, useful for
+  diagnostics and debugging in the MCP. It keeps the last `CLIENT_LOG_LIMIT`
+  entries of the `CLIENT_LOG_MAX_CLIENTS` most recently active clients, so a
+  long-running worker does not grow with traffic.
+- A `SharedCounterTable` of per-client request and token totals. Backed by a
+  file-mapped table it is shared by every worker on the host, and it is
+  periodically snapshotted to SQLite so totals survive restarts. Statistics
+  (`get_client_stats`) are read from these counters.
 
 Attributes:
-    CLIENT_LOGS (dict): A dictionary mapping client IDs to a list of usage entries.
+    CLIENT_LOGS (OrderedDict): Client IDs mapped to their recent usage entries,
+        least recently active first.
 """
 
-CLIENT_LOGS = {}
+import asyncio
+from collections import OrderedDict, deque
+from typing import Optional
+
+from llmops.database import load_client_usage, save_client_usage
+from llmops.mcp.shared_counters import SharedCounterTable
+
+CLIENT_LOGS = OrderedDict()
+
+# Recent usage entries kept per client in CLIENT_LOGS
+CLIENT_LOG_LIMIT = 100
+
+# Clients kept in CLIENT_LOGS; the least recently active is dropped beyond it
+CLIENT_LOG_MAX_CLIENTS = 1000
+
+# Per-client totals shared across workers; created on first use
+_COUNTERS: Optional[SharedCounterTable] = None
+
+
+def configure_client_counters(
+    path: Optional[str] = None, slots: int = 4096
+) -> SharedCounterTable:
+    """
+    Replaces the per-client counter table.
+
+    Args:
+        path (str, optional): Backing file shared by all workers; None keeps
+            the counters private to this process.
+        slots (int): Maximum number of distinct clients. Defaults to 4096.
+
+    Returns:
+        SharedCounterTable: The new table.
+    """
+    global _COUNTERS
+    if _COUNTERS is not None:
+        _COUNTERS.close()
+    _COUNTERS = SharedCounterTable(path=path, slots=slots)
+    return _COUNTERS
+
+
+def get_client_counters() -> SharedCounterTable:
+    """
+    Returns the per-client counter table, creating a private one if needed.
+
+    Returns:
+        SharedCounterTable: Active table.
+    """
+    if _COUNTERS is None:
+        return configure_client_counters()
+    return _COUNTERS
 
 
 def log_client_usage(client_id, model_name, tokens_used):
@@ -25,27 +83,34 @@ def log_client_usage(client_id, model_name, tokens_used):
     Returns:
         None
     """
-    if client_id not in CLIENT_LOGS:
-        CLIENT_LOGS[client_id] = []
-    CLIENT_LOGS[client_id].append({"model": model_name, "tokens": tokens_used})
+    entries = CLIENT_LOGS.get(client_id)
+    if entries is None:
+        entries = CLIENT_LOGS[client_id] = deque(maxlen=CLIENT_LOG_LIMIT)
+        if len(CLIENT_LOGS) > CLIENT_LOG_MAX_CLIENTS:
+            CLIENT_LOGS.popitem(last=False)
+    else:
+        CLIENT_LOGS.move_to_end(client_id)
+    entries.append({"model": model_name, "tokens": tokens_used})
+    get_client_counters().add(client_id, requests=1, tokens=tokens_used)
 
 
 def get_client_summary(client_id):
     """
-    Retrieves the full usage history for a specific client.
+    Retrieves the recent usage history recorded by this process for a client.
 
     Args:
         client_id (str): Unique identifier of the client/user.
 
     Returns:
-        list[dict]: A list of usage entries containing model name and tokens used.
+        list[dict]: Up to `CLIENT_LOG_LIMIT` usage entries containing model name
+            and tokens used, oldest first.
     """
-    return CLIENT_LOGS.get(client_id, [])
+    return list(CLIENT_LOGS.get(client_id, ()))
 
 
 def get_client_stats(client_id):
     """
-    Computes usage statistics for a specific client.
+    Computes usage statistics for a specific client across all workers.
 
     Args:
         client_id (str): Unique identifier of the client/user.
@@ -53,10 +118,43 @@ def get_client_stats(client_id):
     Returns:
         dict: A dictionary with total token usage, request count, and average tokens per request.
     """
-    usage = CLIENT_LOGS.get(client_id, [])
-    if not usage:
+    count, total_tokens = get_client_counters().get(client_id)
+    if not count:
         return {"total_tokens": 0, "request_count": 0, "avg_tokens": 0}
-    total_tokens = sum(entry["tokens"] for entry in usage)
-    count = len(usage)
     avg = total_tokens / count
     return {"total_tokens": total_tokens, "request_count": count, "avg_tokens": avg}
+
+
+def restore_client_usage() -> bool:
+    """
+    Seeds the counters from the last SQLite snapshot, once per shared table.
+
+    Returns:
+        bool: True if this call restored the counters.
+    """
+    return get_client_counters().restore(load_client_usage())
+
+
+def snapshot_client_usage() -> int:
+    """
+    Writes the current per-client totals to SQLite.
+
+    Returns:
+        int: Number of clients written.
+    """
+    return save_client_usage(list(get_client_counters().items()))
+
+
+async def run_snapshots(interval: float):
+    """
+    Snapshots the counters forever at a fixed interval. Run as a background task.
+
+    Args:
+        interval (float): Seconds between snapshots.
+
+    Returns:
+        None
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(snapshot_client_usage)
@@ -0,0 +1,475 @@
+"""
+concurrency_limiter.py
+
+Adaptive concurrency limits for upstream model calls.
+
+A fixed cap on parallel calls to a model is either too low (the GPU idles) or
+too high (requests queue inside Ollama and latency grows for everyone). Each
+model instead gets an `AdaptiveLimiter` whose in-flight limit is tuned from the
+latency of completed calls, after Netflix's concurrency-limits:
+
+- Samples are aggregated into windows of at least `window_size` calls and one
+  average latency, and the limit is updated once per window, so a decision
+  sees the effect of the previous one instead of reacting many times to the
+  same queue.
+- "gradient" (default): a long-window average of the windows whose latency
+  is within `tolerance` of it estimates the no-load latency (gradient2-style),
+  so the estimate follows gradual shifts without lowering the limit. While
+  latency stays within `tolerance` the limit grows by a small queue allowance
+  (`sqrt(limit)`); once queueing inflates latency the gradient
+  `tolerance * no_load / latency` drops below 1 and the limit shrinks
+  proportionally, so it settles near the knee of the latency curve where
+  throughput stops rising with concurrency. Only when latency has stayed
+  inflated for `long_window` windows in a row, which a model whose latency
+  does not depend on concurrency never triggers, is the limit halved once to
+  re-measure: inflation caused by queueing disappears at the lower
+  concurrency, while a model that got slower for good keeps it and becomes
+  the new estimate.
+- "aimd": additive increase while calls are fast and the limit is in use,
+  multiplicative decrease (`backoff_ratio`) after a failure or a window slower
+  than `latency_threshold`.
+
+The limit only grows while at least half of it is in use, so an idle period
+does not inflate it. Calls over the limit are rejected immediately
+(`ConcurrencyLimitExceeded`); routes answer 503 so clients back off, rather than
+queueing work the model cannot absorb.
+
+Metrics:
+    CONCURRENCY_LIMIT: Current limit per model.
+    CONCURRENCY_IN_FLIGHT: Admitted in-flight calls per model.
+    CONCURRENCY_REJECTED: Calls rejected over the limit per model.
+"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import Request
+from prometheus_client import Counter, Gauge
+
+# Prometheus gauge: adaptive concurrency limit per model
+CONCURRENCY_LIMIT = Gauge(
+    "llm_concurrency_limit", "Adaptive upstream concurrency limit", ["model"]
+)
+
+# Prometheus gauge: in-flight upstream calls admitted by the limiter per model
+CONCURRENCY_IN_FLIGHT = Gauge(
+    "llm_concurrency_in_flight", "Upstream calls admitted by the limiter", ["model"]
+)
+
+# Prometheus counter: upstream calls rejected over the limit per model
+CONCURRENCY_REJECTED = Counter(
+    "llm_concurrency_rejected_total",
+    "Upstream calls rejected by the adaptive concurrency limit",
+    ["model"],
+)
+
+ALGORITHMS = ("gradient", "aimd")
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Raised when a call would exceed the model's current concurrency limit."""
+
+
+class GradientLimit:
+    """
+    Gradient limit algorithm: windowed latency against the no-load latency.
+
+    Attributes:
+        tolerance (float): Latency inflation over the no-load latency tolerated
+            before the limit shrinks.
+        smoothing (float): Weight of each new estimate in the limit.
+        long_window (int): Windows averaged by the no-load latency estimate,
+            and inflated windows in a row before it is re-measured.
+        no_load_rtt (float, optional): Long-window average latency of the
+            windows within tolerance.
+    """
+
+    def __init__(
+        self, tolerance: float = 1.5, smoothing: float = 0.2, long_window: int = 100
+    ):
+        """
+        Args:
+            tolerance (float): Tolerated latency inflation. Defaults to 1.5.
+            smoothing (float): New estimate weight. Defaults to 0.2.
+            long_window (int): Windows in the no-load average. Defaults to 100.
+        """
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.long_window = long_window
+        self.no_load_rtt: Optional[float] = None
+        self._inflated = 0
+        self._probing = False
+
+    def update(
+        self, limit: float, rtt: Optional[float], in_flight: int, dropped: bool
+    ) -> float:
+        """
+        Computes the next limit from one window of calls.
+
+        Failures are left to the circuit breakers; only latency moves the limit.
+
+        Args:
+            limit (float): Current limit.
+            rtt (float, optional): Average latency of the window's successful
+                calls in seconds, None if every call failed.
+            in_flight (int): Most calls in flight during the window.
+            dropped (bool): Whether any call failed.
+
+        Returns:
+            float: New limit (unclamped).
+        """
+        if rtt is None:
+            return limit
+        if self._probing:
+            if in_flight > limit:
+                # Calls admitted before the limit was lowered are still finishing
+                return limit
+            self.no_load_rtt = rtt
+            self._probing = False
+        elif self.no_load_rtt is None:
+            self.no_load_rtt = rtt
+        elif rtt <= self.tolerance * self.no_load_rtt:
+            # Windows without queueing move the estimate, so a steady latency
+            # shift is followed without ever lowering the limit to measure it
+            self._inflated = 0
+            self.no_load_rtt += (rtt - self.no_load_rtt) / self.long_window
+            if self.no_load_rtt > 2 * rtt:
+                # Queues drained: let the estimate catch up with the fast windows
+                self.no_load_rtt *= 0.95
+        else:
+            self._inflated += 1
+            if self._inflated >= self.long_window:
+                # Inflated for a long window: queueing or a slower model. Only
+                # a lower concurrency tells them apart, so re-measure there.
+                self._inflated = 0
+                self._probing = True
+                return limit / 2
+        if in_flight < limit / 2:
+            return limit
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.no_load_rtt / rtt))
+        estimate = limit * gradient + math.sqrt(limit)
+        return limit * (1 - self.smoothing) + estimate * self.smoothing
+
+
+class AIMDLimit:
+    """
+    Additive-increase / multiplicative-decrease limit algorithm.
+
+    Attributes:
+        backoff_ratio (float): Factor applied to the limit on a drop.
+        latency_threshold (float): Windows slower than this on average count
+            as drops.
+    """
+
+    def __init__(self, backoff_ratio: float = 0.9, latency_threshold: float = 5.0):
+        """
+        Args:
+            backoff_ratio (float): Decrease factor. Defaults to 0.9.
+            latency_threshold (float): Slow-call threshold in seconds. Defaults to 5.0.
+        """
+        self.backoff_ratio = backoff_ratio
+        self.latency_threshold = latency_threshold
+
+    def update(
+        self, limit: float, rtt: Optional[float], in_flight: int, dropped: bool
+    ) -> float:
+        """
+        Computes the next limit from one window of calls.
+
+        Args:
+            limit (float): Current limit.
+            rtt (float, optional): Average latency of the window's successful
+                calls in seconds, None if every call failed.
+            in_flight (int): Most calls in flight during the window.
+            dropped (bool): Whether any call failed.
+
+        Returns:
+            float: New limit (unclamped).
+        """
+        if dropped or rtt > self.latency_threshold:
+            return limit * self.backoff_ratio
+        if in_flight * 2 >= limit:
+            return limit + 1
+        return limit
+
+
+class AdaptiveLimiter:
+    """
+    In-flight limit for one model, adapted from observed call latency.
+
+    Attributes:
+        model (str): Model whose calls are limited (metric label).
+        limit (float): Current limit; `int(limit)` calls are admitted.
+        min_limit (int): Lowest limit.
+        max_limit (int): Highest limit.
+        window_size (int): Calls sampled before the limit is updated.
+        in_flight (int): Admitted calls not yet finished.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        algorithm: str = "gradient",
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        latency_threshold: float = 5.0,
+        window_size: int = 10,
+    ):
+        """
+        Args:
+            model (str): Model whose calls are limited.
+            algorithm (str): "gradient" or "aimd". Defaults to "gradient".
+            initial_limit (int): Starting limit. Defaults to 20.
+            min_limit (int): Lowest limit. Defaults to 1.
+            max_limit (int): Highest limit. Defaults to 200.
+            latency_threshold (float): AIMD slow-window threshold in seconds.
+                Defaults to 5.0.
+            window_size (int): Calls per update window. Defaults to 10.
+
+        Raises:
+            ValueError: If `algorithm` is unknown.
+        """
+        if algorithm == "gradient":
+            self.algorithm = GradientLimit()
+        elif algorithm == "aimd":
+            self.algorithm = AIMDLimit(latency_threshold=latency_threshold)
+        else:
+            raise ValueError(f"Unknown concurrency limit algorithm: {algorithm}")
+        self.model = model
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window_size = window_size
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.in_flight = 0
+        self._reset_window(None)
+        CONCURRENCY_LIMIT.labels(model=model).set(int(self.limit))
+
+    def _reset_window(self, now: Optional[float]):
+        """Starts a new sample window at `now` (at the first sample if None)."""
+        self._window_start = now
+        self._window_calls = 0
+        self._window_successes = 0
+        self._window_rtt = 0.0
+        self._window_in_flight = 0
+        self._window_dropped = False
+
+    def on_sample(
+        self,
+        rtt: float,
+        in_flight: int,
+        dropped: bool = False,
+        now: Optional[float] = None,
+    ):
+        """
+        Adds one completed call to the window, updating the limit when it closes.
+
+        A window closes once it holds `window_size` calls and has lasted at
+        least their average latency.
+
+        Args:
+            rtt (float): Call latency in seconds.
+            in_flight (int): Calls in flight when this one started.
+            dropped (bool): Whether the call failed. Defaults to False.
+            now (float, optional): Completion time (`time.perf_counter()` scale).
+                Defaults to the current time.
+
+        Returns:
+            None
+        """
+        now = time.perf_counter() if now is None else now
+        if self._window_start is None:
+            self._window_start = now - rtt
+        self._window_calls += 1
+        self._window_in_flight = max(self._window_in_flight, in_flight)
+        if dropped:
+            self._window_dropped = True
+        else:
+            self._window_successes += 1
+            self._window_rtt += rtt
+
+        average = (
+            self._window_rtt / self._window_successes
+            if self._window_successes
+            else None
+        )
+        if self._window_calls < self.window_size or (
+            average is not None and now - self._window_start < average
+        ):
+            return
+        limit = self.algorithm.update(
+            self.limit, average, self._window_in_flight, self._window_dropped
+        )
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        CONCURRENCY_LIMIT.labels(model=self.model).set(int(self.limit))
+        self._reset_window(now)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Admits one call for the duration of the block and samples its latency.
+
+        An exception raised inside the block counts as a drop; a cancellation
+        is not sampled.
+
+        Yields:
+            None
+
+        Raises:
+            ConcurrencyLimitExceeded: If the limit is already reached.
+        """
+        if self.in_flight >= int(self.limit):
+            CONCURRENCY_REJECTED.labels(model=self.model).inc()
+            raise ConcurrencyLimitExceeded(
+                f"Concurrency limit {int(self.limit)} reached for model '{self.model}'"
+            )
+        self.in_flight += 1
+        in_flight = self.in_flight
+        CONCURRENCY_IN_FLIGHT.labels(model=self.model).inc()
+        start = time.perf_counter()
+        try:
+            yield
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.on_sample(time.perf_counter() - start, in_flight, dropped=True)
+            raise
+        else:
+            self.on_sample(time.perf_counter() - start, in_flight)
+        finally:
+            self.in_flight -= 1
+            CONCURRENCY_IN_FLIGHT.labels(model=self.model).dec()
+
+    def status(self) -> dict:
+        """
+        Summarises the limiter for diagnostics.
+
+        Returns:
+            dict: Model, limit and in-flight count.
+        """
+        return {
+            "model": self.model,
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+        }
+
+
+class UpstreamLimiters:
+    """
+    Adaptive limiters per model, created on first use.
+
+    Attributes:
+        algorithm (str): "gradient", "aimd" or "none" (no limiting).
+        options (dict): Keyword arguments for each `AdaptiveLimiter`.
+    """
+
+    def __init__(self, algorithm: str = "gradient", **options):
+        """
+        Args:
+            algorithm (str): "gradient", "aimd" or "none". Defaults to "gradient".
+            **options: `AdaptiveLimiter` keyword arguments.
+
+        Raises:
+            ValueError: If `algorithm` is unknown.
+        """
+        if algorithm != "none" and algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown concurrency limit algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.options = options
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def get(self, model: str) -> Optional[AdaptiveLimiter]:
+        """
+        Returns the limiter of a model.
+
+        Args:
+            model (str): Model name.
+
+        Returns:
+            AdaptiveLimiter or None: The model's limiter, None when disabled.
+        """
+        if self.algorithm == "none":
+            return None
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limiter = AdaptiveLimiter(model, self.algorithm, **self.options)
+            self._limiters[model] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def acquire(self, model: str):
+        """
+        Admits one call to `model` (see `AdaptiveLimiter.acquire`).
+
+        Args:
+            model (str): Model name.
+
+        Yields:
+            None
+
+        Raises:
+            ConcurrencyLimitExceeded: If the model's limit is reached.
+        """
+        limiter = self.get(model)
+        if limiter is None:
+            yield
+            return
+        async with limiter.acquire():
+            yield
+
+    def status(self) -> list:
+        """
+        Summarises every limiter.
+
+        Returns:
+            list: `AdaptiveLimiter.status()` per model.
+        """
+        return [limiter.status() for limiter in self._limiters.values()]
+
+
+def build_upstream_limiters(settings) -> UpstreamLimiters:
+    """
+    Builds the per-model limiters configured by application settings.
+
+    Args:
+        settings (Settings): Active settings.
+
+    Returns:
+        UpstreamLimiters: Limiters using the configured algorithm and bounds.
+    """
+    return UpstreamLimiters(
+        settings.concurrency_algorithm,
+        initial_limit=settings.concurrency_initial_limit,
+        max_limit=settings.concurrency_max_limit,
+        latency_threshold=settings.concurrency_aimd_latency_seconds,
+    )
+
+
+# Limiters used by routers mounted outside `create_app` (e.g. in unit tests)
+_DEFAULT_LIMITERS: Optional[UpstreamLimiters] = None
+
+
+def get_request_limiters(request: Request) -> UpstreamLimiters:
+    """
+    FastAPI dependency returning the upstream limiters of the app serving `request`.
+
+    Args:
+        request (Request): Incoming FastAPI request.
+
+    Returns:
+        UpstreamLimiters: `app.state.upstream_limiters`, or process-wide
+            limiters built from `get_settings()` when the app has none.
+    """
+    global _DEFAULT_LIMITERS
+    limiters = getattr(request.app.state, "upstream_limiters", None)
+    if limiters is not None:
+        return limiters
+    if _DEFAULT_LIMITERS is None:
+        from llmops.config import get_settings
+
+        _DEFAULT_LIMITERS = build_upstream_limiters(get_settings())
+    return _DEFAULT_LIMITERS
@@ -3,21 +3,29 @@ model_registry.py
 
 Provides model registration and lookup utilities for the Model Control Plane (MCP).
 
-This module tracks models by name, version, and alias, and persists them to disk.
+This module tracks models by name, version, alias, serving endpoints and
+fallback model, and persists them to disk. Endpoints drive the backend pool in
+`backend_pool.py`; the fallback is served when a model's backends are down.
+
+The registry is an immutable snapshot replaced atomically on every change (see
+`snapshot.py`), so lookups are lock-free and never observe a half-applied
+update. `load_registry` is also called by the MCP file watcher to hot-reload
+the registry file while the service runs.
 
 Attributes:
-    MODEL_REGISTRY (dict): An in-memory dictionary of registered models.
+    REGISTRY (SnapshotStore): Versioned snapshots of the registry.
+    MODEL_REGISTRY (Mapping): Read-only live view of the current registry.
     MODEL_REGISTRY_FILE (str): Path to the JSON file for saving/loading the registry.
 """
 
-import json
-import os
+from llmops.mcp.snapshot import LiveView, SnapshotStore
 
-MODEL_REGISTRY = {}
+REGISTRY = SnapshotStore("model_registry")
+MODEL_REGISTRY = LiveView(REGISTRY)
 MODEL_REGISTRY_FILE = "data/model_registry.json"
 
 
-def register_model(name, version, alias=None):
+def register_model(name, version, alias=None, endpoints=None, fallback=None):
     """
     Registers a new model in the MCP registry.
 
@@ -25,11 +33,23 @@ def register_model(name, version, alias=None):
         name (str): Unique name of the model.
         version (str): Version tag or identifier of the model.
         alias (str, optional): Alternate name for the model. Defaults to `name`.
+        endpoints (list, optional): Base URLs of inference hosts serving the
+            model (e.g. "http://gpu-1:11434"). Defaults to [].
+        fallback (str, optional): Model to serve when this one is unavailable.
+            Defaults to None (no fallback).
 
     Returns:
         None
     """
-    MODEL_REGISTRY[name] = {"version": version, "alias": alias or name}
+    REGISTRY.set(
+        name,
+        {
+            "version": version,
+            "alias": alias or name,
+            "endpoints": list(endpoints or []),
+            "fallback": fallback,
+        },
+    )
 
 
 def get_model_info(name_or_alias):
@@ -40,33 +60,92 @@ def get_model_info(name_or_alias):
         name_or_alias (str): Model name or alias to search for.
 
     Returns:
-        dict or None: Dictionary containing model metadata, or None if not found.
+        Mapping or None: Read-only model metadata, or None if not found.
     """
-    for name, info in MODEL_REGISTRY.items():
+    for name, info in REGISTRY.current.data.items():
         if name == name_or_alias or info["alias"] == name_or_alias:
             return info
     return None
 
 
+def get_model_endpoints(name_or_alias):
+    """
+    Retrieves the serving endpoints registered for a model.
+
+    Args:
+        name_or_alias (str): Model name or alias to search for.
+
+    Returns:
+        tuple: Endpoint base URLs, or () if the model is unknown or has none.
+    """
+    info = get_model_info(name_or_alias)
+    if info is None:
+        return ()
+    return info.get("endpoints", ())
+
+
+def get_model_fallback(name_or_alias):
+    """
+    Retrieves the fallback model registered for a model.
+
+    Args:
+        name_or_alias (str): Model name or alias to search for.
+
+    Returns:
+        str or None: Fallback model name, or None if unknown or not configured.
+    """
+    info = get_model_info(name_or_alias)
+    if info is None:
+        return None
+    return info.get("fallback")
+
+
 def save_registry():
     """
-    Saves the current in-memory model registry to disk as JSON.
+    Saves the current model registry snapshot to disk as JSON.
 
     Returns:
         None
     """
-    with open(MODEL_REGISTRY_FILE, "w") as f:
-        json.dump(MODEL_REGISTRY, f)
+    REGISTRY.save(MODEL_REGISTRY_FILE)
+
+
+def _validate_registry(data):
+    """
+    Checks a registry document loaded from disk.
+
+    Args:
+        data (dict): Parsed registry file.
+
+    Returns:
+        dict: The registry, with defaults for fields added in later versions.
+
+    Raises:
+        ValueError: If an entry is not an object with a version.
+    """
+    registry = {}
+    for name, info in data.items():
+        if not isinstance(info, dict) or "version" not in info:
+            raise ValueError(f"Invalid registry entry for model '{name}'")
+        registry[name] = {
+            "version": info["version"],
+            "alias": info.get("alias") or name,
+            "endpoints": list(info.get("endpoints") or []),
+            "fallback": info.get("fallback"),
+        }
+    return registry
 
 
 def load_registry():
     """
-    Loads the model registry from disk into memory.
+    Loads the model registry from disk, atomically replacing the snapshot.
 
     Returns:
-        None
+        bool: True if a new snapshot was published, False if the file is
+            missing or unchanged.
+
+    Raises:
+        ValueError: If the file is not a valid registry; the current
+            snapshot is kept.
     """
-    global MODEL_REGISTRY
-    if os.path.exists(MODEL_REGISTRY_FILE):
-        with open(MODEL_REGISTRY_FILE, "r") as f:
-            MODEL_REGISTRY = json.load(f)
+    return REGISTRY.load(MODEL_REGISTRY_FILE, transform=_validate_registry)
@@ -0,0 +1,325 @@
+"""
+shared_counters.py
+
+Fixed-slot counter table in shared memory, for per-client usage across workers.
+
+Each slot holds one key (up to `KEY_BYTES` of UTF-8) with a request and a token
+counter, at a fixed offset in an `mmap`. Keys are placed by open addressing on a
+stable 64-bit BLAKE2 hash, and a key never moves once claimed, so every process
+agrees on slot positions without coordination beyond the slot being written.
+Slots are claimed under their lock, and a probe whose hash matches re-reads the
+key under that lock, so a half-written claim is never mistaken for another key.
+
+- Anonymous mapping (default): private to the process, behaves like the former
+  in-memory dict.
+- File-backed mapping (`path`): every uvicorn worker on the host maps the same
+  file and sees the same counters.
+
+Increments lock only their own slot: a striped `threading.Lock` for threads of
+this process plus, for file-backed tables, a POSIX byte-range lock
+(`fcntl.lockf`) on the slot for other processes. An increment therefore costs a
+hash lookup, two small syscalls and a struct update.
+
+The table is not durable on its own; `client_tracker` snapshots it to SQLite
+periodically and restores it on startup (once per table, guarded by a header
+flag so several workers don't restore twice).
+
+Metrics:
+    COUNTER_OVERFLOW: Increments dropped because every slot is taken.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional, Tuple
+
+from prometheus_client import Counter
+
+# Prometheus counter: increments lost because the table is full
+COUNTER_OVERFLOW = Counter(
+    "llm_client_counter_overflow_total",
+    "Client usage increments dropped because the shared counter table is full",
+)
+
+# File format identifier and version stored in the header
+MAGIC = b"LLMOPSCT"
+VERSION = 1
+
+# Header: magic, version, slot count, restored flag; padded to HEADER_SIZE
+HEADER = struct.Struct("<8sIIQ")
+HEADER_SIZE = 64
+
+# Maximum encoded key length; longer keys are stored by digest
+KEY_BYTES = 64
+
+# Slot: key hash (0 = empty), key, requests, tokens
+SLOT = struct.Struct(f"<Q{KEY_BYTES}sqq")
+COUNTS = struct.Struct("<qq")
+COUNTS_OFFSET = 8 + KEY_BYTES
+
+# Striped in-process locks guarding slots
+LOCK_STRIPES = 64
+
+
+def _encode_key(key: str) -> bytes:
+    """
+    Encodes a key to at most `KEY_BYTES` bytes.
+
+    Args:
+        key (str): Counter key.
+
+    Returns:
+        bytes: UTF-8 key, or "sha256:<hex>" for keys that do not fit.
+    """
+    encoded = key.encode("utf-8")
+    if len(encoded) > KEY_BYTES or encoded.endswith(b"\0"):
+        encoded = b"sha256:" + hashlib.sha256(encoded).hexdigest()[:56].encode()
+    return encoded
+
+
+def _hash_key(encoded: bytes) -> int:
+    """
+    Hashes a key identically in every process (unlike `hash()`).
+
+    Args:
+        encoded (bytes): Encoded key.
+
+    Returns:
+        int: Non-zero 64-bit hash.
+    """
+    digest = hashlib.blake2b(encoded, digest_size=8).digest()
+    return int.from_bytes(digest, "little") | 1
+
+
+class SharedCounterTable:
+    """
+    Fixed-capacity table of (requests, tokens) counters keyed by string.
+
+    Attributes:
+        path (str, optional): Backing file, or None for an anonymous mapping.
+        slots (int): Number of slots (maximum distinct keys).
+    """
+
+    def __init__(self, path: Optional[str] = None, slots: int = 4096):
+        """
+        Args:
+            path (str, optional): File to map, shared by all workers using the
+                same path. Created if missing; an existing file keeps its slot
+                count. Defaults to an anonymous, process-private mapping.
+            slots (int): Slots for a new table. Defaults to 4096.
+
+        Raises:
+            ValueError: If `path` exists but is not a counter table.
+        """
+        self.path = path
+        self._fd = None
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._header_lock = threading.Lock()
+        self._slot_index = {}
+
+        if path is None:
+            self.slots = slots
+            self._mm = mmap.mmap(-1, HEADER_SIZE + slots * SLOT.size)
+            HEADER.pack_into(self._mm, 0, MAGIC, VERSION, slots, 0)
+            return
+
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._file_lock(0, HEADER_SIZE):
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, HEADER_SIZE + slots * SLOT.size)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, VERSION, slots, 0), 0)
+            magic, version, self.slots, _ = HEADER.unpack(
+                os.pread(self._fd, HEADER.size, 0)
+            )
+        if magic != MAGIC or version != VERSION:
+            os.close(self._fd)
+            raise ValueError(f"{path} is not an llmops counter table")
+        self._mm = mmap.mmap(self._fd, HEADER_SIZE + self.slots * SLOT.size)
+
+    @contextmanager
+    def _file_lock(self, offset: int, length: int):
+        """
+        Holds an exclusive POSIX lock on a byte range of the backing file.
+
+        Args:
+            offset (int): Start of the range.
+            length (int): Length of the range.
+
+        Yields:
+            None
+        """
+        if self._fd is None:
+            yield
+            return
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, offset, os.SEEK_SET)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, offset, os.SEEK_SET)
+
+    @contextmanager
+    def _locked(self, slot: int):
+        """
+        Locks one slot against other threads and processes.
+
+        Args:
+            slot (int): Slot number.
+
+        Yields:
+            int: Byte offset of the slot.
+        """
+        offset = HEADER_SIZE + slot * SLOT.size
+        with self._locks[slot % LOCK_STRIPES]:
+            with self._file_lock(offset, SLOT.size):
+                yield offset
+
+    def _find(self, key: str, create: bool) -> Optional[int]:
+        """
+        Locates the slot of a key, optionally claiming a free one.
+
+        Args:
+            key (str): Counter key.
+            create (bool): Whether to claim a slot for an unknown key.
+
+        Returns:
+            int or None: Slot number, or None if unknown (or the table is full).
+        """
+        slot = self._slot_index.get(key)
+        if slot is not None:
+            return slot
+        encoded = _encode_key(key)
+        key_hash = _hash_key(encoded)
+        start = key_hash % self.slots
+        for probe in range(self.slots):
+            slot = (start + probe) % self.slots
+            offset = HEADER_SIZE + slot * SLOT.size
+            slot_hash, slot_key, _, _ = SLOT.unpack_from(self._mm, offset)
+            if slot_hash == 0:
+                if not create:
+                    return None
+                with self._locked(slot):
+                    slot_hash, slot_key, _, _ = SLOT.unpack_from(self._mm, offset)
+                    if slot_hash == 0:
+                        SLOT.pack_into(self._mm, offset, key_hash, encoded, 0, 0)
+                        self._slot_index[key] = slot
+                        return slot
+            elif slot_hash == key_hash:
+                # A claim in progress may have written the hash but not the
+                # key yet: compare the key under the lock the claimer holds
+                with self._locked(slot):
+                    slot_key = SLOT.unpack_from(self._mm, offset)[1]
+            if slot_hash == key_hash and slot_key.rstrip(b"\0") == encoded:
+                self._slot_index[key] = slot
+                return slot
+        return None
+
+    def add(self, key: str, requests: int = 1, tokens: int = 0) -> bool:
+        """
+        Atomically adds to a key's counters, claiming a slot if needed.
+
+        Args:
+            key (str): Counter key.
+            requests (int): Requests to add. Defaults to 1.
+            tokens (int): Tokens to add. Defaults to 0.
+
+        Returns:
+            bool: False if the table is full and the increment was dropped.
+        """
+        slot = self._slot_index.get(key)
+        if slot is None:
+            slot = self._find(key, create=True)
+            if slot is None:
+                COUNTER_OVERFLOW.inc()
+                return False
+        # Hot path: locking inlined rather than via `_locked` to keep it cheap
+        slot_offset = HEADER_SIZE + slot * SLOT.size
+        offset = slot_offset + COUNTS_OFFSET
+        with self._locks[slot % LOCK_STRIPES]:
+            if self._fd is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, SLOT.size, slot_offset)
+            try:
+                current_requests, current_tokens = COUNTS.unpack_from(self._mm, offset)
+                COUNTS.pack_into(
+                    self._mm,
+                    offset,
+                    current_requests + requests,
+                    current_tokens + tokens,
+                )
+            finally:
+                if self._fd is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, SLOT.size, slot_offset)
+        return True
+
+    def get(self, key: str) -> Tuple[int, int]:
+        """
+        Reads a key's counters.
+
+        Args:
+            key (str): Counter key.
+
+        Returns:
+            tuple:
+                - int: Request count (0 if unknown).
+                - int: Token count (0 if unknown).
+        """
+        slot = self._find(key, create=False)
+        if slot is None:
+            return 0, 0
+        with self._locked(slot) as offset:
+            return COUNTS.unpack_from(self._mm, offset + COUNTS_OFFSET)
+
+    def items(self) -> Iterator[Tuple[str, int, int]]:
+        """
+        Iterates over all claimed slots.
+
+        Yields:
+            tuple: (key, requests, tokens) per key.
+        """
+        for slot in range(self.slots):
+            offset = HEADER_SIZE + slot * SLOT.size
+            if SLOT.unpack_from(self._mm, offset)[0] == 0:
+                continue
+            with self._locked(slot):
+                _, key, requests, tokens = SLOT.unpack_from(self._mm, offset)
+            yield key.rstrip(b"\0").decode("utf-8"), requests, tokens
+
+    def restore(self, rows: Iterable[Tuple[str, int, int]]) -> bool:
+        """
+        Seeds the counters from a durable snapshot, once per table.
+
+        The first caller (across all processes sharing the file) applies the
+        rows and sets the header's restored flag; later callers do nothing.
+
+        Args:
+            rows (Iterable[Tuple[str, int, int]]): (key, requests, tokens) rows.
+
+        Returns:
+            bool: True if this call applied the rows.
+        """
+        with self._header_lock, self._file_lock(0, HEADER_SIZE):
+            magic, version, slots, restored = HEADER.unpack_from(self._mm, 0)
+            if restored:
+                return False
+            for key, requests, tokens in rows:
+                self.add(key, requests, tokens)
+            HEADER.pack_into(self._mm, 0, magic, version, slots, 1)
+            return True
+
+    def close(self):
+        """
+        Unmaps the table and closes the backing file.
+
+        Returns:
+            None
+        """
+        self._mm.close()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
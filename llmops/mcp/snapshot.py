@@ -0,0 +1,231 @@
+"""
+snapshot.py
+
+Copy-on-write, immutable snapshots for MCP state (model registry, usage policies).
+
+A `SnapshotStore` always exposes one frozen `Snapshot`. Writers build a new
+mapping from the current one and swap it in under a lock; readers just read
+`store.current`, a single attribute load, so they never take a lock, never
+block behind an update and always see one consistent version.
+
+Snapshot contents are frozen recursively: dicts become `MappingProxyType`
+views and lists become tuples, so a reader cannot mutate shared state by
+accident. `LiveView` is a read-only mapping that always reflects the latest
+snapshot, which keeps module attributes such as `MODEL_REGISTRY` valid for
+code that imported them before an update or reload.
+
+Metrics:
+    SNAPSHOT_VERSION: Current snapshot version per store.
+"""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Optional
+
+from prometheus_client import Gauge
+
+# Prometheus gauge: version of the active snapshot per store
+SNAPSHOT_VERSION = Gauge(
+    "llm_mcp_snapshot_version", "Active MCP snapshot version", ["store"]
+)
+
+
+def freeze(value: Any) -> Any:
+    """
+    Recursively converts dicts and lists into read-only equivalents.
+
+    Args:
+        value (Any): JSON-like value.
+
+    Returns:
+        Any: `MappingProxyType` for dicts, tuple for lists, other values unchanged.
+    """
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """
+    Converts a frozen value back into plain, JSON-serializable dicts and lists.
+
+    Args:
+        value (Any): Value produced by `freeze`.
+
+    Returns:
+        Any: Mutable copy.
+    """
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    One immutable version of a store's contents.
+
+    Attributes:
+        version (int): Monotonic version number, starting at 1.
+        data (Mapping): Frozen contents.
+        loaded_at (float): Epoch time the snapshot was published.
+        source (str): What produced it ("init", "api" or a file path).
+    """
+
+    version: int
+    data: Mapping
+    loaded_at: float
+    source: str
+
+
+class SnapshotStore:
+    """
+    Holder of the current snapshot, replaced atomically on every change.
+
+    Attributes:
+        name (str): Store name, used as metric label.
+    """
+
+    def __init__(self, name: str, initial: Optional[dict] = None):
+        """
+        Args:
+            name (str): Store name.
+            initial (dict, optional): Initial contents. Defaults to empty.
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._current = Snapshot(1, freeze(initial or {}), time.time(), "init")
+        SNAPSHOT_VERSION.labels(store=name).set(1)
+
+    @property
+    def current(self) -> Snapshot:
+        """Snapshot: The active snapshot; safe to read without locking."""
+        return self._current
+
+    def _publish(self, data: Mapping, source: str):
+        """
+        Swaps in new contents. Caller must hold `_lock`.
+
+        Args:
+            data (Mapping): Frozen contents.
+            source (str): Origin of the change.
+
+        Returns:
+            None
+        """
+        version = self._current.version + 1
+        self._current = Snapshot(version, data, time.time(), source)
+        SNAPSHOT_VERSION.labels(store=self.name).set(version)
+
+    def set(self, key: str, value: Any):
+        """
+        Publishes a snapshot with one entry added or replaced.
+
+        Args:
+            key (str): Entry key.
+            value (Any): Entry value; frozen before publication.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            data = dict(self._current.data)
+            data[key] = freeze(value)
+            self._publish(MappingProxyType(data), "api")
+
+    def replace(self, data: Mapping, source: str) -> bool:
+        """
+        Publishes entirely new contents, unless they equal the current ones.
+
+        Args:
+            data (Mapping): New contents.
+            source (str): Origin of the change.
+
+        Returns:
+            bool: True if a new snapshot was published.
+        """
+        frozen = freeze(data)
+        with self._lock:
+            if thaw(frozen) == thaw(self._current.data):
+                return False
+            self._publish(frozen, source)
+            return True
+
+    def save(self, path: str):
+        """
+        Writes the current contents to a JSON file atomically.
+
+        The file is written next to `path` and renamed into place, so a file
+        watcher never observes a partially written document.
+
+        Args:
+            path (str): Destination file.
+
+        Returns:
+            None
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(thaw(self._current.data), f)
+        os.replace(tmp_path, path)
+
+    def load(
+        self, path: str, transform: Optional[Callable[[dict], dict]] = None
+    ) -> bool:
+        """
+        Replaces the contents with a JSON file's, if it exists.
+
+        Args:
+            path (str): Source file.
+            transform (Callable[[dict], dict], optional): Validates and
+                normalises the parsed document before publication.
+
+        Returns:
+            bool: True if a new snapshot was published.
+
+        Raises:
+            ValueError: If the file is not a JSON object or fails validation.
+        """
+        if not os.path.exists(path):
+            return False
+        with open(path, "r") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{path} must contain a JSON object")
+        if transform is not None:
+            data = transform(data)
+        return self.replace(data, source=path)
+
+
+class LiveView(Mapping):
+    """
+    Read-only mapping always reflecting a store's latest snapshot.
+    """
+
+    def __init__(self, store: SnapshotStore):
+        """
+        Args:
+            store (SnapshotStore): Store to expose.
+        """
+        self._store = store
+
+    def __getitem__(self, key):
+        return self._store.current.data[key]
+
+    def __iter__(self):
+        return iter(self._store.current.data)
+
+    def __len__(self):
+        return len(self._store.current.data)
+
+    def __repr__(self):
+        return f"LiveView({thaw(self._store.current.data)!r})"
@@ -5,14 +5,29 @@ Manages per-client usage policies for model access within the Model Control Plan
 
 This includes token usage limits and model-level blocklists.
 
+Policies are held in an immutable snapshot replaced atomically on every change
+(see `snapshot.py`): `check_policy` runs on the request hot path and reads the
+current snapshot without taking a lock, so it never waits for an admin update
+or a file reload. Policies are persisted to `USAGE_POLICIES_FILE`, which the MCP
+file watcher hot-reloads.
+
 Attributes:
-    USAGE_POLICIES (dict): In-memory mapping of client IDs to their usage policy.
-        Each policy includes:
+    POLICIES (SnapshotStore): Versioned snapshots of the policies.
+    USAGE_POLICIES (Mapping): Read-only live view mapping client IDs to their
+        usage policy. Each policy includes:
             - max_tokens (int): Maximum allowed tokens for the client.
-            - blocked_models (list): List of model names the client is restricted from using.
+            - blocked_models (tuple): Model names the client is restricted from using.
+    USAGE_POLICIES_FILE (str): Path to the JSON file for saving/loading policies.
 """
 
-USAGE_POLICIES = {"default": {"max_tokens": 100000, "blocked_models": []}}
+from llmops.mcp.snapshot import LiveView, SnapshotStore
+
+# Policy applied to clients without their own; always present
+DEFAULT_POLICY = {"max_tokens": 100000, "blocked_models": []}
+
+POLICIES = SnapshotStore("usage_policies", {"default": DEFAULT_POLICY})
+USAGE_POLICIES = LiveView(POLICIES)
+USAGE_POLICIES_FILE = "data/usage_policies.json"
 
 
 def set_policy(client_id, max_tokens, blocked_models=None):
@@ -27,10 +42,13 @@ def set_policy(client_id, max_tokens, blocked_models=None):
     Returns:
         None
     """
-    USAGE_POLICIES[client_id] = {
-        "max_tokens": max_tokens,
-        "blocked_models": blocked_models or [],
-    }
+    POLICIES.set(
+        client_id,
+        {
+            "max_tokens": max_tokens,
+            "blocked_models": blocked_models or [],
+        },
+    )
 
 
 def check_policy(client_id, model_name, token_count):
@@ -47,9 +65,61 @@ def check_policy(client_id, model_name, token_count):
             - bool: True if the request is allowed, False otherwise.
             - str: Reason for the decision ("Allowed", "Token limit exceeded", etc.)
     """
-    policy = USAGE_POLICIES.get(client_id, USAGE_POLICIES["default"])
+    policies = POLICIES.current.data
+    policy = policies.get(client_id) or policies["default"]
     if model_name in policy["blocked_models"]:
         return False, "Model is blocked"
     if token_count > policy["max_tokens"]:
         return False, "Token limit exceeded"
     return True, "Allowed"
+
+
+def save_policies():
+    """
+    Saves the current usage policies snapshot to disk as JSON.
+
+    Returns:
+        None
+    """
+    POLICIES.save(USAGE_POLICIES_FILE)
+
+
+def _validate_policies(data):
+    """
+    Checks a policy document loaded from disk.
+
+    Args:
+        data (dict): Parsed policy file.
+
+    Returns:
+        dict: The policies, with the default policy added if missing.
+
+    Raises:
+        ValueError: If a policy lacks an integer `max_tokens`.
+    """
+    policies = {"default": DEFAULT_POLICY}
+    for client_id, policy in data.items():
+        if not isinstance(policy, dict) or not isinstance(
+            policy.get("max_tokens"), int
+        ):
+            raise ValueError(f"Invalid usage policy for client '{client_id}'")
+        policies[client_id] = {
+            "max_tokens": policy["max_tokens"],
+            "blocked_models": list(policy.get("blocked_models") or []),
+        }
+    return policies
+
+
+def load_policies():
+    """
+    Loads usage policies from disk, atomically replacing the snapshot.
+
+    Returns:
+        bool: True if a new snapshot was published, False if the file is
+            missing or unchanged.
+
+    Raises:
+        ValueError: If the file is not a valid policy document; the current
+            snapshot is kept.
+    """
+    return POLICIES.load(USAGE_POLICIES_FILE, transform=_validate_policies)
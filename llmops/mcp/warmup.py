@@ -0,0 +1,309 @@
+"""
+warmup.py
+
+Model warm-up and keep-alive for the Model Control Plane (MCP).
+
+Ollama loads a model into memory on its first request and unloads it once
+`keep_alive` (5 minutes by default) passes without traffic, so the first
+`/llm/echo` call after a deploy or an idle period pays the whole model load
+time. The `WarmupManager` removes those cold starts:
+
+- At startup it preloads `OLLAMA_MODEL` and every model in the registry on each
+  of its backends with an empty-prompt `/api/generate` call, which makes
+  Ollama load the model and return without generating.
+- Models with recent traffic stay resident: upstream calls carry
+  `keep_alive`, and a background round re-pings each backend once half of its
+  keep-alive has elapsed. A model without calls for `idle_seconds` is no longer
+  pinged and Ollama is free to unload it; its next call warms it again.
+- Readiness (`/ready`) only turns green once every active model is loaded on
+  its healthy backends, so a load balancer holds traffic back from a fresh
+  instance until the first requests no longer pay for loading.
+
+Metrics:
+    MODEL_WARM: 1 while a model is believed resident on a backend, else 0.
+    WARMUP_REQUESTS: Warm-up pings by model and outcome.
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request
+from prometheus_client import Counter, Gauge
+
+# Prometheus gauge: 1 while a model is believed loaded on a backend
+MODEL_WARM = Gauge(
+    "llm_model_warm", "Model kept resident on the backend", ["model", "backend"]
+)
+
+# Prometheus counter: warm-up pings by model and outcome ("ok", "error")
+WARMUP_REQUESTS = Counter(
+    "llm_warmup_requests_total", "Model warm-up pings", ["model", "outcome"]
+)
+
+# Seconds a warm-up ping may take; loading a large model can be slow
+WARMUP_TIMEOUT_SECONDS = 120.0
+
+
+class WarmupManager:
+    """
+    Preloads models on their backends and keeps recently used ones resident.
+
+    Attributes:
+        pool (BackendPool, optional): Pool providing backends and the HTTP client.
+        keep_alive_seconds (float): How long Ollama keeps a model after a call.
+        idle_seconds (float): Time without calls after which a model is no
+            longer kept warm.
+        enabled (bool): Whether warm-up runs; when False every call is a no-op
+            and the instance is always ready.
+    """
+
+    def __init__(
+        self,
+        pool=None,
+        keep_alive_seconds: float = 1800.0,
+        idle_seconds: float = 3600.0,
+        enabled: bool = True,
+    ):
+        """
+        Args:
+            pool (BackendPool, optional): Backend pool of the application.
+                Required when `enabled`.
+            keep_alive_seconds (float): Keep-alive sent to Ollama. Defaults to 30 min.
+            idle_seconds (float): Idle time before a model is left to unload.
+                Defaults to 1 hour.
+            enabled (bool): Run warm-up and keep-alive. Defaults to True.
+        """
+        self.pool = pool
+        self.keep_alive_seconds = keep_alive_seconds
+        self.idle_seconds = idle_seconds
+        self.enabled = enabled and pool is not None
+        self._last_used: Dict[str, float] = {}
+        self._backends: Dict[Tuple[str, str], dict] = {}
+        self._models: Optional[Tuple[str, ...]] = None
+
+    def request_options(self) -> dict:
+        """
+        Returns the fields to add to an Ollama `/api/generate` payload.
+
+        Returns:
+            dict: `{"keep_alive": seconds}` when enabled, else empty.
+        """
+        if not self.enabled:
+            return {}
+        return {"keep_alive": int(self.keep_alive_seconds)}
+
+    def touch(self, model: str, now: Optional[float] = None):
+        """
+        Records a served call, keeping the model warm for another idle period.
+
+        Args:
+            model (str): Model that served the call.
+            now (float, optional): Current monotonic time, for tests.
+
+        Returns:
+            None
+        """
+        self._last_used[model] = time.monotonic() if now is None else now
+
+    def _active(self, model: str, now: float) -> bool:
+        """Whether the model had a call (or its preload) within `idle_seconds`."""
+        return now - self._last_used.setdefault(model, now) <= self.idle_seconds
+
+    async def ping(self, model: str, backend, now: Optional[float] = None) -> bool:
+        """
+        Loads `model` on one backend with an empty-prompt generate call.
+
+        Args:
+            model (str): Model to load.
+            backend (Backend): Backend to load it on.
+            now (float, optional): Current monotonic time, for tests.
+
+        Returns:
+            bool: True if the backend answered successfully.
+        """
+        state = self._backends.setdefault(
+            (model, backend.url), {"warm": False, "last_ping": None, "error": None}
+        )
+        try:
+            res = await self.pool.client.post(
+                f"{backend.url}/api/generate",
+                json={"model": model, "prompt": "", "stream": False}
+                | self.request_options(),
+                timeout=WARMUP_TIMEOUT_SECONDS,
+            )
+            res.raise_for_status()
+        except Exception as e:
+            state.update(warm=False, error=str(e) or type(e).__name__)
+            WARMUP_REQUESTS.labels(model=model, outcome="error").inc()
+            MODEL_WARM.labels(model=model, backend=backend.url).set(0)
+            return False
+        state.update(
+            warm=True,
+            last_ping=time.monotonic() if now is None else now,
+            error=None,
+        )
+        WARMUP_REQUESTS.labels(model=model, outcome="ok").inc()
+        MODEL_WARM.labels(model=model, backend=backend.url).set(1)
+        return True
+
+    async def keep_warm(self, models: Iterable[str], now: Optional[float] = None):
+        """
+        Runs one round: loads cold backends of active models and re-pings
+        warm ones whose keep-alive is half spent.
+
+        Models seen for the first time (at startup, or added by a registry
+        reload) count as just used, so they are preloaded and kept warm for one
+        idle period even without traffic.
+
+        Args:
+            models (Iterable[str]): Models to keep warm.
+            now (float, optional): Current monotonic time, for tests.
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic() if now is None else now
+        self._models = tuple(dict.fromkeys(models))
+        pings = []
+        for model in self._models:
+            backends = self.pool.backends(model)
+            if not self._active(model, now):
+                for backend in backends:
+                    state = self._backends.get((model, backend.url))
+                    if (
+                        state
+                        and state["warm"]
+                        and now - state["last_ping"] > self.keep_alive_seconds
+                    ):
+                        state["warm"] = False
+                        MODEL_WARM.labels(model=model, backend=backend.url).set(0)
+                continue
+            for backend in backends:
+                state = self._backends.get((model, backend.url))
+                if (
+                    state is None
+                    or not state["warm"]
+                    or now - state["last_ping"] >= self.keep_alive_seconds / 2
+                ):
+                    pings.append(self.ping(model, backend, now))
+        await asyncio.gather(*pings)
+
+    async def run(self, interval: float, models: Callable[[], Iterable[str]]):
+        """
+        Warms models up, then keeps them warm forever. Run as a background task.
+
+        Args:
+            interval (float): Seconds between rounds; cold backends are retried
+                every round.
+            models (Callable[[], Iterable[str]]): Returns the models to keep
+                warm before each round, so registry reloads are picked up.
+
+        Returns:
+            None
+        """
+        while True:
+            await self.keep_warm(models())
+            await asyncio.sleep(interval)
+
+    def _model_warm(self, model: str) -> bool:
+        """Whether a model is loaded on at least one backend and every healthy one."""
+        states = [
+            (backend, self._backends.get((model, backend.url)))
+            for backend in self.pool.backends(model)
+        ]
+        warm = [backend for backend, state in states if state and state["warm"]]
+        return bool(warm) and all(
+            backend in warm for backend, _ in states if backend.healthy
+        )
+
+    def ready(self, now: Optional[float] = None) -> bool:
+        """
+        Whether every active model is warm.
+
+        Args:
+            now (float, optional): Current monotonic time, for tests.
+
+        Returns:
+            bool: True once the first round loaded all active models, or when
+                warm-up is disabled.
+        """
+        if not self.enabled:
+            return True
+        if self._models is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return all(
+            self._model_warm(model)
+            for model in self._models
+            if now - self._last_used.get(model, now) <= self.idle_seconds
+        )
+
+    def status(self) -> Dict[str, dict]:
+        """
+        Summarises the warm-up state of every model.
+
+        Returns:
+            Dict[str, dict]: Model -> seconds since last use, warm flag and
+                per-backend state.
+        """
+        now = time.monotonic()
+        result = {}
+        for model in self._models or ():
+            backends: List[dict] = []
+            for backend in self.pool.backends(model):
+                state = self._backends.get((model, backend.url)) or {}
+                backends.append(
+                    {
+                        "url": backend.url,
+                        "warm": state.get("warm", False),
+                        "error": state.get("error"),
+                    }
+                )
+            last_used = self._last_used.get(model)
+            result[model] = {
+                "warm": self._model_warm(model),
+                "idle_seconds": None if last_used is None else round(now - last_used),
+                "backends": backends,
+            }
+        return result
+
+
+def build_warmup_manager(settings, pool) -> WarmupManager:
+    """
+    Builds the warm-up manager configured by application settings.
+
+    Args:
+        settings (Settings): Active settings.
+        pool (BackendPool): Backend pool of the application.
+
+    Returns:
+        WarmupManager: Manager, disabled when `warmup_interval` is 0.
+    """
+    return WarmupManager(
+        pool,
+        keep_alive_seconds=settings.keep_alive_seconds,
+        idle_seconds=settings.keep_alive_idle_seconds,
+        enabled=settings.warmup_interval > 0,
+    )
+
+
+# Disabled manager used by routers mounted outside `create_app` (e.g. in unit tests)
+_DEFAULT_WARMUP = WarmupManager(enabled=False)
+
+
+def get_request_warmup(request: Request) -> WarmupManager:
+    """
+    FastAPI dependency returning the warm-up manager of the app serving `request`.
+
+    Args:
+        request (Request): Incoming FastAPI request.
+
+    Returns:
+        WarmupManager: `app.state.warmup`, or a disabled manager when the app
+            has none.
+    """
+    warmup = getattr(request.app.state, "warmup", None)
+    return warmup if warmup is not None else _DEFAULT_WARMUP
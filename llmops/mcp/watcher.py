@@ -0,0 +1,116 @@
+"""
+watcher.py
+
+Polling file watcher that hot-reloads MCP state files without a restart.
+
+Each watched file is paired with a loader such as `load_registry` or
+`load_policies`. The watcher polls `os.stat` every `interval` seconds and calls
+the loader when the file's modification time or size changes. Loaders publish
+a new immutable snapshot, so requests already in flight keep the version they
+started with. A file that fails validation is reported and ignored; the
+previous snapshot stays active. Polling is used instead of inotify to stay
+portable and dependency-free; a stat per file per interval is negligible.
+
+Metrics:
+    MCP_RELOADS: Reload attempts by store and outcome.
+    MCP_RELOAD_SECONDS: Time to read, validate and publish a changed file.
+"""
+
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+# Prometheus counter: reloads by store and outcome ("applied", "unchanged", "error")
+MCP_RELOADS = Counter(
+    "llm_mcp_reloads_total", "MCP state file reloads", ["store", "outcome"]
+)
+
+# Prometheus histogram: duration of reading, validating and swapping in a file
+MCP_RELOAD_SECONDS = Histogram(
+    "llm_mcp_reload_seconds",
+    "Latency of MCP state file reloads",
+    ["store"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+
+class FileWatcher:
+    """
+    Polls files and calls their loaders when they change.
+
+    Attributes:
+        interval (float): Seconds between polls.
+    """
+
+    def __init__(self, interval: float = 2.0):
+        """
+        Args:
+            interval (float): Seconds between polls. Defaults to 2.
+        """
+        self.interval = interval
+        self._watches: Dict[str, Tuple[str, Callable[[], bool]]] = {}
+        self._stamps: Dict[str, Optional[Tuple[int, int]]] = {}
+
+    def watch(self, store: str, path: str, loader: Callable[[], bool]):
+        """
+        Registers a file to watch.
+
+        Args:
+            store (str): Store name, used as metric label.
+            path (str): File to watch.
+            loader (Callable[[], bool]): Reloads the file; returns whether a new
+                snapshot was published and raises `ValueError` or `OSError` on
+                invalid input.
+
+        Returns:
+            None
+        """
+        self._watches[store] = (path, loader)
+        self._stamps[store] = None
+
+    def poll(self) -> List[str]:
+        """
+        Checks every watched file once, reloading those that changed.
+
+        Returns:
+            List[str]: Stores for which a new snapshot was published.
+        """
+        reloaded = []
+        for store, (path, loader) in self._watches.items():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Keep serving the last snapshot if the file disappears
+                continue
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp == self._stamps[store]:
+                continue
+            self._stamps[store] = stamp
+
+            start = time.perf_counter()
+            try:
+                applied = loader()
+            except (OSError, ValueError):
+                MCP_RELOADS.labels(store=store, outcome="error").inc()
+                continue
+            MCP_RELOAD_SECONDS.labels(store=store).observe(time.perf_counter() - start)
+            MCP_RELOADS.labels(
+                store=store, outcome="applied" if applied else "unchanged"
+            ).inc()
+            if applied:
+                reloaded.append(store)
+        return reloaded
+
+    async def run(self):
+        """
+        Polls forever on a worker thread every `interval` seconds.
+
+        Returns:
+            None
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.to_thread(self.poll)
@@ -0,0 +1,134 @@
+"""
+metrics.py
+
+Shared Prometheus metrics describing LLM usage, independent of the HTTP layer.
+
+Request-level metrics (`request_count`, `request_latency_seconds`) live in
+`main.py` next to the middleware that records them. The metrics here count the
+usage events themselves, whether they were served by this process or ingested
+from another service, so every source lands on the same dashboard.
+
+Metrics:
+    USAGE_EVENTS: Usage events recorded, by model and source.
+    USAGE_TOKENS: Tokens consumed, by model and source.
+    FALLBACKS: Requests rerouted to a fallback model, by models and reason.
+    GENERATION_TOKENS_PER_SECOND: Per-request generation throughput, by model.
+    PROMPT_TOKENS_PER_SECOND: Per-request prompt processing throughput, by model.
+    MODEL_LOAD_SECONDS: Time the model server spent loading the model, by model.
+    GENERATED_TOKENS: Tokens processed by the model server, by model and phase.
+"""
+
+from typing import Dict
+
+from prometheus_client import Counter, Histogram
+
+# Prometheus counter: usage events recorded, by model and source ("api", "ingest")
+USAGE_EVENTS = Counter(
+    "llm_usage_events_total", "Total number of LLM usage events", ["model", "source"]
+)
+
+# Prometheus counter: tokens consumed, by model and source
+USAGE_TOKENS = Counter(
+    "llm_usage_tokens_total", "Total number of LLM tokens consumed", ["model", "source"]
+)
+
+
+# Prometheus counter: requests served by a fallback model instead of the primary
+FALLBACKS = Counter(
+    "llm_fallback_total",
+    "Total number of requests rerouted to a fallback model",
+    ["from_model", "to_model", "reason"],
+)
+
+# Prometheus histogram: completion tokens per second of generation, per request
+GENERATION_TOKENS_PER_SECOND = Histogram(
+    "llm_generation_tokens_per_second",
+    "Completion tokens generated per second of eval time",
+    ["model"],
+    buckets=(1, 2.5, 5, 10, 20, 35, 50, 75, 100, 150, 200, 300, 500),
+)
+
+# Prometheus histogram: prompt tokens processed per second, per request
+PROMPT_TOKENS_PER_SECOND = Histogram(
+    "llm_prompt_tokens_per_second",
+    "Prompt tokens processed per second of prompt eval time",
+    ["model"],
+    buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000),
+)
+
+# Prometheus histogram: model load time reported by the model server
+MODEL_LOAD_SECONDS = Histogram(
+    "llm_model_load_seconds",
+    "Time spent loading the model before serving a request",
+    ["model"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# Prometheus counter: tokens processed by the model server, by phase ("prompt", "eval")
+GENERATED_TOKENS = Counter(
+    "llm_generation_tokens_total",
+    "Total number of tokens processed by the model server",
+    ["model", "phase"],
+)
+
+
+def record_usage(model: str, tokens: int, source: str = "api", events: int = 1):
+    """
+    Update the usage counters for one or more events of the same model.
+
+    Args:
+        model (str): Name of the model used.
+        tokens (int): Total tokens consumed by the events.
+        source (str): Where the events came from. Defaults to "api".
+        events (int): Number of events being recorded. Defaults to 1.
+
+    Returns:
+        None
+    """
+    USAGE_EVENTS.labels(model=model, source=source).inc(events)
+    USAGE_TOKENS.labels(model=model, source=source).inc(tokens)
+
+
+def record_fallback(from_model: str, to_model: str, reason: str):
+    """
+    Count a request rerouted from its primary model to a fallback model.
+
+    Args:
+        from_model (str): Model originally requested.
+        to_model (str): Model that served the request instead.
+        reason (str): Why the fallback happened ("circuit_open", "overloaded",
+            "error").
+
+    Returns:
+        None
+    """
+    FALLBACKS.labels(from_model=from_model, to_model=to_model, reason=reason).inc()
+
+
+def record_generation(model: str, timings: Dict):
+    """
+    Record the generation timings reported by the model server for one request.
+
+    Throughput is only observed when both the token count and a positive
+    duration are known; missing timings are skipped.
+
+    Args:
+        model (str): Name of the model that served the request.
+        timings (Dict): Values keyed by `llmops.storage.base.TIMING_COLUMNS`
+            (counts and durations in seconds), None when unknown.
+
+    Returns:
+        None
+    """
+    for phase, histogram in (
+        ("prompt_eval", PROMPT_TOKENS_PER_SECOND),
+        ("eval", GENERATION_TOKENS_PER_SECOND),
+    ):
+        count, seconds = timings.get(f"{phase}_count"), timings.get(f"{phase}_seconds")
+        if count is None:
+            continue
+        GENERATED_TOKENS.labels(model=model, phase=phase.split("_")[0]).inc(count)
+        if seconds:
+            histogram.labels(model=model).observe(count / seconds)
+    if timings.get("load_seconds") is not None:
+        MODEL_LOAD_SECONDS.labels(model=model).observe(timings["load_seconds"])
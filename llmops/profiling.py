@@ -0,0 +1,529 @@
+"""
+profiling.py
+
+On-demand, in-process profilers for diagnosing production hot paths.
+
+Two complementary tools are provided, both idle (and effectively free) until an
+admin starts them through the `/admin/profile` routes:
+
+- `SamplingProfiler`: a background thread that snapshots every thread's stack
+  with `sys._current_frames()` at a fixed interval for N seconds and aggregates
+  them as collapsed stacks (`frame;frame;frame count`), the input format of
+  flamegraph.pl, speedscope and similar viewers. Overhead is proportional to
+  the sampling rate, not to the request rate.
+- `RequestProfiler`: deterministic `cProfile` profiling of a sampled fraction of
+  requests whose path matches a prefix, aggregated into `pstats` data.
+  `ProfilingMiddleware` picks the sampled requests and `instrument_routes`
+  wraps every route endpoint so that it runs under that request's profiler:
+  sync endpoints in their threadpool thread, async ones only while their own
+  coroutine runs. Work of other requests on the event loop is not attributed
+  to the profiled one. Dependencies, middleware and response streaming are not
+  profiled; use the sampling profiler for those.
+
+When request profiling is not active, `ProfilingMiddleware` costs one global
+lookup and instrumented endpoints one context variable lookup.
+
+Attributes:
+    MAX_STACK_DEPTH (int): Deepest stack recorded per sample.
+"""
+
+import cProfile
+import functools
+import inspect
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+# Deepest stack recorded per sample; deeper frames are truncated at the root
+MAX_STACK_DEPTH = 128
+
+# cProfile collecting the request being processed, None when it is not sampled
+_PROFILE: ContextVar[Optional[cProfile.Profile]] = ContextVar(
+    "llmops_request_profile", default=None
+)
+
+
+def _frame_label(frame) -> str:
+    """
+    Formats a frame as `function (file:line)` for collapsed-stack output.
+
+    Args:
+        frame (FrameType): Python frame.
+
+    Returns:
+        str: Label without the `;` separator character.
+    """
+    code = frame.f_code
+    label = (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+    return label.replace(";", ":")
+
+
+class SamplingProfiler:
+    """
+    Statistical wall-clock profiler sampling all thread stacks periodically.
+
+    Attributes:
+        interval (float): Seconds between samples.
+        duration (float): Seconds after which sampling stops automatically.
+        samples (int): Number of sampling ticks taken.
+        stacks (Counter): Collapsed stack string -> number of samples.
+        started_at (float): Epoch time sampling started.
+        stopped_at (float, optional): Epoch time sampling ended.
+    """
+
+    def __init__(self, duration: float, interval: float = 0.005):
+        """
+        Args:
+            duration (float): Seconds to sample for.
+            interval (float): Seconds between samples. Defaults to 5 ms.
+        """
+        self.interval = interval
+        self.duration = duration
+        self.samples = 0
+        self.stacks = Counter()
+        self.started_at = None
+        self.stopped_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """bool: Whether the sampling thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Starts the background sampling thread.
+
+        Returns:
+            None
+        """
+        self.started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, name="llmops-sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops sampling and waits for the sampling thread to exit.
+
+        Returns:
+            None
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        """Sampling loop executed on the profiler thread."""
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + self.duration
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            tick = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(f"thread:{names.get(ident, ident)}")
+                tick.append(";".join(reversed(labels)))
+            with self._lock:
+                self.stacks.update(tick)
+                self.samples += 1
+            self._stop.wait(self.interval)
+        self.stopped_at = time.time()
+
+    def status(self) -> dict:
+        """
+        Summarizes the profiler state.
+
+        Returns:
+            dict: Running flag, timing, sample count and distinct stack count.
+        """
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "duration": self.duration,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+        }
+
+    def collapsed(self) -> str:
+        """
+        Renders the aggregated samples in collapsed-stack format.
+
+        Returns:
+            str: One `frame;frame;... count` line per distinct stack.
+        """
+        with self._lock:
+            ranked = self.stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in ranked)
+
+
+class RequestProfiler:
+    """
+    Deterministic profiler for a sampled fraction of matching requests.
+
+    Attributes:
+        route_prefix (str): Only request paths starting with this prefix are profiled.
+        sample_rate (float): Probability that a matching request is profiled.
+        max_requests (int): Stop after this many profiled requests.
+        deadline (float): Monotonic time after which no new requests are profiled.
+        profiled (int): Number of requests profiled so far.
+        started_at (float): Epoch time profiling was enabled.
+    """
+
+    def __init__(
+        self,
+        route_prefix: str,
+        sample_rate: float,
+        duration: float,
+        max_requests: int = 1000,
+    ):
+        """
+        Args:
+            route_prefix (str): Path prefix to match, e.g. "/llm".
+            sample_rate (float): Fraction of matching requests to profile (0-1].
+            duration (float): Seconds during which requests are sampled.
+            max_requests (int): Upper bound on profiled requests. Defaults to 1000.
+        """
+        self.route_prefix = route_prefix
+        self.sample_rate = sample_rate
+        self.max_requests = max_requests
+        self.deadline = time.monotonic() + duration
+        self.profiled = 0
+        self.started_at = time.time()
+        self._stats = None
+        self._stats_lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        """bool: Whether new requests may still be sampled."""
+        return self.profiled < self.max_requests and time.monotonic() < self.deadline
+
+    def should_profile(self, path: str) -> bool:
+        """
+        Decides whether to profile a request.
+
+        Args:
+            path (str): Request URL path.
+
+        Returns:
+            bool: True if the request matches and wins the sampling draw.
+        """
+        return (
+            path.startswith(self.route_prefix)
+            and self.active
+            and random.random() < self.sample_rate
+        )
+
+    async def profile(self, app, scope, receive, send):
+        """
+        Runs a request with its own `cProfile` and merges the result.
+
+        The profiler is published in a context variable; the endpoints wrapped
+        by `instrument_routes` enable it while they run.
+
+        Args:
+            app (ASGIApp): Downstream ASGI application.
+            scope (dict): ASGI connection scope.
+            receive (Callable): ASGI receive channel.
+            send (Callable): ASGI send channel.
+
+        Returns:
+            None
+        """
+        profiler = cProfile.Profile()
+        token = _PROFILE.set(profiler)
+        try:
+            await app(scope, receive, send)
+        finally:
+            _PROFILE.reset(token)
+            self.profiled += 1
+            if profiler.getstats():
+                with self._stats_lock:
+                    if self._stats is None:
+                        self._stats = pstats.Stats(profiler)
+                    else:
+                        self._stats.add(profiler)
+
+    def status(self) -> dict:
+        """
+        Summarizes the profiler state.
+
+        Returns:
+            dict: Matching rule, sampling rate, activity flag and request count.
+        """
+        return {
+            "active": self.active,
+            "route_prefix": self.route_prefix,
+            "sample_rate": self.sample_rate,
+            "max_requests": self.max_requests,
+            "started_at": self.started_at,
+            "profiled": self.profiled,
+        }
+
+    def pstats_bytes(self) -> bytes:
+        """
+        Serializes the aggregated stats in the `pstats` file format.
+
+        The output can be loaded with `pstats.Stats(path)` or snakeviz.
+
+        Returns:
+            bytes: Marshalled stats (empty stats if nothing was profiled yet).
+        """
+        with self._stats_lock:
+            return marshal.dumps(self._stats.stats if self._stats else {})
+
+    def text(self, limit: int = 50) -> str:
+        """
+        Renders the top functions by cumulative time as text.
+
+        Args:
+            limit (int): Number of functions to include. Defaults to 50.
+
+        Returns:
+            str: `pstats` report sorted by cumulative time.
+        """
+        from io import StringIO
+
+        with self._stats_lock:
+            if self._stats is None:
+                return "No requests profiled yet.\n"
+            out = StringIO()
+            self._stats.stream = out
+            self._stats.sort_stats("cumulative").print_stats(limit)
+            return out.getvalue()
+
+
+# Most recent profilers; kept after completion so results can be downloaded
+_SAMPLER: Optional[SamplingProfiler] = None
+_REQUEST_PROFILER: Optional[RequestProfiler] = None
+
+
+def start_sampler(duration: float, interval: float) -> SamplingProfiler:
+    """
+    Starts a new sampling profiler, replacing the previous result.
+
+    Args:
+        duration (float): Seconds to sample for.
+        interval (float): Seconds between samples.
+
+    Returns:
+        SamplingProfiler: The running profiler.
+
+    Raises:
+        RuntimeError: If a sampling profiler is already running.
+    """
+    global _SAMPLER
+    if _SAMPLER is not None and _SAMPLER.running:
+        raise RuntimeError("Sampling profiler already running")
+    _SAMPLER = SamplingProfiler(duration=duration, interval=interval)
+    _SAMPLER.start()
+    return _SAMPLER
+
+
+def get_sampler() -> Optional[SamplingProfiler]:
+    """
+    Returns the current or most recent sampling profiler.
+
+    Returns:
+        SamplingProfiler or None: Profiler, or None if never started.
+    """
+    return _SAMPLER
+
+
+def start_request_profiling(
+    route_prefix: str, sample_rate: float, duration: float, max_requests: int
+) -> RequestProfiler:
+    """
+    Enables request profiling, replacing the previous result.
+
+    Args:
+        route_prefix (str): Path prefix to match.
+        sample_rate (float): Fraction of matching requests to profile.
+        duration (float): Seconds during which requests are sampled.
+        max_requests (int): Upper bound on profiled requests.
+
+    Returns:
+        RequestProfiler: The active request profiler.
+    """
+    global _REQUEST_PROFILER
+    _REQUEST_PROFILER = RequestProfiler(
+        route_prefix=route_prefix,
+        sample_rate=sample_rate,
+        duration=duration,
+        max_requests=max_requests,
+    )
+    return _REQUEST_PROFILER
+
+
+def stop_request_profiling() -> Optional[RequestProfiler]:
+    """
+    Stops sampling new requests while keeping collected stats.
+
+    Returns:
+        RequestProfiler or None: The stopped profiler, if any.
+    """
+    if _REQUEST_PROFILER is not None:
+        _REQUEST_PROFILER.deadline = 0.0
+    return _REQUEST_PROFILER
+
+
+def get_request_profiler() -> Optional[RequestProfiler]:
+    """
+    Returns the current or most recent request profiler.
+
+    Returns:
+        RequestProfiler or None: Profiler, or None if never started.
+    """
+    return _REQUEST_PROFILER
+
+
+class _ProfiledCoroutine:
+    """
+    Awaitable running a coroutine with a profiler enabled only during its steps.
+
+    The profiler is disabled whenever the coroutine suspends, so coroutines of
+    other requests running on the event loop meanwhile are not recorded.
+    """
+
+    def __init__(self, coro, profiler: cProfile.Profile):
+        """
+        Args:
+            coro (Coroutine): Coroutine to run.
+            profiler (cProfile.Profile): Profiler of the request.
+        """
+        self._coro = coro
+        self._profiler = profiler
+
+    def __await__(self):
+        """Drives the coroutine step by step, forwarding what it awaits."""
+        step, value = self._coro.send, None
+        while True:
+            self._profiler.enable()
+            try:
+                suspended = step(value)
+            except StopIteration as done:
+                return done.value
+            finally:
+                self._profiler.disable()
+            try:
+                value, step = (yield suspended), self._coro.send
+            except GeneratorExit:
+                self._coro.close()
+                raise
+            except BaseException as exc:
+                # Thrown into the awaiting task (e.g. cancellation)
+                value, step = exc, self._coro.throw
+
+
+def profile_endpoint(call):
+    """
+    Wraps an endpoint so that it runs under the profiler of sampled requests.
+
+    Args:
+        call (Callable): Sync function or coroutine function.
+
+    Returns:
+        Callable: Wrapper of the same kind; it calls `call` directly when the
+            current request is not profiled.
+    """
+    if inspect.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            profiler = _PROFILE.get()
+            if profiler is None:
+                return call(*args, **kwargs)
+            return _ProfiledCoroutine(call(*args, **kwargs), profiler)
+
+    else:
+
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            # Sync endpoints run in the threadpool, which copies the context
+            profiler = _PROFILE.get()
+            if profiler is None:
+                return call(*args, **kwargs)
+            return profiler.runcall(call, *args, **kwargs)
+
+    wrapper.__llmops_profiled__ = True
+    return wrapper
+
+
+def instrument_routes(app):
+    """
+    Wraps the endpoint of every route registered on an application.
+
+    Call once all routers are included. FastAPI reads `dependant.call` for
+    each request, so wrapping it changes neither the route's parameters nor
+    whether it runs on the event loop or in the threadpool.
+
+    Args:
+        app (FastAPI): Application whose routes are instrumented.
+
+    Returns:
+        None
+    """
+    from fastapi.routing import APIRoute
+
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not getattr(
+            route.dependant.call, "__llmops_profiled__", False
+        ):
+            route.dependant.call = profile_endpoint(route.dependant.call)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling sampled requests while request profiling is on.
+
+    Plain ASGI like `StageTimingMiddleware`, so it adds no task or body
+    buffering and returns straight to the application while profiling is idle.
+    """
+
+    def __init__(self, app):
+        """
+        Args:
+            app (ASGIApp): Downstream ASGI application.
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        """
+        Processes one ASGI connection.
+
+        Args:
+            scope (dict): ASGI connection scope.
+            receive (Callable): ASGI receive channel.
+            send (Callable): ASGI send channel.
+
+        Returns:
+            None
+        """
+        profiler = _REQUEST_PROFILER
+        if (
+            profiler is None
+            or scope["type"] != "http"
+            or not profiler.should_profile(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        await profiler.profile(self.app, scope, receive, send)
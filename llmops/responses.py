@@ -0,0 +1,241 @@
+"""
+responses.py
+
+Optimised response path for data-heavy endpoints.
+
+- `FastJSONResponse`: the application's default response class. Encodes with
+  orjson when it is installed (`pip install llmops-dashboard[fast]`), several
+  times faster than the standard library encoder on usage log payloads, and
+  falls back to `TimedJSONResponse` otherwise. Hot routes return it directly
+  with plain dicts, which also skips FastAPI's response-model validation and
+  `jsonable_encoder` pass.
+- `CompressionMiddleware`: compresses complete response bodies above a size
+  threshold with the best encoding the client accepts, zstd (when `zstandard`
+  is installed) or gzip. Streaming responses (`/logs/stream`, `/llm/batch`)
+  are passed through untouched so events are never held back.
+
+Compression time is recorded as the "compress" stage, and body sizes before
+and after compression are counted in `response_body_bytes_total`.
+
+Attributes:
+    RESPONSE_BODY_BYTES (Counter): Body bytes by encoding, before and after compression.
+"""
+
+import gzip
+from typing import Dict, Optional
+
+from prometheus_client import Counter
+from starlette.datastructures import Headers, MutableHeaders
+
+from llmops.timing import TimedJSONResponse, span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content types worth compressing; everything else is passed through
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/javascript",
+)
+
+# Prometheus counter: response body bytes by encoding, "raw" before and "sent" after compression
+RESPONSE_BODY_BYTES = Counter(
+    "response_body_bytes_total",
+    "Compressed response body bytes before and after compression",
+    ["encoding", "stage"],
+)
+
+
+class FastJSONResponse(TimedJSONResponse):
+    """
+    JSON response encoded with orjson when available.
+    """
+
+    def render(self, content) -> bytes:
+        """
+        Encodes `content` as JSON inside a "serialize" span.
+
+        Args:
+            content (Any): JSON-compatible response content.
+
+        Returns:
+            bytes: Encoded body.
+        """
+        if orjson is None:
+            return super().render(content)
+        with span("serialize"):
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def available_encodings() -> tuple:
+    """
+    Returns the supported content codings, most preferred first.
+
+    Returns:
+        tuple: "zstd" (if `zstandard` is installed) and "gzip".
+    """
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Parses an `Accept-Encoding` header into coding -> quality.
+
+    Args:
+        header (str): Header value, e.g. "gzip;q=0.8, zstd".
+
+    Returns:
+        Dict[str, float]: Quality of each listed coding (lower-cased).
+    """
+    qualities = {}
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def choose_encoding(header: str, encodings: tuple = None) -> Optional[str]:
+    """
+    Picks the content coding for a response.
+
+    The coding with the highest client quality wins; ties go to the server
+    preference order. Codings with quality 0 are never used.
+
+    Args:
+        header (str): Request `Accept-Encoding` value.
+        encodings (tuple, optional): Supported codings, most preferred first.
+            Defaults to `available_encodings()`.
+
+    Returns:
+        str or None: Chosen coding, or None to send the body unencoded.
+    """
+    qualities = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for coding in encodings or available_encodings():
+        quality = qualities.get(coding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing complete response bodies above a threshold.
+
+    Implemented as plain ASGI so that streamed responses can be recognised
+    from their first body message and passed through unbuffered.
+    """
+
+    def __init__(
+        self, app, minimum_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3
+    ):
+        """
+        Args:
+            app (ASGIApp): Downstream ASGI application.
+            minimum_size (int): Smallest body, in bytes, that is compressed.
+            gzip_level (int): gzip compression level (1-9).
+            zstd_level (int): zstd compression level.
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self._zstd = (
+            zstandard.ZstdCompressor(level=zstd_level)
+            if zstandard is not None
+            else None
+        )
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        """
+        Compresses a body with the given coding.
+
+        Args:
+            encoding (str): "zstd" or "gzip".
+            body (bytes): Uncompressed body.
+
+        Returns:
+            bytes: Compressed body.
+        """
+        if encoding == "zstd":
+            return self._zstd.compress(body)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope, receive, send):
+        """
+        Processes one ASGI connection.
+
+        Args:
+            scope (dict): ASGI connection scope.
+            receive (Callable): ASGI receive channel.
+            send (Callable): ASGI send channel.
+
+        Returns:
+            None
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        pending_start = None
+
+        async def send_compressed(message):
+            nonlocal pending_start
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows the response kind
+                pending_start = message
+                return
+            if message["type"] != "http.response.body" or pending_start is None:
+                await send(message)
+                return
+
+            start, pending_start = pending_start, None
+            headers = MutableHeaders(raw=list(start.get("headers", [])))
+            headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send({**start, "headers": headers.raw})
+                await send(message)
+                return
+
+            with span("compress"):
+                compressed = self.compress(encoding, body)
+            RESPONSE_BODY_BYTES.labels(encoding=encoding, stage="raw").inc(len(body))
+            RESPONSE_BODY_BYTES.labels(encoding=encoding, stage="sent").inc(
+                len(compressed)
+            )
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(compressed))
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
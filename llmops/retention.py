@@ -0,0 +1,245 @@
+"""
+retention.py
+
+Prompt retention policy: which usage rows keep their prompt text.
+
+Every request is logged, but full prompts dominate the bytes written per row
+(and the prompt search index grows with them), while only a few are ever read
+back. With a policy configured, `llmops.database` always stores each row's
+metadata and keeps the prompt body only when the finished request matches one
+of these rules, checked in order:
+
+- "flagged": the user is listed in `LLMOPS_PROMPT_FLAGGED_USERS`.
+- "error": the upstream call failed (`error` is set).
+- "slow": the latency is above the `LLMOPS_PROMPT_LATENCY_PERCENTILE`
+  percentile of recent requests to the same model. Thresholds come from a
+  `DDSketch` per model over the last one to two windows of `window` requests,
+  so they follow load changes; no request is "slow" until `min_requests`
+  latencies of its model were seen.
+- "sampled": a random `LLMOPS_PROMPT_SAMPLE_RATE` share of the rest.
+
+Other rows are stored with a NULL prompt and `prompt_retention = "dropped"`.
+Each row also records `prompt_sample_rate`, the probability that its prompt
+was kept: 1 for the first three rules, the sample rate otherwise. Weighting
+each kept prompt by `1 / prompt_sample_rate` gives unbiased estimates over all
+requests (e.g. top prompt counts in `llmops-report`).
+
+Decisions are made after the request completed, in the writing thread. Each
+worker process keeps its own latency thresholds.
+
+Metrics:
+    PROMPT_RETENTION: Logged rows by retention decision.
+    PROMPT_BYTES: Prompt bytes of logged rows, "stored" or "dropped".
+"""
+
+import random
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from llmops.sketches import OTHER, DDSketch
+from llmops.storage.base import DROPPED, USAGE_COLUMNS
+
+# Prometheus counter: logged rows by decision (a keeping rule or "dropped")
+PROMPT_RETENTION = Counter(
+    "llm_prompt_retention_total",
+    "Logged rows by prompt retention decision",
+    ["decision"],
+)
+
+# Prometheus counter: UTF-8 prompt bytes of logged rows, "stored" or "dropped"
+PROMPT_BYTES = Counter(
+    "llm_prompt_bytes_total", "Prompt bytes of logged rows", ["outcome"]
+)
+
+# Positions of the columns the policy reads and fills in a row without id
+_USER, _PROMPT, _MODEL, _LATENCY, _ERROR, _SAMPLE_RATE, _RETENTION = (
+    USAGE_COLUMNS.index(column) - 1
+    for column in (
+        "user",
+        "prompt",
+        "model",
+        "latency",
+        "error",
+        "prompt_sample_rate",
+        "prompt_retention",
+    )
+)
+
+
+class PromptRetention:
+    """
+    Decides per finished request whether its prompt is stored.
+
+    Thread-safe: called from every thread writing usage rows.
+
+    Attributes:
+        sample_rate (float): Share of otherwise unmatched prompts kept.
+        latency_percentile (float): Per-model latency percentile above which
+            prompts are kept; 0 disables the rule.
+        flagged_users (frozenset): Users whose prompts are always kept.
+        window (int): Requests per model in one latency window.
+        min_requests (int): Latencies of a model needed before the rule applies.
+        refresh (int): Requests between threshold recomputations.
+        max_models (int): Models with their own threshold; others share one.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.05,
+        latency_percentile: float = 0.99,
+        flagged_users: Iterable[str] = (),
+        window: int = 1000,
+        min_requests: int = 100,
+        refresh: int = 100,
+        max_models: int = 100,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            sample_rate (float): Share of other prompts kept. Defaults to 0.05.
+            latency_percentile (float): Outlier percentile, 0 disables.
+                Defaults to 0.99.
+            flagged_users (Iterable[str]): Users always kept. Defaults to none.
+            window (int): Requests per latency window. Defaults to 1000.
+            min_requests (int): Warm-up latencies per model. Defaults to 100.
+            refresh (int): Requests between threshold updates. Defaults to 100.
+            max_models (int): Models tracked individually. Defaults to 100.
+            seed (int, optional): Seed of the sampling generator, for tests.
+
+        Raises:
+            ValueError: If `sample_rate` is outside [0, 1] or
+                `latency_percentile` outside [0, 1).
+        """
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be in [0, 1]")
+        if not 0 <= latency_percentile < 1:
+            raise ValueError("latency_percentile must be in [0, 1)")
+        self.sample_rate = sample_rate
+        self.latency_percentile = latency_percentile
+        self.flagged_users = frozenset(flagged_users)
+        self.window = window
+        self.min_requests = min_requests
+        self.refresh = refresh
+        self.max_models = max_models
+        self._random = random.Random(seed)
+        # Per model: [previous window sketch, current window sketch, threshold]
+        self._latencies: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def latency_threshold(self, model: str) -> Optional[float]:
+        """
+        Returns the current outlier latency of a model.
+
+        Args:
+            model (str): Model name.
+
+        Returns:
+            float or None: Latency in seconds above which prompts are kept, or
+                None while the model has too few requests (or the rule is off).
+        """
+        with self._lock:
+            state = self._latencies.get(model) or self._latencies.get(OTHER)
+            return state[2] if state else None
+
+    def _observe(self, model: str, latency: float) -> Optional[float]:
+        """Records a latency and returns the model's threshold before it."""
+        state = self._latencies.get(model)
+        if state is None:
+            if len(self._latencies) >= self.max_models:
+                model = OTHER
+            state = self._latencies.setdefault(model, [None, DDSketch(), None])
+        previous, current, threshold = state
+        current.add(latency)
+        if current.count % self.refresh == 0:
+            merged = DDSketch()
+            for sketch in (previous, current):
+                if sketch is not None:
+                    merged.merge(sketch)
+            if merged.count >= self.min_requests:
+                # Upper edge of the percentile's bucket: values sharing the
+                # bucket are within the sketch's error, not outliers
+                state[2] = merged.quantile(self.latency_percentile) * (1 + merged.alpha)
+        if current.count >= self.window:
+            state[0], state[1] = current, DDSketch()
+        return threshold
+
+    def decide(
+        self, user: str, model: str, latency: float, error: Optional[str] = None
+    ) -> Tuple[str, float]:
+        """
+        Decides whether the prompt of a finished request is kept.
+
+        Args:
+            user (str): User who sent the request.
+            model (str): Model that served it.
+            latency (float): Request latency in seconds.
+            error (str, optional): Error of a failed request.
+
+        Returns:
+            Tuple[str, float]: The matching rule ("flagged", "error", "slow",
+                "sampled") or `DROPPED`, and the probability that a prompt of
+                this request is kept.
+        """
+        with self._lock:
+            threshold = None
+            if self.latency_percentile and latency is not None:
+                threshold = self._observe(model, latency)
+            if user in self.flagged_users:
+                return "flagged", 1.0
+            if error is not None:
+                return "error", 1.0
+            if threshold is not None and latency > threshold:
+                return "slow", 1.0
+            if self._random.random() < self.sample_rate:
+                return "sampled", self.sample_rate
+            return DROPPED, self.sample_rate
+
+    def apply(self, rows: List[tuple]) -> List[tuple]:
+        """
+        Applies the policy to rows about to be written.
+
+        Args:
+            rows (List[tuple]): Values in `USAGE_COLUMNS[1:]` order.
+
+        Returns:
+            List[tuple]: The rows with `prompt_sample_rate` and
+                `prompt_retention` filled in and dropped prompts set to None.
+        """
+        retained = []
+        for row in rows:
+            decision, rate = self.decide(
+                row[_USER], row[_MODEL], row[_LATENCY], row[_ERROR]
+            )
+            size = len((row[_PROMPT] or "").encode("utf-8"))
+            PROMPT_RETENTION.labels(decision=decision).inc()
+            row = list(row)
+            if decision == DROPPED:
+                PROMPT_BYTES.labels(outcome="dropped").inc(size)
+                row[_PROMPT] = None
+            else:
+                PROMPT_BYTES.labels(outcome="stored").inc(size)
+            row[_SAMPLE_RATE], row[_RETENTION] = rate, decision
+            retained.append(tuple(row))
+        return retained
+
+
+def build_prompt_retention(settings) -> Optional[PromptRetention]:
+    """
+    Builds the retention policy configured by application settings.
+
+    Args:
+        settings (Settings): Active settings.
+
+    Returns:
+        PromptRetention: Policy, or None when `prompt_sample_rate` is 1 and
+            every prompt is stored.
+    """
+    if settings.prompt_sample_rate >= 1:
+        return None
+    return PromptRetention(
+        sample_rate=settings.prompt_sample_rate,
+        latency_percentile=settings.prompt_latency_percentile,
+        flagged_users=settings.prompt_flagged_users,
+    )
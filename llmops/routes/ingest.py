@@ -0,0 +1,275 @@
+"""
+ingest.py
+
+Defines the `/ingest` route for importing usage events produced by other services.
+
+Events are sent as newline-delimited JSON (NDJSON), optionally gzip-compressed
+(`Content-Encoding: gzip`, concatenated gzip members included). The body is
+decompressed and parsed incrementally as it streams in, so arbitrarily large
+uploads never have to fit in memory. Valid events are written to the usage log
+store in batched transactions and counted in the shared usage metrics under
+`source="ingest"`.
+
+Batches are committed as the body streams in, so an upload that fails midway
+(oversized line, corrupt or truncated compressed body) has already stored the
+batches before the failure. Error responses report that number as `accepted`;
+a client retrying the whole upload would store those events twice.
+
+Event schema (one JSON object per line):
+    user (str): User/client identifier. Required.
+    model (str): Model name. Required.
+    latency (float): Inference duration in seconds. Required, >= 0.
+    tokens (int): Token count. Required, >= 0.
+    prompt (str): Prompt text. Optional, defaults to "".
+    timestamp (str): ISO-8601 timestamp, stored in UTC (naive values are taken as
+        UTC). Optional, defaults to ingestion time.
+
+Configuration:
+    Settings.ingest_batch_size (int): Events per database transaction, read from
+        `LLMOPS_INGEST_BATCH_SIZE`. Defaults to 5000.
+
+Dependencies:
+    - log_usage_batch (llmops.database): Persists each batch in one transaction.
+    - record_usage (llmops.metrics): Updates the usage counters.
+"""
+
+import json
+import zlib
+from collections import Counter as TallyCounter
+from datetime import datetime
+from typing import Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import Counter
+
+from llmops.config import Settings, get_request_settings
+from llmops.database import log_usage_batch
+from llmops.metrics import record_usage
+from llmops.timing import span
+
+router = APIRouter()
+
+# Longest accepted NDJSON line, guards against unbounded buffering
+MAX_LINE_BYTES = 1024 * 1024
+
+# Decompressed bytes produced per step, bounds memory for highly compressible input
+DECOMPRESS_CHUNK_BYTES = 256 * 1024
+
+# Number of per-line errors echoed back in the response
+MAX_REPORTED_ERRORS = 20
+
+# Prometheus counter: ingested lines by outcome ("accepted", "rejected")
+INGEST_EVENTS = Counter(
+    "llm_ingest_events_total", "Total number of ingested usage events", ["outcome"]
+)
+
+
+def validate_event(event) -> Dict:
+    """
+    Validates a decoded usage event and normalizes it for `log_usage_batch`.
+
+    Args:
+        event (Any): Decoded JSON value for one NDJSON line.
+
+    Returns:
+        Dict: Normalized entry with user, prompt, model, latency, tokens and timestamp.
+
+    Raises:
+        ValueError: If the event is not an object or a field is missing or invalid.
+    """
+    if not isinstance(event, dict):
+        raise ValueError("event must be a JSON object")
+
+    user = event.get("user")
+    model = event.get("model")
+    if not isinstance(user, str) or not user:
+        raise ValueError("'user' must be a non-empty string")
+    if not isinstance(model, str) or not model:
+        raise ValueError("'model' must be a non-empty string")
+
+    latency = event.get("latency")
+    if isinstance(latency, bool) or not isinstance(latency, (int, float)):
+        raise ValueError("'latency' must be a number")
+    if latency < 0:
+        raise ValueError("'latency' must be >= 0")
+
+    tokens = event.get("tokens")
+    if isinstance(tokens, bool) or not isinstance(tokens, int) or tokens < 0:
+        raise ValueError("'tokens' must be a non-negative integer")
+
+    prompt = event.get("prompt", "")
+    if not isinstance(prompt, str):
+        raise ValueError("'prompt' must be a string")
+
+    timestamp = event.get("timestamp")
+    if timestamp is not None:
+        try:
+            datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            raise ValueError("'timestamp' must be an ISO-8601 string")
+
+    return {
+        "user": user,
+        "prompt": prompt,
+        "model": model,
+        "latency": float(latency),
+        "tokens": tokens,
+        "timestamp": timestamp,
+    }
+
+
+def _make_decompressor(content_encoding: str):
+    """
+    Builds an incremental decompressor for the request's content encoding.
+
+    Args:
+        content_encoding (str): Value of the Content-Encoding header.
+
+    Returns:
+        zlib.Decompress or None: Decompressor, or None for identity encoding.
+
+    Raises:
+        HTTPException: If the encoding is not supported.
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "gzip":
+        return zlib.decompressobj(zlib.MAX_WBITS | 16)
+    if encoding == "deflate":
+        return zlib.decompressobj()
+    if encoding == "identity":
+        return None
+    raise HTTPException(status_code=415, detail=f"Unsupported encoding: {encoding}")
+
+
+async def _flush(batch: List[Dict]):
+    """
+    Writes a batch of validated events and updates the usage counters.
+
+    Args:
+        batch (List[Dict]): Normalized events from `validate_event`.
+
+    Returns:
+        None
+    """
+    with span("db"):
+        await run_in_threadpool(log_usage_batch, batch)
+
+    events_by_model = TallyCounter()
+    tokens_by_model = TallyCounter()
+    for entry in batch:
+        events_by_model[entry["model"]] += 1
+        tokens_by_model[entry["model"]] += entry["tokens"]
+    for model, count in events_by_model.items():
+        record_usage(model, tokens_by_model[model], source="ingest", events=count)
+    INGEST_EVENTS.labels(outcome="accepted").inc(len(batch))
+
+
+@router.post("/ingest")
+async def ingest_usage(
+    request: Request, settings: Settings = Depends(get_request_settings)
+):
+    """
+    Streams an NDJSON body of usage events into the usage log.
+
+    Lines are decoded as they arrive; every `Settings.ingest_batch_size` valid
+    events are committed in one transaction. Invalid lines (including JSON
+    nested too deeply to decode) are skipped and reported, so one bad record
+    does not reject the whole upload.
+
+    Args:
+        request (Request): FastAPI request whose body is NDJSON (optionally gzip'd).
+        settings (Settings): Active settings providing the batch size.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'accepted': Number of events written.
+            - 'rejected': Number of lines that failed validation.
+            - 'errors': Up to 20 `{"line": n, "error": reason}` entries.
+
+    Raises:
+        HTTPException: 400 for a corrupt or truncated compressed body, 413 for
+            an oversized line, both with a detail of `{"error": reason,
+            "accepted": events already committed}`; 415 for an unsupported
+            Content-Encoding.
+    """
+    encoding = request.headers.get("content-encoding")
+    decompressor = _make_decompressor(encoding)
+
+    pending = b""
+    batch = []
+    accepted = 0
+    rejected = 0
+    line_no = 0
+    errors = []
+
+    def fail(status_code: int, message: str) -> HTTPException:
+        # Earlier batches are committed; tell the client how many
+        return HTTPException(
+            status_code=status_code, detail={"error": message, "accepted": accepted}
+        )
+
+    async def consume(data: bytes):
+        nonlocal pending, accepted, rejected, line_no, batch
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+
+        for line in lines:
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                batch.append(validate_event(json.loads(line)))
+            except (ValueError, RecursionError) as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    reason = str(e)
+                    if isinstance(e, RecursionError):
+                        reason = "JSON nested too deeply"
+                    errors.append({"line": line_no, "error": reason})
+                continue
+
+            if len(batch) >= settings.ingest_batch_size:
+                await _flush(batch)
+                accepted += len(batch)
+                batch = []
+
+        if len(pending) > MAX_LINE_BYTES:
+            raise fail(413, "NDJSON line too long")
+
+    async def inflate(data: bytes):
+        nonlocal decompressor
+        while True:
+            await consume(decompressor.decompress(data, DECOMPRESS_CHUNK_BYTES))
+            if decompressor.eof and decompressor.unused_data:
+                # Next member of a concatenated stream (e.g. `cat a.gz b.gz`)
+                data = decompressor.unused_data
+                decompressor = _make_decompressor(encoding)
+            elif decompressor.unconsumed_tail:
+                data = decompressor.unconsumed_tail
+            else:
+                return
+
+    compressed = False
+    try:
+        async for chunk in request.stream():
+            if decompressor is None:
+                await consume(chunk)
+            elif chunk:
+                compressed = True
+                await inflate(chunk)
+        if compressed:
+            await consume(decompressor.flush())
+    except zlib.error as e:
+        raise fail(400, f"Corrupt compressed body: {e}")
+    if compressed and not decompressor.eof:
+        raise fail(400, "Truncated compressed body")
+
+    # Trailing line without a final newline
+    await consume(b"\n")
+    if batch:
+        await _flush(batch)
+        accepted += len(batch)
+
+    INGEST_EVENTS.labels(outcome="rejected").inc(rejected)
+    return {"accepted": accepted, "rejected": rejected, "errors": errors}
@@ -1,29 +1,109 @@
 """
 llm_echo.py
 
-This module defines the `/llm/echo` route for sending prompts to a local
-Ollama instance via its HTTP API and returning the generated response.
+This module defines the `/llm/echo` route for sending prompts to Ollama via its
+HTTP API and returning the generated response. Requests are spread across the
+model's registered endpoints by the MCP backend pool, which also fails fast on
+backends with an open circuit breaker and, when `LLMOPS_HEDGE_REQUESTS` is set,
+hedges calls that run past the backend's p95. Calls per model are capped by an
+adaptive concurrency limit tuned from upstream latency; calls over the limit
+are shed. If the model cannot be served and the registry names a fallback
+model, the prompt is retried on the fallback and the substitution is recorded
+in `usage_logs.fallback_from` and `llm_fallback_total`.
+
+Ollama's timing fields (prompt/eval token counts and the prompt eval, eval,
+model load and total durations) are stored with each usage row and observed
+in the `llm_generation_tokens_per_second`, `llm_prompt_tokens_per_second` and
+`llm_model_load_seconds` histograms, telling model-load cold starts apart
+from slow generation.
+
+Failed Ollama calls are logged too, with the exception type in
+`usage_logs.error`, so the prompt retention policy keeps their prompts.
+
+Each call carries Ollama's `keep_alive` and marks the serving model as used,
+so the warm-up manager keeps it resident while it has traffic.
 
 It is intended as a lightweight LLM integration for local inference testing
 without requiring OpenAI keys or external network access.
 
-Environment Variables:
-    OLLAMA_MODEL (str): Name of the Ollama model to use. Defaults to "llama3".
+Configuration:
+    Settings.ollama_model (str): Name of the Ollama model to use, read from
+        `OLLAMA_MODEL`. Defaults to "llama3".
+    Settings.ollama_url (str): Base URL of the Ollama API, read from
+        `OLLAMA_URL`, used when the model has no registered endpoints.
+        Defaults to "http://localhost:11434".
+    Settings.concurrency_algorithm (str): Adaptive limit algorithm, read from
+        `LLMOPS_CONCURRENCY_ALGORITHM`. Defaults to "gradient".
 
 Dependencies:
     - FastAPI for HTTP routing.
     - Pydantic for request schema validation.
     - HTTPX for async HTTP client support.
+    - BackendPool (llmops.mcp.backend_pool): Backend selection and health.
+    - UpstreamLimiters (llmops.mcp.concurrency_limiter): Adaptive in-flight limits.
+    - WarmupManager (llmops.mcp.warmup): Model keep-alive.
 """
 
-import os
+import time
+from typing import Dict
 
-import httpx
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
+from llmops.config import Settings, get_request_settings
+from llmops.database import log_usage
+from llmops.mcp.backend_pool import (
+    BackendPool,
+    NoBackendAvailable,
+    get_request_backend_pool,
+)
+from llmops.mcp.client_tracker import log_client_usage
+from llmops.mcp.concurrency_limiter import (
+    ConcurrencyLimitExceeded,
+    UpstreamLimiters,
+    get_request_limiters,
+)
+from llmops.mcp.model_registry import get_model_fallback
+from llmops.mcp.usage_policy import check_policy
+from llmops.mcp.warmup import WarmupManager, get_request_warmup
+from llmops.metrics import record_fallback, record_generation, record_usage
+from llmops.timing import span
+
 router = APIRouter()
 
+# Ollama response fields by usage log column; durations are in nanoseconds
+OLLAMA_TIMING_FIELDS = {
+    "prompt_eval_count": "prompt_eval_count",
+    "prompt_eval_seconds": "prompt_eval_duration",
+    "eval_count": "eval_count",
+    "eval_seconds": "eval_duration",
+    "load_seconds": "load_duration",
+    "total_seconds": "total_duration",
+}
+
+
+def parse_ollama_timings(result: Dict) -> Dict:
+    """
+    Extracts the generation timings from an Ollama `/api/generate` response.
+
+    Args:
+        result (Dict): Decoded Ollama response.
+
+    Returns:
+        Dict: Counts and durations in seconds keyed by usage log column; fields
+            missing from the response or not numeric are None.
+    """
+    timings = {}
+    for column, field in OLLAMA_TIMING_FIELDS.items():
+        value = result.get(field)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            value = None
+        elif column.endswith("_seconds"):
+            value = value / 1e9
+        timings[column] = value
+    return timings
+
 
 class PromptRequest(BaseModel):
     """
@@ -37,16 +117,30 @@ class PromptRequest(BaseModel):
 
 
 @router.post("/llm/echo")
-async def echo_llm(req: Request, body: PromptRequest):
+async def echo_llm(
+    req: Request,
+    body: PromptRequest,
+    settings: Settings = Depends(get_request_settings),
+    pool: BackendPool = Depends(get_request_backend_pool),
+    limiters: UpstreamLimiters = Depends(get_request_limiters),
+    warmup: WarmupManager = Depends(get_request_warmup),
+):
     """
     POST endpoint to send a prompt to Ollama and return its generated response.
 
-    This route interfaces with Ollama's local HTTP API (`/api/generate`)
-    using the configured model, and returns the raw output.
+    This route interfaces with Ollama's HTTP API (`/api/generate`) using the
+    configured model on a backend picked by the pool, falls back to the
+    registry's fallback model if that fails, logs the usage and returns the
+    raw output.
 
     Args:
         req (Request): FastAPI request object.
         body (PromptRequest): Parsed request body containing the prompt string.
+        settings (Settings): Active settings providing the Ollama model, URL
+            and hedging switch.
+        pool (BackendPool): Backend pool selecting the serving endpoint.
+        limiters (UpstreamLimiters): Adaptive concurrency limits per model.
+        warmup (WarmupManager): Keep-alive of the served models.
 
     Returns:
         dict: A dictionary containing:
@@ -54,20 +148,90 @@ async def echo_llm(req: Request, body: PromptRequest):
             - 'response': The generated response from the LLM.
 
     Raises:
-        HTTPException: If the Ollama call fails or returns an error.
+        HTTPException: 403 if the MCP usage policy rejects the request,
+            503 if no backend is available or the model is at its concurrency
+            limit (with `Retry-After`), or 500 if the Ollama call fails
+            or returns an error.
     """
-    model = os.getenv("OLLAMA_MODEL", "llama3")
-
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            res = await client.post(
-                "http://localhost:11434/api/generate",
-                json={"model": model, "prompt": body.prompt, "stream": False},
+    model = settings.ollama_model
+    user = req.headers.get("x-user-id", "anonymous")
+    token_count = len(body.prompt.split())
+
+    with span("policy"):
+        allowed, reason = check_policy(user, model, token_count)
+    if not allowed:
+        raise HTTPException(status_code=403, detail=reason)
+
+    async def generate(target: str) -> dict:
+        async def send(backend):
+            res = await pool.client.post(
+                f"{backend.url}/api/generate",
+                json={"model": target, "prompt": body.prompt, "stream": False}
+                | warmup.request_options(),
             )
             res.raise_for_status()
-            result = res.json()
+            return res.json()
 
+        async with limiters.acquire(target):
+            result = await pool.request(target, send, hedge=settings.hedge_requests)
+        warmup.touch(target)
+        return result
+
+    start_time = time.perf_counter()
+    fallback_from = None
+    try:
+        with span("upstream"):
+            try:
+                result = await generate(model)
+            except Exception as e:
+                fallback = get_model_fallback(model)
+                if fallback is None or not check_policy(user, fallback, token_count)[0]:
+                    raise
+                if isinstance(e, NoBackendAvailable):
+                    reason = "circuit_open"
+                elif isinstance(e, ConcurrencyLimitExceeded):
+                    reason = "overloaded"
+                else:
+                    reason = "error"
+                record_fallback(model, fallback, reason)
+                fallback_from, model = model, fallback
+                result = await generate(model)
+
+    except NoBackendAvailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ConcurrencyLimitExceeded as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
     except Exception as e:
+        with span("db"):
+            await run_in_threadpool(
+                log_usage,
+                user=user,
+                prompt=body.prompt,
+                model=model,
+                latency=time.perf_counter() - start_time,
+                tokens=token_count,
+                fallback_from=fallback_from,
+                error=type(e).__name__,
+            )
         raise HTTPException(status_code=500, detail=f"Ollama error: {e}")
 
+    latency = time.perf_counter() - start_time
+    timings = parse_ollama_timings(result)
+    with span("db"):
+        await run_in_threadpool(
+            log_usage,
+            user=user,
+            prompt=body.prompt,
+            model=model,
+            latency=latency,
+            tokens=token_count,
+            fallback_from=fallback_from,
+            timings=timings,
+        )
+    record_usage(model, token_count)
+    record_generation(model, timings)
+    log_client_usage(user, model, token_count)
+
     return {"prompt": body.prompt, "response": result.get("response", "")}
@@ -5,26 +5,55 @@ Defines FastAPI routes for simulating LLM interactions and retrieving recent usa
 
 This module includes:
 - POST /llm: Simulates an LLM (e.g., OpenAI or local model) response with mocked latency and token usage.
+  The simulated call is made through the backend pool, so it updates backend
+  latency and circuit breakers; requests fall back from the primary model to its
+  registered fallback while no primary backend is healthy with a closed circuit.
+- POST /llm/batch: Runs many prompts concurrently and streams per-item results as NDJSON.
+  Prompts the client's usage policy rejects are reported as per-item errors.
 - GET /logs: Returns recent LLM usage logs with a configurable limit.
 
+`/llm` and `/logs` return `FastJSONResponse` directly: their payloads are built
+from trusted dicts, so FastAPI's response-model validation and encoding pass is
+skipped while the declared models still document the schema.
+
 Used for testing LLM observability metrics, latency tracking, and usage history inspection.
 
 Dependencies:
     - log_usage (llmops.database): Persists request metadata.
+    - log_usage_batch (llmops.database): Persists a whole batch in one transaction.
     - get_recent_logs (llmops.database): Retrieves usage logs for observability or UI display.
 """
 
-import random
+import asyncio
+import json
 import time
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query, Request
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
-from llmops.database import get_recent_logs, log_usage
+from llmops.config import Settings, get_request_settings
+from llmops.database import get_recent_logs, log_usage, log_usage_batch
+from llmops.mcp.backend_pool import (
+    BackendPool,
+    NoBackendAvailable,
+    get_request_backend_pool,
+)
+from llmops.mcp.client_tracker import log_client_usage
+from llmops.mcp.model_registry import get_model_fallback
+from llmops.mcp.usage_policy import check_policy
+from llmops.metrics import record_fallback, record_usage
+from llmops.responses import FastJSONResponse
+from llmops.timing import STAGE_LATENCY, span
 
 router = APIRouter()
 
+# Model requested by default, and the fallback used when the registry has none
+PRIMARY_MODEL = "openai-gpt"
+DEFAULT_FALLBACK_MODEL = "local-ollama"
+
 
 class PromptRequest(BaseModel):
     """
@@ -48,42 +77,251 @@ class PromptResponse(BaseModel):
     response: str
 
 
+class BatchPromptRequest(BaseModel):
+    """
+    Request schema for executing several prompts in one call.
+
+    Attributes:
+        prompts (List[str]): Prompts to execute. Results reference them by index.
+            At most `Settings.batch_max_prompts` are accepted.
+        concurrency (int, optional): Requested parallelism. Capped at
+            `Settings.batch_concurrency`; defaults to the cap.
+    """
+
+    prompts: List[str] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(None, ge=1)
+
+
+def route_model(pool: BackendPool, model: str = PRIMARY_MODEL) -> tuple:
+    """
+    Picks the model to serve a prompt, falling back while the primary is down.
+
+    The fallback is taken when no backend of `model` is both healthy and
+    admitted by its circuit breaker; the event is counted in
+    `llm_fallback_total` with reason "circuit_open" or "unhealthy".
+
+    Args:
+        pool (BackendPool): Backend pool holding health and circuit breakers.
+        model (str): Requested model. Defaults to `PRIMARY_MODEL`.
+
+    Returns:
+        tuple:
+            - str: Model that will serve the prompt.
+            - str or None: Requested model if a fallback was taken, else None.
+    """
+    if pool.is_available(model):
+        return model, None
+    fallback = get_model_fallback(model) or DEFAULT_FALLBACK_MODEL
+    if any(b.breaker.available() for b in pool.backends(model)):
+        reason = "unhealthy"
+    else:
+        reason = "circuit_open"
+    record_fallback(model, fallback, reason)
+    return fallback, model
+
+
+def simulate_llm(prompt: str, model: str = PRIMARY_MODEL) -> tuple:
+    """
+    Produces a simulated completion for a single prompt.
+
+    Args:
+        prompt (str): The user prompt.
+        model (str): Model serving the prompt. Defaults to `PRIMARY_MODEL`.
+
+    Returns:
+        tuple:
+            - str: Name of the model that served the prompt.
+            - str: Generated response text.
+    """
+    return model, f"[{model.capitalize()}] Answer to: {prompt}"
+
+
 @router.post("/llm", response_model=PromptResponse)
-def call_llm(request: Request, body: PromptRequest) -> PromptResponse:
+def call_llm(
+    request: Request,
+    body: PromptRequest,
+    pool: BackendPool = Depends(get_request_backend_pool),
+) -> FastJSONResponse:
     """
     Simulates a call to a large language model and logs the request for monitoring.
 
-    Includes fallback routing logic with randomized model switching and latency simulation.
+    Includes fallback routing driven by the backend pool's health and circuit
+    breakers; the simulated upstream call holds a backend reservation, so its
+    outcome feeds the same breakers. The selected model is checked against the
+    client's MCP usage policy before the upstream call, so rejected requests
+    cost no model call; fallbacks are logged with the originally requested
+    model.
 
     Args:
         request (Request): FastAPI request object containing headers like x-user-id.
         body (PromptRequest): JSON body containing the user prompt.
+        pool (BackendPool): Backend pool serving the call and deciding
+            whether to fall back.
 
     Returns:
-        PromptResponse: Simulated model response with attribution label.
+        FastJSONResponse: `PromptResponse` body with the simulated model
+            response and its attribution label.
+
+    Raises:
+        HTTPException: 403 if the usage policy rejects the request, 503 if no
+            backend of the selected model admits the call.
     """
     prompt = body.prompt
     user = request.headers.get("x-user-id", "anonymous")
 
+    token_count = len(prompt.split())
+
     start_time = time.time()
 
-    # Simulated fallback routing: 30% chance to use local model
-    model_used = "openai-gpt"
-    if random.random() < 0.3:
-        model_used = "local-ollama"
+    model, fallback_from = route_model(pool)
+    with span("policy"):
+        allowed, reason = check_policy(user, model, token_count)
+    if not allowed:
+        raise HTTPException(status_code=403, detail=reason)
+
+    try:
+        with span("upstream"), pool.reserve(model):
+            model_used, answer = simulate_llm(prompt, model)
+    except NoBackendAvailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
     latency = time.time() - start_time
-    token_count = len(prompt.split())
 
-    log_usage(
-        user=user, prompt=prompt, model=model_used, latency=latency, tokens=token_count
+    with span("db"):
+        log_usage(
+            user=user,
+            prompt=prompt,
+            model=model_used,
+            latency=latency,
+            tokens=token_count,
+            fallback_from=fallback_from,
+        )
+    record_usage(model_used, token_count)
+    log_client_usage(user, model_used, token_count)
+
+    return FastJSONResponse({"response": answer})
+
+
+@router.post("/llm/batch")
+async def call_llm_batch(
+    request: Request,
+    body: BatchPromptRequest,
+    settings: Settings = Depends(get_request_settings),
+    pool: BackendPool = Depends(get_request_backend_pool),
+):
+    """
+    Executes a batch of prompts concurrently and streams results as they finish.
+
+    Prompts run under a semaphore sized by the requested concurrency (capped at
+    `Settings.batch_concurrency`). Each completed prompt is emitted immediately as
+    one NDJSON line, so results arrive in completion order rather than input
+    order. Each prompt is checked against the client's MCP usage policy before
+    its upstream call; rejected prompts yield an error item and no usage row.
+    Usage rows for every successful item are written in a single transaction
+    once the batch finishes (or the client disconnects); that write is
+    recorded in the `db` stage histogram but not in `Server-Timing`, which
+    was sent with the headers.
+
+    Args:
+        request (Request): FastAPI request object containing headers like x-user-id.
+        body (BatchPromptRequest): JSON body containing the prompts.
+        settings (Settings): Active settings providing the batch limits.
+        pool (BackendPool): Backend pool serving the calls and deciding
+            whether to fall back.
+
+    Returns:
+        StreamingResponse: `application/x-ndjson` stream with one object per prompt:
+            - index (int): Position of the prompt in the request.
+            - status (str): "ok" or "error".
+            - model (str): Model that served the prompt (on success).
+            - response (str): Generated text (on success).
+            - latency (float): Execution time in seconds (on success).
+            - fallback_from (str): Requested model if a fallback served it (on success).
+            - error (str): Failure reason, e.g. the policy's (on error).
+
+    Raises:
+        HTTPException: 413 if the batch exceeds `Settings.batch_max_prompts`.
+    """
+    if len(body.prompts) > settings.batch_max_prompts:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {settings.batch_max_prompts} prompts",
+        )
+
+    user = request.headers.get("x-user-id", "anonymous")
+    endpoint = request.scope["route"].path
+    limit = min(
+        body.concurrency or settings.batch_concurrency, settings.batch_concurrency
     )
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run_one(index: int, prompt: str) -> dict:
+        async with semaphore:
+            start_time = time.time()
+            model, fallback_from = route_model(pool)
+            with span("policy"):
+                allowed, reason = check_policy(user, model, len(prompt.split()))
+            if not allowed:
+                return {"index": index, "status": "error", "error": reason}
+            try:
+                with span("upstream"):
+                    async with pool.acquire(model):
+                        model_used, answer = await run_in_threadpool(
+                            simulate_llm, prompt, model
+                        )
+            except Exception as e:
+                return {"index": index, "status": "error", "error": str(e)}
+            return {
+                "index": index,
+                "status": "ok",
+                "model": model_used,
+                "response": answer,
+                "latency": time.time() - start_time,
+                "fallback_from": fallback_from,
+            }
+
+    async def stream_results():
+        tasks = [
+            asyncio.create_task(run_one(i, prompt))
+            for i, prompt in enumerate(body.prompts)
+        ]
+        usage_rows = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                if item["status"] == "ok":
+                    prompt = body.prompts[item["index"]]
+                    token_count = len(prompt.split())
+                    usage_rows.append(
+                        {
+                            "user": user,
+                            "prompt": prompt,
+                            "model": item["model"],
+                            "latency": item["latency"],
+                            "tokens": token_count,
+                            "fallback_from": item["fallback_from"],
+                        }
+                    )
+                    record_usage(item["model"], token_count)
+                    log_client_usage(user, item["model"], token_count)
+                yield json.dumps(item) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+            # One commit for the whole batch instead of one per prompt. It runs
+            # after the headers were sent, so it cannot appear in Server-Timing
+            # and is observed in the stage histogram directly
+            started = time.perf_counter()
+            await run_in_threadpool(log_usage_batch, usage_rows)
+            STAGE_LATENCY.labels(endpoint=endpoint, stage="db").observe(
+                time.perf_counter() - started
+            )
 
-    return PromptResponse(response=f"[{model_used.capitalize()}] Answer to: {prompt}")
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 
-@router.get("/logs")
-def fetch_logs(limit: int = Query(10, ge=1, le=100)) -> List[dict]:
+@router.get("/logs", response_model=List[dict])
+def fetch_logs(limit: int = Query(10, ge=1, le=100)) -> FastJSONResponse:
     """
     Retrieves the N most recent LLM usage logs.
 
@@ -93,6 +331,6 @@ def fetch_logs(limit: int = Query(10, ge=1, le=100)) -> List[dict]:
         limit (int, optional): Number of logs to retrieve (1–100). Defaults to 10.
 
     Returns:
-        List[dict]: Chronologically sorted usage logs from newest to oldest.
+        FastJSONResponse: Chronologically sorted usage logs from newest to oldest.
     """
-    return get_recent_logs(limit=limit)
+    return FastJSONResponse(get_recent_logs(limit=limit))
@@ -0,0 +1,72 @@
+"""
+log_search.py
+
+Defines the `/logs/search` route, ranked full-text search over logged prompts.
+
+Prompts are indexed by an FTS5 table maintained by the SQLite backends on
+every write (`llmops.storage.search_index`), so finding the requests that
+mention a phrase is an index lookup instead of a `LIKE '%...%'` scan of every
+prompt. Results are ranked by BM25 relevance, can be narrowed to a user, model
+and time range, and are paginated with `offset`.
+
+`q` uses the FTS5 query syntax: words match in any order, "quoted text"
+matches a phrase, `term*` matches a prefix, and AND/OR/NOT combine terms.
+
+Dependencies:
+    - search_usage (llmops.database): Index lookup on the active backend.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from llmops.database import search_usage
+from llmops.responses import FastJSONResponse
+
+router = APIRouter()
+
+
+@router.get("/logs/search")
+def search_logs(
+    q: str = Query(..., min_length=1),
+    user: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+) -> FastJSONResponse:
+    """
+    Returns the usage logs whose prompt best matches a full-text query.
+
+    Args:
+        q (str): FTS5 query.
+        user (str, optional): Only search this user's logs.
+        model (str, optional): Only search this model's logs.
+        start (str, optional): Inclusive ISO-8601 lower timestamp bound.
+        end (str, optional): Exclusive ISO-8601 upper timestamp bound.
+        limit (int): Results per page (1–100). Defaults to 20.
+        offset (int): Results to skip. Defaults to 0.
+
+    Returns:
+        FastJSONResponse: The query, `results` (usage rows with prompt,
+            relevance `score` and a `snippet` with matches in brackets, best
+            first) and `next_offset`, None on the last page.
+
+    Raises:
+        HTTPException: 422 if the query or a timestamp is invalid, or 501 if
+            the storage backend has no prompt index.
+    """
+    try:
+        rows = search_usage(q, user, model, start, end, limit + 1, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return FastJSONResponse(
+        {
+            "query": q,
+            "results": rows[:limit],
+            "next_offset": offset + limit if len(rows) > limit else None,
+        }
+    )
@@ -0,0 +1,78 @@
+"""
+log_stream.py
+
+Defines the `/logs/stream` route, a push-based live tail of usage events.
+
+Instead of polling `GET /logs`, dashboards open one Server-Sent Events
+connection and receive every new `usage_logs` row as it is committed, whether
+written by `/llm`, `/llm/batch`, `/llm/echo` or `/ingest`. All connections are
+served from a single in-process fan-out (`llmops.events`), so viewers add no
+database load.
+
+Resuming: each event carries a broadcaster event id (`<epoch>-<sequence>`) as
+the SSE `id`; the row id is part of the data. Clients reconnecting with a
+`Last-Event-ID` header (sent automatically by browsers) or `last_id` query
+parameter first receive the retained events published after that event. Ids
+from another worker or an earlier process start the stream at new events.
+
+Configuration:
+    Settings.live_buffer_size (int): Undelivered events kept per connection,
+        read from `LLMOPS_LIVE_BUFFER_SIZE`. Defaults to 1000.
+    Settings.live_replay_size (int): Recent events kept for resuming, read from
+        `LLMOPS_LIVE_REPLAY_SIZE`. Defaults to 1000.
+
+Dependencies:
+    - UsageBroadcaster (llmops.events): In-process event fan-out.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+
+from llmops.events import UsageBroadcaster, get_request_broadcaster, sse_stream
+
+router = APIRouter()
+
+# Idle seconds between SSE keep-alive comments
+KEEPALIVE_SECONDS = 15.0
+
+
+@router.get("/logs/stream")
+async def stream_logs(
+    user: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    last_id: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Header(None),
+    broadcaster: UsageBroadcaster = Depends(get_request_broadcaster),
+):
+    """
+    Streams new usage events as Server-Sent Events.
+
+    Args:
+        user (str, optional): Only stream events for this user.
+        model (str, optional): Only stream events for this model.
+        last_id (str, optional): Resume after this event id.
+        last_event_id (str, optional): `Last-Event-ID` header; used when
+            `last_id` is not given.
+        broadcaster (UsageBroadcaster): Application event broadcaster.
+
+    Returns:
+        StreamingResponse: `text/event-stream` with events:
+            - usage: One usage row (every `usage_logs` column but the
+              prompt) as JSON.
+            - dropped: `{"dropped": n}` when the client fell behind and
+              events were discarded.
+    """
+    resume_from = last_id if last_id is not None else last_event_id
+    return StreamingResponse(
+        sse_stream(
+            broadcaster,
+            user=user,
+            model=model,
+            last_id=resume_from,
+            keepalive=KEEPALIVE_SECONDS,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
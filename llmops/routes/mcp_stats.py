@@ -0,0 +1,121 @@
+"""
+mcp_stats.py
+
+Defines the `/mcp/stats/quantiles` route for tail-latency queries and the
+`/mcp/stats/duplication` route for prompt duplication.
+
+Latency percentiles are answered from in-memory DDSketches (`llmops.sketches`)
+kept per (minute window, user, model), so p99 over the last hour costs a merge
+of a few dozen small sketches rather than a scan of `usage_logs`. Every answer
+is within 1% relative error of the exact percentile.
+
+Each worker process holds its own sketches. With `include_sketch=true` the
+serialised merged sketch is returned too; sketches collected from every worker
+can be combined with `llmops.sketches.merge_sketches` for host-wide answers.
+
+Prompt duplication is answered from the MinHash index of recent prompts
+(`llmops.fingerprints`): the shares of requests an exact or normalising
+response cache would have served, the near-duplicate ratio, broken down by
+user and model, and the largest clusters of near-duplicate prompts.
+
+Configuration:
+    Settings.quantile_window_seconds (int): Window length, read from
+        `LLMOPS_QUANTILE_WINDOW_SECONDS`. Defaults to 60.
+    Settings.quantile_retention_windows (int): Windows kept, read from
+        `LLMOPS_QUANTILE_RETENTION_WINDOWS`. Defaults to 60.
+    Settings.fingerprint_window (int): Prompts indexed, read from
+        `LLMOPS_FINGERPRINT_WINDOW`; 0 disables the duplication route.
+        Defaults to 20000.
+    Settings.fingerprint_threshold (float): Near-duplicate similarity, read
+        from `LLMOPS_FINGERPRINT_THRESHOLD`. Defaults to 0.8.
+
+Dependencies:
+    - QuantileStore (llmops.sketches): Windowed latency sketches.
+    - PromptFingerprinter (llmops.fingerprints): Near-duplicate prompt index.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from llmops.fingerprints import PromptFingerprinter, get_request_fingerprints
+from llmops.sketches import QuantileStore, get_request_quantiles
+
+router = APIRouter()
+
+# Quantiles reported when none are requested
+DEFAULT_QUANTILES = "0.5,0.9,0.95,0.99"
+
+
+@router.get("/mcp/stats/quantiles")
+def get_latency_quantiles(
+    user: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    minutes: float = Query(15, gt=0),
+    q: str = Query(DEFAULT_QUANTILES),
+    include_sketch: bool = Query(False),
+    store: QuantileStore = Depends(get_request_quantiles),
+):
+    """
+    Returns latency quantiles over recent windows.
+
+    Args:
+        user (str, optional): Only include this user.
+        model (str, optional): Only include this model.
+        minutes (float): Look-back period in minutes. Defaults to 15.
+        q (str): Comma-separated quantiles in [0, 1].
+        include_sketch (bool): Also return the serialised merged sketch.
+        store (QuantileStore): Application latency sketches.
+
+    Returns:
+        dict: Request count, mean/min/max latency and the requested quantiles
+            (None when no request matched), plus `sketch` if requested.
+
+    Raises:
+        HTTPException: 422 if `q` is not a list of numbers in [0, 1].
+    """
+    try:
+        quantiles = [float(value) for value in q.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="q must be comma-separated numbers")
+    if not quantiles or any(not 0 <= value <= 1 for value in quantiles):
+        raise HTTPException(status_code=422, detail="q values must be in [0, 1]")
+
+    sketch = store.query(user=user, model=model, minutes=minutes)
+    response = {
+        "user": user,
+        "model": model,
+        "minutes": minutes,
+        "count": sketch.count,
+        "mean": sketch.total / sketch.count if sketch.count else None,
+        "min": sketch.min if sketch.count else None,
+        "max": sketch.max if sketch.count else None,
+        "quantiles": {str(value): sketch.quantile(value) for value in quantiles},
+    }
+    if include_sketch:
+        response["sketch"] = sketch.to_dict()
+    return response
+
+
+@router.get("/mcp/stats/duplication")
+def get_prompt_duplication(
+    top: int = Query(10, ge=1, le=100),
+    fingerprints: Optional[PromptFingerprinter] = Depends(get_request_fingerprints),
+):
+    """
+    Returns prompt duplication rates and the largest near-duplicate clusters.
+
+    Args:
+        top (int): Users, models and clusters listed. Defaults to 10.
+        fingerprints (PromptFingerprinter): Application prompt index.
+
+    Returns:
+        dict: Overall, per-user and per-model exact/normalised cache hit
+            rates and near-duplicate ratios, and the top clusters.
+
+    Raises:
+        HTTPException: 404 if prompt fingerprinting is disabled.
+    """
+    if fingerprints is None:
+        raise HTTPException(status_code=404, detail="Prompt fingerprinting is disabled")
+    return fingerprints.report(top)
@@ -0,0 +1,222 @@
+"""
+profiler.py
+
+Defines admin-only routes for on-demand profiling of the running service.
+
+This module includes:
+- POST /admin/profile/sampler/start: Sample all thread stacks for N seconds.
+- POST /admin/profile/sampler/stop: Stop the sampling profiler early.
+- GET /admin/profile/sampler: Sampling profiler status.
+- GET /admin/profile/sampler/download: Collapsed stacks for flamegraph tools.
+- POST /admin/profile/requests/start: cProfile a sampled fraction of matching requests.
+- POST /admin/profile/requests/stop: Stop sampling new requests.
+- GET /admin/profile/requests: Request profiler status.
+- GET /admin/profile/requests/download: `pstats` file or text report.
+
+All routes are mounted with the `require_admin` dependency from `llmops.auth`.
+
+Dependencies:
+    - llmops.profiling: Profiler implementations and process-wide state.
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+from pydantic import BaseModel, Field
+
+from llmops import profiling
+
+router = APIRouter(prefix="/admin/profile")
+
+
+class SamplerStartRequest(BaseModel):
+    """
+    Request schema for starting the sampling profiler.
+
+    Attributes:
+        seconds (float): Sampling duration, up to 10 minutes.
+        interval_ms (float): Milliseconds between stack samples.
+    """
+
+    seconds: float = Field(30.0, gt=0, le=600)
+    interval_ms: float = Field(5.0, ge=1, le=1000)
+
+
+class RequestProfileStartRequest(BaseModel):
+    """
+    Request schema for enabling request profiling.
+
+    Attributes:
+        route_prefix (str): Only paths starting with this prefix are profiled.
+        sample_rate (float): Fraction of matching requests to profile.
+        seconds (float): How long to keep sampling requests, up to 1 hour.
+        max_requests (int): Upper bound on profiled requests.
+    """
+
+    route_prefix: str = "/"
+    sample_rate: float = Field(0.01, gt=0, le=1)
+    seconds: float = Field(60.0, gt=0, le=3600)
+    max_requests: int = Field(1000, ge=1, le=100000)
+
+
+@router.post("/sampler/start")
+def start_sampler(body: SamplerStartRequest):
+    """
+    Starts the sampling profiler.
+
+    Args:
+        body (SamplerStartRequest): Duration and sampling interval.
+
+    Returns:
+        dict: Sampling profiler status.
+
+    Raises:
+        HTTPException: 409 if a sampling run is already in progress.
+    """
+    try:
+        sampler = profiling.start_sampler(
+            duration=body.seconds, interval=body.interval_ms / 1000.0
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return sampler.status()
+
+
+@router.post("/sampler/stop")
+def stop_sampler():
+    """
+    Stops the sampling profiler, keeping the collected samples.
+
+    Returns:
+        dict: Sampling profiler status.
+
+    Raises:
+        HTTPException: 404 if the sampler was never started.
+    """
+    sampler = _require(profiling.get_sampler())
+    sampler.stop()
+    return sampler.status()
+
+
+@router.get("/sampler")
+def sampler_status():
+    """
+    Reports the sampling profiler state.
+
+    Returns:
+        dict: Sampling profiler status.
+
+    Raises:
+        HTTPException: 404 if the sampler was never started.
+    """
+    return _require(profiling.get_sampler()).status()
+
+
+@router.get("/sampler/download")
+def download_sampler():
+    """
+    Downloads sampled stacks in collapsed-stack format.
+
+    Feed the output to `flamegraph.pl` or open it in speedscope.
+
+    Returns:
+        PlainTextResponse: `frame;frame;... count` lines.
+
+    Raises:
+        HTTPException: 404 if the sampler was never started.
+    """
+    sampler = _require(profiling.get_sampler())
+    return PlainTextResponse(
+        sampler.collapsed(),
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+    )
+
+
+@router.post("/requests/start")
+def start_request_profiling(body: RequestProfileStartRequest):
+    """
+    Enables cProfile sampling of matching requests.
+
+    Args:
+        body (RequestProfileStartRequest): Route prefix, sample rate and limits.
+
+    Returns:
+        dict: Request profiler status.
+    """
+    profiler = profiling.start_request_profiling(
+        route_prefix=body.route_prefix,
+        sample_rate=body.sample_rate,
+        duration=body.seconds,
+        max_requests=body.max_requests,
+    )
+    return profiler.status()
+
+
+@router.post("/requests/stop")
+def stop_request_profiling():
+    """
+    Stops sampling new requests, keeping the aggregated stats.
+
+    Returns:
+        dict: Request profiler status.
+
+    Raises:
+        HTTPException: 404 if request profiling was never started.
+    """
+    return _require(profiling.stop_request_profiling()).status()
+
+
+@router.get("/requests")
+def request_profiling_status():
+    """
+    Reports the request profiler state.
+
+    Returns:
+        dict: Request profiler status.
+
+    Raises:
+        HTTPException: 404 if request profiling was never started.
+    """
+    return _require(profiling.get_request_profiler()).status()
+
+
+@router.get("/requests/download")
+def download_request_profile(format: str = Query("pstats", pattern="^(pstats|text)$")):
+    """
+    Downloads aggregated request profiles.
+
+    Args:
+        format (str): "pstats" for a binary file loadable by `pstats`/snakeviz,
+            or "text" for a cumulative-time report.
+
+    Returns:
+        Response: Profile data in the requested format.
+
+    Raises:
+        HTTPException: 404 if request profiling was never started.
+    """
+    profiler = _require(profiling.get_request_profiler())
+    if format == "text":
+        return PlainTextResponse(profiler.text())
+    return Response(
+        profiler.pstats_bytes(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="requests.pstats"'},
+    )
+
+
+def _require(profiler):
+    """
+    Raises 404 when a profiler has never been started.
+
+    Args:
+        profiler (Any): Profiler instance or None.
+
+    Returns:
+        Any: The profiler.
+
+    Raises:
+        HTTPException: 404 if `profiler` is None.
+    """
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler has not been started")
+    return profiler
@@ -6,9 +6,10 @@ This module defines an authentication route for issuing JWT tokens using FastAPI
 It provides a simple endpoint `/auth/token` that generates a short-lived JWT for a fixed demo user.
 This is primarily used for testing and local development scenarios requiring authentication via Bearer tokens.
 
-Environment Variables:
-    JWT_SECRET (str): Secret key used for signing JWTs. Must be defined in the environment.
-                      🚨 WARNING: Never hardcode secrets in production environments.
+Configuration:
+    Settings.jwt_secret (str): Secret key used for signing JWTs, read from the
+                               `JWT_SECRET` environment variable (see `llmops.config`).
+                               🚨 WARNING: Never hardcode secrets in production environments.
 
 Dependencies:
     - fastapi.APIRouter: Routing utility for modular endpoint grouping.
@@ -16,27 +17,18 @@ Dependencies:
 """
 
 import datetime
-import os
 
 import jwt
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-# Require JWT secret from env
-JWT_SECRET = os.getenv("JWT_SECRET")
-if not JWT_SECRET:
-    raise RuntimeError(
-        "❌ JWT_SECRET is not set in the environment. Please define it in your .env file or environment variables."
-    )
-
-# JWT signing algorithm
-JWT_ALGORITHM = "HS256"
+from llmops.config import Settings, get_request_settings
 
 # FastAPI router for this module
 router = APIRouter()
 
 
 @router.post("/auth/token")
-def issue_token():
+def issue_token(settings: Settings = Depends(get_request_settings)):
     """
     Issues a short-lived demo JWT token for the hardcoded user "demo-user".
 
@@ -45,6 +37,9 @@ def issue_token():
     - Is signed using HS256 and a secret key.
     - Expires in 15 minutes.
 
+    Args:
+        settings (Settings): Active settings providing the signing secret.
+
     Returns:
         dict: Dictionary with a single key `access_token` containing the signed JWT.
     """
@@ -53,5 +48,5 @@ def issue_token():
         "sub": demo_user,
         "exp": datetime.datetime.utcnow() + datetime.timedelta(minutes=15),
     }
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    token = jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
     return {"access_token": token}
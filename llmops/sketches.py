@@ -0,0 +1,334 @@
+"""
+sketches.py
+
+Mergeable streaming quantile sketches of LLM latency per user, model and window.
+
+`DDSketch` (Masson et al., VLDB 2019) maps each value to a logarithmic bucket
+`ceil(log_gamma(x))` with `gamma = (1 + alpha) / (1 - alpha)`, so every quantile
+it reports is within relative error `alpha` of the true value, whatever the
+distribution. Updates are O(1) (one log and a dict increment), memory is bounded
+by `max_bins`, and two sketches merge exactly by adding bucket counts, which is
+what lets sketches from several workers be combined.
+
+`QuantileStore` keeps one sketch per (time window, user, model). It is
+registered as a database write listener, so every usage row written by the API
+or `/ingest` is recorded without touching the request handlers. Old windows
+are discarded and the number of series per window is capped (extra users are
+folded into "other"), keeping memory bounded.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import Request
+
+# Users beyond the per-window series cap are recorded under this name
+OTHER = "other"
+
+
+class DDSketch:
+    """
+    Relative-error quantile sketch for non-negative values.
+
+    Attributes:
+        alpha (float): Relative accuracy guarantee.
+        max_bins (int): Maximum buckets; the lowest are collapsed beyond it.
+        count (int): Number of values recorded.
+        total (float): Sum of recorded values.
+        min (float): Smallest value recorded.
+        max (float): Largest value recorded.
+    """
+
+    # Values at or below this are counted in the zero bucket
+    MIN_VALUE = 1e-9
+
+    def __init__(self, alpha: float = 0.01, max_bins: int = 2048):
+        """
+        Args:
+            alpha (float): Relative accuracy. Defaults to 1%.
+            max_bins (int): Bucket limit. Defaults to 2048.
+        """
+        self.alpha = alpha
+        self.max_bins = max_bins
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        """
+        Records one value in O(1).
+
+        Args:
+            value (float): Non-negative value, e.g. latency in seconds.
+
+        Returns:
+            None
+        """
+        if value <= self.MIN_VALUE:
+            self.zero_count += 1
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + 1
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _collapse(self):
+        """
+        Merges the lowest buckets until `max_bins` holds, sacrificing accuracy
+        only for the smallest values.
+
+        Returns:
+            None
+        """
+        ordered = sorted(self.bins)
+        excess = len(ordered) - self.max_bins
+        target = ordered[excess]
+        for index in ordered[:excess]:
+            self.bins[target] += self.bins.pop(index)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimates the value at quantile `q`.
+
+        Args:
+            q (float): Quantile in [0, 1].
+
+        Returns:
+            float or None: Estimated value, or None for an empty sketch.
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                value = 2 * self._gamma**index / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def merge(self, other: "DDSketch"):
+        """
+        Adds another sketch's values into this one.
+
+        Args:
+            other (DDSketch): Sketch with the same `alpha`.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the sketches use different accuracies.
+        """
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different alpha")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> dict:
+        """
+        Serialises the sketch to a JSON-compatible dict.
+
+        Returns:
+            dict: Accuracy, bucket counts and summary statistics.
+        """
+        return {
+            "alpha": self.alpha,
+            "bins": {str(index): count for index, count in self.bins.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DDSketch":
+        """
+        Rebuilds a sketch serialised with `to_dict`.
+
+        Args:
+            data (dict): Serialised sketch.
+
+        Returns:
+            DDSketch: Equivalent sketch.
+        """
+        sketch = cls(alpha=data["alpha"])
+        sketch.bins = {int(index): count for index, count in data["bins"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.total = data["sum"]
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        return sketch
+
+
+def merge_sketches(sketches: Iterable[dict], alpha: float = 0.01) -> DDSketch:
+    """
+    Merges serialised sketches, e.g. collected from several workers.
+
+    Args:
+        sketches (Iterable[dict]): Sketches produced by `DDSketch.to_dict`.
+        alpha (float): Accuracy of the result when `sketches` is empty.
+
+    Returns:
+        DDSketch: Combined sketch.
+    """
+    merged = None
+    for data in sketches:
+        sketch = DDSketch.from_dict(data)
+        if merged is None:
+            merged = sketch
+        else:
+            merged.merge(sketch)
+    return merged or DDSketch(alpha=alpha)
+
+
+class QuantileStore:
+    """
+    Latency sketches per (window, user, model) with bounded retention.
+
+    Attributes:
+        window_seconds (int): Length of one time window.
+        retention_windows (int): Windows kept, including the current one.
+        max_series (int): Distinct (user, model) pairs kept per window.
+        alpha (float): Sketch relative accuracy.
+    """
+
+    def __init__(
+        self,
+        window_seconds: int = 60,
+        retention_windows: int = 60,
+        max_series: int = 1000,
+        alpha: float = 0.01,
+    ):
+        """
+        Args:
+            window_seconds (int): Window length. Defaults to 60.
+            retention_windows (int): Windows retained. Defaults to 60 (1 hour).
+            max_series (int): Series per window. Defaults to 1000.
+            alpha (float): Sketch accuracy. Defaults to 1%.
+        """
+        self.window_seconds = window_seconds
+        self.retention_windows = retention_windows
+        self.max_series = max_series
+        self.alpha = alpha
+        self._windows: Dict[int, Dict[tuple, DDSketch]] = {}
+        self._lock = threading.Lock()
+
+    def _window(self, now: float) -> int:
+        """Returns the start of the window containing `now`."""
+        return int(now // self.window_seconds) * self.window_seconds
+
+    def record(self, user: str, model: str, latency: float, now: float = None):
+        """
+        Records one latency observation.
+
+        Args:
+            user (str): User ID.
+            model (str): Model name.
+            latency (float): Latency in seconds.
+            now (float, optional): Observation time. Defaults to `time.time()`.
+
+        Returns:
+            None
+        """
+        start = self._window(time.time() if now is None else now)
+        with self._lock:
+            series = self._windows.get(start)
+            if series is None:
+                series = self._windows[start] = {}
+                oldest = start - (self.retention_windows - 1) * self.window_seconds
+                for expired in [w for w in self._windows if w < oldest]:
+                    del self._windows[expired]
+            key = (user, model)
+            sketch = series.get(key)
+            if sketch is None:
+                if len(series) >= self.max_series:
+                    key = (OTHER, model)
+                    sketch = series.get(key)
+                if sketch is None:
+                    sketch = series[key] = DDSketch(alpha=self.alpha)
+            sketch.add(latency)
+
+    def record_events(self, events: List[Dict]):
+        """
+        Database write listener recording the latency of every new usage row.
+
+        Args:
+            events (List[Dict]): Events with `user`, `model` and `latency`.
+
+        Returns:
+            None
+        """
+        now = time.time()
+        for event in events:
+            self.record(event["user"], event["model"], event["latency"], now=now)
+
+    def query(
+        self,
+        user: Optional[str] = None,
+        model: Optional[str] = None,
+        minutes: float = 15,
+        now: float = None,
+    ) -> DDSketch:
+        """
+        Merges the sketches matching the filters over recent windows.
+
+        Args:
+            user (str, optional): Restrict to one user. Defaults to all users.
+            model (str, optional): Restrict to one model. Defaults to all models.
+            minutes (float): How far back to look. Defaults to 15.
+            now (float, optional): Reference time. Defaults to `time.time()`.
+
+        Returns:
+            DDSketch: Merged sketch (empty if nothing matched).
+        """
+        now = time.time() if now is None else now
+        since = self._window(now - minutes * 60)
+        merged = DDSketch(alpha=self.alpha)
+        with self._lock:
+            for start, series in self._windows.items():
+                if start < since:
+                    continue
+                for (series_user, series_model), sketch in series.items():
+                    if user is not None and series_user != user:
+                        continue
+                    if model is not None and series_model != model:
+                        continue
+                    merged.merge(sketch)
+        return merged
+
+
+def get_request_quantiles(request: Request) -> QuantileStore:
+    """
+    FastAPI dependency returning the latency sketches of the serving application.
+
+    Args:
+        request (Request): Incoming request.
+
+    Returns:
+        QuantileStore: `app.state.quantiles`.
+    """
+    return request.app.state.quantiles
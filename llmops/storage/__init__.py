@@ -0,0 +1 @@
+# Storage backends for usage logs behind the llmops.database functions
@@ -0,0 +1,194 @@
+"""
+base.py
+
+Interface shared by the usage log storage backends.
+
+`llmops.database` is the only caller: it builds rows, picks the backend
+configured by `LLMOPS_STORAGE_BACKEND`, and handles caching and write
+notifications, so backends only persist and read rows.
+
+Rows are passed to `append` as tuples in `USAGE_COLUMNS[1:]` order (everything
+but the id, which the backend assigns) and are returned as dicts with every
+`USAGE_COLUMNS` key. Timestamps are ISO-8601 strings; durations are seconds.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Hashable, Iterator, List, Optional
+
+# Column order of usage log rows; later additions are appended
+USAGE_COLUMNS = [
+    "id",
+    "timestamp",
+    "user",
+    "prompt",
+    "model",
+    "latency",
+    "tokens",
+    "fallback_from",
+    "prompt_eval_count",
+    "prompt_eval_seconds",
+    "eval_count",
+    "eval_seconds",
+    "load_seconds",
+    "total_seconds",
+    "error",
+    "prompt_sample_rate",
+    "prompt_retention",
+]
+
+# Generation timings reported by the model server, None when unknown
+TIMING_COLUMNS = USAGE_COLUMNS[8:14]
+
+# Prompt retention policy outcome (see `llmops.retention`), None without a policy
+RETENTION_COLUMNS = USAGE_COLUMNS[15:]
+
+# `prompt_retention` of rows whose prompt was not stored (`prompt` is None)
+DROPPED = "dropped"
+
+# String columns that can be looked up with `UsageStore.find`
+FIND_COLUMNS = ("user", "model")
+
+
+class UsageStore(ABC):
+    """
+    Append-only store of usage log rows with unique integer ids.
+
+    Ids are consecutive within an `append` and increase in write order, except
+    in the sharded store, where this only holds per shard.
+    """
+
+    @abstractmethod
+    def append(self, rows: List[tuple]) -> int:
+        """
+        Persists rows atomically with consecutive ids.
+
+        Args:
+            rows (List[tuple]): Values in `USAGE_COLUMNS[1:]` order.
+
+        Returns:
+            int: Id of the first row.
+        """
+
+    def append_ids(self, rows: List[tuple]) -> List[int]:
+        """
+        Persists rows like `append` and returns the id of every row.
+
+        Stores whose ids are not consecutive within one append override this.
+
+        Args:
+            rows (List[tuple]): Values in `USAGE_COLUMNS[1:]` order.
+
+        Returns:
+            List[int]: Ids of the rows, in order.
+        """
+        first_id = self.append(rows)
+        return list(range(first_id, first_id + len(rows)))
+
+    @abstractmethod
+    def recent(self, limit: int) -> List[Dict]:
+        """
+        Returns the newest rows.
+
+        Args:
+            limit (int): Maximum number of rows.
+
+        Returns:
+            List[Dict]: Rows sorted by id, newest first.
+        """
+
+    @abstractmethod
+    def find(self, column: str, value: str) -> List[Dict]:
+        """
+        Returns every row whose `column` equals `value`.
+
+        Args:
+            column (str): One of `FIND_COLUMNS`.
+            value (str): Value to match.
+
+        Returns:
+            List[Dict]: Matching rows in id order.
+        """
+
+    @abstractmethod
+    def between(self, start: str, end: str) -> List[Dict]:
+        """
+        Returns the rows with `start <= timestamp < end`.
+
+        Args:
+            start (str): Inclusive ISO-8601 lower bound.
+            end (str): Exclusive ISO-8601 upper bound.
+
+        Returns:
+            List[Dict]: Matching rows in id order.
+        """
+
+    @abstractmethod
+    def scan(
+        self, after_id: int = 0, until_id: Optional[int] = None, chunk_size: int = 1000
+    ) -> Iterator[Dict]:
+        """
+        Streams rows in id order.
+
+        Args:
+            after_id (int): Only return rows with a greater id.
+            until_id (int, optional): Last id to return. Defaults to the
+                largest id present when iteration starts.
+            chunk_size (int): Rows read at a time.
+
+        Yields:
+            Dict: One row.
+        """
+
+    def search(
+        self,
+        query: str,
+        user: Optional[str] = None,
+        model: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[Dict]:
+        """
+        Ranks rows by full-text relevance of their prompt to `query`.
+
+        Args:
+            query (str): FTS5 query string.
+            user (str, optional): Only rows of this user.
+            model (str, optional): Only rows of this model.
+            start (str, optional): Inclusive ISO-8601 lower timestamp bound.
+            end (str, optional): Exclusive ISO-8601 upper timestamp bound.
+            limit (int): Maximum rows. Defaults to 20.
+            offset (int): Best matches to skip. Defaults to 0.
+
+        Returns:
+            List[Dict]: Rows plus `score` (higher is more relevant) and
+                `snippet`, best first.
+
+        Raises:
+            ValueError: If `query` is invalid.
+            NotImplementedError: If the store has no prompt index.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support prompt search"
+        )
+
+    def data_version(self) -> Optional[Hashable]:
+        """
+        Returns a token that changes whenever a write is committed by any process.
+
+        The query cache keys results on it, so writes made by other processes
+        invalidate them too. Stores only one process can write return None.
+
+        Returns:
+            Hashable or None: Current version, or None if unknown.
+        """
+        return None
+
+    def close(self):
+        """
+        Releases files and mappings held by the store.
+
+        Returns:
+            None
+        """
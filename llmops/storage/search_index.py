@@ -0,0 +1,291 @@
+"""
+search_index.py
+
+Full-text index of usage log prompts for the SQLite backends.
+
+`usage_fts` is an FTS5 table over `usage_logs.prompt` with external content:
+it stores only the inverted index and reads prompts from `usage_logs`, so the
+index costs a fraction of the prompt text. Triggers on `usage_logs` keep it
+current from the logging path itself, in the same transaction as each insert
+or delete, so every process writing the file maintains it.
+
+Databases that already hold rows when the index is created are not indexed in
+the migration, which would hold the write lock for the whole table. Instead
+the pending id range is recorded in `usage_fts_backfill` and indexed by
+`backfill_search_index` (the `llmops-search-index` command) in short chunks
+while the service keeps writing; new rows are indexed by the triggers
+meanwhile. Searches only see backfilled rows until the backfill finishes.
+"""
+
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+# Snippet markers around matched terms, and the tokens shown per snippet
+SNIPPET_MARKERS = ("[", "]")
+SNIPPET_TOKENS = 12
+
+# Index table, backfill bookkeeping and triggers, created together
+SEARCH_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE usage_fts USING fts5(
+        prompt, content='usage_logs', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TABLE usage_fts_backfill (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        next_id INTEGER,
+        end_id INTEGER
+    )
+    """,
+    """
+    CREATE TRIGGER usage_fts_insert AFTER INSERT ON usage_logs BEGIN
+        INSERT INTO usage_fts (rowid, prompt) VALUES (new.id, new.prompt);
+    END
+    """,
+    # Rows still waiting for the backfill are not in the index yet
+    """
+    CREATE TRIGGER usage_fts_delete AFTER DELETE ON usage_logs
+    WHEN NOT EXISTS (
+        SELECT 1 FROM usage_fts_backfill WHERE old.id BETWEEN next_id AND end_id
+    )
+    BEGIN
+        INSERT INTO usage_fts (usage_fts, rowid, prompt)
+        VALUES ('delete', old.id, old.prompt);
+    END
+    """,
+)
+
+
+def ensure_search_index(conn: sqlite3.Connection) -> bool:
+    """
+    Creates the prompt index and its triggers if missing.
+
+    Existing rows are left for `backfill_search_index`. Creation runs in an
+    immediate transaction, so no row is both indexed by the new trigger and
+    recorded for backfill.
+
+    Args:
+        conn (sqlite3.Connection): Connection with `usage_logs` in place.
+
+    Returns:
+        bool: False if this SQLite build has no FTS5 support.
+    """
+    exists = "SELECT 1 FROM sqlite_master WHERE name = 'usage_fts'"
+    if conn.execute(exists).fetchone():
+        return True
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not conn.execute(exists).fetchone():
+            for statement in SEARCH_SCHEMA:
+                conn.execute(statement)
+            first, last = conn.execute(
+                "SELECT MIN(id), MAX(id) FROM usage_logs"
+            ).fetchone()
+            if first is not None:
+                conn.execute(
+                    "INSERT INTO usage_fts_backfill VALUES (0, ?, ?)", (first, last)
+                )
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if "fts5" in str(e):
+            return False
+        raise
+    return True
+
+
+def pending_rows(conn: sqlite3.Connection) -> int:
+    """
+    Counts the ids still waiting for the backfill.
+
+    Args:
+        conn (sqlite3.Connection): Open connection.
+
+    Returns:
+        int: Size of the pending id range (0 when fully indexed).
+    """
+    try:
+        row = conn.execute("SELECT next_id, end_id FROM usage_fts_backfill").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return max(0, row[1] - row[0] + 1) if row else 0
+
+
+def backfill_search_index(
+    path: str, chunk_rows: int = 5000, pause: float = 0.0, progress=None
+) -> int:
+    """
+    Indexes the rows that existed before the index, one chunk per transaction.
+
+    Each chunk advances `usage_fts_backfill` in the same transaction, so the
+    backfill can be interrupted and resumed at any point.
+
+    Args:
+        path (str): SQLite database file.
+        chunk_rows (int): Ids indexed per transaction. Defaults to 5000.
+        pause (float): Seconds to sleep between chunks, leaving the write
+            lock to the service. Defaults to 0.
+        progress (Callable[[int, int], None], optional): Called after each
+            chunk with the rows indexed so far and the ids still pending.
+
+    Returns:
+        int: Rows indexed.
+    """
+    from llmops.storage.sqlite_store import ensure_usage_table
+
+    indexed = 0
+    conn = sqlite3.connect(path)
+    try:
+        ensure_usage_table(conn, path)
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            state = conn.execute(
+                "SELECT next_id, end_id FROM usage_fts_backfill"
+            ).fetchone()
+            if state is None:
+                conn.rollback()
+                return indexed
+            next_id, end_id = state
+            last = min(next_id + chunk_rows - 1, end_id)
+            cursor = conn.execute(
+                """
+                INSERT INTO usage_fts (rowid, prompt)
+                SELECT id, prompt FROM usage_logs WHERE id BETWEEN ? AND ?
+                """,
+                (next_id, last),
+            )
+            indexed += cursor.rowcount
+            if last >= end_id:
+                conn.execute("DELETE FROM usage_fts_backfill")
+            else:
+                conn.execute("UPDATE usage_fts_backfill SET next_id = ?", (last + 1,))
+            conn.commit()
+            if progress is not None:
+                progress(indexed, max(0, end_id - last))
+            if last >= end_id:
+                return indexed
+            if pause:
+                time.sleep(pause)
+    finally:
+        conn.close()
+
+
+def rebuild_search_index(path: str) -> int:
+    """
+    Rebuilds the whole index from `usage_logs` in one transaction.
+
+    Holds the write lock until done; meant for repairing an index offline.
+
+    Args:
+        path (str): SQLite database file.
+
+    Returns:
+        int: Rows in the rebuilt index.
+    """
+    from llmops.storage.sqlite_store import ensure_usage_table
+
+    conn = sqlite3.connect(path)
+    try:
+        ensure_usage_table(conn, path)
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO usage_fts (usage_fts) VALUES ('rebuild')")
+        conn.execute("DELETE FROM usage_fts_backfill")
+        conn.commit()
+        return conn.execute("SELECT COUNT(*) FROM usage_logs").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def check_query(query: str):
+    """
+    Validates an FTS5 query against an empty in-memory index.
+
+    FTS5 reports malformed queries with several messages (syntax errors,
+    unterminated strings, unknown columns); running the query on an empty
+    index separates them from errors of the database itself.
+
+    Args:
+        query (str): FTS5 query.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If `query` is not a valid FTS5 query.
+    """
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(prompt)")
+        conn.execute("SELECT * FROM probe WHERE probe MATCH ?", (query,)).fetchall()
+    except sqlite3.OperationalError as e:
+        raise ValueError(f"Invalid search query: {e}") from None
+    finally:
+        conn.close()
+
+
+def search_prompts(
+    conn: sqlite3.Connection,
+    columns: List[str],
+    query: str,
+    user: Optional[str] = None,
+    model: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict]:
+    """
+    Runs a ranked full-text search over the prompts.
+
+    Args:
+        conn (sqlite3.Connection): Open connection.
+        columns (List[str]): `usage_logs` columns to return.
+        query (str): FTS5 query, e.g. `timeout`, `"connection reset"` or
+            `gpu AND (oom OR memory)`.
+        user (str, optional): Only rows of this user.
+        model (str, optional): Only rows of this model.
+        start (str, optional): Inclusive UTC ISO-8601 lower timestamp bound.
+        end (str, optional): Exclusive UTC ISO-8601 upper timestamp bound.
+        limit (int): Maximum rows. Defaults to 20.
+        offset (int): Best matches to skip. Defaults to 0.
+
+    Returns:
+        List[Dict]: Rows with `columns`, a `score` (BM25, higher is more
+            relevant) and a `snippet` with matches marked, best first.
+
+    Raises:
+        ValueError: If `query` is not a valid FTS5 query.
+        NotImplementedError: If the database has no prompt index.
+    """
+    where = ["usage_fts MATCH ?"]
+    params: list = [query]
+    for clause, value in (
+        ("u.user = ?", user),
+        ("u.model = ?", model),
+        ("u.timestamp >= ?", start),
+        ("u.timestamp < ?", end),
+    ):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    open_mark, close_mark = SNIPPET_MARKERS
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT {', '.join(f'u.{c}' for c in columns)}, -usage_fts.rank,
+                snippet(usage_fts, 0, ?, ?, '…', {SNIPPET_TOKENS})
+            FROM usage_fts JOIN usage_logs u ON u.id = usage_fts.rowid
+            WHERE {' AND '.join(where)}
+            ORDER BY usage_fts.rank LIMIT ? OFFSET ?
+            """,
+            [open_mark, close_mark, *params, limit, offset],
+        ).fetchall()
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e):
+            raise NotImplementedError("This database has no prompt search index")
+        check_query(query)
+        raise
+    return [dict(zip([*columns, "score", "snippet"], row)) for row in rows]
@@ -0,0 +1,691 @@
+"""
+segment_log.py
+
+High-ingest usage log backend: an append-only log of fixed-layout binary
+records in memory-mapped segment files.
+
+SQLite serialises every write on one lock and pays for B-tree maintenance and
+a journal per transaction. Usage logs are append-only and read mostly in id or
+time order, so this backend stores them as a log instead:
+
+- Records are 128 bytes with a fixed layout (`RECORD`): id, epoch timestamp,
+  dictionary ids of user, model and fallback model, latency, tokens, the
+  offset/length of the prompt in the segment's `.blob` file, the model
+  server's generation timings (-1 / NaN when unknown), the dictionary id of
+  the error and the prompt retention rate and decision (NaN / 0 without a
+  policy), followed by a CRC-32 of the record. Prompts dropped by the
+  retention policy take no `.blob` bytes. Appending a batch is one packed buffer copied into the
+  mapping, with no per-row parsing or index updates beyond a few integers.
+- User and model strings are dictionary-encoded: each distinct string is
+  written once to `strings.dict` and records carry its 4-byte id.
+- A segment holds `segment_records` records (128 MiB by default, allocated
+  sparsely); when it is full the log rolls over to a new segment named after
+  its first id. Segments written with earlier layouts (`MAGIC_V1`: 64 bytes,
+  no timings; `MAGIC_V2`: no error or retention fields) stay readable;
+  opening such a log seals its last segment and continues in a new one.
+- Sparse indexes: ids are consecutive, so a segment's first id locates any
+  record by arithmetic; each block of `INDEX_STRIDE` records keeps its
+  min/max timestamp so time-range reads skip non-overlapping blocks; each
+  segment keeps the set of user and model ids it contains so lookups skip
+  segments without them. Indexes of full segments are saved to `.idx` files.
+- Crash-safe recovery: prompts and dictionary entries are written before the
+  records that reference them. On open, the active segment is scanned up to
+  the first record whose CRC, id or prompt does not check out; later stale
+  records are zeroed, and torn dictionary and blob tails are truncated. With
+  `fsync=True` every append is also flushed to disk, surviving power loss and
+  not just process crashes.
+
+Only one process may write a log directory at a time (enforced with a lock
+file); point each worker at its own directory, or use the SQLite backend when
+several workers share storage.
+"""
+
+import bisect
+import fcntl
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from llmops.storage.base import (
+    DROPPED,
+    FIND_COLUMNS,
+    RETENTION_COLUMNS,
+    TIMING_COLUMNS,
+    UsageStore,
+)
+
+# Identifies a segment file and its record layout version
+MAGIC = b"LLMSEG03"
+
+# Magic of segments written before errors and prompt retention were recorded
+MAGIC_V2 = b"LLMSEG02"
+
+# Magic of segments written before generation timings were recorded
+MAGIC_V1 = b"LLMSEG01"
+
+# Segment header: magic, record size, id of the first record
+HEADER = struct.Struct("<8sIQ")
+
+# Bytes reserved for the segment header
+HEADER_SIZE = 64
+
+# Record fields covered by the checksum: id, timestamp, user, model,
+# fallback_from, latency, tokens, prompt offset, prompt length, the
+# `TIMING_COLUMNS` in order, then error, prompt sample rate and retention
+BODY = struct.Struct("<QdIIIdqQIididddIdI")
+
+# Full record: body, CRC-32 of the body, padding to 128 bytes
+RECORD = struct.Struct("<QdIIIdqQIididddIdII12x")
+
+# CRC-32 and padding appended to a packed body
+CHECKSUM = struct.Struct("<I12x")
+
+# Body and full record of `MAGIC_V2` segments (no error or retention fields)
+BODY_V2 = struct.Struct("<QdIIIdqQIididdd")
+RECORD_V2 = struct.Struct("<QdIIIdqQIididddI28x")
+
+# Body and full record of `MAGIC_V1` segments (no timings, 64 bytes)
+BODY_V1 = struct.Struct("<QdIIIdqQI")
+RECORD_V1 = struct.Struct("<QdIIIdqQII4x")
+
+# (body, record) layouts by segment magic
+LAYOUTS = {
+    MAGIC: (BODY, RECORD),
+    MAGIC_V2: (BODY_V2, RECORD_V2),
+    MAGIC_V1: (BODY_V1, RECORD_V1),
+}
+
+# Dictionary entry header: UTF-8 length, CRC-32 of the bytes
+DICT_ENTRY = struct.Struct("<II")
+
+# Records summarised by one entry of the sparse time index
+INDEX_STRIDE = 1024
+
+# Records per segment by default (128 MiB files)
+DEFAULT_SEGMENT_RECORDS = 1 << 20
+
+# Position of the user and model ids in an unpacked record
+_FIELD_POSITIONS = {"user": 2, "model": 3}
+
+# Position of the first timing field in an unpacked record
+_TIMINGS_START = 9
+
+# Position of the error field, followed by the retention fields
+_ERROR_POSITION = 15
+
+# Dictionary id positions in an unpacked `RECORD` (older layouts: the first three)
+_STRING_POSITIONS = (2, 3, 4, 15, 17)
+
+# Stored for timings the model server did not report: -1 counts, NaN durations
+_MISSING_TIMINGS = (-1, float("nan"), -1, float("nan"), float("nan"), float("nan"))
+
+
+def to_epoch(timestamp: str) -> float:
+    """
+    Converts an ISO-8601 timestamp to epoch seconds; naive values are UTC.
+
+    Args:
+        timestamp (str): ISO-8601 timestamp.
+
+    Returns:
+        float: Seconds since the epoch.
+
+    Raises:
+        ValueError: If `timestamp` is not ISO-8601.
+    """
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def to_iso(epoch: float) -> str:
+    """
+    Converts epoch seconds to a UTC ISO-8601 timestamp.
+
+    Args:
+        epoch (float): Seconds since the epoch.
+
+    Returns:
+        str: Timestamp such as "2025-01-01T00:00:00+00:00".
+    """
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+class StringDictionary:
+    """
+    Append-only file mapping strings to small integer ids (0 means None).
+
+    Attributes:
+        path (str): Dictionary file.
+        strings (list): Strings by id.
+    """
+
+    def __init__(self, path: str):
+        """
+        Loads the dictionary, dropping a torn trailing entry.
+
+        Args:
+            path (str): Dictionary file; created if missing.
+        """
+        self.path = path
+        self.strings: List[Optional[str]] = [None]
+        self._ids: Dict[str, int] = {}
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        data = os.pread(self._fd, os.fstat(self._fd).st_size, 0)
+        end = 0
+        while end + DICT_ENTRY.size <= len(data):
+            length, crc = DICT_ENTRY.unpack_from(data, end)
+            raw = data[end + DICT_ENTRY.size : end + DICT_ENTRY.size + length]
+            if len(raw) < length or zlib.crc32(raw) != crc:
+                break
+            self._ids[raw.decode("utf-8")] = len(self.strings)
+            self.strings.append(raw.decode("utf-8"))
+            end += DICT_ENTRY.size + length
+        if end < len(data):
+            os.ftruncate(self._fd, end)
+
+    def lookup(self, value: Optional[str]) -> Optional[int]:
+        """
+        Returns the id of `value` without adding it.
+
+        Args:
+            value (str, optional): String to look up.
+
+        Returns:
+            int or None: Id, 0 for None, or None if the string is unknown.
+        """
+        if value is None:
+            return 0
+        return self._ids.get(value)
+
+    def encode(self, value: Optional[str]) -> int:
+        """
+        Returns the id of `value`, appending it to the file if new.
+
+        Not thread-safe; called under the store's write lock.
+
+        Args:
+            value (str, optional): String to encode.
+
+        Returns:
+            int: Id of the string, 0 for None.
+        """
+        if value is None:
+            return 0
+        string_id = self._ids.get(value)
+        if string_id is None:
+            raw = value.encode("utf-8")
+            os.write(self._fd, DICT_ENTRY.pack(len(raw), zlib.crc32(raw)) + raw)
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self._ids[value] = string_id
+        return string_id
+
+    def sync(self):
+        """Flushes the dictionary file to disk."""
+        os.fsync(self._fd)
+
+    def close(self):
+        """Closes the dictionary file."""
+        os.close(self._fd)
+
+
+class Segment:
+    """
+    One memory-mapped segment file, its prompt blob and its sparse indexes.
+
+    Attributes:
+        path (str): Segment file.
+        first_id (int): Id of the first record.
+        capacity (int): Records the segment can hold.
+        count (int): Valid records.
+        body (struct.Struct): Checksummed part of the segment's record layout.
+        record (struct.Struct): Record layout of the segment.
+        blocks (list): [min, max] timestamp of each block of `INDEX_STRIDE` records.
+        users (set): Dictionary ids of the users in the segment.
+        models (set): Dictionary ids of the models in the segment.
+    """
+
+    def __init__(self, path: str, first_id: int = None, capacity: int = None):
+        """
+        Opens a segment, creating it when `first_id` is given.
+
+        Args:
+            path (str): Segment file.
+            first_id (int, optional): First id of a new segment.
+            capacity (int, optional): Records in a new segment.
+
+        Raises:
+            ValueError: If the file is not a segment of this layout.
+        """
+        self.path = path
+        if first_id is not None:
+            # Renamed into place so a crash never leaves a headerless segment
+            with open(path + ".tmp", "wb") as new:
+                new.truncate(HEADER_SIZE + capacity * RECORD.size)
+                new.write(HEADER.pack(MAGIC, RECORD.size, first_id))
+            os.replace(path + ".tmp", path)
+        self._file = open(path, "r+b")
+        self.mm = mmap.mmap(self._file.fileno(), 0)
+        magic, record_size, self.first_id = HEADER.unpack_from(self.mm, 0)
+        self.body, self.record = LAYOUTS.get(magic, (None, None))
+        if self.record is None or record_size != self.record.size:
+            raise ValueError(f"{path} is not a usage log segment")
+        self.capacity = (len(self.mm) - HEADER_SIZE) // self.record.size
+        self.blob_fd = os.open(
+            path[: -len(".log")] + ".blob", os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644
+        )
+        self.blob_size = 0
+        self.count = 0
+        self.blocks: List[List[float]] = []
+        self.users = set()
+        self.models = set()
+
+    @property
+    def index_path(self) -> str:
+        """Path of the saved sparse index of a full segment."""
+        return self.path[: -len(".log")] + ".idx"
+
+    def note(self, position: int, timestamp: float, user: int, model: int):
+        """
+        Adds a record to the sparse indexes.
+
+        Args:
+            position (int): Record position in the segment.
+            timestamp (float): Record timestamp (epoch seconds).
+            user (int): User dictionary id.
+            model (int): Model dictionary id.
+
+        Returns:
+            None
+        """
+        block = position // INDEX_STRIDE
+        if block == len(self.blocks):
+            self.blocks.append([timestamp, timestamp])
+        else:
+            bounds = self.blocks[block]
+            if timestamp < bounds[0]:
+                bounds[0] = timestamp
+            elif timestamp > bounds[1]:
+                bounds[1] = timestamp
+        self.users.add(user)
+        self.models.add(model)
+
+    def recover(self, strings: int):
+        """
+        Finds the valid records, rebuilds the indexes and discards torn writes.
+
+        Args:
+            strings (int): Entries in the string dictionary; records referring
+                past it were written after a torn dictionary entry.
+
+        Returns:
+            None
+        """
+        blob_size = os.fstat(self.blob_fd).st_size
+        blob_end = 0
+        position = 0
+        size = self.record.size
+        string_positions = _STRING_POSITIONS[: 5 if self.record is RECORD else 3]
+        while position < self.capacity:
+            offset = HEADER_SIZE + position * size
+            fields = self.record.unpack_from(self.mm, offset)
+            body = self.mm[offset : offset + self.body.size]
+            if (
+                fields[0] != self.first_id + position
+                or zlib.crc32(body) != fields[-1]
+                or fields[7] + fields[8] > blob_size
+                or max(fields[i] for i in string_positions) >= strings
+            ):
+                break
+            self.note(position, fields[1], fields[2], fields[3])
+            blob_end = fields[7] + fields[8]
+            position += 1
+        self.count = position
+
+        # Zero stale records left behind a torn write so they never resurface
+        empty = bytes(size)
+        while position < self.capacity:
+            offset = HEADER_SIZE + position * size
+            if self.mm[offset : offset + 8] == empty[:8]:
+                break
+            self.mm[offset : offset + size] = empty
+            position += 1
+        if blob_end < blob_size:
+            os.ftruncate(self.blob_fd, blob_end)
+        self.blob_size = blob_end
+
+    def load_index(self) -> bool:
+        """
+        Loads the saved sparse index of a full segment.
+
+        Returns:
+            bool: True if a consistent index was loaded.
+        """
+        try:
+            with open(self.index_path) as saved:
+                index = json.load(saved)
+        except (OSError, ValueError):
+            return False
+        if index.get("first_id") != self.first_id:
+            return False
+        self.count = index["count"]
+        self.blob_size = index["blob_size"]
+        self.blocks = index["blocks"]
+        self.users = set(index["users"])
+        self.models = set(index["models"])
+        return True
+
+    def seal(self):
+        """
+        Flushes a full segment and saves its sparse index.
+
+        Returns:
+            None
+        """
+        self.mm.flush()
+        os.fsync(self.blob_fd)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as saved:
+            json.dump(
+                {
+                    "first_id": self.first_id,
+                    "count": self.count,
+                    "blob_size": self.blob_size,
+                    "blocks": self.blocks,
+                    "users": sorted(self.users),
+                    "models": sorted(self.models),
+                },
+                saved,
+            )
+        os.replace(tmp, self.index_path)
+
+    def read(self, start: int, stop: int) -> List[tuple]:
+        """
+        Unpacks records `start` to `stop - 1`, with their prompts.
+
+        Args:
+            start (int): First position.
+            stop (int): Position after the last one.
+
+        Returns:
+            List[tuple]: (record fields, prompt) pairs.
+        """
+        if stop <= start:
+            return []
+        size = self.record.size
+        data = self.mm[HEADER_SIZE + start * size : HEADER_SIZE + stop * size]
+        records = list(self.record.iter_unpack(data))
+        first = records[0][7]
+        blob = os.pread(self.blob_fd, records[-1][7] + records[-1][8] - first, first)
+        return [
+            (fields, blob[fields[7] - first : fields[7] - first + fields[8]])
+            for fields in records
+        ]
+
+    def close(self):
+        """Unmaps the segment and closes its files."""
+        self.mm.close()
+        self._file.close()
+        os.close(self.blob_fd)
+
+
+class SegmentLogStore(UsageStore):
+    """
+    Usage logs stored in memory-mapped append-only segment files.
+
+    Attributes:
+        directory (str): Directory holding the segments.
+        segment_records (int): Records per new segment.
+        fsync (bool): Whether every append is flushed to disk.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_records: int = DEFAULT_SEGMENT_RECORDS,
+        fsync: bool = False,
+    ):
+        """
+        Opens (or creates) a log directory and recovers its state.
+
+        Args:
+            directory (str): Directory holding the segments.
+            segment_records (int): Records per new segment. Defaults to 1M.
+            fsync (bool): Flush every append to disk. Defaults to False.
+
+        Raises:
+            RuntimeError: If another process has the directory open.
+        """
+        self.directory = directory
+        self.segment_records = segment_records
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(directory, "LOCK"), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._lock_fd)
+            raise RuntimeError(f"Usage log {directory} is in use by another process")
+        self._write_lock = threading.Lock()
+        self._dictionary = StringDictionary(os.path.join(directory, "strings.dict"))
+
+        self._segments: List[Segment] = []
+        paths = sorted(glob.glob(os.path.join(directory, "segment-*.log")))
+        for number, path in enumerate(paths):
+            segment = Segment(path)
+            if number == len(paths) - 1 or not segment.load_index():
+                segment.recover(len(self._dictionary.strings))
+            self._segments.append(segment)
+        if self._segments and self._segments[-1].record is not RECORD:
+            self._retire(self._segments[-1])
+        if not self._segments:
+            self._roll(1)
+
+    def _retire(self, segment: Segment):
+        """Stops appending to a segment of an older layout."""
+        if segment.count:
+            segment.seal()
+            self._roll(segment.first_id + segment.count)
+            return
+        # Nothing to keep: replace it with a segment of the current layout
+        self._segments.pop()
+        segment.close()
+        os.remove(segment.path)
+        self._roll(segment.first_id)
+
+    def _roll(self, first_id: int):
+        """Starts a new segment whose first record gets `first_id`."""
+        path = os.path.join(self.directory, f"segment-{first_id:020d}.log")
+        segment = Segment(path, first_id=first_id, capacity=self.segment_records)
+        self._segments.append(segment)
+
+    @property
+    def next_id(self) -> int:
+        """Id the next appended record will get."""
+        active = self._segments[-1]
+        return active.first_id + active.count
+
+    def append(self, rows: List[tuple]) -> int:
+        encode = self._dictionary.encode
+        with self._write_lock:
+            first_id = self.next_id
+            pending = list(rows)
+            while pending:
+                active = self._segments[-1]
+                if active.count == active.capacity:
+                    active.seal()
+                    self._roll(active.first_id + active.count)
+                    continue
+                batch = pending[: active.capacity - active.count]
+                pending = pending[len(batch) :]
+                self._write(active, batch, encode)
+            if self.fsync:
+                self._dictionary.sync()
+                self._segments[-1].mm.flush()
+                os.fsync(self._segments[-1].blob_fd)
+        return first_id
+
+    def _write(self, segment: Segment, rows: List[tuple], encode):
+        """Packs `rows` into `segment` after its last record."""
+        records = bytearray()
+        prompts = []
+        blob_offset = segment.blob_size
+        position = segment.count
+        notes = []
+        for row in rows:
+            timestamp, user, prompt, model, latency, tokens, fallback_from = row[:7]
+            error, sample_rate, retention = row[13:16]
+            raw = (prompt or "").encode("utf-8")
+            epoch = to_epoch(timestamp)
+            user_id, model_id = encode(user), encode(model)
+            body = BODY.pack(
+                segment.first_id + position,
+                epoch,
+                user_id,
+                model_id,
+                encode(fallback_from),
+                latency,
+                tokens,
+                blob_offset,
+                len(raw),
+                *(
+                    missing if value is None else value
+                    for value, missing in zip(row[7:13], _MISSING_TIMINGS)
+                ),
+                encode(error),
+                float("nan") if sample_rate is None else sample_rate,
+                encode(retention),
+            )
+            records += body
+            records += CHECKSUM.pack(zlib.crc32(body))
+            prompts.append(raw)
+            notes.append((position, epoch, user_id, model_id))
+            blob_offset += len(raw)
+            position += 1
+
+        # Prompts first: a record is only valid once its prompt is on file
+        os.write(segment.blob_fd, b"".join(prompts))
+        start = HEADER_SIZE + segment.count * RECORD.size
+        segment.mm[start : start + len(records)] = records
+        for note in notes:
+            segment.note(*note)
+        segment.blob_size = blob_offset
+        segment.count = position
+
+    def _decode(self, fields: tuple, prompt: bytes) -> Dict:
+        """Builds a row dict from unpacked record fields."""
+        strings = self._dictionary.strings
+        row = {
+            "id": fields[0],
+            "timestamp": to_iso(fields[1]),
+            "user": strings[fields[2]],
+            "prompt": prompt.decode("utf-8"),
+            "model": strings[fields[3]],
+            "latency": fields[5],
+            "tokens": fields[6],
+            "fallback_from": strings[fields[4]],
+        }
+        # Older layouts end with the checksum where later fields would start
+        timings = _MISSING_TIMINGS
+        if len(fields) > _ERROR_POSITION:
+            timings = fields[_TIMINGS_START:_ERROR_POSITION]
+        for column, value in zip(TIMING_COLUMNS, timings):
+            # -1 and NaN (the only value unequal to itself) mark unknown timings
+            row[column] = None if value == -1 or value != value else value
+        error, sample_rate, retention = 0, float("nan"), 0
+        if len(fields) > _ERROR_POSITION + 3:
+            error, sample_rate, retention = fields[_ERROR_POSITION:-1]
+        row["error"] = strings[error]
+        sample_rate = None if sample_rate != sample_rate else sample_rate
+        row[RETENTION_COLUMNS[0]] = sample_rate
+        row[RETENTION_COLUMNS[1]] = strings[retention]
+        if strings[retention] == DROPPED and not prompt:
+            row["prompt"] = None
+        return row
+
+    def _snapshot(self) -> List[tuple]:
+        """Returns (segment, count) pairs of the records committed so far."""
+        with self._write_lock:
+            return [(segment, segment.count) for segment in self._segments]
+
+    def recent(self, limit: int) -> List[Dict]:
+        rows = []
+        for segment, count in reversed(self._snapshot()):
+            while count > 0 and len(rows) < limit:
+                start = max(0, count - (limit - len(rows)))
+                for fields, prompt in reversed(segment.read(start, count)):
+                    rows.append(self._decode(fields, prompt))
+                count = start
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def find(self, column: str, value: str) -> List[Dict]:
+        if column not in FIND_COLUMNS:
+            raise ValueError(f"Cannot look up rows by {column!r}")
+        target = self._dictionary.lookup(value)
+        if target is None:
+            return []
+        field = _FIELD_POSITIONS[column]
+        rows = []
+        for segment, count in self._snapshot():
+            present = segment.users if column == "user" else segment.models
+            if target not in present:
+                continue
+            for start in range(0, count, INDEX_STRIDE):
+                for fields, prompt in segment.read(
+                    start, min(start + INDEX_STRIDE, count)
+                ):
+                    if fields[field] == target:
+                        rows.append(self._decode(fields, prompt))
+        return rows
+
+    def between(self, start: str, end: str) -> List[Dict]:
+        low, high = to_epoch(start), to_epoch(end)
+        rows = []
+        for segment, count in self._snapshot():
+            for block, (first, last) in enumerate(list(segment.blocks)):
+                if last < low or first >= high:
+                    continue
+                begin = block * INDEX_STRIDE
+                for fields, prompt in segment.read(
+                    begin, min(begin + INDEX_STRIDE, count)
+                ):
+                    if low <= fields[1] < high:
+                        rows.append(self._decode(fields, prompt))
+        return rows
+
+    def scan(
+        self, after_id: int = 0, until_id: Optional[int] = None, chunk_size: int = 1000
+    ) -> Iterator[Dict]:
+        snapshot = self._snapshot()
+        last_segment, last_count = snapshot[-1]
+        newest = last_segment.first_id + last_count - 1
+        until_id = newest if until_id is None else min(until_id, newest)
+        first_ids = [segment.first_id for segment, _ in snapshot]
+        first = max(0, bisect.bisect_right(first_ids, after_id + 1) - 1)
+        for segment, count in snapshot[first:]:
+            position = max(0, after_id + 1 - segment.first_id)
+            stop = min(count, until_id + 1 - segment.first_id)
+            while position < stop:
+                chunk_stop = min(position + chunk_size, stop)
+                for fields, prompt in segment.read(position, chunk_stop):
+                    yield self._decode(fields, prompt)
+                position = chunk_stop
+
+    def close(self):
+        with self._write_lock:
+            for segment in self._segments:
+                segment.mm.flush()
+                segment.close()
+            self._segments = []
+            self._dictionary.close()
+            os.close(self._lock_fd)
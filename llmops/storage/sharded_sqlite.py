@@ -0,0 +1,282 @@
+"""
+sharded_sqlite.py
+
+Usage log backend spreading rows over several SQLite files by user.
+
+A single SQLite file admits one writer at a time, so workers logging usage
+queue on its lock. This store keeps `shards` files next to `LLMOPS_DB_PATH`
+(`usage.db` -> `usage.shard0.db`, `usage.shard1.db`, ...) and writes every row
+to the shard picked by a stable hash of its user (CRC-32, identical in every
+process). Writes for different shards take different locks, so write
+throughput grows with the shard count.
+
+Ids stay globally unique without coordination between shards: the row with
+local id `n` in shard `s` gets the id `(n - 1) * shards + s + 1`, so
+`(id - 1) % shards` names its shard. Ids increase within a shard but shards
+fill at different rates, so across shards ids only roughly follow time and
+the rows of one `append` are not consecutive when their users hash to
+different shards. A batch is committed with one transaction per shard.
+
+Reads fan out to the shards in parallel threads (SQLite releases the GIL while
+it runs a query) and the per-shard results, each already sorted, are k-way
+merged with `heapq.merge`:
+
+- `recent`: the newest rows of each shard by timestamp (then id), merged by
+  the same key. Ids do not follow time across shards, and `/ingest` stores
+  historical timestamps, so each shard orders by timestamp itself through an
+  index created with the shard files.
+- `find("user", ...)`: only the user's shard is read.
+- `find("model", ...)`, `between`, `scan`: merged by id.
+- `search`: the best `offset + limit` matches of each shard, merged by score.
+  BM25 scores use per-shard term statistics, which are close for shards of
+  similar size.
+
+The shard count is fixed when the files are created; opening them with a
+different count raises, because users would hash to other shards.
+"""
+
+import glob
+import heapq
+import itertools
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, Iterator, List, Optional
+
+from llmops.storage.base import UsageStore
+from llmops.storage.sqlite_store import SQLiteUsageStore
+
+
+def shard_of(user: str, shards: int) -> int:
+    """
+    Picks the shard of a user.
+
+    Args:
+        user (str): User id.
+        shards (int): Number of shards.
+
+    Returns:
+        int: Shard index in `[0, shards)`.
+    """
+    return zlib.crc32((user or "").encode("utf-8")) % shards
+
+
+def shard_paths(path: str, shards: int) -> List[str]:
+    """
+    Returns the database files of a sharded store.
+
+    Args:
+        path (str): Configured database path, e.g. "data/usage.db".
+        shards (int): Number of shards.
+
+    Returns:
+        List[str]: One file per shard, e.g. "data/usage.shard0.db".
+    """
+    root, ext = os.path.splitext(path)
+    return [f"{root}.shard{index}{ext or '.db'}" for index in range(shards)]
+
+
+def sqlite_paths(path: str, backend: str, shards: int) -> List[str]:
+    """
+    Returns the SQLite files holding the usage log of a storage backend.
+
+    Args:
+        path (str): Configured database path (`LLMOPS_DB_PATH`).
+        backend (str): Storage backend (`LLMOPS_STORAGE_BACKEND`).
+        shards (int): Shard count of the sharded backend.
+
+    Returns:
+        List[str]: Every shard file for "sqlite_sharded", else `[path]`.
+    """
+    if backend == "sqlite_sharded":
+        return shard_paths(path, shards)
+    return [path]
+
+
+class ShardedSQLiteUsageStore(UsageStore):
+    """
+    Usage logs sharded by user over several SQLite files.
+
+    Attributes:
+        path (str): Configured database path the shard files are named after.
+        shards (List[SQLiteUsageStore]): One store per shard file.
+    """
+
+    def __init__(self, path: str, shards: int = 4):
+        """
+        Args:
+            path (str): Database path the shard files are named after.
+            shards (int): Number of shard files. Defaults to 4.
+
+        Raises:
+            ValueError: If `shards` is below 1, or existing shard files were
+                created with another shard count.
+        """
+        if shards < 1:
+            raise ValueError("A sharded store needs at least one shard")
+        root, ext = os.path.splitext(path)
+        existing = glob.glob(f"{glob.escape(root)}.shard*{ext or '.db'}")
+        if existing and sorted(existing) != sorted(shard_paths(path, shards)):
+            raise ValueError(
+                f"{path} was sharded into {len(existing)} files, not {shards}; "
+                "users would map to other shards"
+            )
+        self.path = path
+        self.shards = [SQLiteUsageStore(p) for p in shard_paths(path, shards)]
+        # Create every file up front so the shard count can be checked on reopen
+        for shard in self.shards:
+            conn = shard._connect()
+            try:
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS usage_logs_timestamp "
+                    "ON usage_logs (timestamp)"
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _global_id(self, local_id: int, shard: int) -> int:
+        """Maps a shard's local id to the store-wide id."""
+        return (local_id - 1) * len(self.shards) + shard + 1
+
+    def _local_id(self, global_id: int, shard: int) -> int:
+        """Returns the largest local id of `shard` whose global id is <= `global_id`."""
+        return (global_id - shard - 1) // len(self.shards) + 1
+
+    def _rows(self, rows: List[Dict], shard: int) -> List[Dict]:
+        """Rewrites the ids of rows read from a shard in place."""
+        for row in rows:
+            row["id"] = self._global_id(row["id"], shard)
+        return rows
+
+    def _fan_out(self, read) -> List[List[Dict]]:
+        """Runs `read(shard_store)` on every shard in parallel, with global ids."""
+        if len(self.shards) == 1:
+            return [self._rows(read(self.shards[0]), 0)]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=len(self.shards), thread_name_prefix="usage-shard"
+                )
+        results = self._executor.map(read, self.shards)
+        return [self._rows(rows, shard) for shard, rows in enumerate(results)]
+
+    def append_ids(self, rows: List[tuple]) -> List[int]:
+        groups: Dict[int, List[int]] = {}
+        for position, row in enumerate(rows):
+            groups.setdefault(shard_of(row[1], len(self.shards)), []).append(position)
+        ids = [0] * len(rows)
+        for shard, positions in groups.items():
+            first = self.shards[shard].append([rows[p] for p in positions])
+            for offset, position in enumerate(positions):
+                ids[position] = self._global_id(first + offset, shard)
+        return ids
+
+    def append(self, rows: List[tuple]) -> int:
+        """
+        Persists rows, one transaction per shard.
+
+        Args:
+            rows (List[tuple]): Values in `USAGE_COLUMNS[1:]` order.
+
+        Returns:
+            int: Id of the first row; use `append_ids` for every id, as rows
+                of different shards do not get consecutive ids.
+        """
+        return self.append_ids(rows)[0]
+
+    def recent(self, limit: int) -> List[Dict]:
+        """
+        Returns the newest rows by timestamp.
+
+        Unlike a single file, rows are not ordered by id, which only roughly
+        follows time across shards.
+
+        Args:
+            limit (int): Maximum number of rows.
+
+        Returns:
+            List[Dict]: Rows sorted by timestamp, then id, newest first.
+        """
+        newest = self._fan_out(
+            lambda shard: shard._select(
+                "ORDER BY timestamp DESC, id DESC LIMIT ?", (limit,)
+            )
+        )
+        merged = heapq.merge(
+            *newest, key=lambda row: (row["timestamp"] or "", row["id"]), reverse=True
+        )
+        return list(itertools.islice(merged, limit))
+
+    def find(self, column: str, value: str) -> List[Dict]:
+        if column == "user":
+            shard = shard_of(value, len(self.shards))
+            return self._rows(self.shards[shard].find(column, value), shard)
+        results = self._fan_out(lambda shard: shard.find(column, value))
+        return list(heapq.merge(*results, key=lambda row: row["id"]))
+
+    def between(self, start: str, end: str) -> List[Dict]:
+        results = self._fan_out(lambda shard: shard.between(start, end))
+        return list(heapq.merge(*results, key=lambda row: row["id"]))
+
+    def search(
+        self,
+        query: str,
+        user: Optional[str] = None,
+        model: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[Dict]:
+        if user is not None:
+            shard = shard_of(user, len(self.shards))
+            return self._rows(
+                self.shards[shard].search(
+                    query, user, model, start, end, limit, offset
+                ),
+                shard,
+            )
+        results = self._fan_out(
+            lambda shard: shard.search(query, None, model, start, end, offset + limit)
+        )
+        merged = heapq.merge(*results, key=lambda row: -row["score"])
+        return list(itertools.islice(merged, offset, offset + limit))
+
+    def scan(
+        self, after_id: int = 0, until_id: Optional[int] = None, chunk_size: int = 1000
+    ) -> Iterator[Dict]:
+        if until_id is None:
+            last = self._fan_out(lambda shard: shard.recent(1))
+            ids = [rows[0]["id"] for rows in last if rows]
+            if not ids:
+                return
+            until_id = max(ids)
+        streams = [
+            self._scan_shard(index, after_id, until_id, chunk_size)
+            for index in range(len(self.shards))
+            if self._local_id(until_id, index) > self._local_id(after_id, index)
+        ]
+        yield from heapq.merge(*streams, key=lambda row: row["id"])
+
+    def _scan_shard(
+        self, index: int, after_id: int, until_id: int, chunk_size: int
+    ) -> Iterator[Dict]:
+        """Streams the rows of one shard with global ids in `(after_id, until_id]`."""
+        for row in self.shards[index].scan(
+            self._local_id(after_id, index), self._local_id(until_id, index), chunk_size
+        ):
+            # Copied: the shard pages on the local id of the rows it yielded
+            yield dict(row, id=self._global_id(row["id"], index))
+
+    def data_version(self) -> Optional[Hashable]:
+        return tuple(shard.data_version() for shard in self.shards)
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
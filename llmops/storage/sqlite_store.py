@@ -0,0 +1,204 @@
+"""
+sqlite_store.py
+
+Default usage log backend: the `usage_logs` table of a SQLite file.
+
+Every operation opens its own short-lived connection, so the store is safe to
+share between threads and between worker processes writing the same file, at
+the cost of SQLite's single writer lock. Writes of other processes are
+detected through the change counter in the database header (`data_version`).
+
+Prompts are full-text indexed by the FTS5 table of `search_index.py`, created
+with the schema and maintained by triggers.
+"""
+
+import os
+import sqlite3
+from typing import Dict, Hashable, Iterator, List, Optional
+
+from llmops.storage.base import USAGE_COLUMNS, UsageStore
+from llmops.storage.search_index import ensure_search_index, search_prompts
+
+# Columns added after the original schema, with their SQL types
+MIGRATED_COLUMNS = {
+    "fallback_from": "TEXT",
+    "prompt_eval_count": "INTEGER",
+    "prompt_eval_seconds": "REAL",
+    "eval_count": "INTEGER",
+    "eval_seconds": "REAL",
+    "load_seconds": "REAL",
+    "total_seconds": "REAL",
+    "error": "TEXT",
+    "prompt_sample_rate": "REAL",
+    "prompt_retention": "TEXT",
+}
+
+# Byte offset of the file change counter in the SQLite header; every commit
+# increments it in the default rollback-journal mode
+CHANGE_COUNTER_OFFSET = 24
+
+# Database paths whose schema has already been checked in this process
+_SCHEMA_CHECKED = set()
+
+
+def ensure_usage_table(conn: sqlite3.Connection, path: str):
+    """
+    Creates `usage_logs` if needed and adds columns and the prompt search index
+    introduced after a database was created, once per path and process.
+
+    Args:
+        conn (sqlite3.Connection): Open connection to the database.
+        path (str): Database path, used to remember migrated files.
+
+    Returns:
+        None
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS usage_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            user TEXT,
+            prompt TEXT,
+            model TEXT,
+            latency REAL,
+            tokens INTEGER,
+            fallback_from TEXT,
+            prompt_eval_count INTEGER,
+            prompt_eval_seconds REAL,
+            eval_count INTEGER,
+            eval_seconds REAL,
+            load_seconds REAL,
+            total_seconds REAL,
+            error TEXT,
+            prompt_sample_rate REAL,
+            prompt_retention TEXT
+        )
+    """
+    )
+    if path not in _SCHEMA_CHECKED:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(usage_logs)")}
+        for column, sql_type in MIGRATED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE usage_logs ADD COLUMN {column} {sql_type}")
+        ensure_search_index(conn)
+        _SCHEMA_CHECKED.add(path)
+
+
+class SQLiteUsageStore(UsageStore):
+    """
+    Usage logs stored in a SQLite table.
+
+    Attributes:
+        path (str): Database file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Database file; created on first use.
+        """
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens a connection with the schema in place."""
+        conn = sqlite3.connect(self.path)
+        ensure_usage_table(conn, self.path)
+        return conn
+
+    def _select(self, where: str = "", params: tuple = ()) -> List[Dict]:
+        """Runs a SELECT of every column and returns the rows as dicts."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {', '.join(USAGE_COLUMNS)} FROM usage_logs {where}", params
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(USAGE_COLUMNS, row)) for row in rows]
+
+    def data_version(self) -> Optional[Hashable]:
+        """
+        Reads the file change counter, which commits of every process increment.
+
+        Returns:
+            tuple or None: (inode, counter bytes), or None before the file exists.
+        """
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            return os.fstat(fd).st_ino, os.pread(fd, 4, CHANGE_COUNTER_OFFSET)
+        finally:
+            os.close(fd)
+
+    def append(self, rows: List[tuple]) -> int:
+        conn = self._connect()
+        try:
+            cursor = conn.executemany(
+                f"""
+                INSERT INTO usage_logs ({', '.join(USAGE_COLUMNS[1:])})
+                VALUES ({', '.join('?' * (len(USAGE_COLUMNS) - 1))})
+                """,
+                rows,
+            )
+            # Rows of one transaction get consecutive AUTOINCREMENT ids
+            last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+            conn.commit()
+        finally:
+            conn.close()
+        return last_id - len(rows) + 1
+
+    def recent(self, limit: int) -> List[Dict]:
+        return self._select("ORDER BY id DESC LIMIT ?", (limit,))
+
+    def find(self, column: str, value: str) -> List[Dict]:
+        if column not in ("user", "model"):
+            raise ValueError(f"Cannot look up rows by {column!r}")
+        return self._select(f"WHERE {column} = ? ORDER BY id", (value,))
+
+    def between(self, start: str, end: str) -> List[Dict]:
+        return self._select(
+            "WHERE timestamp >= ? AND timestamp < ? ORDER BY id", (start, end)
+        )
+
+    def scan(
+        self, after_id: int = 0, until_id: Optional[int] = None, chunk_size: int = 1000
+    ) -> Iterator[Dict]:
+        if until_id is None:
+            conn = self._connect()
+            try:
+                until_id = conn.execute("SELECT MAX(id) FROM usage_logs").fetchone()[0]
+            finally:
+                conn.close()
+            if until_id is None:
+                return
+        last_id = after_id
+        while True:
+            rows = self._select(
+                "WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+                (last_id, until_id, chunk_size),
+            )
+            yield from rows
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1]["id"]
+
+    def search(
+        self,
+        query: str,
+        user: Optional[str] = None,
+        model: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[Dict]:
+        conn = self._connect()
+        try:
+            return search_prompts(
+                conn, USAGE_COLUMNS, query, user, model, start, end, limit, offset
+            )
+        finally:
+            conn.close()
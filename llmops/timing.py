@@ -0,0 +1,174 @@
+"""
+timing.py
+
+Lightweight per-stage request timing.
+
+Route code wraps the interesting stages of a request (JWT verification, policy
+check, upstream model call, database write, response serialisation) in
+`span(stage)`. Durations are accumulated in a per-request dict held in a
+context variable, then exported once per request by `StageTimingMiddleware`:
+
+- `request_stage_seconds{endpoint, stage}`: one Prometheus histogram series per
+  stage. `endpoint` is the matched route template (e.g. `/llm`), or
+  "unmatched", like the labels of `metrics_middleware`, so path parameters
+  cannot multiply the series.
+- `Server-Timing` response header (optional, `LLMOPS_SERVER_TIMING=true`), e.g.
+  `auth;dur=0.21, upstream;dur=312.40, db;dur=1.72, total;dur=315.02` (milliseconds).
+
+A span costs two `perf_counter()` calls and a dict update; outside a request
+(e.g. in scripts or tests) spans are no-ops. Stages executed concurrently
+within one request (such as batch items) are summed.
+
+Attributes:
+    STAGE_LATENCY (Histogram): Stage durations by endpoint and stage.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse
+from prometheus_client import Histogram
+
+# Prometheus histogram: per-stage latency, fine buckets for sub-millisecond stages
+STAGE_LATENCY = Histogram(
+    "request_stage_seconds",
+    "Latency of request processing stages",
+    ["endpoint", "stage"],
+    buckets=(
+        0.0001,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        30.0,
+    ),
+)
+
+# Stage name -> accumulated seconds for the request being processed
+_STAGES: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "llmops_request_stages", default=None
+)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Times a block of code as a named stage of the current request.
+
+    Args:
+        stage (str): Stage name, e.g. "auth", "policy", "upstream", "db", "serialize".
+
+    Yields:
+        None
+    """
+    stages = _STAGES.get()
+    if stages is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        stages[stage] = stages.get(stage, 0.0) + (perf_counter() - start)
+
+
+def current_stages() -> Optional[Dict[str, float]]:
+    """
+    Returns the stage durations recorded so far for the current request.
+
+    Returns:
+        Dict[str, float] or None: Stage -> seconds, or None outside a request.
+    """
+    return _STAGES.get()
+
+
+class TimedJSONResponse(JSONResponse):
+    """
+    JSON response whose body encoding is recorded as the "serialize" stage.
+    """
+
+    def render(self, content) -> bytes:
+        """
+        Encodes `content` as JSON inside a "serialize" span.
+
+        Args:
+            content (Any): JSON-compatible response content.
+
+        Returns:
+            bytes: Encoded body.
+        """
+        with span("serialize"):
+            return super().render(content)
+
+
+class StageTimingMiddleware:
+    """
+    ASGI middleware collecting stage spans and exporting them per request.
+
+    Implemented as plain ASGI (rather than `@app.middleware("http")`) so that it
+    adds no extra task or response streaming overhead and can stay always on.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        """
+        Args:
+            app (ASGIApp): Downstream ASGI application.
+            server_timing (bool): Whether to add a `Server-Timing` response header.
+        """
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        """
+        Processes one ASGI connection.
+
+        Args:
+            scope (dict): ASGI connection scope.
+            receive (Callable): ASGI receive channel.
+            send (Callable): ASGI send channel.
+
+        Returns:
+            None
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages = {}
+        token = _STAGES.set(stages)
+        start = perf_counter()
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                total = perf_counter() - start
+                metrics = [
+                    f"{name};dur={secs * 1000:.2f}" for name, secs in stages.items()
+                ]
+                metrics.append(f"total;dur={total * 1000:.2f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(metrics).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(
+                scope, receive, send_with_header if self.server_timing else send
+            )
+        finally:
+            _STAGES.reset(token)
+            route = scope.get("route")
+            endpoint = route.path if route is not None else "unmatched"
+            for stage, seconds in stages.items():
+                STAGE_LATENCY.labels(endpoint=endpoint, stage=stage).observe(seconds)
@@ -0,0 +1 @@
+# Init for perf tests
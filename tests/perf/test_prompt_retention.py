@@ -0,0 +1,95 @@
+"""
+test_prompt_retention.py
+
+Benchmark of storage growth per logged request with and without a prompt
+retention policy.
+
+Logs the same requests, with prompts of 100-400 words, through
+`llmops.database.log_usage` into fresh SQLite and segment log stores, once
+storing every prompt and once with a 5% head sample plus p99 latency
+outliers (`llmops.retention`), and compares the bytes the stores occupy on
+disk per request. Metadata is stored in both runs, so the reduction is what
+dropping prompt bodies (and, for SQLite, their full-text index entries) saves.
+
+The budget is deliberately generous so the guard only trips when prompts stop
+being dropped. Override it with LLMOPS_RETENTION_SIZE_REDUCTION.
+"""
+
+import os
+import random
+
+import pytest
+
+from llmops import database
+from llmops.retention import PromptRetention
+
+RETENTION_SIZE_REDUCTION_BUDGET = float(
+    os.getenv("LLMOPS_RETENTION_SIZE_REDUCTION", "5")
+)
+
+# Requests logged per run
+REQUESTS = 2000
+
+# Vocabulary of the generated prompts
+WORDS = (
+    "the model latency token cache request user prompt gpu memory timeout "
+    "error context window summary report billing account"
+).split()
+
+
+def _disk_bytes(path: str) -> int:
+    """Returns the allocated size of a file, or of every file under a directory."""
+    paths = [path]
+    if os.path.isdir(path):
+        paths = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(path)
+            for name in names
+        ]
+    return sum(os.stat(p).st_blocks * 512 for p in paths if os.path.exists(p))
+
+
+def _bytes_per_request(tmp_path, backend: str, policy) -> float:
+    """Logs `REQUESTS` requests into a fresh store and returns its size per request."""
+    rng = random.Random(1)
+    location = str(tmp_path / f"{backend}-{policy is not None}")
+    database.close_usage_stores()
+    database.init_db(location + ".db", backend, location)
+    database.configure_query_cache(0, 0)
+    database.configure_prompt_retention(policy)
+    try:
+        for i in range(REQUESTS):
+            prompt = " ".join(rng.choice(WORDS) for _ in range(rng.randint(100, 400)))
+            latency = rng.lognormvariate(-1, 0.5)
+            database.log_usage(f"user-{i % 20}", prompt, "llama3", latency, 1)
+    finally:
+        database.configure_prompt_retention(None)
+        database.close_usage_stores()
+    stored = location + ".db" if backend == "sqlite" else location
+    return _disk_bytes(stored) / REQUESTS
+
+
+@pytest.mark.perf
+@pytest.mark.parametrize("backend", ["sqlite", "segment_log"])
+def test_retention_reduces_storage_growth(tmp_path, monkeypatch, backend):
+    """
+    Benchmark bytes stored per request with every prompt and with the policy.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+        monkeypatch (MonkeyPatch): pytest fixture isolating the environment.
+        backend (str): Storage backend under test.
+
+    Asserts:
+        - The policy cuts storage per request at least
+          `RETENTION_SIZE_REDUCTION_BUDGET` times.
+    """
+    for name in ("LLMOPS_DB_PATH", "LLMOPS_STORAGE_BACKEND", "LLMOPS_SEGMENT_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    full = _bytes_per_request(tmp_path, backend, None)
+    retained = _bytes_per_request(tmp_path, backend, PromptRetention(seed=1))
+    print(
+        f"{backend}: {full:.0f} B/request with every prompt, {retained:.0f} "
+        f"B/request with retention ({full / retained:.1f}x)"
+    )
+    assert full / retained >= RETENTION_SIZE_REDUCTION_BUDGET
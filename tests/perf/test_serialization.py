@@ -0,0 +1,145 @@
+"""
+test_serialization.py
+
+Benchmark of the optimised response path for data-heavy endpoints.
+
+Measures on a `/logs`-sized payload (100 usage rows):
+- Serialisation CPU per response: FastAPI's default path (response-model
+  validation, `jsonable_encoder`, standard library `json`) against the direct
+  `FastJSONResponse` path used by `/logs` and `/llm`.
+- Bytes on the wire for `/logs` and `/metrics` with and without negotiated
+  compression, through the app.
+
+Budgets are deliberately generous so the guard only trips on real regressions
+(e.g. a hot route falling back to validation or compression being bypassed).
+Override them with LLMOPS_SERIALIZE_SPEEDUP / LLMOPS_COMPRESSION_RATIO.
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+from typing import List
+
+import jwt
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from llmops import responses
+from llmops.config import Settings
+from llmops.database import log_usage_batch
+from llmops.main import create_app
+from llmops.responses import FastJSONResponse
+
+SERIALIZE_SPEEDUP_BUDGET = float(os.getenv("LLMOPS_SERIALIZE_SPEEDUP", "2.0"))
+COMPRESSION_RATIO_BUDGET = float(os.getenv("LLMOPS_COMPRESSION_RATIO", "0.35"))
+
+# Rows per payload, the `/logs` maximum
+PAYLOAD_ROWS = 100
+
+
+def _rows():
+    """Returns `PAYLOAD_ROWS` usage rows shaped like `get_recent_logs` output."""
+    now = datetime.now(timezone.utc).isoformat()
+    return [
+        {
+            "id": i,
+            "timestamp": now,
+            "user": f"tenant-{i % 7}",
+            "model": "llama3" if i % 2 else "openai-gpt",
+            "latency": 0.1234 + i / 1000,
+            "tokens": 40 + i,
+            "fallback_from": None,
+        }
+        for i in range(PAYLOAD_ROWS)
+    ]
+
+
+def _per_call(func, rounds=300) -> float:
+    """Returns the best mean seconds per call over three timed runs."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        best = min(best, (time.perf_counter() - start) / rounds)
+    return best
+
+
+@pytest.mark.perf
+def test_fast_serialization_cpu():
+    """
+    Benchmark per-response serialisation CPU of the default and fast paths.
+
+    Asserts:
+        - Both paths produce the same document.
+        - With orjson installed, the fast path is at least
+          `SERIALIZE_SPEEDUP_BUDGET` times faster.
+    """
+    rows = _rows()
+    adapter = TypeAdapter(List[dict])
+
+    def default_path():
+        return JSONResponse(jsonable_encoder(adapter.validate_python(rows))).body
+
+    def fast_path():
+        return FastJSONResponse(rows).body
+
+    assert TypeAdapter(List[dict]).validate_json(fast_path()) == rows
+    default_s, fast_s = _per_call(default_path), _per_call(fast_path)
+    print(
+        f"serialise {PAYLOAD_ROWS} rows: default {default_s * 1e6:.0f} us, "
+        f"fast {fast_s * 1e6:.0f} us ({default_s / fast_s:.1f}x)"
+    )
+    if responses.orjson is None:
+        pytest.skip("orjson not installed; FastJSONResponse uses the json fallback")
+    assert default_s / fast_s >= SERIALIZE_SPEEDUP_BUDGET
+
+
+@pytest.mark.perf
+def test_compression_bytes_on_wire(tmp_path):
+    """
+    Benchmark response sizes of `/logs` and `/metrics` with each coding.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+
+    Asserts:
+        - Compressed bodies are at most `COMPRESSION_RATIO_BUDGET` of the
+          identity size.
+    """
+    secret = "bench-secret"
+    app = create_app(
+        Settings(
+            jwt_secret=secret,
+            db_path=str(tmp_path / "usage.db"),
+            health_check_interval=0,
+            mcp_reload_interval=0,
+            client_snapshot_interval=0,
+        )
+    )
+    token = jwt.encode(
+        {"sub": "bench", "exp": int(time.time()) + 60}, secret, algorithm="HS256"
+    )
+    auth = {"Authorization": f"Bearer {token}"}
+    report = []
+
+    with TestClient(app) as client:
+        log_usage_batch({**row, "prompt": "benchmark prompt"} for row in _rows())
+        for path, params in (("/logs", {"limit": PAYLOAD_ROWS}), ("/metrics", {})):
+            sizes = {}
+            for coding in ("identity", *responses.available_encodings()):
+                res = client.get(
+                    path, params=params, headers={**auth, "Accept-Encoding": coding}
+                )
+                assert res.status_code == 200
+                sizes[coding] = res.num_bytes_downloaded
+            report.append(
+                f"{path}: "
+                + ", ".join(f"{coding} {size} B" for coding, size in sizes.items())
+            )
+            for coding in responses.available_encodings():
+                assert sizes[coding] <= COMPRESSION_RATIO_BUDGET * sizes["identity"]
+    print("\n".join(report))
@@ -0,0 +1,98 @@
+"""
+test_sharded_writes.py
+
+Benchmark of concurrent usage log writes to one SQLite file and to shards.
+
+Four worker processes each log single rows (one transaction per row, like
+`log_usage`) for their own users, first into one SQLite file and then into a
+four-way `ShardedSQLiteUsageStore` whose users hash to a different shard per
+worker. With one file the workers queue on its write lock; with shards they
+commit independently.
+
+The budget is deliberately generous so the guard only trips when sharded
+writes stop scaling at all (e.g. every row routed to the same shard).
+Override it with LLMOPS_SHARD_WRITE_SPEEDUP.
+"""
+
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from llmops.storage.sharded_sqlite import ShardedSQLiteUsageStore, shard_of
+
+SHARD_WRITE_SPEEDUP_BUDGET = float(os.getenv("LLMOPS_SHARD_WRITE_SPEEDUP", "1.1"))
+
+# Writer processes, and shards of the sharded run
+WORKERS = 4
+
+# Rows committed by each writer
+ROWS_PER_WORKER = 300
+
+
+def _users(worker: int, shards: int, count: int = 4):
+    """Returns `count` user ids that hash to shard `worker % shards`."""
+    users, candidate = [], 0
+    while len(users) < count:
+        user = f"worker-{worker}-user-{candidate}"
+        if shard_of(user, shards) == worker % shards:
+            users.append(user)
+        candidate += 1
+    return users
+
+
+def _write(path: str, shards: int, worker: int, start):
+    """Worker process: logs `ROWS_PER_WORKER` rows one transaction at a time."""
+    store = ShardedSQLiteUsageStore(path, shards)
+    users = _users(worker, shards)
+    start.wait()
+    for i in range(ROWS_PER_WORKER):
+        row = ("2025-01-01T00:00:00+00:00", users[i % len(users)], "prompt", "llama3")
+        store.append([row + (0.1, 1) + (None,) * 10])
+    store.close()
+
+
+def _rows_per_second(path: str, shards: int) -> float:
+    """Runs the writers against a fresh store and returns committed rows/s."""
+    ShardedSQLiteUsageStore(path, shards).close()
+    start = multiprocessing.Event()
+    workers = [
+        multiprocessing.Process(target=_write, args=(path, shards, worker, start))
+        for worker in range(WORKERS)
+    ]
+    for process in workers:
+        process.start()
+    time.sleep(0.5)
+    began = time.perf_counter()
+    start.set()
+    for process in workers:
+        process.join()
+    assert all(process.exitcode == 0 for process in workers)
+    return WORKERS * ROWS_PER_WORKER / (time.perf_counter() - began)
+
+
+@pytest.mark.perf
+def test_sharded_write_throughput(tmp_path):
+    """
+    Benchmark concurrent single-row writes against 1 and `WORKERS` shards.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+
+    Asserts:
+        - Every row is stored.
+        - Sharded writes are at least `SHARD_WRITE_SPEEDUP_BUDGET` times faster.
+    """
+    single = _rows_per_second(str(tmp_path / "single.db"), 1)
+    sharded = _rows_per_second(str(tmp_path / "sharded.db"), WORKERS)
+    print(
+        f"{WORKERS} writers: 1 file {single:.0f} rows/s, "
+        f"{WORKERS} shards {sharded:.0f} rows/s ({sharded / single:.1f}x)"
+    )
+    store = ShardedSQLiteUsageStore(str(tmp_path / "sharded.db"), WORKERS)
+    try:
+        assert len(list(store.scan())) == WORKERS * ROWS_PER_WORKER
+    finally:
+        store.close()
+    assert sharded / single >= SHARD_WRITE_SPEEDUP_BUDGET
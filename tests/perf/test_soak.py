@@ -0,0 +1,140 @@
+"""
+test_soak.py
+
+Memory soak test guarding long-running workers against unbounded growth.
+
+Drives sustained synthetic `/llm` traffic from more distinct users than any
+per-user structure keeps (`CLIENT_LOGS`, the top-K user labeler, latency
+sketch series, prompt fingerprint counters) through the app in-process, then measures what the hot path
+retains once those structures are full:
+
+- `tracemalloc` snapshots before and after a measured phase give the retained
+  bytes and allocation count per request, and the top growth sites.
+- RSS is sampled across the run.
+
+Both snapshots are taken after tracing has started, so bounded caches that
+replace entries allocated during warm-up do not show up as growth.
+
+Budgets are deliberately generous so the guard only trips on real leaks (a
+structure keyed by user, path or request that is never trimmed). Override them
+with LLMOPS_SOAK_BYTES_PER_REQUEST / LLMOPS_SOAK_BLOCKS_PER_REQUEST /
+LLMOPS_SOAK_RSS_BYTES_PER_REQUEST, and the run length with LLMOPS_SOAK_REQUESTS.
+"""
+
+import gc
+import os
+import resource
+import time
+import tracemalloc
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from llmops.config import Settings
+from llmops.main import create_app
+
+BYTES_PER_REQUEST_BUDGET = float(os.getenv("LLMOPS_SOAK_BYTES_PER_REQUEST", "512"))
+BLOCKS_PER_REQUEST_BUDGET = float(os.getenv("LLMOPS_SOAK_BLOCKS_PER_REQUEST", "3"))
+RSS_BYTES_PER_REQUEST_BUDGET = float(
+    os.getenv("LLMOPS_SOAK_RSS_BYTES_PER_REQUEST", "8192")
+)
+SOAK_REQUESTS = int(os.getenv("LLMOPS_SOAK_REQUESTS", "500"))
+
+# More users than CLIENT_LOGS, the labeler and a sketch window keep
+DISTINCT_USERS = 1500
+
+
+def _rss_bytes() -> int:
+    """Returns the current resident set size, or the peak where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@pytest.mark.perf
+def test_llm_hot_path_memory_is_bounded(tmp_path):
+    """
+    Soak `/llm` and check per-request retained memory stays within budget.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+
+    Asserts:
+        - Every request succeeds.
+        - Retained bytes and allocations per request, measured by tracemalloc
+          after warm-up, stay within budget.
+        - RSS growth per request stays within budget.
+    """
+    secret = "soak-secret"
+    app = create_app(
+        Settings(
+            jwt_secret=secret,
+            db_path=str(tmp_path / "soak.db"),
+            enable_instrumentator=False,
+            health_check_interval=0,
+            mcp_reload_interval=0,
+            client_snapshot_interval=0,
+            # One sketch window for the whole run, so its fill happens in warm-up
+            quantile_window_seconds=10**9,
+            # A prompt window that fills during warm-up, then only evicts
+            fingerprint_window=1000,
+        )
+    )
+    token = jwt.encode(
+        {"sub": "soak-user", "exp": int(time.time()) + 3600}, secret, algorithm="HS256"
+    )
+    sent = 0
+
+    def drive(client, count):
+        nonlocal sent
+        for _ in range(count):
+            res = client.post(
+                "/llm",
+                json={"prompt": "sustained soak traffic prompt"},
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "x-user-id": f"soak-{sent % DISTINCT_USERS}",
+                },
+            )
+            assert res.status_code == 200, res.text
+            sent += 1
+
+    with TestClient(app) as client:
+        # Warm-up: every user seen, bounded structures filled and evicting
+        drive(client, DISTINCT_USERS)
+        tracemalloc.start()
+        try:
+            # Cycle every user again so bounded structures hold only traced entries
+            drive(client, DISTINCT_USERS)
+            gc.collect()
+            baseline = tracemalloc.take_snapshot()
+            rss_before = _rss_bytes()
+
+            drive(client, SOAK_REQUESTS)
+            gc.collect()
+            final = tracemalloc.take_snapshot()
+            rss_after = _rss_bytes()
+        finally:
+            tracemalloc.stop()
+
+    growth = final.compare_to(baseline, "lineno")
+    bytes_per_request = sum(stat.size_diff for stat in growth) / SOAK_REQUESTS
+    blocks_per_request = sum(stat.count_diff for stat in growth) / SOAK_REQUESTS
+    rss_per_request = (rss_after - rss_before) / SOAK_REQUESTS
+    report = "\n".join(
+        [
+            f"retained {bytes_per_request:.1f} B/request, "
+            f"{blocks_per_request:.2f} allocations/request, "
+            f"RSS {rss_per_request:.1f} B/request over {SOAK_REQUESTS} requests",
+            "top growth sites:",
+            *(f"  {stat}" for stat in growth[:10]),
+        ]
+    )
+    print(report)
+
+    assert bytes_per_request < BYTES_PER_REQUEST_BUDGET, report
+    assert blocks_per_request < BLOCKS_PER_REQUEST_BUDGET, report
+    assert rss_per_request < RSS_BYTES_PER_REQUEST_BUDGET, report
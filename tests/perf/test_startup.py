@@ -0,0 +1,73 @@
+"""
+test_startup.py
+
+Startup-time benchmark guarding cold-start latency of the LLMOps service.
+
+Measures, in a fresh interpreter so module caches do not hide regressions:
+- Time to `import llmops.main` (must stay free of app construction and I/O).
+- Time to build the app with `create_app(settings)`, run its lifespan and serve
+  the first request.
+
+Budgets are deliberately generous so the guard only trips on real regressions
+(e.g. an eager heavy import or blocking work moved back to import time).
+Override them with LLMOPS_IMPORT_BUDGET_S / LLMOPS_FIRST_REQUEST_BUDGET_S.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+IMPORT_BUDGET_S = float(os.getenv("LLMOPS_IMPORT_BUDGET_S", "1.5"))
+FIRST_REQUEST_BUDGET_S = float(os.getenv("LLMOPS_FIRST_REQUEST_BUDGET_S", "3.0"))
+
+BENCH_SCRIPT = """
+import json, sys, time
+
+t0 = time.perf_counter()
+import llmops.main as main
+t1 = time.perf_counter()
+
+from fastapi.testclient import TestClient
+from llmops.config import Settings
+
+app = main.create_app(Settings(jwt_secret="bench-secret", db_path=sys.argv[1]))
+with TestClient(app) as client:
+    status = client.get("/").status_code
+t2 = time.perf_counter()
+
+print(json.dumps({
+    "import_s": t1 - t0,
+    "first_request_s": t2 - t1,
+    "status": status,
+    "app_built_on_import": "app" in vars(main),
+}))
+"""
+
+
+@pytest.mark.perf
+def test_startup_budget(tmp_path):
+    """
+    Benchmark import and first-request latency in a clean subprocess.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+
+    Asserts:
+        - Importing `llmops.main` does not build the app.
+        - Import time and first-request time stay within budget.
+        - The first request succeeds.
+    """
+    env = {k: v for k, v in os.environ.items() if k != "JWT_SECRET"}
+    out = subprocess.check_output(
+        [sys.executable, "-c", BENCH_SCRIPT, str(tmp_path / "startup.db")],
+        env=env,
+    )
+    result = json.loads(out.decode("utf-8").strip().splitlines()[-1])
+
+    assert result["status"] == 200
+    assert not result["app_built_on_import"]
+    assert result["import_s"] < IMPORT_BUDGET_S, result
+    assert result["first_request_s"] < FIRST_REQUEST_BUDGET_S, result
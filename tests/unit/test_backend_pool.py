@@ -0,0 +1,128 @@
+"""
+test_backend_pool.py
+
+Unit tests for the MCP backend pool.
+
+Verifies:
+- Least-outstanding balancing spreads concurrent requests across endpoints.
+- Failing backends are evicted and readmitted by successful health probes.
+- Reservations from many threads keep in-flight counts and half-open probe
+  slots consistent.
+"""
+
+import asyncio
+import sys
+import threading
+
+import httpx
+import pytest
+
+from llmops.mcp.backend_pool import BackendPool
+from llmops.mcp.circuit_breaker import OPEN
+from llmops.mcp.model_registry import register_model
+
+
+@pytest.mark.unit
+def test_least_outstanding_spreads_load():
+    """
+    Test that concurrent acquisitions land on distinct backends.
+
+    Asserts:
+        - Two overlapping requests use both registered endpoints.
+    """
+    register_model(
+        "pool-model", "1", endpoints=["http://gpu-a:11434", "http://gpu-b:11434"]
+    )
+    pool = BackendPool()
+
+    async def scenario():
+        async with pool.acquire("pool-model") as first:
+            async with pool.acquire("pool-model") as second:
+                return {first.url, second.url}
+
+    assert asyncio.run(scenario()) == {"http://gpu-a:11434", "http://gpu-b:11434"}
+
+
+@pytest.mark.unit
+def test_eviction_and_readmission():
+    """
+    Test passive eviction after failures and readmission after probes.
+
+    Asserts:
+        - A backend is evicted after `unhealthy_after` failed requests.
+        - Traffic avoids the evicted backend.
+        - It is readmitted after `healthy_after` successful probes.
+    """
+    register_model(
+        "flaky-model", "1", endpoints=["http://bad:11434", "http://good:11434"]
+    )
+    pool = BackendPool(unhealthy_after=2, healthy_after=2)
+    pool._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200))
+    )
+    bad = next(b for b in pool.backends("flaky-model") if "bad" in b.url)
+
+    async def fail_once():
+        with pytest.raises(RuntimeError):
+            async with pool.acquire("flaky-model", exclude=("http://good:11434",)):
+                raise RuntimeError("upstream down")
+
+    async def scenario():
+        await fail_once()
+        await fail_once()
+        assert not bad.healthy
+        assert pool.choose("flaky-model").url == "http://good:11434"
+
+        await pool.check_health()
+        await pool.check_health()
+        assert bad.healthy
+        await pool.aclose()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+def test_reserve_from_threads():
+    """
+    Test concurrent `reserve` calls, as made by threadpool route handlers.
+
+    Asserts:
+        - In-flight counts return to zero after many overlapping reservations.
+        - A half-open breaker admits no more than `half_open_max_calls` probes.
+    """
+    register_model("thread-model", "1", endpoints=["http://gpu-t:11434"])
+    pool = BackendPool(breaker_options={"open_seconds": 0, "half_open_max_calls": 1})
+    (backend,) = pool.backends("thread-model")
+    threads, rounds = 8, 2000
+    barrier = threading.Barrier(threads)
+    admitted = []
+
+    def reserve_many():
+        barrier.wait()
+        for _ in range(rounds):
+            with pool.reserve("thread-model"):
+                pass
+
+    def probe():
+        barrier.wait()
+        admitted.append(backend.breaker.allow())
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        workers = [threading.Thread(target=reserve_many) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert backend.in_flight == 0
+
+        backend.breaker._transition(OPEN)
+        workers = [threading.Thread(target=probe) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert admitted.count(True) == 1
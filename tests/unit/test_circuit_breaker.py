@@ -0,0 +1,201 @@
+"""
+test_circuit_breaker.py
+
+Unit tests for per-backend circuit breakers, hedged requests and model fallback.
+
+Verifies:
+- A breaker opens on failures, fails fast, and closes after a half-open probe.
+- Hedged requests return the faster backend and fail over on errors.
+- `call_llm` reserves the primary's backend, falls back while it is open or
+  unhealthy, and logs the fallback.
+- Failed health probes of a model without registered endpoints cause no fallback.
+"""
+
+import asyncio
+import time
+
+import httpx
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from llmops.config import Settings
+from llmops.database import get_usage_by_client
+from llmops.main import create_app
+from llmops.mcp.backend_pool import BackendPool, NoBackendAvailable
+from llmops.mcp.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from llmops.mcp.model_registry import register_model
+from llmops.routes.llm_proxy import route_model
+
+
+@pytest.mark.unit
+def test_breaker_opens_and_recovers():
+    """
+    Test the closed -> open -> half-open -> closed cycle.
+
+    Asserts:
+        - Slow calls count as failures and trip the breaker.
+        - An open breaker rejects calls until the cool-down elapses.
+        - A successful half-open probe closes the breaker.
+    """
+    breaker = CircuitBreaker(
+        "m", "http://b", min_calls=2, slow_call_seconds=1.0, open_seconds=0.05
+    )
+    breaker.record_failure()
+    breaker.record_success(latency=5.0)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success(latency=0.1)
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.unit
+def test_pool_fails_fast_when_circuits_open():
+    """
+    Test that backends with open circuits are skipped without waiting.
+
+    Asserts:
+        - Traffic moves to the remaining backend.
+        - With every circuit open, acquisition raises immediately.
+    """
+    register_model("cb-model", "1", endpoints=["http://cb-a:1", "http://cb-b:1"])
+    pool = BackendPool(breaker_options={"min_calls": 1, "open_seconds": 60})
+    a, b = pool.backends("cb-model")
+
+    a.breaker.record_failure()
+    assert pool.choose("cb-model") is b
+    assert pool.is_available("cb-model")
+
+    b.breaker.record_failure()
+    assert not pool.is_available("cb-model")
+    with pytest.raises(NoBackendAvailable):
+        pool.choose("cb-model")
+
+
+@pytest.mark.unit
+def test_hedged_request_and_failover():
+    """
+    Test hedging past the p95 and failover after an error.
+
+    Asserts:
+        - A stalled primary is hedged and the faster backend's answer wins.
+        - An erroring primary is retried on the other backend.
+    """
+    register_model("hedge-model", "1", endpoints=["http://slow:1", "http://fast:1"])
+    pool = BackendPool(hedge_min_samples=5)
+    slow = next(b for b in pool.backends("hedge-model") if "slow" in b.url)
+    slow.latencies.extend([0.01] * 10)
+    slow.in_flight = -1  # make the stalled backend the primary choice
+
+    async def send(backend):
+        if backend is slow:
+            await asyncio.sleep(5)
+        return backend.url
+
+    async def flaky(backend):
+        if backend is slow:
+            raise RuntimeError("boom")
+        return backend.url
+
+    async def scenario():
+        started = time.perf_counter()
+        assert await pool.request("hedge-model", send, hedge=True) == "http://fast:1"
+        assert time.perf_counter() - started < 1.0
+        assert await pool.request("hedge-model", flaky) == "http://fast:1"
+
+    asyncio.run(scenario())
+    assert slow.in_flight == -1
+
+
+@pytest.mark.unit
+def test_call_llm_falls_back_when_primary_open(tmp_path):
+    """
+    Test that `/llm` serves the registry fallback while the primary is down.
+
+    The primary's backend is not created by the test: it must come from the
+    route reserving it for the simulated call.
+
+    Asserts:
+        - A first request is served by the primary through its backend.
+        - With the backend's circuit open, the response comes from the
+          fallback model and the usage row records the requested model.
+        - An evicted (unhealthy) backend also triggers the fallback.
+    """
+    secret = "cb-secret"
+    app = create_app(
+        Settings(
+            jwt_secret=secret,
+            db_path=str(tmp_path / "usage.db"),
+            health_check_interval=0,
+        )
+    )
+    register_model("openai-gpt", "1", endpoints=["http://gpt:1"], fallback="llama3")
+    token = jwt.encode(
+        {"sub": "cb-user", "exp": int(time.time()) + 60}, secret, algorithm="HS256"
+    )
+    headers = {"Authorization": f"Bearer {token}", "x-user-id": "cb-user"}
+
+    with TestClient(app) as client:
+        pool = app.state.backend_pool
+        res = client.post("/llm", json={"prompt": "first"}, headers=headers)
+        assert res.json()["response"].startswith("[Openai-gpt]")
+        (status,) = pool.status()["openai-gpt"]
+        assert status["url"] == "http://gpt:1"
+        assert status["ewma_latency"] > 0
+
+        (backend,) = pool.backends("openai-gpt")
+        backend.breaker.open_seconds = 60
+        backend.breaker._transition(OPEN)
+        res = client.post("/llm", json={"prompt": "hello there"}, headers=headers)
+        assert res.status_code == 200
+        assert res.json()["response"].startswith("[Llama3]")
+
+        backend.breaker._transition(CLOSED)
+        backend.healthy = False
+        res = client.post("/llm", json={"prompt": "evicted"}, headers=headers)
+        assert res.json()["response"].startswith("[Llama3]")
+
+    rows = sorted(get_usage_by_client("cb-user"), key=lambda row: row["id"])
+    assert [(row["model"], row["fallback_from"]) for row in rows] == [
+        ("openai-gpt", None),
+        ("llama3", "openai-gpt"),
+        ("llama3", "openai-gpt"),
+    ]
+
+
+@pytest.mark.unit
+def test_no_fallback_for_unprobed_model_without_endpoints():
+    """
+    Test that a model without registered endpoints ignores health probes.
+
+    Its backend is the pool's `default_url`, which is probed like any other
+    but does not serve the (simulated) model.
+
+    Asserts:
+        - Failed probes evict the default backend.
+        - The model is still available and `route_model` takes no fallback.
+    """
+    pool = BackendPool(unhealthy_after=3)
+    pool._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(503))
+    )
+    (backend,) = pool.backends("unregistered-sim-model")
+
+    async def probe():
+        for _ in range(3):
+            await pool.check_health()
+        await pool.aclose()
+
+    asyncio.run(probe())
+
+    assert not backend.healthy
+    assert pool.is_available("unregistered-sim-model")
+    assert route_model(pool, "unregistered-sim-model") == (
+        "unregistered-sim-model",
+        None,
+    )
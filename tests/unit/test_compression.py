@@ -0,0 +1,127 @@
+"""
+test_compression.py
+
+Unit tests for the optimised response path (`llmops.responses`).
+
+Verifies:
+- `Accept-Encoding` negotiation honours client qualities and server preference.
+- Large JSON responses are compressed; small and streamed ones are not.
+- `/logs` and `/llm` return the same payloads through `FastJSONResponse`.
+"""
+
+import time
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from llmops.config import Settings
+from llmops.database import log_usage_batch
+from llmops.main import create_app
+from llmops.responses import FastJSONResponse, choose_encoding
+
+
+@pytest.mark.unit
+def test_choose_encoding_negotiates_quality():
+    """
+    Test content-coding negotiation.
+
+    Asserts:
+        - The server preference breaks ties; higher client quality wins.
+        - `q=0` and unlisted codings are never chosen; `*` matches any coding.
+    """
+    both = ("zstd", "gzip")
+    assert choose_encoding("gzip, deflate, br, zstd", both) == "zstd"
+    assert choose_encoding("zstd;q=0.5, gzip", both) == "gzip"
+    assert choose_encoding("gzip;q=0, zstd;q=0", both) is None
+    assert choose_encoding("br, deflate", both) is None
+    assert choose_encoding("*", ("gzip",)) == "gzip"
+    assert choose_encoding("", both) is None
+
+
+@pytest.mark.unit
+def test_fast_json_response_matches_json_encoding():
+    """
+    Test that the fast encoder produces the same document as the default one.
+
+    Asserts:
+        - Decoded bodies are equal, including non-ASCII text and None.
+    """
+    import json
+
+    content = {"rows": [{"user": "é", "latency": 0.25, "fallback_from": None}]}
+    assert json.loads(FastJSONResponse(content).body) == content
+
+
+@pytest.mark.unit
+def test_large_responses_are_compressed(tmp_path):
+    """
+    Test compression of `/logs`, `/metrics` and the `/llm/batch` stream.
+
+    Asserts:
+        - `/logs` above the threshold is gzip-encoded, advertises `Vary`, and
+          decodes to the logged rows.
+        - Clients not accepting gzip get the identity body.
+        - Small `/llm` responses and streamed batch results are not encoded.
+    """
+    secret = "compression-secret"
+    app = create_app(
+        Settings(
+            jwt_secret=secret,
+            db_path=str(tmp_path / "usage.db"),
+            health_check_interval=0,
+            mcp_reload_interval=0,
+            client_snapshot_interval=0,
+            compression_min_bytes=512,
+        )
+    )
+    token = jwt.encode(
+        {"sub": "gzip-user", "exp": int(time.time()) + 60}, secret, algorithm="HS256"
+    )
+    auth = {"Authorization": f"Bearer {token}"}
+
+    with TestClient(app) as client:
+        log_usage_batch(
+            {
+                "user": f"user-{i}",
+                "prompt": "compress me",
+                "model": "llama3",
+                "latency": 0.1,
+                "tokens": 2,
+            }
+            for i in range(50)
+        )
+        logs = client.get(
+            "/logs", params={"limit": 50}, headers={**auth, "Accept-Encoding": "gzip"}
+        )
+        identity = client.get(
+            "/logs",
+            params={"limit": 50},
+            headers={**auth, "Accept-Encoding": "identity"},
+        )
+        metrics = client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+        small = client.post(
+            "/llm",
+            json={"prompt": "hi"},
+            headers={**auth, "Accept-Encoding": "gzip"},
+        )
+        batch = client.post(
+            "/llm/batch",
+            json={"prompts": ["x " * 200] * 5},
+            headers={**auth, "Accept-Encoding": "gzip"},
+        )
+
+    assert logs.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in logs.headers["vary"]
+    assert int(logs.headers["content-length"]) < len(identity.content) / 3
+    assert logs.json() == identity.json()
+    assert [row["user"] for row in logs.json()] == [
+        f"user-{i}" for i in range(49, -1, -1)
+    ]
+    assert "content-encoding" not in identity.headers
+    assert metrics.headers["content-encoding"] == "gzip"
+    assert b"request_count" in metrics.content
+    assert small.json() == {"response": "[Openai-gpt] Answer to: hi"}
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in batch.headers
+    assert len(batch.text.splitlines()) == 5
@@ -0,0 +1,185 @@
+"""
+test_concurrency_limiter.py
+
+Unit tests for adaptive upstream concurrency limits.
+
+Verifies:
+- The gradient limit settles near the knee of a simulated latency curve, and
+  never shrinks for a model whose latency does not depend on concurrency.
+- AIMD grows additively while busy and backs off on failures and slow windows.
+- Calls over the limit are rejected, and `/llm/echo` answers 503 with Retry-After.
+"""
+
+import asyncio
+import heapq
+import random
+import statistics
+import time
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from llmops.config import Settings
+from llmops.main import create_app
+from llmops.mcp.concurrency_limiter import (
+    CONCURRENCY_REJECTED,
+    AdaptiveLimiter,
+    ConcurrencyLimitExceeded,
+)
+
+
+def _simulate(limiter, knee=16, base=1.0, clients=300, duration=1500.0):
+    """
+    Drives a limiter with closed-loop clients against a simulated model.
+
+    The model serves `knee` calls in parallel at `base` seconds; beyond that
+    calls share it and latency grows linearly. Rejected clients retry after
+    0.1s. Returns (throughput, mean limit, median latency) over the second half.
+    """
+    rng = random.Random(7)
+    events = [(rng.random() * 0.1, "try", None) for _ in range(clients)]
+    heapq.heapify(events)
+    now, completed, limits, latencies = 0.0, 0, [], []
+    while now < duration:
+        now, kind, data = heapq.heappop(events)
+        if kind == "try":
+            if limiter.in_flight >= int(limiter.limit):
+                heapq.heappush(events, (now + 0.1, "try", None))
+                continue
+            limiter.in_flight += 1
+            rtt = base * max(1.0, limiter.in_flight / knee) * rng.uniform(0.9, 1.1)
+            heapq.heappush(events, (now + rtt, "done", (rtt, limiter.in_flight)))
+            continue
+        rtt, in_flight = data
+        limiter.in_flight -= 1
+        limiter.on_sample(rtt, in_flight, now=now)
+        if now > duration / 2:
+            completed += 1
+            limits.append(limiter.limit)
+            latencies.append(rtt)
+        heapq.heappush(events, (now, "try", None))
+    return (
+        completed / (duration / 2),
+        statistics.mean(limits),
+        statistics.median(latencies),
+    )
+
+
+@pytest.mark.unit
+def test_gradient_limit_settles_near_the_knee():
+    """
+    Test the gradient limit against saturating demand (300 clients, knee 16).
+
+    Asserts:
+        - Throughput stays within 10% of the model's capacity.
+        - The limit settles close to the knee instead of admitting every client,
+          keeping median latency under twice the no-load latency.
+    """
+    limiter = AdaptiveLimiter("sim-gradient", "gradient", initial_limit=20)
+    throughput, limit, latency = _simulate(limiter)
+
+    assert throughput >= 0.9 * 16
+    assert 16 <= limit <= 40
+    assert latency < 2.0
+
+
+@pytest.mark.unit
+def test_gradient_limit_never_throttles_flat_latency():
+    """
+    Test the gradient limit against a model without a knee (60 clients).
+
+    Asserts:
+        - The limit never decreases, so no re-measurement rejects calls.
+        - Every client is admitted: throughput matches the demand.
+    """
+    limiter = AdaptiveLimiter("sim-flat", "gradient", initial_limit=20)
+    limits = []
+    on_sample = limiter.on_sample
+
+    def record(*args, **kwargs):
+        on_sample(*args, **kwargs)
+        limits.append(limiter.limit)
+
+    limiter.on_sample = record
+    throughput, limit, _ = _simulate(limiter, knee=10**6, clients=60)
+
+    assert all(later >= earlier for earlier, later in zip(limits, limits[1:]))
+    assert limit >= 60
+    assert throughput >= 0.95 * 60
+
+
+@pytest.mark.unit
+def test_aimd_increases_while_busy_and_backs_off():
+    """
+    Test AIMD decisions on single-call windows.
+
+    Asserts:
+        - A fast window with the limit in use adds one.
+        - An idle window leaves the limit unchanged.
+        - A failure or a slow window multiplies it by the backoff ratio.
+    """
+    limiter = AdaptiveLimiter(
+        "sim-aimd", "aimd", initial_limit=10, latency_threshold=1.0, window_size=1
+    )
+    limiter.on_sample(0.5, in_flight=8, now=1.0)
+    assert limiter.limit == 11
+    limiter.on_sample(0.5, in_flight=2, now=2.0)
+    assert limiter.limit == 11
+    limiter.on_sample(0.5, in_flight=8, dropped=True, now=3.0)
+    assert limiter.limit == pytest.approx(9.9)
+    limiter.on_sample(2.0, in_flight=8, now=5.0)
+    assert limiter.limit == pytest.approx(8.91)
+
+
+@pytest.mark.unit
+def test_calls_over_the_limit_are_rejected(tmp_path):
+    """
+    Test admission through the limiter and the `/llm/echo` response.
+
+    Asserts:
+        - Calls beyond the limit raise and are counted as rejections.
+        - A finished call frees its slot.
+        - `/llm/echo` answers 503 with `Retry-After` while the model is at its limit.
+    """
+    limiter = AdaptiveLimiter("sim-reject", initial_limit=1)
+
+    async def scenario():
+        async with limiter.acquire():
+            with pytest.raises(ConcurrencyLimitExceeded):
+                async with limiter.acquire():
+                    pass
+        async with limiter.acquire():
+            return limiter.in_flight
+
+    before = CONCURRENCY_REJECTED.labels(model="sim-reject")._value.get()
+    assert asyncio.run(scenario()) == 1
+    assert limiter.in_flight == 0
+    assert CONCURRENCY_REJECTED.labels(model="sim-reject")._value.get() == before + 1
+
+    secret = "limit-secret"
+    app = create_app(
+        Settings(
+            jwt_secret=secret,
+            db_path=str(tmp_path / "usage.db"),
+            ollama_model="limited-model",
+            health_check_interval=0,
+            mcp_reload_interval=0,
+            client_snapshot_interval=0,
+        )
+    )
+    token = jwt.encode(
+        {"sub": "limit-user", "exp": int(time.time()) + 60}, secret, algorithm="HS256"
+    )
+    with TestClient(app) as client:
+        busy = app.state.upstream_limiters.get("limited-model")
+        busy.limit, busy.in_flight = 1.0, 1
+        res = client.post(
+            "/llm/echo",
+            json={"prompt": "hello"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == "1"
+    assert "Concurrency limit 1 reached" in res.json()["detail"]
@@ -0,0 +1,55 @@
+"""
+test_config.py
+
+Unit tests for the typed settings object and the application factory.
+
+Verifies:
+- Settings are parsed from an explicit environment mapping.
+- Missing JWT_SECRET is reported at app startup, not at import time.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from llmops.config import Settings
+from llmops.main import create_app
+
+
+@pytest.mark.unit
+def test_settings_from_env():
+    """
+    Test that Settings.from_env parses typed values and applies defaults.
+
+    Asserts:
+        - Integer and boolean values are converted.
+        - Unset values fall back to the dataclass defaults.
+    """
+    settings = Settings.from_env(
+        {
+            "JWT_SECRET": "s3cret",
+            "LLMOPS_BATCH_CONCURRENCY": "3",
+            "LLMOPS_ENABLE_INGEST": "false",
+        }
+    )
+    assert settings.jwt_secret == "s3cret"
+    assert settings.batch_concurrency == 3
+    assert settings.enable_ingest is False
+    assert settings.db_path == "data/usage.db"
+
+
+@pytest.mark.unit
+def test_missing_secret_fails_at_startup(tmp_path):
+    """
+    Test that create_app succeeds without a secret but startup fails.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+
+    Asserts:
+        - Building the app does not raise.
+        - Running the lifespan raises RuntimeError.
+    """
+    app = create_app(Settings(db_path=str(tmp_path / "usage.db")))
+    with pytest.raises(RuntimeError):
+        with TestClient(app):
+            pass
@@ -7,13 +7,14 @@ Verifies the ability to:
 - Override database path using a temporary file
 - Log a simulated LLM usage entry
 - Fetch and assert the correct log content
+- Apply `init_db` overrides without writing them to the environment
 """
 
 import os
 
 import pytest
 
-from llmops.database import get_db_path, get_recent_logs, log_usage
+from llmops.database import get_db_path, get_recent_logs, init_db, log_usage
 
 
 @pytest.mark.unit
@@ -45,3 +46,58 @@ def test_log_and_fetch(tmp_path):
 
     # Assert at least one log entry contains the expected model
     assert any(log["model"] == "gpt-test" for log in logs)
+
+
+@pytest.mark.unit
+def test_legacy_schema_is_migrated(tmp_path):
+    """
+    Test that a database created before `fallback_from` existed gains the column.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+    """
+    import sqlite3
+
+    test_db = tmp_path / "legacy.db"
+    conn = sqlite3.connect(test_db)
+    conn.execute(
+        "CREATE TABLE usage_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "timestamp TEXT, user TEXT, prompt TEXT, model TEXT, latency REAL, "
+        "tokens INTEGER)"
+    )
+    conn.commit()
+    conn.close()
+    os.environ["LLMOPS_DB_PATH"] = str(test_db)
+    get_db_path.cache_clear()
+
+    log_usage("legacy_user", "hi", "gpt-b", 0.1, 1, fallback_from="gpt-a")
+
+    assert get_recent_logs(1)[0]["fallback_from"] == "gpt-a"
+
+
+@pytest.mark.unit
+def test_init_db_leaves_environment_untouched(tmp_path, monkeypatch):
+    """
+    Test that `init_db` keeps its overrides in module state, not `os.environ`.
+
+    Asserts:
+        - `get_db_path()` returns the path passed to `init_db`
+        - `LLMOPS_DB_PATH` keeps its previous value
+        - `cache_clear()` falls back to the environment again
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+        monkeypatch (MonkeyPatch): pytest fixture restoring the environment.
+    """
+    env_db = str(tmp_path / "env.db")
+    override_db = str(tmp_path / "override.db")
+    monkeypatch.setenv("LLMOPS_DB_PATH", env_db)
+    get_db_path.cache_clear()
+
+    init_db(db_path=override_db)
+
+    assert get_db_path() == override_db
+    assert os.environ["LLMOPS_DB_PATH"] == env_db
+
+    get_db_path.cache_clear()
+    assert get_db_path() == env_db
@@ -0,0 +1,188 @@
+"""
+test_fingerprints.py
+
+Unit tests for the MinHash prompt fingerprints behind `/mcp/stats/duplication`.
+
+Verifies:
+- The numpy and pure Python paths compute identical signatures.
+- Exact, normalised and near-duplicate prompts are counted and clustered.
+- The index stays bounded by its window, and logged prompts feed the API.
+- Clusters survive their slots being recycled and drop departed keys.
+"""
+
+import json
+import time
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from llmops import fingerprints
+from llmops.config import Settings
+from llmops.fingerprints import PromptFingerprinter, minhash
+from llmops.main import create_app
+
+PROMPTS = [
+    "",
+    "hi",
+    "Summarise the attached incident report for the on-call team.",
+    "Ünïcödé  prompt\twith   irregular whitespace",
+    "x" * 5000,
+]
+
+
+@pytest.mark.unit
+def test_numpy_and_python_signatures_match(monkeypatch):
+    """
+    Test that both MinHash implementations agree.
+
+    Asserts:
+        - Signatures are equal for short, empty, non-ASCII and long prompts.
+        - Batches split into several vectorised steps give the same result.
+    """
+    pytest.importorskip("numpy")
+    vectorised = minhash(PROMPTS)
+    monkeypatch.setattr(fingerprints, "MAX_BATCH_SHINGLES", 16)
+    chunked = minhash(PROMPTS)
+    monkeypatch.setattr(fingerprints, "np", None)
+    pure = minhash(PROMPTS)
+
+    assert vectorised == pure == chunked
+    assert all(len(signature) == 4 * fingerprints.NUM_PERM for signature in pure)
+
+
+@pytest.mark.unit
+def test_duplicates_are_counted_and_clustered():
+    """
+    Test exact, normalised and near-duplicate detection.
+
+    Asserts:
+        - A verbatim repeat hits all three kinds, a case/whitespace variant
+          only the normalised and near kinds, and a one-word edit only near.
+        - Repeats of another model are not exact or normalised hits.
+        - The variants form one cluster attributed to their users.
+    """
+    base = (
+        "Write a short summary of the quarterly revenue report for the finance "
+        "team, highlighting regional growth and the main cost drivers."
+    )
+    index = PromptFingerprinter(window=100)
+    index.add(base, "alice", "m1")
+    index.add(base, "bob", "m1")
+    index.add("  " + base.upper(), "bob", "m1")
+    index.add(base.replace("short", "brief"), "carol", "m1")
+    index.add(base, "dave", "m2")
+    index.add("Translate 'good morning' into French.", "erin", "m1")
+
+    report = index.report()
+    overall = report["overall"]
+    assert overall["requests"] == 6
+    assert overall["exact_hit_rate"] == pytest.approx(1 / 6)
+    assert overall["normalised_hit_rate"] == pytest.approx(2 / 6)
+    assert overall["near_duplicate_ratio"] == pytest.approx(4 / 6)
+    by_user = {row["key"]: row for row in report["by_user"]}
+    assert by_user["alice"]["near_duplicate_ratio"] == 0
+    assert by_user["bob"]["normalised_hit_rate"] == 1
+    assert report["clusters"][0]["size"] == 5
+    assert report["clusters"][0]["users"]["bob"] == 2
+    assert report["clusters"][0]["models"] == {"m1": 4, "m2": 1}
+    assert len(report["clusters"]) == 1
+
+
+@pytest.mark.unit
+def test_window_bounds_the_index():
+    """
+    Test eviction of prompts older than the window.
+
+    Asserts:
+        - At most `window` prompts, buckets and cache keys are held.
+        - A repeat of an evicted prompt is no longer a duplicate.
+    """
+    index = PromptFingerprinter(window=3)
+    prompts = [f"prompt number {i} about topic {i * 7919}" for i in range(10)]
+    for prompt in prompts:
+        index.add(prompt, "u", "m")
+    index.add(prompts[0], "u", "m")
+
+    report = index.report()
+    assert report["window"] == {"prompts": 3, "capacity": 3}
+    assert sum(index._exact.values()) == 3
+    assert all(
+        len(members) <= 3 for buckets in index._buckets for members in buckets.values()
+    )
+    assert sum(c["size"] for c in index._clusters.values()) == 3
+    assert report["overall"]["exact_hit_rate"] == 0
+
+
+@pytest.mark.unit
+def test_repeated_prompt_stays_in_one_cluster():
+    """
+    Test that a prompt repeated past the window keeps its cluster.
+
+    Asserts:
+        - Overwriting the most similar slot does not start a new cluster.
+        - Users and models that left the window leave the cluster's counters.
+    """
+    index = PromptFingerprinter(window=2)
+    index.add("Summarise the incident report", "user-0", "model-0")
+    for i in range(1, 10):
+        index.add("Summarise the incident report", f"user-{i}", f"model-{i % 3}")
+        (cluster,) = index._clusters.values()
+        assert cluster["size"] == 2
+        assert dict(cluster["users"]) == {f"user-{i - 1}": 1, f"user-{i}": 1}
+        assert sum(cluster["models"].values()) == len(cluster["models"]) == 2
+
+
+@pytest.mark.unit
+def test_duplication_endpoint_reports_logged_prompts(tmp_path):
+    """
+    Test `/mcp/stats/duplication` on prompts written through `/ingest`.
+
+    Asserts:
+        - Ingested prompts are fingerprinted through the write listener.
+        - The route returns 404 when fingerprinting is disabled.
+    """
+    secret = "fingerprint-secret"
+    token = jwt.encode(
+        {"sub": "f-user", "exp": int(time.time()) + 60}, secret, algorithm="HS256"
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    events = [
+        {
+            "user": f"svc-{i % 2}",
+            "model": "f-model",
+            "prompt": "Reset my password",
+            "latency": 0.1,
+            "tokens": 1,
+        }
+        for i in range(4)
+    ]
+
+    def build(window):
+        return create_app(
+            Settings(
+                jwt_secret=secret,
+                db_path=str(tmp_path / f"usage{window}.db"),
+                health_check_interval=0,
+                mcp_reload_interval=0,
+                client_snapshot_interval=0,
+                fingerprint_window=window,
+            )
+        )
+
+    with TestClient(build(100)) as client:
+        client.post(
+            "/ingest",
+            content="\n".join(json.dumps(event) for event in events),
+            headers=headers,
+        )
+        res = client.get("/mcp/stats/duplication", headers=headers)
+    with TestClient(build(0)) as client:
+        disabled = client.get("/mcp/stats/duplication", headers=headers)
+
+    assert res.status_code == 200
+    body = res.json()
+    assert body["overall"]["requests"] == 4
+    assert body["overall"]["exact_hit_rate"] == 0.75
+    assert body["clusters"][0]["users"] == {"svc-0": 2, "svc-1": 2}
+    assert disabled.status_code == 404
@@ -0,0 +1,200 @@
+"""
+test_generation_metrics.py
+
+Unit tests for the generation timings reported by Ollama.
+
+Verifies:
+- Ollama's nanosecond durations and token counts are converted per column.
+- `/llm/echo` stores the timings with the usage row and observes the
+  throughput and model load histograms.
+- Logs created before the timing columns existed keep working: SQLite tables
+  are migrated and earlier segment log records read back without timings.
+"""
+
+import sqlite3
+import struct
+import time
+import zlib
+
+import httpx
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from llmops import database
+from llmops.config import Settings
+from llmops.main import create_app
+from llmops.metrics import (
+    GENERATION_TOKENS_PER_SECOND,
+    MODEL_LOAD_SECONDS,
+    PROMPT_TOKENS_PER_SECOND,
+)
+from llmops.routes.llm_echo import parse_ollama_timings
+from llmops.storage.segment_log import (
+    BODY_V1,
+    HEADER,
+    HEADER_SIZE,
+    MAGIC_V1,
+    RECORD,
+    RECORD_V1,
+    SegmentLogStore,
+)
+from llmops.storage.sqlite_store import SQLiteUsageStore
+
+# Timing fields of an Ollama `/api/generate` response (durations in ns)
+OLLAMA_TIMINGS = {
+    "total_duration": 5_000_000_000,
+    "load_duration": 3_000_000_000,
+    "prompt_eval_count": 26,
+    "prompt_eval_duration": 130_000_000,
+    "eval_count": 100,
+    "eval_duration": 1_250_000_000,
+}
+
+
+def _observed(histogram, model):
+    """Returns (count, sum) of a labelled histogram."""
+    samples = {
+        sample.name: sample.value
+        for metric in histogram.collect()
+        for sample in metric.samples
+        if sample.labels.get("model") == model
+    }
+    name = histogram._name
+    return samples.get(f"{name}_count", 0), samples.get(f"{name}_sum", 0)
+
+
+@pytest.mark.unit
+def test_parse_ollama_timings():
+    """
+    Test conversion of Ollama's timing fields.
+
+    Asserts:
+        - Durations become seconds and counts are kept.
+        - Missing or non-numeric fields are None.
+    """
+    timings = parse_ollama_timings({"response": "hi", **OLLAMA_TIMINGS})
+    assert timings == {
+        "prompt_eval_count": 26,
+        "prompt_eval_seconds": 0.13,
+        "eval_count": 100,
+        "eval_seconds": 1.25,
+        "load_seconds": 3.0,
+        "total_seconds": 5.0,
+    }
+
+    partial = parse_ollama_timings({"eval_count": 7, "load_duration": "slow"})
+    assert partial["eval_count"] == 7
+    assert partial["load_seconds"] is None
+    assert partial["total_seconds"] is None
+
+
+@pytest.mark.unit
+def test_echo_records_generation_timings(tmp_path):
+    """
+    Test `/llm/echo` against a fake Ollama reporting timings.
+
+    Asserts:
+        - The usage row carries the converted timings.
+        - Generation (80 tok/s) and prompt (200 tok/s) throughput and the load
+          time are observed for the serving model.
+    """
+    secret = "timing-secret"
+    app = create_app(
+        Settings(
+            jwt_secret=secret,
+            db_path=str(tmp_path / "usage.db"),
+            ollama_model="timed-model",
+            health_check_interval=0,
+            mcp_reload_interval=0,
+            client_snapshot_interval=0,
+        )
+    )
+    token = jwt.encode(
+        {"sub": "timing-user", "exp": int(time.time()) + 60}, secret, algorithm="HS256"
+    )
+
+    def ollama(request):
+        return httpx.Response(200, json={"response": "ok", **OLLAMA_TIMINGS})
+
+    with TestClient(app) as client:
+        app.state.backend_pool._client = httpx.AsyncClient(
+            transport=httpx.MockTransport(ollama)
+        )
+        res = client.post(
+            "/llm/echo",
+            json={"prompt": "how fast"},
+            headers={"Authorization": f"Bearer {token}", "x-user-id": "timing-user"},
+        )
+
+    assert res.status_code == 200
+    (row,) = database.get_usage_by_client("timing-user")
+    assert row["eval_count"] == 100
+    assert row["eval_seconds"] == 1.25
+    assert row["load_seconds"] == 3.0
+    assert row["total_seconds"] == 5.0
+    assert _observed(GENERATION_TOKENS_PER_SECOND, "timed-model") == (1, 80.0)
+    assert _observed(PROMPT_TOKENS_PER_SECOND, "timed-model") == (1, 200.0)
+    assert _observed(MODEL_LOAD_SECONDS, "timed-model") == (1, 3.0)
+
+
+@pytest.mark.unit
+def test_logs_without_timing_columns_stay_readable(tmp_path):
+    """
+    Test SQLite databases and segment logs written before timings existed.
+
+    Asserts:
+        - A legacy `usage_logs` table gains the timing columns; old rows read
+          back with None and new rows keep their timings.
+        - A `MAGIC_V1` segment is read back without timings, and appends go to
+          a new segment of the current layout with consecutive ids.
+    """
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE usage_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, user TEXT,
+            prompt TEXT, model TEXT, latency REAL, tokens INTEGER
+        )
+        """
+    )
+    conn.execute(
+        "INSERT INTO usage_logs (timestamp, user, prompt, model, latency, tokens) "
+        "VALUES ('2025-01-01T00:00:00+00:00', 'old', 'p', 'llama3', 0.5, 1)"
+    )
+    conn.commit()
+    conn.close()
+    store = SQLiteUsageStore(path)
+    timed = ("2025-01-01T00:01:00+00:00", "new", "p", "llama3", 0.5, 1, None)
+    store.append([timed + (4, 0.1, 9, 0.3, 0.0, 0.5, None, None, None)])
+    old, new = store.scan()
+    assert old["fallback_from"] is None and old["eval_count"] is None
+    assert new["eval_count"] == 9 and new["total_seconds"] == 0.5
+
+    directory = tmp_path / "segments"
+    directory.mkdir()
+    (directory / "strings.dict").write_bytes(
+        b"".join(struct.pack("<II", len(s), zlib.crc32(s)) + s for s in (b"u", b"m"))
+    )
+    (directory / "segment-00000000000000000001.blob").write_bytes(b"old prompt")
+    body = BODY_V1.pack(1, 1735689600.0, 1, 2, 0, 0.5, 3, 0, 10)
+    with open(directory / "segment-00000000000000000001.log", "wb") as segment:
+        segment.truncate(HEADER_SIZE + 4 * RECORD_V1.size)
+        segment.write(HEADER.pack(MAGIC_V1, RECORD_V1.size, 1))
+        segment.seek(HEADER_SIZE)
+        segment.write(body + struct.pack("<I4x", zlib.crc32(body)))
+
+    log = SegmentLogStore(str(directory))
+    try:
+        assert log.append([timed + (4, 0.1, 9, 0.3, 0.0, 0.5, None, None, None)]) == 2
+        old, new = log.scan()
+        assert (old["user"], old["prompt"], old["eval_seconds"]) == (
+            "u",
+            "old prompt",
+            None,
+        )
+        assert new["eval_count"] == 9 and new["load_seconds"] == 0.0
+        assert log._segments[-1].record is RECORD
+    finally:
+        log.close()
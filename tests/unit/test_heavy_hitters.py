@@ -0,0 +1,92 @@
+"""
+test_heavy_hitters.py
+
+Unit tests for top-K user labelling of request metrics.
+
+Verifies:
+- Heavy users are found in a skewed stream with bounded memory.
+- The long tail is labelled "other" and label cardinality stays at K.
+- Decay lets users whose traffic stopped leave the top-K, and their request
+  metric series are removed.
+"""
+
+import random
+
+import pytest
+
+from llmops.heavy_hitters import OTHER, UserLabeler
+from llmops.main import (
+    REQUEST_COUNT,
+    REQUEST_LATENCY,
+    record_request,
+    remove_user_series,
+)
+
+
+@pytest.mark.unit
+def test_top_users_labelled_tail_grouped():
+    """
+    Test labelling on a stream of 5 heavy users and 5000 one-off users.
+
+    Asserts:
+        - The summary never monitors more than `capacity` users.
+        - Exactly the heavy users receive their own label.
+        - One-off users are reported as "other".
+    """
+    rng = random.Random(7)
+    heavy = [f"heavy-{i}" for i in range(5)]
+    stream = heavy * 400 + [f"tail-{i}" for i in range(5000)]
+    rng.shuffle(stream)
+
+    labeler = UserLabeler(k=5, capacity=50, refresh_every=100)
+    labels = {labeler.label(user) for user in stream}
+
+    assert len(labeler._counts) <= 50
+    assert labels - {OTHER} == set(heavy)
+    assert {user for user, _ in labeler.top()} == set(heavy)
+    assert labeler.label("tail-new") == OTHER
+
+
+@pytest.mark.unit
+def test_decay_rotates_top_users():
+    """
+    Test that a user who stops sending requests is eventually replaced.
+
+    Asserts:
+        - A formerly heavy user loses its label to the new heavy user.
+        - The user is reported to `on_unlabel`, whose series removal leaves
+          the other users' series in place.
+    """
+    for user in ("old-heavy", "new-heavy"):
+        record_request("/llm", "POST", user, 0.1)
+        record_request("/llm", "GET", user, 0.1)
+    unlabelled = []
+
+    def on_unlabel(users):
+        unlabelled.extend(users)
+        remove_user_series(users)
+
+    labeler = UserLabeler(
+        k=1,
+        capacity=4,
+        min_count=5,
+        refresh_every=50,
+        decay_every=100,
+        on_unlabel=on_unlabel,
+    )
+    for _ in range(200):
+        labeler.label("old-heavy")
+    assert labeler.label("old-heavy") == "old-heavy"
+
+    for _ in range(2000):
+        labeler.label("new-heavy")
+    assert labeler.label("new-heavy") == "new-heavy"
+    assert labeler.label("old-heavy") == OTHER
+    assert unlabelled == ["old-heavy"]
+    series = {
+        sample.labels["user"]
+        for metric in (REQUEST_COUNT, REQUEST_LATENCY)
+        for sample in metric.collect()[0].samples
+    }
+    assert "old-heavy" not in series
+    assert "new-heavy" in series
@@ -0,0 +1,125 @@
+"""
+test_ingest.py
+
+Unit test for the `/ingest` route in `ingest.py`.
+
+Verifies:
+- A gzip-compressed NDJSON body is decoded and its valid events persisted.
+- Invalid lines are rejected and reported without failing the upload.
+- Concatenated gzip members are all read, truncated bodies are rejected, and
+  failures after committed batches report how many events were stored.
+"""
+
+import gzip
+import json
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from llmops.config import Settings, get_request_settings
+from llmops.database import get_db_path, get_usage_by_model
+from llmops.routes.ingest import MAX_LINE_BYTES, router
+
+
+def _events(model: str, count: int) -> bytes:
+    """Returns `count` valid NDJSON events for `model`."""
+    return b"".join(
+        json.dumps({"user": "svc", "model": model, "latency": 0.1, "tokens": i}).encode(
+            "utf-8"
+        )
+        + b"\n"
+        for i in range(count)
+    )
+
+
+@pytest.mark.unit
+def test_ingest_gzip_ndjson(tmp_path):
+    """
+    Test that gzip'd NDJSON usage events are ingested.
+
+    Sends 1000 valid events plus one malformed line and one event with a
+    negative token count, then checks the reported counts and stored rows.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+    """
+    os.environ["LLMOPS_DB_PATH"] = str(tmp_path / "ingest_usage.db")
+    get_db_path.cache_clear()
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    events = [
+        {"user": f"svc-{i % 7}", "model": "ingest-model", "latency": 0.5, "tokens": i}
+        for i in range(1000)
+    ]
+    lines = [json.dumps(event) for event in events]
+    lines += ["{not json", json.dumps({**events[0], "tokens": -1})]
+    body = gzip.compress("\n".join(lines).encode("utf-8"))
+
+    res = client.post(
+        "/ingest",
+        content=body,
+        headers={"Content-Encoding": "gzip", "Content-Type": "application/x-ndjson"},
+    )
+
+    assert res.status_code == 200
+    result = res.json()
+    assert result["accepted"] == 1000
+    assert result["rejected"] == 2
+    assert [error["line"] for error in result["errors"]] == [1001, 1002]
+    assert len(get_usage_by_model("ingest-model")) == 1000
+
+
+@pytest.mark.unit
+def test_ingest_rejects_incomplete_uploads(tmp_path):
+    """
+    Test compressed bodies that end early or contain several members.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+
+    Asserts:
+        - Every member of a concatenated gzip body is ingested.
+        - JSON nested too deeply is a rejected line, not a server error.
+        - A truncated gzip body fails with 400 and stores nothing.
+        - An oversized line after a committed batch fails with 413 whose
+          detail reports the committed events.
+    """
+    os.environ["LLMOPS_DB_PATH"] = str(tmp_path / "ingest_usage.db")
+    get_db_path.cache_clear()
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_request_settings] = lambda: Settings(
+        ingest_batch_size=4
+    )
+    client = TestClient(app)
+    gzipped = {"Content-Encoding": "gzip"}
+
+    body = gzip.compress(_events("members", 5)) + gzip.compress(
+        _events("members", 5) + b"[" * 200000 + b"\n"
+    )
+    res = client.post("/ingest", content=body, headers=gzipped)
+    assert res.status_code == 200
+    assert res.json()["accepted"] == 10
+    assert res.json()["errors"] == [{"line": 11, "error": "JSON nested too deeply"}]
+    assert len(get_usage_by_model("members")) == 10
+
+    body = gzip.compress(_events("truncated", 3))
+    res = client.post("/ingest", content=body[:-6], headers=gzipped)
+    assert res.status_code == 400
+    assert res.json()["detail"] == {
+        "error": "Truncated compressed body",
+        "accepted": 0,
+    }
+    assert get_usage_by_model("truncated") == []
+
+    body = _events("oversized", 6) + b"x" * (MAX_LINE_BYTES + 1)
+    res = client.post("/ingest", content=body)
+    assert res.status_code == 413
+    assert res.json()["detail"]["accepted"] == 4
+    assert len(get_usage_by_model("oversized")) == 4
@@ -0,0 +1,187 @@
+"""
+test_live_events.py
+
+Unit tests for the live usage event broadcaster behind `/logs/stream`.
+
+Verifies:
+- Database writes from worker threads reach filtered subscribers.
+- Slow subscribers keep a bounded buffer and are told how many events dropped.
+- Resuming from an event id replays the retained newer events as SSE, gaps
+  are counted in publication order whatever the row ids, and ids of another
+  broadcaster replay nothing.
+- A `/logs/stream` response whose body never starts leaves no subscriber.
+"""
+
+import asyncio
+import os
+import threading
+
+import pytest
+
+from llmops.database import (
+    add_write_listener,
+    get_db_path,
+    log_usage,
+    log_usage_batch,
+    remove_write_listener,
+)
+from llmops.events import UsageBroadcaster, sse_stream
+from llmops.routes.log_stream import stream_logs
+
+
+def _event(event_id, user="u", model="m"):
+    """Builds a minimal usage event."""
+    return {"id": event_id, "user": user, "model": model}
+
+
+@pytest.mark.unit
+def test_writes_fan_out_to_filtered_subscribers(tmp_path):
+    """
+    Test that committed rows are published with their ids to matching subscribers.
+
+    Asserts:
+        - Writes on another thread wake the subscriber's event loop.
+        - The model filter excludes other models.
+        - Batch writes publish consecutive row ids.
+    """
+    os.environ["LLMOPS_DB_PATH"] = str(tmp_path / "live.db")
+    get_db_path.cache_clear()
+    broadcaster = UsageBroadcaster()
+    add_write_listener(broadcaster.publish)
+
+    def write():
+        log_usage("alice", "hi", "gpt-live", 0.1, 1)
+        log_usage("alice", "hi", "other-model", 0.1, 1)
+        log_usage_batch(
+            [
+                {
+                    "user": "bob",
+                    "prompt": "",
+                    "model": "gpt-live",
+                    "latency": 0.2,
+                    "tokens": 2,
+                },
+                {
+                    "user": "bob",
+                    "prompt": "",
+                    "model": "gpt-live",
+                    "latency": 0.3,
+                    "tokens": 3,
+                },
+            ]
+        )
+
+    async def scenario():
+        sub = broadcaster.subscribe(model="gpt-live")
+        writer = threading.Thread(target=write)
+        writer.start()
+        received = []
+        while len(received) < 3:
+            events, _ = await sub.next_batch(timeout=2.0)
+            assert events or writer.is_alive()
+            received.extend(event for _, event in events)
+        writer.join()
+        broadcaster.unsubscribe(sub)
+        return received
+
+    try:
+        received = asyncio.run(scenario())
+    finally:
+        remove_write_listener(broadcaster.publish)
+
+    assert [e["user"] for e in received] == ["alice", "bob", "bob"]
+    assert received[2]["id"] == received[1]["id"] + 1
+    assert "prompt" not in received[0]
+    assert broadcaster.subscriber_count == 0
+
+
+@pytest.mark.unit
+def test_slow_subscriber_drops_oldest():
+    """
+    Test the bounded per-subscriber buffer.
+
+    Asserts:
+        - Only the newest `buffer_size` events are kept.
+        - The number of discarded events is reported once.
+    """
+    broadcaster = UsageBroadcaster(buffer_size=3)
+
+    async def scenario():
+        sub = broadcaster.subscribe()
+        broadcaster.publish([_event(i) for i in range(1, 11)])
+        first = await sub.next_batch(timeout=1.0)
+        second = await sub.next_batch(timeout=0.01)
+        return first, second
+
+    (events, dropped), (later, later_dropped) = asyncio.run(scenario())
+    assert [e["id"] for _, e in events] == [8, 9, 10]
+    assert dropped == 7
+    assert later == [] and later_dropped == 0
+
+
+@pytest.mark.unit
+def test_resume_replays_as_sse():
+    """
+    Test resuming a stream from the last seen event id.
+
+    Asserts:
+        - Retained events after `last_id` are replayed with SSE ids.
+        - A gap older than the replay ring is announced as dropped.
+        - Row ids written out of order by other writers neither skip events
+          nor count as a gap.
+        - An id sent by another broadcaster replays nothing.
+    """
+    broadcaster = UsageBroadcaster(replay_size=3)
+    # Row ids of several writers, not consecutive in publication order
+    broadcaster.publish([_event(i) for i in (40, 12, 41, 7, 13)])
+
+    async def scenario(last_id):
+        stream = sse_stream(broadcaster, last_id=last_id, keepalive=0.01)
+        chunks = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return chunks
+
+    dropped_chunk, usage_chunk = asyncio.run(scenario(broadcaster.event_id(1)))
+    assert dropped_chunk == 'event: dropped\ndata: {"dropped": 1}\n\n'
+    assert usage_chunk.count("event: usage") == 3
+    assert usage_chunk.startswith(f"id: {broadcaster.event_id(3)}\n")
+    assert '"id": 41' in usage_chunk and '"id": 13' in usage_chunk
+
+    usage_chunk, _ = asyncio.run(scenario(broadcaster.event_id(3)))
+    assert usage_chunk.count("event: usage") == 2
+    assert '"id": 7' in usage_chunk
+
+    other = UsageBroadcaster().event_id(2)
+    assert asyncio.run(scenario(other)) == [": keepalive\n\n"] * 2
+    assert broadcaster.subscriber_count == 0
+
+
+@pytest.mark.unit
+def test_unstarted_stream_leaves_no_subscriber():
+    """
+    Test a client disconnecting before the stream body starts.
+
+    Asserts:
+        - Building the response subscribes nothing.
+        - The subscription exists only while the body is iterated.
+    """
+    broadcaster = UsageBroadcaster()
+
+    async def scenario():
+        response = await stream_logs(
+            user=None,
+            model=None,
+            last_id=None,
+            last_event_id=None,
+            broadcaster=broadcaster,
+        )
+        assert broadcaster.subscriber_count == 0
+        first = asyncio.ensure_future(response.body_iterator.__anext__())
+        await asyncio.sleep(0)
+        assert broadcaster.subscriber_count == 1
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await response.body_iterator.aclose()
+
+    asyncio.run(scenario())
+    assert broadcaster.subscriber_count == 0
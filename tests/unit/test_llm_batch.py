@@ -0,0 +1,60 @@
+"""
+test_llm_batch.py
+
+Unit test for the `/llm/batch` route in `llm_proxy.py`.
+
+Verifies:
+- Every prompt in a batch yields exactly one NDJSON result line.
+- All usage rows for the batch are persisted to the database.
+- The batch write is observed as the route's `db` stage.
+"""
+
+import json
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from llmops.database import get_db_path, get_usage_by_client
+from llmops.routes.llm_proxy import router
+
+
+@pytest.mark.unit
+def test_batch_streams_all_results_and_logs_usage(tmp_path):
+    """
+    Test that a batch of prompts is streamed back and logged.
+
+    Sends five prompts with a parallelism of two and checks that each prompt
+    index appears once with status "ok", that five usage rows were written
+    for the calling user, and that their write was timed once.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+    """
+    os.environ["LLMOPS_DB_PATH"] = str(tmp_path / "batch_usage.db")
+    get_db_path.cache_clear()
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    def db_observations():
+        labels = {"endpoint": "/llm/batch", "stage": "db"}
+        return REGISTRY.get_sample_value("request_stage_seconds_count", labels) or 0.0
+
+    before = db_observations()
+    prompts = [f"prompt {i}" for i in range(5)]
+    res = client.post(
+        "/llm/batch",
+        headers={"x-user-id": "batch-user"},
+        json={"prompts": prompts, "concurrency": 2},
+    )
+
+    assert res.status_code == 200
+    items = [json.loads(line) for line in res.text.splitlines() if line]
+    assert sorted(item["index"] for item in items) == list(range(5))
+    assert all(item["status"] == "ok" for item in items)
+    assert len(get_usage_by_client("batch-user")) == 5
+    assert db_observations() == before + 1
@@ -0,0 +1,233 @@
+"""
+test_log_search.py
+
+Unit tests for the full-text prompt index and `/logs/search`.
+
+Verifies:
+- Logged prompts are indexed on write and found ranked, filtered by user,
+  model and time, and paginated.
+- Invalid queries and backends without an index are reported as errors.
+- Rows of databases created before the index are backfilled in resumable
+  chunks while new rows are indexed by the triggers.
+- Sharded stores merge the matches of every shard.
+"""
+
+import sqlite3
+import time
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from llmops import database
+from llmops.cli.search_index import main as search_index_main
+from llmops.config import Settings
+from llmops.main import create_app
+from llmops.storage.search_index import backfill_search_index, pending_rows
+from llmops.storage.sharded_sqlite import ShardedSQLiteUsageStore
+from llmops.storage.sqlite_store import SQLiteUsageStore
+
+# Prompts logged by the tests, by user
+PROMPTS = [
+    ("alice", "llama3", "The GPU ran out of memory during the batch"),
+    ("alice", "mistral", "How do I reset my password?"),
+    ("bob", "llama3", "Connection reset by peer while streaming"),
+    ("bob", "llama3", "memory leak in the connection pool, memory keeps growing"),
+    ("carol", "mistral", "Summarise this memory dump"),
+]
+
+
+def _row(user, model, prompt, minute=0):
+    """Builds a row in `USAGE_COLUMNS[1:]` order."""
+    return (f"2025-01-01T00:{minute:02d}:00+00:00", user, prompt, model, 0.2, 4) + (
+        None,
+    ) * 10
+
+
+def _verify(path):
+    """Runs the FTS5 integrity check of the prompt index against usage_logs."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(
+            "INSERT INTO usage_fts (usage_fts, rank) VALUES ('integrity-check', 1)"
+        )
+    finally:
+        conn.close()
+
+
+@pytest.mark.unit
+def test_search_endpoint_ranks_filters_and_paginates(tmp_path):
+    """
+    Test `/logs/search` on an app logging to a fresh SQLite database.
+
+    Asserts:
+        - Rows are searchable as soon as they are logged, with the most
+          relevant match first and matches marked in the snippet.
+        - Phrase, user, model and time filters narrow the results.
+        - `next_offset` pages through the matches.
+        - Bad queries get 422 and the route requires a token.
+    """
+    secret = "search-secret"
+    app = create_app(
+        Settings(
+            jwt_secret=secret,
+            db_path=str(tmp_path / "usage.db"),
+            health_check_interval=0,
+            mcp_reload_interval=0,
+            client_snapshot_interval=0,
+            warmup_interval=0,
+        )
+    )
+    token = jwt.encode(
+        {"sub": "analyst", "exp": int(time.time()) + 60}, secret, algorithm="HS256"
+    )
+    auth = {"Authorization": f"Bearer {token}"}
+
+    with TestClient(app) as client:
+        database.log_usage_batch(
+            {
+                "timestamp": f"2025-01-01T00:{minute:02d}:00+00:00",
+                "user": user,
+                "model": model,
+                "prompt": prompt,
+                "latency": 0.2,
+                "tokens": 4,
+            }
+            for minute, (user, model, prompt) in enumerate(PROMPTS)
+        )
+
+        def search(**params):
+            res = client.get("/logs/search", params=params, headers=auth)
+            assert res.status_code == 200, res.text
+            return res.json()
+
+        memory = search(q="memory")
+        assert [r["prompt"] for r in memory["results"]][0] == PROMPTS[3][2]
+        assert len(memory["results"]) == 3
+        assert "[memory]" in memory["results"][0]["snippet"]
+        assert memory["results"][0]["score"] > memory["results"][-1]["score"]
+        assert memory["next_offset"] is None
+
+        phrase = search(q='"connection reset"')["results"]
+        assert [r["user"] for r in phrase] == ["bob"]
+        assert [r["user"] for r in search(q="memory", user="carol")["results"]] == [
+            "carol"
+        ]
+        assert len(search(q="memory OR reset", model="llama3")["results"]) == 3
+        windowed = search(
+            q="memory", start="2025-01-01T00:01:00", end="2025-01-01T00:04:00"
+        )
+        assert [r["user"] for r in windowed["results"]] == ["bob"]
+
+        first = search(q="memory OR reset", limit=2)
+        second = search(q="memory OR reset", limit=2, offset=first["next_offset"])
+        assert first["next_offset"] == 2
+        ids = [r["id"] for r in first["results"] + second["results"]]
+        assert len(set(ids)) == 4
+        assert second["next_offset"] == 4
+
+        assert (
+            client.get(
+                "/logs/search", params={"q": '"unbalanced'}, headers=auth
+            ).status_code
+            == 422
+        )
+        assert client.get("/logs/search", params={"q": "memory"}).status_code in (
+            401,
+            403,
+        )
+
+    _verify(str(tmp_path / "usage.db"))
+
+
+@pytest.mark.unit
+def test_backfill_indexes_existing_rows(tmp_path):
+    """
+    Test adding the index to a database that already holds rows.
+
+    Asserts:
+        - Old rows are pending and not yet found; rows written after the
+          upgrade are found immediately.
+        - Deleting a pending row does not touch the index.
+        - The backfill indexes the rest in chunks and can resume; the CLI
+          reports nothing pending afterwards and the index is consistent.
+    """
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE usage_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, user TEXT,
+            prompt TEXT, model TEXT, latency REAL, tokens INTEGER
+        )
+        """
+    )
+    conn.executemany(
+        "INSERT INTO usage_logs (timestamp, user, prompt, model, latency, tokens) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            _row(user, model, prompt, i)[:6]
+            for i, (user, model, prompt) in enumerate(PROMPTS)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    store = SQLiteUsageStore(path)
+    store.append([_row("dave", "llama3", "memory pressure on the new node", 9)])
+    assert [r["user"] for r in store.search("memory")] == ["dave"]
+    conn = sqlite3.connect(path)
+    assert pending_rows(conn) == 5
+    conn.execute("DELETE FROM usage_logs WHERE user = 'carol'")
+    conn.commit()
+    conn.close()
+
+    progress = []
+    assert (
+        backfill_search_index(
+            path, chunk_rows=2, progress=lambda *p: progress.append(p)
+        )
+        == 4
+    )
+    assert progress[0] == (2, 3)
+    assert backfill_search_index(path) == 0
+    assert sorted(r["user"] for r in store.search("memory")) == ["alice", "bob", "dave"]
+
+    assert search_index_main(["--db", path, "--status"]) == 0
+    assert search_index_main(["--db", path, "--rebuild"]) == 0
+    _verify(path)
+
+
+@pytest.mark.unit
+def test_search_across_backends(tmp_path):
+    """
+    Test search on the sharded store and on a store without an index.
+
+    Asserts:
+        - Matches from every shard are merged best first; a user filter reads
+          that user's shard only and pages like a single file.
+        - The segment log reports NotImplementedError.
+    """
+    store = ShardedSQLiteUsageStore(str(tmp_path / "usage.db"), shards=3)
+    try:
+        store.append([_row(*entry, minute=i) for i, entry in enumerate(PROMPTS)])
+        results = store.search("memory")
+        assert len(results) == 3
+        assert [r["score"] for r in results] == sorted(
+            (r["score"] for r in results), reverse=True
+        )
+        assert [
+            r["prompt"] for r in store.search("memory OR reset", limit=2, offset=3)
+        ] == [r["prompt"] for r in store.search("memory OR reset")[3:5]]
+        assert [r["user"] for r in store.search("reset", user="alice")] == ["alice"]
+    finally:
+        store.close()
+
+    from llmops.storage.segment_log import SegmentLogStore
+
+    log = SegmentLogStore(str(tmp_path / "segments"))
+    try:
+        with pytest.raises(NotImplementedError):
+            log.search("memory")
+    finally:
+        log.close()
@@ -5,11 +5,39 @@ Unit tests for the usage_policy module.
 
 Verifies:
 - Existence of the default usage policy in the global policy registry.
+- `/llm` and `/llm/batch` enforce policies before calling the model.
 """
 
+import json
+import os
+
 import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from llmops.database import get_db_path, get_usage_by_client
+from llmops.mcp.usage_policy import POLICIES, USAGE_POLICIES, set_policy
+from llmops.routes import llm_proxy
+
 
-from llmops.mcp.usage_policy import USAGE_POLICIES
+@pytest.fixture
+def proxy_client(tmp_path, monkeypatch):
+    """Returns a client of the proxy routes and the prompts sent upstream."""
+    os.environ["LLMOPS_DB_PATH"] = str(tmp_path / "policy_usage.db")
+    get_db_path.cache_clear()
+    upstream = []
+    simulate = llm_proxy.simulate_llm
+
+    def record(prompt, model=llm_proxy.PRIMARY_MODEL):
+        upstream.append(prompt)
+        return simulate(prompt, model)
+
+    monkeypatch.setattr(llm_proxy, "simulate_llm", record)
+    policies = dict(POLICIES.current.data)
+    app = FastAPI()
+    app.include_router(llm_proxy.router)
+    yield TestClient(app), upstream
+    POLICIES.replace(policies, "test")
 
 
 @pytest.mark.unit
@@ -24,3 +52,52 @@ def test_default_policy_exists():
         - The key "default" exists in the USAGE_POLICIES dictionary.
     """
     assert "default" in USAGE_POLICIES
+
+
+@pytest.mark.unit
+def test_llm_checks_policy_before_upstream(proxy_client):
+    """
+    Test `/llm` for a client whose policy blocks the primary model.
+
+    Asserts:
+        - The request is rejected with 403 and the policy's reason.
+        - The model was not called and no usage was logged.
+    """
+    client, upstream = proxy_client
+    set_policy("blocked-client", 100, [llm_proxy.PRIMARY_MODEL])
+
+    res = client.post(
+        "/llm", headers={"x-user-id": "blocked-client"}, json={"prompt": "hi"}
+    )
+
+    assert res.status_code == 403
+    assert res.json()["detail"] == "Model is blocked"
+    assert upstream == []
+    assert get_usage_by_client("blocked-client") == []
+
+
+@pytest.mark.unit
+def test_batch_rejects_prompts_per_policy(proxy_client):
+    """
+    Test `/llm/batch` for a client limited to three tokens per prompt.
+
+    Asserts:
+        - Prompts over the limit yield error items with the policy's reason.
+        - Only the allowed prompts reach the model and are logged.
+    """
+    client, upstream = proxy_client
+    set_policy("capped-client", 3)
+    prompts = ["short one", "this prompt is far too long", "ok", "four words too many"]
+
+    res = client.post(
+        "/llm/batch",
+        headers={"x-user-id": "capped-client"},
+        json={"prompts": prompts},
+    )
+
+    items = {item["index"]: item for item in map(json.loads, res.text.splitlines())}
+    assert [items[i]["status"] for i in range(4)] == ["ok", "error", "ok", "error"]
+    assert items[1]["error"] == "Token limit exceeded"
+    assert sorted(upstream) == ["ok", "short one"]
+    logged = get_usage_by_client("capped-client")
+    assert sorted(row["prompt"] for row in logged) == ["ok", "short one"]
@@ -0,0 +1,77 @@
+"""
+test_mcp_snapshot.py
+
+Unit tests for copy-on-write MCP snapshots and file hot-reloading.
+
+Verifies:
+- Updates publish a new snapshot while readers keep a consistent old one.
+- Snapshot contents are read-only.
+- Policies persist to disk and are hot-reloaded by the file watcher, and
+  invalid files leave the active snapshot untouched.
+"""
+
+import json
+
+import pytest
+
+from llmops.mcp import usage_policy
+from llmops.mcp.model_registry import MODEL_REGISTRY, REGISTRY, register_model
+from llmops.mcp.usage_policy import POLICIES, check_policy, save_policies, set_policy
+from llmops.mcp.watcher import FileWatcher
+
+
+@pytest.mark.unit
+def test_copy_on_write_snapshots():
+    """
+    Test that registry updates swap snapshots instead of mutating them.
+
+    Asserts:
+        - A snapshot taken before an update does not change.
+        - The live `MODEL_REGISTRY` view and version reflect the update.
+        - Snapshot entries cannot be modified in place.
+    """
+    before = REGISTRY.current
+    register_model("snap-model", "2", endpoints=["http://snap:1"])
+    after = REGISTRY.current
+
+    assert "snap-model" not in before.data
+    assert after.version == before.version + 1
+    assert MODEL_REGISTRY["snap-model"]["endpoints"] == ("http://snap:1",)
+    with pytest.raises(TypeError):
+        after.data["snap-model"]["version"] = "3"
+
+
+@pytest.mark.unit
+def test_policy_file_hot_reload(tmp_path, monkeypatch):
+    """
+    Test persisting policies and reloading external edits.
+
+    Asserts:
+        - `save_policies` writes the current snapshot.
+        - The watcher applies a changed file and skips an unchanged one.
+        - An invalid file is rejected and the previous policies stay active.
+    """
+    path = tmp_path / "usage_policies.json"
+    monkeypatch.setattr(usage_policy, "USAGE_POLICIES_FILE", str(path))
+    set_policy("reload-client", 50)
+    save_policies()
+
+    watcher = FileWatcher()
+    watcher.watch("usage_policies", str(path), usage_policy.load_policies)
+    assert watcher.poll() == []
+
+    data = json.loads(path.read_text())
+    data["reload-client"] = {"max_tokens": 5, "blocked_models": ["gpt-x"]}
+    path.write_text(json.dumps(data) + "\n")
+    version = POLICIES.current.version
+    assert watcher.poll() == ["usage_policies"]
+    assert POLICIES.current.version == version + 1
+    assert check_policy("reload-client", "gpt-x", 1) == (False, "Model is blocked")
+
+    path.write_text('{"reload-client": {"max_tokens": "lots"}}')
+    assert watcher.poll() == []
+    assert check_policy("reload-client", "gpt-y", 10) == (
+        False,
+        "Token limit exceeded",
+    )
+    assert "default" in POLICIES.current.data
@@ -6,10 +6,12 @@ Unit test for the client_tracker module.
 Verifies:
 - That client usage can be logged.
 - That statistics are accurately calculated per client.
+- That the in-process usage log stays bounded.
 """
 
 import pytest
 
+from llmops.mcp import client_tracker
 from llmops.mcp.client_tracker import get_client_stats, log_client_usage
 
 
@@ -27,3 +29,25 @@ def test_logging_and_stats():
     log_client_usage("abc", "llama", 100)
     stats = get_client_stats("abc")
     assert stats["total_tokens"] >= 100
+
+
+@pytest.mark.unit
+def test_client_logs_are_bounded():
+    """
+    Test that CLIENT_LOGS keeps recent entries of recently active clients only.
+
+    Asserts:
+        - A client's summary holds its last CLIENT_LOG_LIMIT entries.
+        - The least recently active client is dropped past the client limit.
+    """
+    limit = client_tracker.CLIENT_LOG_LIMIT
+    for tokens in range(limit + 5):
+        log_client_usage("bounded-client", "llama", tokens)
+    summary = client_tracker.get_client_summary("bounded-client")
+    assert len(summary) == limit
+    assert summary[-1]["tokens"] == limit + 4
+
+    for i in range(client_tracker.CLIENT_LOG_MAX_CLIENTS):
+        log_client_usage(f"filler-{i}", "llama", 1)
+    assert len(client_tracker.CLIENT_LOGS) == client_tracker.CLIENT_LOG_MAX_CLIENTS
+    assert client_tracker.get_client_summary("bounded-client") == []
@@ -0,0 +1,158 @@
+"""
+test_profiling.py
+
+Unit tests for the on-demand profilers and their admin routes.
+
+Verifies:
+- The sampling profiler captures stacks of a busy thread in collapsed format.
+- Profiling routes reject non-admin tokens and accept admin tokens.
+- Request profiles contain the frames of sampled sync and async handlers, and
+  only those.
+"""
+
+import asyncio
+import datetime
+import marshal
+import threading
+import time
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from llmops.config import Settings
+from llmops.main import create_app
+from llmops import profiling
+from llmops.profiling import SamplingProfiler
+
+
+def _busy_loop(stop: threading.Event):
+    """Spins until `stop` is set so the sampler has something to observe."""
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _token(secret: str, sub: str) -> str:
+    """Returns a JWT for `sub` valid for five minutes."""
+    exp = datetime.datetime.utcnow() + datetime.timedelta(minutes=5)
+    return jwt.encode({"sub": sub, "exp": exp}, secret, algorithm="HS256")
+
+
+@pytest.mark.unit
+def test_sampling_profiler_collects_stacks():
+    """
+    Test that sampled stacks include the busy function.
+
+    Asserts:
+        - At least one sample was taken.
+        - The collapsed output contains the busy loop frame.
+    """
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy")
+    worker.start()
+
+    sampler = SamplingProfiler(duration=0.2, interval=0.002)
+    sampler.start()
+    time.sleep(0.25)
+    sampler.stop()
+    stop.set()
+    worker.join()
+
+    assert sampler.samples > 0
+    assert "_busy_loop (test_profiling.py" in sampler.collapsed()
+
+
+@pytest.mark.unit
+def test_profiler_routes_require_admin(tmp_path):
+    """
+    Test that profiling routes are guarded by the admin dependency.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+
+    Asserts:
+        - A non-admin token is rejected with 403.
+        - An admin token can enable and query request profiling.
+    """
+    secret = "profiler-secret"
+    app = create_app(Settings(jwt_secret=secret, db_path=str(tmp_path / "u.db")))
+
+    def token(sub):
+        return _token(secret, sub)
+
+    with TestClient(app) as client:
+        res = client.post(
+            "/admin/profile/requests/start",
+            headers={"Authorization": f"Bearer {token('demo-user')}"},
+            json={"route_prefix": "/", "sample_rate": 1.0},
+        )
+        assert res.status_code == 403
+
+        admin = {"Authorization": f"Bearer {token('admin')}"}
+        res = client.post(
+            "/admin/profile/requests/start",
+            headers=admin,
+            json={"route_prefix": "/", "sample_rate": 1.0, "max_requests": 1},
+        )
+        assert res.status_code == 200
+
+        client.get("/")
+        status = client.get("/admin/profile/requests", headers=admin).json()
+        assert status["profiled"] == 1
+        report = client.get(
+            "/admin/profile/requests/download?format=text", headers=admin
+        )
+        assert "cumulative" in report.text
+
+
+@pytest.mark.unit
+def test_request_profiles_contain_the_handlers(tmp_path):
+    """
+    Test request profiling of a sync and an async route.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+
+    Asserts:
+        - Frames of the sync `/llm` handler, run in the threadpool, and of the
+          functions it calls are recorded.
+        - Frames of an async handler are recorded.
+        - Handlers of requests outside the route prefix are not.
+    """
+    secret = "profiler-secret"
+    app = create_app(Settings(jwt_secret=secret, db_path=str(tmp_path / "u.db")))
+
+    async def slow_step():
+        await asyncio.sleep(0)
+        return sum(range(100))
+
+    @app.get("/llm/async-probe")
+    async def async_probe():
+        return {"total": await slow_step()}
+
+    profiling.instrument_routes(app)
+    admin = {"Authorization": f"Bearer {_token(secret, 'admin')}"}
+    user = {"Authorization": f"Bearer {_token(secret, 'demo-user')}"}
+
+    with TestClient(app) as client:
+        res = client.post(
+            "/admin/profile/requests/start",
+            headers=admin,
+            json={"route_prefix": "/llm", "sample_rate": 1.0},
+        )
+        assert res.status_code == 200
+        for _ in range(5):
+            assert client.post("/llm", headers=user, json={"prompt": "hi"}).is_success
+            assert client.get("/").is_success
+        assert client.get("/llm/async-probe").is_success
+        status = client.get("/admin/profile/requests", headers=admin).json()
+        stats = marshal.loads(
+            client.get("/admin/profile/requests/download", headers=admin).content
+        )
+    profiling.stop_request_profiling()
+
+    functions = {function for _, _, function in stats}
+    assert status["profiled"] == 6
+    assert {"call_llm", "simulate_llm", "log_usage"} <= functions
+    assert {"async_probe", "slow_step"} <= functions
+    assert "health_check" not in functions
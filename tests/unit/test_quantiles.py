@@ -0,0 +1,159 @@
+"""
+test_quantiles.py
+
+Unit tests for the streaming latency sketches behind `/mcp/stats/quantiles`.
+
+Verifies:
+- DDSketch quantiles stay within the relative-error guarantee.
+- Sketches serialised by separate workers merge into the combined distribution.
+- Windows expire, series are capped, and database writes feed the API.
+"""
+
+import json
+import random
+import time
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from llmops.config import Settings
+from llmops.main import create_app
+from llmops.sketches import OTHER, DDSketch, QuantileStore, merge_sketches
+
+
+def _exact(values, q):
+    """Returns the exact quantile using the same rank convention as DDSketch."""
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+@pytest.mark.unit
+def test_quantiles_within_relative_error():
+    """
+    Test accuracy on a heavy-tailed latency distribution.
+
+    Asserts:
+        - p50/p90/p99/p99.9 are within 1% of the exact values.
+        - Memory stays far below one bucket per value.
+    """
+    rng = random.Random(3)
+    values = [rng.lognormvariate(-1.5, 1.2) for _ in range(50000)]
+    sketch = DDSketch(alpha=0.01)
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+    assert len(sketch.bins) < 1500
+    assert sketch.count == 50000
+
+
+@pytest.mark.unit
+def test_serialised_sketches_merge():
+    """
+    Test merging sketches from two simulated workers through JSON.
+
+    Asserts:
+        - The merged buckets match one sketch built from all values.
+    """
+    rng = random.Random(5)
+    fast = [rng.uniform(0.01, 0.1) for _ in range(5000)]
+    slow = [rng.uniform(1.0, 4.0) for _ in range(500)]
+    workers = []
+    for values in (fast, slow):
+        sketch = DDSketch()
+        for value in values:
+            sketch.add(value)
+        workers.append(json.loads(json.dumps(sketch.to_dict())))
+
+    merged = merge_sketches(workers)
+    combined = DDSketch()
+    for value in fast + slow:
+        combined.add(value)
+
+    assert merged.bins == combined.bins
+    assert merged.count == combined.count
+    assert merged.total == pytest.approx(combined.total)
+    assert abs(merged.quantile(0.99) - _exact(fast + slow, 0.99)) <= 0.01 * 4.0
+
+
+@pytest.mark.unit
+def test_store_expires_windows_and_caps_series():
+    """
+    Test retention and cardinality bounds of the windowed store.
+
+    Asserts:
+        - Windows older than the retention period are discarded.
+        - Users beyond `max_series` are folded into "other".
+    """
+    store = QuantileStore(window_seconds=60, retention_windows=2, max_series=2)
+    store.record("alice", "m", 0.1, now=0)
+    store.record("alice", "m", 0.2, now=60)
+    store.record("bob", "m", 0.3, now=60)
+    store.record("carol", "m", 0.4, now=60)
+    store.record("alice", "m", 0.5, now=120)
+
+    assert sorted(store._windows) == [60, 120]
+    assert store.query(user="alice", minutes=60, now=120).count == 2
+    assert store.query(user=OTHER, minutes=60, now=120).count == 1
+
+
+@pytest.mark.unit
+def test_quantiles_endpoint_reports_ingested_latencies(tmp_path):
+    """
+    Test `/mcp/stats/quantiles` on rows written through `/ingest`.
+
+    Asserts:
+        - Counts and quantiles reflect the ingested latencies per user.
+        - The merged sketch is returned on request.
+        - Out-of-range quantiles are rejected with 422.
+    """
+    secret = "quantile-secret"
+    app = create_app(
+        Settings(
+            jwt_secret=secret,
+            db_path=str(tmp_path / "usage.db"),
+            health_check_interval=0,
+            mcp_reload_interval=0,
+            client_snapshot_interval=0,
+        )
+    )
+    token = jwt.encode(
+        {"sub": "q-user", "exp": int(time.time()) + 60}, secret, algorithm="HS256"
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    events = [
+        {"user": "svc-a", "model": "q-model", "latency": (i + 1) / 100, "tokens": 1}
+        for i in range(100)
+    ]
+    events.append({"user": "svc-b", "model": "q-model", "latency": 9.0, "tokens": 1})
+
+    with TestClient(app) as client:
+        client.post(
+            "/ingest",
+            content="\n".join(json.dumps(event) for event in events),
+            headers=headers,
+        )
+        res = client.get(
+            "/mcp/stats/quantiles",
+            params={"user": "svc-a", "q": "0.5,0.99", "include_sketch": "true"},
+            headers=headers,
+        )
+        everyone = client.get(
+            "/mcp/stats/quantiles", params={"model": "q-model"}, headers=headers
+        )
+        invalid = client.get(
+            "/mcp/stats/quantiles", params={"q": "1.5"}, headers=headers
+        )
+
+    assert res.status_code == 200
+    body = res.json()
+    assert body["count"] == 100
+    assert body["quantiles"]["0.5"] == pytest.approx(0.5, rel=0.01)
+    assert body["quantiles"]["0.99"] == pytest.approx(0.99, rel=0.01)
+    assert DDSketch.from_dict(body["sketch"]).count == 100
+    assert everyone.json()["count"] == 101
+    assert everyone.json()["max"] == 9.0
+    assert invalid.status_code == 422
@@ -0,0 +1,125 @@
+"""
+test_query_cache.py
+
+Unit tests for the write-aware usage query cache in `llmops.database`.
+
+Verifies:
+- Repeated reads are served from memory until the next write.
+- Writes committed outside this process's write path invalidate results.
+- Cached results cannot be mutated through returned rows.
+- Entry and row bounds evict least recently used results.
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+from llmops import database
+from llmops.database import (
+    QueryCache,
+    configure_query_cache,
+    get_db_path,
+    get_recent_logs,
+    get_usage_by_client,
+    log_usage,
+)
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    """
+    Points the database module at an empty file with a fresh cache.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+
+    Yields:
+        None
+    """
+    os.environ["LLMOPS_DB_PATH"] = str(tmp_path / "cache.db")
+    get_db_path.cache_clear()
+    configure_query_cache(max_entries=16, max_rows=1000)
+    yield
+    configure_query_cache(max_entries=256, max_rows=50000)
+
+
+@pytest.mark.unit
+def test_reads_cached_until_write(fresh_db, monkeypatch):
+    """
+    Test that SQLite is only queried again after a write.
+
+    Asserts:
+        - The second identical read does not touch the database.
+        - A write invalidates the cached result.
+        - Mutating a returned row does not corrupt the cache.
+    """
+    log_usage("cache-user", "hi", "gpt-cache", 0.1, 1)
+    first = get_usage_by_client("cache-user")
+    first[0]["model"] = "mutated"
+
+    connects = []
+    real_connect = database.sqlite3.connect
+    monkeypatch.setattr(
+        database.sqlite3,
+        "connect",
+        lambda *a, **kw: connects.append(a) or real_connect(*a, **kw),
+    )
+    assert get_usage_by_client("cache-user")[0]["model"] == "gpt-cache"
+    assert connects == []
+
+    log_usage("cache-user", "again", "gpt-cache", 0.1, 1)
+    assert len(get_usage_by_client("cache-user")) == 2
+    assert get_recent_logs(limit=1)[0]["tokens"] == 1
+
+
+@pytest.mark.unit
+def test_reads_see_writes_of_other_processes(fresh_db):
+    """
+    Test that a commit made by another connection invalidates cached reads.
+
+    The row is inserted with a plain SQLite connection, as another worker
+    process would, so the in-process generation counter never moves.
+
+    Asserts:
+        - The cached result is replaced by one including the new row.
+    """
+    log_usage("other-user", "hi", "gpt-cache", 0.1, 1)
+    assert len(get_usage_by_client("other-user")) == 1
+
+    conn = sqlite3.connect(get_db_path())
+    conn.execute(
+        "INSERT INTO usage_logs (timestamp, user, model, latency, tokens) "
+        "VALUES ('2024-01-01T00:00:00', 'other-user', 'gpt-cache', 0.1, 1)"
+    )
+    conn.commit()
+    conn.close()
+
+    assert len(get_usage_by_client("other-user")) == 2
+
+
+@pytest.mark.unit
+def test_lru_bounds():
+    """
+    Test eviction by entry count and by total rows.
+
+    Asserts:
+        - The least recently used entry is evicted first.
+        - Results larger than the row bound are never cached.
+        - Results stored after a concurrent write are discarded.
+    """
+    cache = QueryCache(max_entries=2, max_rows=3)
+    generation = cache.generation
+    cache.put("a", generation, [{"id": 1}])
+    cache.put("b", generation, [{"id": 2}])
+    cache.get("a")
+    cache.put("c", generation, [{"id": 3}])
+    assert cache.get("b")[0] is None
+    assert cache.get("a")[0] == [{"id": 1}]
+
+    cache.put("big", generation, [{"id": i} for i in range(4)])
+    assert cache.get("big")[0] is None
+
+    cache.bump()
+    cache.put("late", generation, [{"id": 9}])
+    assert cache.get("late")[0] is None
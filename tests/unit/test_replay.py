@@ -0,0 +1,166 @@
+"""
+test_replay.py
+
+Unit tests for the `llmops-replay` traffic replay tool.
+
+Verifies:
+- Usage logs are streamed in id order up to the rows present at start.
+- Replayed requests carry the recorded user and a JWT minted for it, and keep
+  the recorded inter-arrival times scaled by the speed factor.
+- The report compares recorded and replayed latency and throughput.
+- Rows whose prompt was not stored are skipped unless explicitly included.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import jwt
+import pytest
+from fastapi import FastAPI, Request
+
+from llmops.cli.replay import TokenMinter, format_report, replay
+from llmops.database import get_db_path, iter_usage_logs, log_usage_batch
+
+
+def _record(tmp_path, count=6, gap=0.5):
+    """Writes `count` usage rows `gap` seconds apart and returns the db path."""
+    path = str(tmp_path / "recorded.db")
+    os.environ["LLMOPS_DB_PATH"] = path
+    get_db_path.cache_clear()
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    log_usage_batch(
+        {
+            "timestamp": (start + timedelta(seconds=i * gap)).isoformat(),
+            "user": f"user-{i % 2}",
+            "prompt": f"prompt {i}",
+            "model": "llama3" if i % 3 else "openai-gpt",
+            "latency": 0.2,
+            "tokens": 2,
+        }
+        for i in range(count)
+    )
+    return path
+
+
+@pytest.mark.unit
+def test_iter_usage_logs_streams_in_chunks(tmp_path):
+    """
+    Test keyset-paginated streaming from a read-only connection.
+
+    Asserts:
+        - Every row is returned once, in id order, across chunk boundaries.
+        - `after_id` skips earlier rows.
+    """
+    path = _record(tmp_path, count=7)
+
+    rows = list(iter_usage_logs(path, chunk_size=3))
+    assert [row["id"] for row in rows] == list(range(1, 8))
+    assert rows[0]["prompt"] == "prompt 0"
+    assert [row["id"] for row in iter_usage_logs(path, after_id=5)] == [6, 7]
+
+
+@pytest.mark.unit
+def test_replay_preserves_users_and_pacing(tmp_path):
+    """
+    Test replaying six rows recorded 0.5s apart at 5x speed.
+
+    Asserts:
+        - Each request's JWT subject and `x-user-id` match the recorded user.
+        - The replay takes about the compressed recorded span (2.5s / 5).
+        - The report counts every request and compares latencies per model.
+    """
+    path = _record(tmp_path)
+    secret = "replay-secret"
+    seen = []
+
+    app = FastAPI()
+
+    @app.post("/llm")
+    async def fake_llm(request: Request):
+        token = request.headers["authorization"].split()[1]
+        claims = jwt.decode(token, secret, algorithms=["HS256"])
+        body = await request.json()
+        seen.append((claims["sub"], request.headers["x-user-id"], body["prompt"]))
+        return {"response": "ok"}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await replay(
+                iter_usage_logs(path),
+                "http://replay-target",
+                TokenMinter(secret),
+                speed=5,
+                client=client,
+            )
+
+    report = asyncio.run(run())
+    data = report.to_dict()
+
+    assert [(sub, user) for sub, user, _ in seen] == [
+        (f"user-{i % 2}", f"user-{i % 2}") for i in range(6)
+    ]
+    assert [prompt for _, _, prompt in seen] == [f"prompt {i}" for i in range(6)]
+    assert 0.45 <= report.elapsed < 1.5
+    assert data["sent"] == data["succeeded"] == 6
+    assert data["statuses"] == {"200": 6}
+    assert data["throughput_rps"]["recorded"] == pytest.approx(6 / 2.5)
+    assert data["throughput_rps"]["target"] == pytest.approx(6 / 2.5 * 5)
+    assert set(data["models"]) == {"llama3", "openai-gpt"}
+    p50 = data["overall"]["latency_seconds"]["p50"]
+    assert p50["recorded"] == pytest.approx(0.2, rel=0.01)
+    assert p50["delta"] == pytest.approx(p50["replayed"] - p50["recorded"])
+    assert "all models: 6 recorded, 6 replayed OK" in format_report(data)
+
+
+@pytest.mark.unit
+def test_replay_skips_rows_without_prompt():
+    """
+    Test replaying rows whose prompt the retention policy dropped.
+
+    Asserts:
+        - By default they are not sent and are reported as skipped.
+        - With `include_dropped=True` they are sent with an empty prompt.
+    """
+    entries = [
+        {"user": "kept", "prompt": "kept prompt", "model": "llama3", "latency": 0.1},
+        {
+            "user": "dropped",
+            "prompt": None,
+            "prompt_retention": "dropped",
+            "model": "llama3",
+            "latency": 0.1,
+        },
+    ]
+    seen = []
+
+    app = FastAPI()
+
+    @app.post("/llm")
+    async def fake_llm(request: Request):
+        seen.append((await request.json())["prompt"])
+        return {"response": "ok"}
+
+    async def run(include_dropped):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await replay(
+                entries,
+                "http://replay-target",
+                TokenMinter("replay-secret"),
+                speed=0,
+                client=client,
+                include_dropped=include_dropped,
+            )
+
+    data = asyncio.run(run(False)).to_dict()
+    assert seen == ["kept prompt"]
+    assert (data["sent"], data["skipped"]) == (1, 1)
+    assert "1 skipped without a stored prompt" in format_report(data)
+
+    seen.clear()
+    data = asyncio.run(run(True)).to_dict()
+    assert sorted(seen) == ["", "kept prompt"]
+    assert (data["sent"], data["skipped"]) == (2, 0)
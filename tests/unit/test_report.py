@@ -0,0 +1,191 @@
+"""
+test_report.py
+
+Unit tests for the `llmops-report` offline usage reports.
+
+Verifies:
+- Aggregating id ranges in a process pool gives the same per-user-day and
+  per-model totals as a single pass, with the time window applied.
+- Merged Misra-Gries prompt summaries keep the frequent prompts with counts
+  within the reported error.
+- Reports are written as JSON or as one CSV file per table.
+- The shard files of a sharded store are reported together.
+"""
+
+import csv
+import json
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from llmops.cli.report import (
+    UsageAggregate,
+    aggregate_range,
+    build_report,
+    main,
+    report_tables,
+)
+from llmops.storage.sharded_sqlite import ShardedSQLiteUsageStore, shard_paths
+from llmops.storage.sqlite_store import SQLiteUsageStore
+
+
+def _rows(count=120):
+    """Returns `count` usage rows spread over three days, users and models."""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        model = ("llama3", "mistral", "phi3")[i % 3]
+        rows.append(
+            (
+                (start + timedelta(hours=i)).isoformat(),
+                f"user-{i % 4}",
+                "hello" if i % 2 else f"prompt {i % 10}",
+                model,
+                0.1 * (1 + i % 5),
+                1 + i % 7,
+                "llama3" if model == "mistral" and i % 4 == 1 else None,
+                5,
+                0.01,
+                10,
+                0.5,
+                0.0,
+                0.6,
+                None,
+                None,
+                None,
+            )
+        )
+    return rows
+
+
+def _database(tmp_path, rows):
+    """Writes `rows` to a fresh SQLite database and returns its path."""
+    path = str(tmp_path / "usage.db")
+    SQLiteUsageStore(path).append(rows)
+    return path
+
+
+@pytest.mark.unit
+def test_parallel_report_matches_single_pass(tmp_path):
+    """
+    Test a report over several ranges aggregated by two worker processes.
+
+    Asserts:
+        - Per-user-day and per-model totals equal a naive count of the rows in
+          the time window, and match an in-process single-range run.
+        - Fallbacks, generation throughput and latency quantiles are reported.
+        - The most repeated prompt is first with its exact count.
+    """
+    rows = _rows()
+    path = _database(tmp_path, rows)
+    window = [r for r in rows if "2025-01-01T12" <= r[0] < "2025-01-04"]
+
+    parallel = build_report(
+        path, jobs=2, chunk_rows=25, since="2025-01-01T12:00:00", until="2025-01-04"
+    )
+    single = build_report(
+        path, jobs=1, chunk_rows=1000, since="2025-01-01T12:00:00", until="2025-01-04"
+    )
+
+    expected_days = Counter()
+    expected_tokens = Counter()
+    for r in window:
+        expected_days[(r[1], r[0][:10])] += 1
+        expected_tokens[(r[1], r[0][:10])] += r[5]
+    assert parallel.rows == len(window)
+    assert parallel.user_days == {
+        key: [expected_days[key], expected_tokens[key]] for key in expected_days
+    }
+    assert parallel.user_days == single.user_days
+    assert parallel.prompts == single.prompts
+
+    tables = report_tables(parallel, top=3)
+    models = {row["model"]: row for row in tables["models"]}
+    assert models["llama3"]["requests"] == sum(r[3] == "llama3" for r in window)
+    assert models["mistral"]["fallbacks"] == sum(r[6] is not None for r in window)
+    assert models["phi3"]["eval_tokens_per_second"] == pytest.approx(20.0)
+    assert 0.1 <= models["llama3"]["p50_latency_seconds"] <= 0.5
+    assert sum(row["share"] for row in tables["models"]) == pytest.approx(1.0)
+    assert tables["top_prompts"][0] == {
+        "prompt": "hello",
+        "requests": sum(r[2] == "hello" for r in window),
+        "error": 0,
+    }
+
+
+@pytest.mark.unit
+def test_prompt_summary_is_bounded(tmp_path):
+    """
+    Test the prompt summary with fewer slots than distinct prompts.
+
+    Asserts:
+        - Merged summaries keep at most `prompt_capacity` prompts.
+        - The frequent prompt is kept and its count is at most `error` below
+          the true count.
+    """
+    path = _database(tmp_path, _rows(200))
+    total = UsageAggregate(prompt_capacity=3)
+    for first in range(1, 201, 50):
+        total.merge(aggregate_range(path, first, first + 49, prompt_capacity=3))
+
+    assert len(total.prompts) <= 3
+    assert total.prompt_error > 0
+    assert 100 - total.prompt_error <= total.prompts["hello"] <= 100
+
+
+@pytest.mark.unit
+def test_report_cli_writes_json_and_csv(tmp_path, capsys):
+    """
+    Test the `llmops-report` entry point.
+
+    Asserts:
+        - JSON output holds the row count and all three tables.
+        - CSV output writes `user_daily.csv`, `models.csv` and `top_prompts.csv`.
+    """
+    path = _database(tmp_path, _rows(30))
+    output = tmp_path / "report.json"
+    assert main(["--db", path, "--jobs", "1", "--output", str(output)]) == 0
+    report = json.loads(output.read_text())
+    assert report["rows"] == 30
+    assert {row["model"] for row in report["models"]} == {"llama3", "mistral", "phi3"}
+    assert sum(row["requests"] for row in report["user_daily"]) == 30
+
+    directory = tmp_path / "csv"
+    main(["--db", path, "--jobs", "1", "--format", "csv", "--output", str(directory)])
+    assert str(directory / "models.csv") in capsys.readouterr().out
+    with open(directory / "user_daily.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == ["day", "user", "requests", "tokens"]
+    assert sum(int(row["requests"]) for row in rows) == 30
+    assert (directory / "top_prompts.csv").exists()
+
+
+@pytest.mark.unit
+def test_report_merges_shard_files(tmp_path, capsys):
+    """
+    Test a report over the files of a two-shard store.
+
+    Asserts:
+        - Aggregating both shard files gives the totals of the same rows in
+          one file.
+        - The CLI reads every shard file passed to `--db`.
+    """
+    rows = _rows(60)
+    single = build_report(_database(tmp_path, rows), jobs=1)
+    store = ShardedSQLiteUsageStore(str(tmp_path / "sharded.db"), shards=2)
+    store.append(rows)
+    store.close()
+    paths = shard_paths(str(tmp_path / "sharded.db"), 2)
+
+    sharded = build_report(paths, jobs=2, chunk_rows=10)
+    assert sharded.rows == 60
+    assert sharded.user_days == single.user_days
+    assert sharded.prompts == single.prompts
+    assert {m: s.requests for m, s in sharded.models.items()} == {
+        m: s.requests for m, s in single.models.items()
+    }
+
+    output = tmp_path / "report.json"
+    assert main(["--db", *paths, "--jobs", "1", "--output", str(output)]) == 0
+    assert json.loads(output.read_text())["rows"] == 60
@@ -0,0 +1,200 @@
+"""
+test_retention.py
+
+Unit tests for the sampled and tail-based prompt retention policy.
+
+Verifies:
+- Flagged users, errors and latency outliers always keep their prompt, and a
+  seeded share of the rest is sampled, each with its inclusion probability.
+- Both storage backends store metadata for every row and prompts only for
+  retained ones, while prompt listeners still see every prompt.
+- Segments written before the retention fields stay readable, and reports
+  weight retained prompts by their inverse sample rate.
+"""
+
+import struct
+import zlib
+
+import pytest
+
+from llmops import database
+from llmops.cli.report import aggregate_range
+from llmops.retention import PromptRetention
+from llmops.storage.segment_log import (
+    BODY_V2,
+    HEADER,
+    HEADER_SIZE,
+    MAGIC_V2,
+    RECORD,
+    RECORD_V2,
+    SegmentLogStore,
+)
+from llmops.storage.sqlite_store import SQLiteUsageStore
+
+
+@pytest.fixture
+def use_backend(tmp_path, monkeypatch):
+    """Returns a function pointing `llmops.database` at a fresh backend."""
+    for name in ("LLMOPS_DB_PATH", "LLMOPS_STORAGE_BACKEND", "LLMOPS_SEGMENT_DIR"):
+        monkeypatch.delenv(name, raising=False)
+
+    def use(backend):
+        database.close_usage_stores()
+        database.init_db(
+            str(tmp_path / backend / "usage.db"),
+            backend,
+            str(tmp_path / backend / "log"),
+        )
+        database.configure_query_cache(0, 0)
+
+    yield use
+    database.configure_prompt_retention(None)
+    database.close_usage_stores()
+    for reader in (
+        database.get_db_path,
+        database.get_storage_backend,
+        database.get_segment_dir,
+    ):
+        reader.cache_clear()
+
+
+@pytest.mark.unit
+def test_policy_keeps_flagged_errors_outliers_and_a_sample():
+    """
+    Test the retention rules and their recorded inclusion probabilities.
+
+    Asserts:
+        - No request is an outlier before `min_requests` latencies were seen.
+        - Flagged users, errors and latencies above the percentile are kept
+          with probability 1.
+        - About `sample_rate` of ordinary requests are sampled, recorded with
+          that rate, and the rest dropped.
+    """
+    policy = PromptRetention(
+        sample_rate=0.1,
+        latency_percentile=0.9,
+        flagged_users=["audited"],
+        min_requests=50,
+        refresh=10,
+        seed=7,
+    )
+    assert policy.decide("u", "m", 9.0)[0] != "slow"
+    for i in range(200):
+        policy.decide("u", "m", 0.1 + (i % 10) / 100)
+
+    assert policy.latency_threshold("m") == pytest.approx(0.18, rel=0.03)
+    assert policy.decide("audited", "m", 0.1) == ("flagged", 1.0)
+    assert policy.decide("u", "m", 0.1, error="ReadTimeout") == ("error", 1.0)
+    assert policy.decide("u", "m", 5.0) == ("slow", 1.0)
+    decisions = [policy.decide("u", "m", 0.12) for _ in range(2000)]
+    sampled = sum(decision == "sampled" for decision, _ in decisions)
+    assert 150 < sampled < 250
+    assert {rate for _, rate in decisions} == {0.1}
+    assert {decision for decision, _ in decisions} == {"sampled", "dropped"}
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("backend", ["sqlite", "segment_log"])
+def test_backends_store_metadata_and_retained_prompts(use_backend, backend):
+    """
+    Test writes through `llmops.database` with a policy keeping no sample.
+
+    Asserts:
+        - Every row is stored with its metadata, error and retention columns.
+        - Only the failed request keeps its prompt; dropped prompts are None.
+        - Prompt listeners receive every prompt as sent.
+    """
+    use_backend(backend)
+    database.configure_prompt_retention(PromptRetention(sample_rate=0.0))
+    heard = []
+    database.add_write_listener(heard.extend, with_prompts=True)
+    try:
+        database.log_usage("u1", "first prompt", "llama3", 0.2, 2)
+        database.log_usage(
+            "u2", "failing prompt", "llama3", 1.5, 2, error="ConnectError"
+        )
+        database.log_usage_batch(
+            [
+                {
+                    "user": "u3",
+                    "prompt": "batched prompt",
+                    "model": "llama3",
+                    "latency": 0.3,
+                    "tokens": 2,
+                }
+            ]
+        )
+    finally:
+        database.remove_write_listener(heard.extend)
+
+    rows = list(database.iter_usage_logs())
+    assert [row["user"] for row in rows] == ["u1", "u2", "u3"]
+    assert [row["prompt"] for row in rows] == [None, "failing prompt", None]
+    assert [row["prompt_retention"] for row in rows] == ["dropped", "error", "dropped"]
+    assert [row["prompt_sample_rate"] for row in rows] == [0.0, 1.0, 0.0]
+    assert [row["error"] for row in rows] == [None, "ConnectError", None]
+    assert rows[0]["latency"] == 0.2 and rows[2]["tokens"] == 2
+    assert [event["prompt"] for event in heard] == [
+        "first prompt",
+        "failing prompt",
+        "batched prompt",
+    ]
+
+
+@pytest.mark.unit
+def test_older_segments_and_reports(tmp_path):
+    """
+    Test compatibility of earlier segments and estimates from sampled prompts.
+
+    Asserts:
+        - A segment written without retention fields reads them as None and
+          is sealed, new rows going to a segment of the current layout.
+        - `llmops-report` counts a prompt kept at rate 0.25 four times and
+          skips dropped prompts.
+    """
+    directory = tmp_path / "segments"
+    directory.mkdir()
+    (directory / "strings.dict").write_bytes(
+        b"".join(struct.pack("<II", len(s), zlib.crc32(s)) + s for s in (b"u", b"m"))
+    )
+    (directory / "segment-00000000000000000001.blob").write_bytes(b"old prompt")
+    body = BODY_V2.pack(1, 1735689600.0, 1, 2, 0, 0.5, 3, 0, 10, 4, 0.1, 9, 0.3, 0, 0.5)
+    with open(directory / "segment-00000000000000000001.log", "wb") as segment:
+        segment.truncate(HEADER_SIZE + 4 * RECORD_V2.size)
+        segment.write(HEADER.pack(MAGIC_V2, RECORD_V2.size, 1))
+        segment.seek(HEADER_SIZE)
+        segment.write(body + struct.pack("<I28x", zlib.crc32(body)))
+
+    new = ("2025-01-01T00:01:00+00:00", "u", None, "m", 0.2, 1, None)
+    log = SegmentLogStore(str(directory))
+    try:
+        log.append([new + (None,) * 6 + (None, 0.05, "dropped")])
+        old, dropped = log.scan()
+        assert (old["prompt"], old["eval_count"], old["total_seconds"]) == (
+            "old prompt",
+            9,
+            0.5,
+        )
+        assert old["error"] is None and old["prompt_retention"] is None
+        assert dropped["prompt"] is None and dropped["prompt_sample_rate"] == 0.05
+        assert log._segments[-1].record is RECORD
+    finally:
+        log.close()
+
+    path = str(tmp_path / "usage.db")
+    SQLiteUsageStore(path).append(
+        [
+            ("2025-01-01T00:00:00+00:00", "u", prompt, "m", 0.1, 1, None)
+            + (None,) * 7
+            + (rate, retention)
+            for prompt, rate, retention in [
+                ("kept", 0.25, "sampled"),
+                ("slow one", 1.0, "slow"),
+                (None, 0.25, "dropped"),
+                (None, 0.25, "dropped"),
+            ]
+        ]
+    )
+    aggregate = aggregate_range(path, 1, 4)
+    assert aggregate.rows == 4
+    assert aggregate.prompts == {"kept": 4, "slow one": 1}
@@ -0,0 +1,221 @@
+"""
+test_segment_log.py
+
+Unit tests for the pluggable usage storage and the segment log backend.
+
+Verifies:
+- The `llmops.database` query functions return the same rows from the SQLite
+  and segment log backends.
+- Segments roll over when full and are reopened from their saved indexes.
+- Torn writes left by a crash are discarded on reopen, and the log keeps
+  appending with consecutive ids.
+- A log directory can only be opened by one writer.
+"""
+
+import os
+
+import pytest
+
+from llmops import database
+from llmops.storage.segment_log import HEADER_SIZE, RECORD, SegmentLogStore
+
+
+def _rows(count, start=0):
+    """Builds `count` rows in `USAGE_COLUMNS[1:]` order, one minute apart."""
+    return [
+        (
+            f"2025-01-01T{(start + i) // 60:02d}:{(start + i) % 60:02d}:00+00:00",
+            f"user-{i % 3}",
+            f"prompt {start + i}",
+            "llama3" if i % 2 else "openai-gpt",
+            0.1 * (i + 1),
+            i,
+            "llama3" if i % 5 == 0 else None,
+            *(
+                (i + 8, 0.02 * i, 3 * i, 0.25 * i, 0.5, 0.75 * i)
+                if i % 4
+                else [None] * 6
+            ),
+            "TimeoutError" if i % 7 == 3 else None,
+            *((0.05, "sampled") if i % 3 == 1 else (None, None)),
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def use_backend(tmp_path, monkeypatch):
+    """Returns a function pointing `llmops.database` at a fresh backend."""
+    for name in ("LLMOPS_DB_PATH", "LLMOPS_STORAGE_BACKEND", "LLMOPS_SEGMENT_DIR"):
+        monkeypatch.delenv(name, raising=False)
+
+    def use(backend):
+        database.close_usage_stores()
+        database.init_db(
+            str(tmp_path / backend / "usage.db"),
+            backend,
+            str(tmp_path / backend / "log"),
+        )
+        database.configure_query_cache(0, 0)
+
+    yield use
+    database.close_usage_stores()
+    for reader in (
+        database.get_db_path,
+        database.get_storage_backend,
+        database.get_segment_dir,
+    ):
+        reader.cache_clear()
+
+
+@pytest.mark.unit
+def test_query_functions_match_across_backends(use_backend):
+    """
+    Test that both backends answer every query function identically.
+
+    Asserts:
+        - Recent logs, model/user lookups, time ranges and streams are equal.
+        - Offset timestamps are stored in UTC by both backends.
+    """
+    results = {}
+    for backend in ("sqlite", "segment_log"):
+        use_backend(backend)
+        database.log_usage_batch(
+            dict(zip(database.USAGE_COLUMNS[1:], row)) for row in _rows(30)
+        )
+        database.log_usage_batch(
+            [
+                {
+                    "timestamp": "2025-01-01T02:15:00+02:00",
+                    "user": "user-0",
+                    "prompt": "",
+                    "model": "llama3",
+                    "latency": 0.5,
+                    "tokens": 1,
+                }
+            ]
+        )
+        row_id = database.log_usage("user-9", "é prompt", "llama3", 0.25, 3)
+        stamped = database.get_recent_logs(1)[0]["timestamp"]
+        assert stamped.endswith("+00:00")
+        results[backend] = {
+            "id": row_id,
+            "recent": database.get_recent_logs(5),
+            "model": database.get_usage_by_model("llama3"),
+            "user": database.get_usage_by_client("user-0"),
+            "missing": database.get_usage_by_client("nobody"),
+            "between": database.get_usage_between(
+                "2025-01-01T00:10:00", "2025-01-01T00:20:00+00:00"
+            ),
+            "scan": list(database.iter_usage_logs(after_id=25, chunk_size=2)),
+        }
+
+    # The last row is stamped with the time of each backend's own write
+    for result in results.values():
+        for rows in result.values():
+            for row in rows if isinstance(rows, list) else []:
+                if row["id"] == 32:
+                    row["timestamp"] = None
+    sqlite, segment = results["sqlite"], results["segment_log"]
+    for key in sqlite:
+        assert segment[key] == sqlite[key], key
+    assert sqlite["id"] == 32
+    assert [row["id"] for row in sqlite["between"]] == list(range(11, 21)) + [31]
+    assert sqlite["between"][-1]["timestamp"] == "2025-01-01T00:15:00+00:00"
+    assert sqlite["recent"][0]["user"] == "user-9"
+    assert [row["id"] for row in sqlite["scan"]] == list(range(26, 33))
+    assert sqlite["missing"] == []
+
+
+@pytest.mark.unit
+def test_segments_roll_over_and_reopen(tmp_path):
+    """
+    Test rollover into new segments and reopening a multi-segment log.
+
+    Asserts:
+        - Full segments are sealed with an index and a new one is started.
+        - A reopened log returns every row and continues the id sequence.
+        - Lookups and time ranges span segments.
+    """
+    directory = str(tmp_path / "log")
+    store = SegmentLogStore(directory, segment_records=8)
+    assert store.append(_rows(20)) == 1
+    assert sorted(name for name in os.listdir(directory) if name.endswith(".idx")) == [
+        "segment-00000000000000000001.idx",
+        "segment-00000000000000000009.idx",
+    ]
+    store.close()
+
+    store = SegmentLogStore(directory, segment_records=8)
+    try:
+        assert store.append(_rows(5, start=20)) == 21
+        rows = list(store.scan(chunk_size=3))
+        assert [row["id"] for row in rows] == list(range(1, 26))
+        assert [row["prompt"] for row in rows] == [f"prompt {i}" for i in range(25)]
+        assert [row["id"] for row in store.recent(10)] == list(range(25, 15, -1))
+        user_ids = [row["id"] for row in store.find("user", "user-1")]
+        assert user_ids == [2, 5, 8, 11, 14, 17, 20, 22, 25]
+        ranged = store.between("2025-01-01T00:06:00Z", "2025-01-01T00:18:00Z")
+        assert [row["id"] for row in ranged] == list(range(7, 19))
+        assert [row["id"] for row in store.scan(after_id=7, until_id=10)] == [8, 9, 10]
+    finally:
+        store.close()
+
+
+@pytest.mark.unit
+def test_recovery_discards_torn_writes(tmp_path):
+    """
+    Test reopening a log after a crash in the middle of an append.
+
+    Asserts:
+        - A record with a bad checksum and every record after it are dropped.
+        - Torn dictionary and prompt blob tails are truncated.
+        - Appends resume with the id of the first dropped record.
+    """
+    directory = str(tmp_path / "log")
+    store = SegmentLogStore(directory, segment_records=64)
+    store.append(_rows(10))
+    segment = os.path.join(directory, "segment-00000000000000000001")
+    blob_size = os.path.getsize(segment + ".blob")
+    dict_size = os.path.getsize(os.path.join(directory, "strings.dict"))
+    store.close()
+
+    # Corrupt record 8 and simulate half-written prompt and dictionary entries
+    with open(segment + ".log", "r+b") as log:
+        log.seek(HEADER_SIZE + 7 * RECORD.size + 20)
+        log.write(b"\xff\xff")
+    with open(segment + ".blob", "ab") as blob:
+        blob.write(b"torn prompt")
+    with open(os.path.join(directory, "strings.dict"), "ab") as strings:
+        strings.write(b"\x10\x00\x00\x00partial")
+
+    store = SegmentLogStore(directory, segment_records=64)
+    try:
+        assert [row["id"] for row in store.scan()] == list(range(1, 8))
+        assert os.path.getsize(os.path.join(directory, "strings.dict")) == dict_size
+        assert os.path.getsize(segment + ".blob") < blob_size
+        assert store.append(_rows(2, start=50)) == 8
+        assert [row["prompt"] for row in store.recent(3)] == [
+            "prompt 51",
+            "prompt 50",
+            "prompt 6",
+        ]
+    finally:
+        store.close()
+
+
+@pytest.mark.unit
+def test_log_directory_has_one_writer(tmp_path):
+    """
+    Test that a second store cannot open a directory already in use.
+
+    Asserts:
+        - RuntimeError is raised while the first store is open.
+        - The directory can be reopened once it is closed.
+    """
+    directory = str(tmp_path / "log")
+    store = SegmentLogStore(directory)
+    with pytest.raises(RuntimeError):
+        SegmentLogStore(directory)
+    store.close()
+    SegmentLogStore(directory).close()
@@ -0,0 +1,247 @@
+"""
+test_sharded_sqlite.py
+
+Unit tests for the sharded SQLite usage log backend.
+
+Verifies:
+- The `llmops.database` query functions return the same rows from the sharded
+  store as from a single SQLite file.
+- Rows land in the shard of their user and ids are unique across shards.
+- Streams merge the shards in id order and honour id bounds.
+- Recent rows are merged by timestamp even when ingested out of order.
+- Shard files cannot be reopened with another shard count.
+- Live subscribers resume without skipping or repeating events although ids
+  of different shards are not published in order.
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from llmops import database
+from llmops.events import UsageBroadcaster
+from llmops.storage.sharded_sqlite import (
+    ShardedSQLiteUsageStore,
+    shard_of,
+    shard_paths,
+)
+
+
+def _entries(count=40):
+    """Builds `count` usage entries for seven users, one minute apart."""
+    return [
+        {
+            "timestamp": f"2025-01-01T00:{i:02d}:00+00:00",
+            "user": f"user-{i % 7}",
+            "prompt": f"prompt {i}",
+            "model": "llama3" if i % 2 else "mistral",
+            "latency": 0.1 * (i + 1),
+            "tokens": i,
+        }
+        for i in range(count)
+    ]
+
+
+def _without_ids(rows):
+    """Drops the ids, which differ between backends."""
+    return [{k: v for k, v in row.items() if k != "id"} for row in rows]
+
+
+@pytest.fixture
+def use_backend(tmp_path, monkeypatch):
+    """Returns a function pointing `llmops.database` at a fresh backend."""
+    for name in ("LLMOPS_DB_PATH", "LLMOPS_STORAGE_BACKEND", "LLMOPS_SQLITE_SHARDS"):
+        monkeypatch.delenv(name, raising=False)
+
+    def use(backend, shards=4):
+        database.close_usage_stores()
+        database.init_db(
+            str(tmp_path / backend / "usage.db"), backend, sqlite_shards=shards
+        )
+        database.configure_query_cache(0, 0)
+
+    yield use
+    database.close_usage_stores()
+    for reader in (
+        database.get_db_path,
+        database.get_storage_backend,
+        database.get_sqlite_shards,
+    ):
+        reader.cache_clear()
+
+
+@pytest.mark.unit
+def test_sharded_queries_match_single_file(use_backend, tmp_path):
+    """
+    Test the query functions against one file and against four shards.
+
+    Asserts:
+        - Recent logs come newest first and equal the single-file result.
+        - Model, user and time range lookups return the same rows.
+        - Every shard file received rows, and each row is in its user's shard.
+        - Write listeners receive the ids the rows were stored with.
+    """
+    results = {}
+    for backend in ("sqlite", "sqlite_sharded"):
+        use_backend(backend)
+        events = []
+        database.add_write_listener(events.extend)
+        try:
+            database.log_usage_batch(_entries())
+        finally:
+            database.remove_write_listener(events.extend)
+        results[backend] = {
+            "recent": database.get_recent_logs(8),
+            "model": database.get_usage_by_model("llama3"),
+            "user": database.get_usage_by_client("user-3"),
+            "between": database.get_usage_between(
+                "2025-01-01T00:10:00", "2025-01-01T00:20:00"
+            ),
+        }
+        assert sorted(event["id"] for event in events) == [
+            row["id"] for row in database.iter_usage_logs()
+        ]
+
+    single, sharded = results["sqlite"], results["sqlite_sharded"]
+    assert [row["timestamp"][14:16] for row in sharded["recent"]] == [
+        f"{i:02d}" for i in range(39, 31, -1)
+    ]
+    assert _without_ids(sharded["recent"]) == _without_ids(single["recent"])
+    for key in ("model", "user", "between"):
+        by_prompt = sorted(_without_ids(sharded[key]), key=lambda row: row["timestamp"])
+        assert by_prompt == sorted(
+            _without_ids(single[key]), key=lambda row: row["timestamp"]
+        ), key
+
+    paths = shard_paths(str(tmp_path / "sqlite_sharded" / "usage.db"), 4)
+    assert all(os.path.exists(path) for path in paths)
+    for row in database.iter_usage_logs():
+        assert (row["id"] - 1) % 4 == shard_of(row["user"], 4)
+
+
+@pytest.mark.unit
+def test_sharded_scan_and_ids(tmp_path):
+    """
+    Test ids and streaming of a sharded store.
+
+    Asserts:
+        - One `append` across shards returns distinct ids in row order.
+        - `scan` yields every row once in id order, in chunks, and honours
+          `after_id` and `until_id`.
+        - A single-shard store numbers rows like a plain SQLite file.
+    """
+    store = ShardedSQLiteUsageStore(str(tmp_path / "usage.db"), shards=3)
+    rows = [
+        (e["timestamp"], e["user"], e["prompt"], e["model"], e["latency"], e["tokens"])
+        + (None,) * 10
+        for e in _entries(30)
+    ]
+    try:
+        ids = store.append_ids(rows)
+        assert len(set(ids)) == 30
+        scanned = list(store.scan(chunk_size=4))
+        assert [row["id"] for row in scanned] == sorted(ids)
+        by_id = {row["id"]: row["prompt"] for row in scanned}
+        assert [by_id[i] for i in ids] == [row[2] for row in rows]
+
+        window = [i for i in sorted(ids) if 10 < i <= 25]
+        assert [row["id"] for row in store.scan(after_id=10, until_id=25)] == window
+        assert [row["id"] for row in store.recent(3)] == ids[:-4:-1]
+    finally:
+        store.close()
+
+    single = ShardedSQLiteUsageStore(str(tmp_path / "single.db"), shards=1)
+    assert single.append_ids(rows[:5]) == [1, 2, 3, 4, 5]
+    single.close()
+
+
+@pytest.mark.unit
+def test_recent_with_out_of_order_timestamps(tmp_path):
+    """
+    Test `recent` when ingested timestamps do not follow insertion order.
+
+    Asserts:
+        - Rows come newest timestamp first across shards.
+    """
+    store = ShardedSQLiteUsageStore(str(tmp_path / "usage.db"), shards=2)
+    users = {}
+    for candidate in range(20):
+        users.setdefault(shard_of(f"user-{candidate}", 2), f"user-{candidate}")
+    stamps = [
+        ("2026-01-01T00:00:00+00:00", users[0]),
+        ("2025-01-01T00:00:00+00:00", users[1]),
+        ("2020-01-01T00:00:00+00:00", users[1]),
+        ("2024-01-01T00:00:00+00:00", users[0]),
+    ]
+    try:
+        store.append_ids(
+            [
+                (stamp, user, "p", "llama3", 0.1, 1) + (None,) * 10
+                for stamp, user in stamps
+            ]
+        )
+        assert [row["timestamp"][:4] for row in store.recent(3)] == [
+            "2026",
+            "2025",
+            "2024",
+        ]
+    finally:
+        store.close()
+
+
+@pytest.mark.unit
+def test_shard_count_is_fixed(tmp_path):
+    """
+    Test reopening shard files with another shard count.
+
+    Asserts:
+        - ValueError is raised instead of hashing users to other shards.
+    """
+    path = str(tmp_path / "usage.db")
+    store = ShardedSQLiteUsageStore(path, shards=2)
+    store.append([("2025-01-01T00:00:00+00:00", "u", "p", "m", 0.1, 1) + (None,) * 10])
+    store.close()
+    with pytest.raises(ValueError):
+        ShardedSQLiteUsageStore(path, shards=3)
+    ShardedSQLiteUsageStore(path, shards=2).close()
+
+
+@pytest.mark.unit
+def test_live_resume_across_shards(use_backend):
+    """
+    Test resuming the live feed over a two-shard store.
+
+    Asserts:
+        - Published row ids are not increasing, as users write to different
+          shards at different rates.
+        - Resuming after any delivered event replays exactly the events
+          published after it, with no false gap.
+    """
+    use_backend("sqlite_sharded", shards=2)
+    users = {shard_of(f"user-{i}", 2): f"user-{i}" for i in range(20)}
+    broadcaster = UsageBroadcaster()
+    database.add_write_listener(broadcaster.publish)
+    try:
+        for _ in range(3):
+            database.log_usage(users[0], "p", "llama3", 0.1, 1)
+        for user in (users[1], users[0], users[1]):
+            database.log_usage(user, "p", "llama3", 0.1, 1)
+    finally:
+        database.remove_write_listener(broadcaster.publish)
+
+    async def resume(last_id):
+        sub = broadcaster.subscribe(last_id=last_id)
+        try:
+            return await sub.next_batch(timeout=0.01)
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    published, dropped = asyncio.run(resume(broadcaster.event_id(0)))
+    ids = [event["id"] for _, event in published]
+    assert dropped == 0 and len(ids) == 6
+    assert ids != sorted(ids)
+    for position, (sequence, _) in enumerate(published):
+        replayed, dropped = asyncio.run(resume(broadcaster.event_id(sequence)))
+        assert dropped == 0
+        assert [event["id"] for _, event in replayed] == ids[position + 1 :]
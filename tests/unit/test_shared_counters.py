@@ -0,0 +1,132 @@
+"""
+test_shared_counters.py
+
+Unit tests for the shared per-client counter table and its SQLite snapshots.
+
+Verifies:
+- Concurrent increments from several processes sharing a file are not lost.
+- Snapshots round-trip through SQLite and are restored only once per table.
+- A full table drops increments instead of failing.
+- A lookup racing a claim of the same key finds the claimed slot.
+"""
+
+import multiprocessing
+import os
+import struct
+import threading
+
+import pytest
+
+from llmops.database import get_db_path
+from llmops.mcp import client_tracker
+from llmops.mcp.shared_counters import (
+    HEADER_SIZE,
+    SLOT,
+    SharedCounterTable,
+    _encode_key,
+    _hash_key,
+)
+
+
+def _hammer(path, increments):
+    """Adds `increments` requests of 2 tokens to the same key from a new process."""
+    table = SharedCounterTable(path=path)
+    for _ in range(increments):
+        table.add("shared-client", requests=1, tokens=2)
+    table.close()
+
+
+@pytest.mark.unit
+def test_increments_shared_across_processes(tmp_path):
+    """
+    Test that workers mapping the same file see each other's increments.
+
+    Asserts:
+        - Totals equal the sum of all processes' increments.
+    """
+    path = str(tmp_path / "counters.mmap")
+    table = SharedCounterTable(path=path, slots=64)
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_hammer, args=(path, 500)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert table.get("shared-client") == (1500, 3000)
+    assert list(table.items()) == [("shared-client", 1500, 3000)]
+    table.close()
+
+
+@pytest.mark.unit
+def test_snapshot_and_restore(tmp_path):
+    """
+    Test persisting counters to SQLite and restoring them after a restart.
+
+    Asserts:
+        - Restored stats match the stats before the snapshot.
+        - A second restore into the same table is a no-op.
+    """
+    os.environ["LLMOPS_DB_PATH"] = str(tmp_path / "usage.db")
+    get_db_path.cache_clear()
+    path = str(tmp_path / "counters.mmap")
+
+    client_tracker.configure_client_counters(path)
+    client_tracker.log_client_usage("durable-client", "llama3", 10)
+    client_tracker.log_client_usage("durable-client", "llama3", 20)
+    assert client_tracker.snapshot_client_usage() == 1
+
+    os.remove(path)
+    client_tracker.configure_client_counters(path)
+    assert client_tracker.restore_client_usage()
+    assert not client_tracker.restore_client_usage()
+    stats = client_tracker.get_client_stats("durable-client")
+    assert stats == {"total_tokens": 30, "request_count": 2, "avg_tokens": 15.0}
+
+    client_tracker.configure_client_counters()
+
+
+@pytest.mark.unit
+def test_full_table_drops_increments():
+    """
+    Test behaviour once every slot is claimed.
+
+    Asserts:
+        - Known keys keep counting; new keys are rejected.
+    """
+    table = SharedCounterTable(slots=2)
+    assert table.add("a") and table.add("b")
+    assert not table.add("c")
+    assert table.add("a", tokens=5)
+    assert table.get("a") == (2, 5)
+    assert table.get("c") == (0, 0)
+
+
+@pytest.mark.unit
+def test_lookup_waits_for_a_claim_in_progress():
+    """
+    Test a lookup that sees a slot whose hash is written but not its key yet.
+
+    Asserts:
+        - The lookup returns the slot being claimed instead of claiming a
+          second slot for the same key.
+    """
+    table = SharedCounterTable(slots=8)
+    encoded = _encode_key("racing-client")
+    key_hash = _hash_key(encoded)
+    slot = key_hash % table.slots
+    offset = HEADER_SIZE + slot * SLOT.size
+    found = []
+    lookup = threading.Thread(
+        target=lambda: found.append(table._find("racing-client", create=True))
+    )
+
+    with table._locked(slot):
+        struct.pack_into("<Q", table._mm, offset, key_hash)
+        lookup.start()
+        lookup.join(0.2)
+        SLOT.pack_into(table._mm, offset, key_hash, encoded, 0, 0)
+    lookup.join()
+
+    assert found == [slot]
+    assert [key for key, _, _ in table.items()] == ["racing-client"]
@@ -0,0 +1,101 @@
+"""
+test_timing.py
+
+Unit test for per-stage request timing in `timing.py`.
+
+Verifies:
+- A `/llm` request records auth, policy, upstream, db and serialize stages.
+- Stages are reported in the `Server-Timing` header and stage histograms.
+- Stage histograms are labelled with the route template, not the raw path.
+"""
+
+import datetime
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from llmops.config import Settings
+from llmops.main import create_app
+from llmops.timing import span
+
+
+@pytest.mark.unit
+def test_llm_stage_timings(tmp_path):
+    """
+    Test that `/llm` exposes its stage breakdown.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+
+    Asserts:
+        - The Server-Timing header names every instrumented stage plus total.
+        - The db stage histogram received an observation for `/llm`.
+    """
+    secret = "timing-secret"
+    settings = Settings(
+        jwt_secret=secret, db_path=str(tmp_path / "u.db"), server_timing=True
+    )
+    exp = datetime.datetime.utcnow() + datetime.timedelta(minutes=5)
+    token = jwt.encode({"sub": "demo-user", "exp": exp}, secret, algorithm="HS256")
+
+    def db_observations():
+        return (
+            REGISTRY.get_sample_value(
+                "request_stage_seconds_count", {"endpoint": "/llm", "stage": "db"}
+            )
+            or 0.0
+        )
+
+    before = db_observations()
+    with TestClient(create_app(settings)) as client:
+        res = client.post(
+            "/llm",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"prompt": "time me"},
+        )
+
+    assert res.status_code == 200
+    header = res.headers["server-timing"]
+    for stage in ("auth", "policy", "upstream", "db", "serialize", "total"):
+        assert f"{stage};dur=" in header
+    assert db_observations() == before + 1
+
+
+@pytest.mark.unit
+def test_stage_endpoint_is_route_template(tmp_path):
+    """
+    Test the endpoint label of a route with a path parameter.
+
+    Args:
+        tmp_path (Path): pytest fixture providing a unique temporary directory.
+
+    Asserts:
+        - Requests for different parameter values share one series labelled
+          with the route template.
+    """
+    app = create_app(
+        Settings(jwt_secret="timing-secret", db_path=str(tmp_path / "u.db"))
+    )
+
+    @app.get("/probe/{item}")
+    def probe(item: str):
+        with span("db"):
+            return {"item": item}
+
+    def observations(endpoint):
+        return (
+            REGISTRY.get_sample_value(
+                "request_stage_seconds_count", {"endpoint": endpoint, "stage": "db"}
+            )
+            or 0.0
+        )
+
+    before = observations("/probe/{item}")
+    with TestClient(app) as client:
+        for item in ("a", "b", "c"):
+            assert client.get(f"/probe/{item}").status_code == 200
+
+    assert observations("/probe/{item}") == before + 3
+    assert observations("/probe/a") == 0.0
@@ -0,0 +1,149 @@
+"""
+test_warmup.py
+
+Unit tests for model warm-up, keep-alive and readiness.
+
+Verifies:
+- Startup loads every model on every backend with an empty prompt.
+- Recently used models are re-pinged once half their keep-alive has elapsed;
+  idle models are left to unload.
+- `/ready` answers 503 until the served models are warm, and `/llm/echo`
+  sends Ollama's `keep_alive`.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from llmops.config import Settings
+from llmops.main import create_app
+from llmops.mcp.backend_pool import BackendPool
+from llmops.mcp.model_registry import register_model
+from llmops.mcp.warmup import WarmupManager
+
+
+class FakeOllama:
+    """Records `/api/generate` payloads; `down` hosts refuse connections."""
+
+    def __init__(self):
+        self.calls = []
+        self.down = set()
+
+    def __call__(self, request):
+        if request.url.host in self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        payload = json.loads(request.content)
+        self.calls.append((request.url.host, payload))
+        return httpx.Response(200, json={"response": "", "done_reason": "load"})
+
+
+def _pool(ollama):
+    """Returns a backend pool whose client talks to `ollama`."""
+    pool = BackendPool(default_url="http://ollama:11434")
+    pool._client = httpx.AsyncClient(transport=httpx.MockTransport(ollama))
+    return pool
+
+
+@pytest.mark.unit
+def test_warm_up_and_keep_alive_rounds():
+    """
+    Test warm-up rounds against two backends of one model.
+
+    Asserts:
+        - The first round loads the model on both backends with an empty
+          prompt and the configured keep-alive, and the manager turns ready.
+        - Warm backends are not pinged again until half the keep-alive passed.
+        - After `idle_seconds` without calls the model is no longer pinged and
+          no longer holds back readiness.
+    """
+    register_model("warm-model", "1", endpoints=["http://gpu-a:1", "http://gpu-b:1"])
+    ollama = FakeOllama()
+    warmup = WarmupManager(_pool(ollama), keep_alive_seconds=600, idle_seconds=1000)
+
+    async def scenario():
+        assert not warmup.ready(now=0)
+        await warmup.keep_warm(["warm-model"], now=0)
+        assert warmup.ready(now=0)
+        assert sorted(host for host, _ in ollama.calls) == ["gpu-a", "gpu-b"]
+        assert ollama.calls[0][1] == {
+            "model": "warm-model",
+            "prompt": "",
+            "stream": False,
+            "keep_alive": 600,
+        }
+
+        await warmup.keep_warm(["warm-model"], now=200)
+        assert len(ollama.calls) == 2
+        await warmup.keep_warm(["warm-model"], now=300)
+        assert len(ollama.calls) == 4
+
+        warmup.touch("warm-model", now=1000)
+        await warmup.keep_warm(["warm-model"], now=1500)
+        assert len(ollama.calls) == 6
+        await warmup.keep_warm(["warm-model"], now=2100)
+        assert len(ollama.calls) == 6
+        assert warmup.ready(now=2100)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+def test_readiness_waits_for_warm_models(tmp_path):
+    """
+    Test `/ready` and the keep-alive of `/llm/echo` through the app.
+
+    Asserts:
+        - `/ready` is 503 with the failing backend's error while the model
+          cannot be loaded, and 200 once a later round loads it.
+        - `/llm/echo` payloads carry `keep_alive`.
+    """
+    secret = "warm-secret"
+    app = create_app(
+        Settings(
+            jwt_secret=secret,
+            db_path=str(tmp_path / "usage.db"),
+            ollama_model="ready-model",
+            ollama_url="http://cold:11434",
+            health_check_interval=0,
+            mcp_reload_interval=0,
+            client_snapshot_interval=0,
+            warmup_interval=0.05,
+            keep_alive_seconds=900,
+        )
+    )
+    ollama = FakeOllama()
+    ollama.down.add("cold")
+    app.state.backend_pool._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(ollama)
+    )
+    token = jwt.encode(
+        {"sub": "warm-user", "exp": int(time.time()) + 60}, secret, algorithm="HS256"
+    )
+
+    with TestClient(app) as client:
+        time.sleep(0.1)
+        warming = client.get("/ready")
+        ollama.down.clear()
+        deadline = time.monotonic() + 5
+        while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        ready = client.get("/ready")
+        client.post(
+            "/llm/echo",
+            json={"prompt": "hello"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    assert warming.status_code == 503
+    assert warming.json()["status"] == "warming"
+    (backend,) = warming.json()["models"]["ready-model"]["backends"]
+    assert "connection refused" in backend["error"]
+    assert ready.status_code == 200
+    assert ready.json()["models"]["ready-model"]["warm"] is True
+    echo_payload = next(p for _, p in ollama.calls if p["prompt"] == "hello")
+    assert echo_payload["keep_alive"] == 900